@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import hmac
+import io
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from code_assistant import create_assistant
+from context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET
+from git_mirror import GitMirrorCache, GitMirrorError
+from http_util import HTTPError, chunk, read_request
+from model_router import AUTO_MODEL, DEFAULT_TEMPERATURE
+from project_analysis import json_default
+from project_index import ProjectIndex
+from structured_output import RECOMMENDATION_SECTIONS
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_HOST = os.getenv("CODEHELPER_API_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("CODEHELPER_API_PORT", "8765"))
+# Requests executed at once; up to DEFAULT_MAX_QUEUE more wait, beyond that requests get 429
+DEFAULT_CONCURRENCY = int(os.getenv("CODEHELPER_API_CONCURRENCY", "8"))
+DEFAULT_MAX_QUEUE = int(os.getenv("CODEHELPER_API_MAX_QUEUE", "64"))
+# Bearer token required on every endpoint but /health when set
+DEFAULT_API_TOKEN = os.getenv("CODEHELPER_API_TOKEN", "")
+
+MAX_BATCH_REQUESTS = 100
+MAX_ZIP_UNCOMPRESSED_BYTES = 512 * 1024 * 1024
+# git_url schemes accepted without --project-root; local paths and file:// must be inside the root
+REMOTE_GIT_PREFIXES = ("https://", "ssh://", "git@")
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway",
+}
+
+def encode_json(value):
+    return json.dumps(value, default=json_default).encode("utf-8")
+
+def require(payload, *names):
+    """Return the named string fields of a request payload, raising 400 if one is missing"""
+    values = []
+    for name in names:
+        value = payload.get(name)
+        if not isinstance(value, str) or not value:
+            raise HTTPError(400, f'"{name}" is required')
+        values.append(value)
+    return values
+
+def decode_base64(payload, name):
+    try:
+        return base64.b64decode(require(payload, name)[0], validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPError(400, f'"{name}" is not valid base64')
+
+def path_in_root(project_root, path, name="path"):
+    """Resolve a request path against the project root; 400 unless it is a directory inside it"""
+    if project_root is None:
+        raise HTTPError(400, "Local paths are disabled; start the server with --project-root")
+    resolved = os.path.realpath(os.path.join(project_root, path))
+    if os.path.commonpath([resolved, project_root]) != project_root or not os.path.isdir(resolved):
+        raise HTTPError(400, f"{name} must be a directory inside the project root")
+    return resolved
+
+def check_git_url(url, project_root=None):
+    """Return what to clone for a request's git_url
+
+    Remote https://, ssh:// and git@ URLs are used as given. Local repositories
+    (a path or a file:// URL) are only accepted inside project_root, like "path".
+    """
+    if not isinstance(url, str) or not url:
+        raise HTTPError(400, '"git_url" is required')
+    if url.startswith(REMOTE_GIT_PREFIXES):
+        return url
+    if project_root is None:
+        raise HTTPError(400, "git_url must be an https://, ssh:// or git@ URL")
+    return path_in_root(project_root, url[len("file://"):] if url.startswith("file://") else url, "git_url")
+
+def request_settings(payload):
+    """Return the (model, temperature) a request asks for; "auto" routes by prompt"""
+    model = payload.get("model") or AUTO_MODEL
+    try:
+        temperature = float(payload.get("temperature", DEFAULT_TEMPERATURE))
+    except (TypeError, ValueError):
+        raise HTTPError(400, '"temperature" must be a number')
+    return model, min(max(temperature, 0.0), 2.0)
+
+def request_token_budget(payload):
+    """Return the architecture context token budget a request asks for"""
+    value = payload.get("token_budget")
+    if value is None or value == "":
+        return DEFAULT_CONTEXT_TOKEN_BUDGET
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise HTTPError(400, '"token_budget" must be a positive integer')
+    return value
+
+class APIServer:
+    """Headless HTTP/1.1 JSON API over a CodeAssistant, built on asyncio streams
+
+    Handlers run in a thread pool of max_concurrency workers; up to max_queue more
+    requests wait for a worker and any further ones are rejected with 429. Requests
+    with "stream": true get newline-delimited JSON events over a chunked response.
+    POST /v1/batch runs a list of requests concurrently and returns their results
+    in order.
+    """
+
+    def __init__(self, assistant, max_concurrency=DEFAULT_CONCURRENCY, max_queue=DEFAULT_MAX_QUEUE,
+                 token=DEFAULT_API_TOKEN, project_root=None):
+        self.assistant = assistant
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.token = token
+        self.project_root = os.path.realpath(project_root) if project_root else None
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="api")
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.pending = 0
+        self._mirror_cache = None
+        self.handlers = {
+            "ask": self.ask,
+            "image": self.analyze_image,
+            "transcribe": self.transcribe,
+            "translate": self.translate,
+            "analyze": self.analyze,
+        }
+
+    # --- capabilities (run in worker threads) ---
+
+    def ask(self, payload, emit=None):
+        prompt, = require(payload, "prompt")
+        settings = request_settings(payload)
+        if emit is None:
+            return {"answer": self.assistant.ask(prompt, settings)}
+        answer = []
+        for delta in self.assistant.ask_stream(prompt, settings):
+            answer.append(delta)
+            emit({"delta": delta})
+        return {"answer": "".join(answer)}
+
+    def analyze_image(self, payload, emit=None):
+        prompt, = require(payload, "prompt")
+        image = base64.b64encode(decode_base64(payload, "image_base64")).decode("ascii")
+        mime_type = payload.get("mime_type") or "image/jpeg"
+        return {"answer": self.assistant.analyze_image(prompt, image, request_settings(payload), mime_type)}
+
+    def transcribe(self, payload, emit=None):
+        data = decode_base64(payload, "audio_base64")
+        file_name = os.path.basename(payload.get("file_name") or "audio.wav")
+        return {"text": self.assistant.transcribe(file_name, data)}
+
+    def translate(self, payload, emit=None):
+        code, source_language, target_language = require(payload, "code", "source_language", "target_language")
+        return {"translation": self.assistant.translate(code, source_language, target_language,
+                                                        request_settings(payload))}
+
+    def analyze(self, payload, emit=None):
+        token_budget = request_token_budget(payload)
+        with self.open_project(payload) as index:
+            if not len(index):
+                raise HTTPError(400, "The project contains no files")
+            results = self.assistant.analyze_architecture(
+                index,
+                request_settings(payload),
+                token_budget=token_budget,
+                use_map_reduce=bool(payload.get("map_reduce")),
+                on_section=(lambda key, value: emit({"section": key, "value": value})) if emit else None,
+                on_step=(lambda step, **details: emit({"step": step})) if emit else None,
+            )
+        analysis = results["analysis"]
+        return {
+            "files": len(index),
+            "structure": analysis["structure"],
+            "dependencies": analysis["dependencies"],
+            "dependency_stats": analysis["dependency_stats"],
+            "patterns": analysis["patterns"],
+            "complexity": analysis["complexity"],
+            "recommendations": {key: results["recommendations"].get(key) for key in RECOMMENDATION_SECTIONS
+                                if key in results["recommendations"]},
+            "blueprint": results["blueprint"],
+            "map_reduce": results["map_reduce"] and results["map_reduce"]["stats"],
+        }
+
+    def open_project(self, payload):
+        """Return a context manager yielding the ProjectIndex a request points at"""
+        if payload.get("git_url"):
+            url = check_git_url(payload["git_url"], self.project_root)
+            return GitProject(self.mirror_cache(), url, payload.get("ref") or "HEAD")
+        if payload.get("zip_base64"):
+            return ZipProject(decode_base64(payload, "zip_base64"))
+        if payload.get("path"):
+            return LocalProject(path_in_root(self.project_root, payload["path"]))
+        raise HTTPError(400, 'One of "git_url", "zip_base64" or "path" is required')
+
+    def mirror_cache(self):
+        if self._mirror_cache is None:
+            self._mirror_cache = GitMirrorCache()
+        return self._mirror_cache
+
+    # --- scheduling ---
+
+    async def run(self, function, *args, admit=True):
+        """Run function in the worker pool once a slot is free; 429 if too many requests are waiting"""
+        if admit and self.pending >= self.max_concurrency + self.max_queue:
+            raise HTTPError(429, "Too many requests are queued; retry later")
+        self.pending += 1
+        try:
+            async with self.slots:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    async def run_streaming(self, handler, payload, send):
+        """Run a handler with an emit callback, forwarding each event to send() as it happens"""
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        done = object()
+
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        task = asyncio.ensure_future(self.run(handler, payload, emit))
+        task.add_done_callback(lambda _: events.put_nowait(done))
+        while True:
+            event = await events.get()
+            if event is done:
+                break
+            await send(event)
+        return task.result()
+
+    async def batch(self, payload):
+        requests = payload.get("requests")
+        if not isinstance(requests, list) or not requests:
+            raise HTTPError(400, '"requests" must be a non-empty list')
+        if len(requests) > MAX_BATCH_REQUESTS:
+            raise HTTPError(413, f"A batch may hold at most {MAX_BATCH_REQUESTS} requests")
+
+        async def run_one(request):
+            try:
+                if not isinstance(request, dict) or request.get("endpoint") not in self.handlers:
+                    raise HTTPError(400, f'"endpoint" must be one of {", ".join(self.handlers)}')
+                # The batch was admitted as a whole, so its items wait for a slot instead of being rejected
+                result = await self.run(self.handlers[request["endpoint"]], request, admit=False)
+                return {"status": 200, "result": result}
+            except HTTPError as e:
+                return {"status": e.status, "error": str(e)}
+            except Exception as e:
+                return {"status": 502, "error": str(e)}
+
+        if self.pending >= self.max_concurrency + self.max_queue:
+            raise HTTPError(429, "Too many requests are queued; retry later")
+        return {"results": await asyncio.gather(*(run_one(request) for request in requests))}
+
+    # --- HTTP ---
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        return await asyncio.start_server(self.handle_connection, host, port, limit=64 * 1024)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self.dispatch(writer, method, path, headers, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, method, path, headers, body, keep_alive):
+        path = path.split("?", 1)[0]
+        try:
+            if path == "/health":
+                return await write_response(writer, 200, {"status": "ok", "pending": self.pending}, keep_alive)
+            if self.token and not hmac.compare_digest(headers.get("authorization", ""), f"Bearer {self.token}"):
+                raise HTTPError(401, "Missing or wrong bearer token")
+            if path == "/metrics" and method == "GET":
+                text = self.assistant.metrics.prometheus_text().encode("utf-8")
+                return await write_raw(writer, 200, "text/plain; version=0.0.4", text, keep_alive)
+
+            name = path[len("/v1/"):] if path.startswith("/v1/") else None
+            if name != "batch" and name not in self.handlers:
+                raise HTTPError(404, f"No endpoint {path}")
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise HTTPError(400, "The request body is not valid JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "The request body must be a JSON object")
+
+            if name == "batch":
+                return await write_response(writer, 200, await self.batch(payload), keep_alive)
+            if payload.get("stream"):
+                return await self.stream(writer, self.handlers[name], payload, keep_alive)
+            result = await self.run(self.handlers[name], payload)
+            return await write_response(writer, 200, result, keep_alive)
+        except HTTPError as e:
+            await write_response(writer, e.status, {"error": str(e)}, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            # Model and repository errors are upstream failures, not bugs in the request
+            await write_response(writer, 502, {"error": str(e)}, keep_alive)
+
+    async def stream(self, writer, handler, payload, keep_alive):
+        """Answer with newline-delimited JSON events, ending with {"done": true, "result": ...}"""
+        if self.pending >= self.max_concurrency + self.max_queue:
+            raise HTTPError(429, "Too many requests are queued; retry later")
+        writer.write(response_head(200, "application/x-ndjson", chunked=True, keep_alive=keep_alive))
+
+        async def send(event):
+            writer.write(chunk(encode_json(event) + b"\n"))
+            await writer.drain()
+
+        try:
+            result = await self.run_streaming(handler, payload, send)
+            await send({"done": True, "result": result})
+        except HTTPError as e:
+            await send({"done": True, "status": e.status, "error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            await send({"done": True, "status": 502, "error": str(e)})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+class GitProject:
+    """Index a repository straight from its mirror's objects, pinned to one commit"""
+
+    def __init__(self, mirror_cache, url, ref):
+        self.mirror_cache, self.url, self.ref = mirror_cache, url, ref
+
+    def __enter__(self):
+        try:
+            commit = self.mirror_cache.resolve(self.url, self.ref)
+        except GitMirrorError as e:
+            raise HTTPError(400, f"Git error: {e}")
+        return ProjectIndex.from_git(self.mirror_cache.mirror_path(self.url), commit)
+
+    def __exit__(self, *exc_info):
+        return False
+
+class ZipProject:
+    """Extract an uploaded ZIP archive to a temporary directory for the duration of a request"""
+
+    def __init__(self, data):
+        self.data = data
+        self.temp_dir = None
+
+    def __enter__(self):
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(self.data))
+        except zipfile.BadZipFile:
+            raise HTTPError(400, "zip_base64 is not a ZIP archive")
+        with archive:
+            if sum(info.file_size for info in archive.infolist()) > MAX_ZIP_UNCOMPRESSED_BYTES:
+                raise HTTPError(413, "The archive is too large once extracted")
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="codehelper-api-")
+            archive.extractall(self.temp_dir.name)
+        return ProjectIndex.from_directory(self.temp_dir.name)
+
+    def __exit__(self, *exc_info):
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+        return False
+
+class LocalProject:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        return ProjectIndex.from_directory(self.path)
+
+    def __exit__(self, *exc_info):
+        return False
+
+def response_head(status, content_type, length=None, chunked=False, keep_alive=True):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Unknown')}", f"Content-Type: {content_type}"]
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append(f"Content-Length: {length}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+async def write_raw(writer, status, content_type, body, keep_alive=True):
+    writer.write(response_head(status, content_type, len(body), keep_alive=keep_alive) + body)
+    await writer.drain()
+
+async def write_response(writer, status, value, keep_alive=True):
+    await write_raw(writer, status, "application/json", encode_json(value), keep_alive)
+
+async def serve(server, host, port):
+    listener = await server.start(host, port)
+    print(f"Serving the Code Helper API on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless HTTP API for the Code Helper")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests executed at once")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Requests waiting for a worker before new ones get 429")
+    parser.add_argument("--project-root", help="Allow analysing local directories and git repositories below this path")
+    parser.add_argument("--stub", action="store_true", help="Answer with the offline stub client instead of Groq")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds the stub client waits per request")
+    args = parser.parse_args(argv)
+
+    server = APIServer(
+        create_assistant(args.stub, args.stub_latency),
+        max_concurrency=args.concurrency,
+        max_queue=args.max_queue,
+        project_root=args.project_root,
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -10,24 +10,40 @@ st.set_page_config(
 import speech_recognition as sr
 import base64
 from groq import Groq
+import httpx
 import os
 from dotenv import load_dotenv
 from ui_components import (
     set_page_style, create_sidebar, create_header,
-    create_text_tab, create_image_tab, create_voice_tab, create_code_translation_tab,
-    display_response, display_loading_animation
+    create_text_tab, create_image_tab, create_voice_tab, create_fallback_voice_tab,
+    create_code_translation_tab, display_response, display_loading_animation,
+    display_workspace_usage, display_memory_usage, display_request_metrics, display_conversation,
+    create_follow_up_buttons, display_speculation_stats, display_semantic_cache_stats
 )
 import io
 import contextlib
 import datetime
-import networkx as nx
-import matplotlib.pyplot as plt
-import tempfile
+import time
 import zipfile
-import shutil
-import subprocess
-import json
-from pathlib import Path
+import hashlib
+from collections import OrderedDict
+import uuid
+from workspace import WorkspaceManager, WorkspaceQuotaError
+from session_memory import Holding, SessionMemory, SessionMemoryError, base64_length, deep_size
+from git_mirror import GitMirrorCache, GitMirrorError
+from project_index import ProjectIndex, GitProjectIndex
+from context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET
+from project_analysis import get_project_structure_text
+from graph_view import expandable_packages, render_dependency_view
+from map_reduce_analysis import MAP_REDUCE_FILE_THRESHOLD, SummaryCache
+from model_router import AUTO_MODEL, DEFAULT_TEMPERATURE, ModelRouter
+from request_metrics import DEFAULT_METRICS_FILE, RequestMetrics
+from tracing import tracer
+from conversation import Conversation
+from code_assistant import TASK_TABS, CodeAssistant
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from speculation import DEFAULT_TOP_K, FOLLOW_UPS, RateBudget, Speculator
 
 # Load environment variables from .env file
 load_dotenv()
@@ -43,13 +59,10 @@ def get_api_key():
     
     return api_key
 
-# Initialize Groq client with more robust API key handling
+# Check the API key up front; the Groq client itself is created once per process in get_code_assistant()
 groq_api_key = get_api_key()
-if groq_api_key:
-    groq_client = Groq(api_key=groq_api_key)
-else:
+if not groq_api_key:
     st.error("No Groq API key found. Please set it in the Streamlit secrets or .env file")
-    groq_client = None
 
 # Initialize usage counters
 if "text_queries" not in st.session_state:
@@ -60,49 +73,178 @@ if "voice_queries" not in st.session_state:
     st.session_state.voice_queries = 0
 if "translation_queries" not in st.session_state:
     st.session_state.translation_queries = 0
+if "render_timings" not in st.session_state:
+    st.session_state.render_timings = {}
+
+# Number of extracted projects (and their analysis results) kept per session
+ARCHITECTURE_CACHE_SIZE = 3
+
+# Fragments rerun only their own function when a widget inside them changes
+# (st.fragment in Streamlit >= 1.37); fall back to full reruns on older versions
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", lambda func: func)
+
+@st.cache_resource
+def get_workspace_manager():
+    """Return the process-wide manager for temporary directories, with its reaper running"""
+    manager = WorkspaceManager()
+    manager.start_reaper()
+    return manager
+
+@st.cache_resource
+def get_session_memory():
+    """Return the process-wide ledger of the bytes each session holds in memory"""
+    return SessionMemory()
+
+@st.cache_resource
+def get_git_mirror_cache():
+    """Return the process-wide cache of bare repository mirrors"""
+    return GitMirrorCache()
+
+@st.cache_resource
+def get_package_summary_cache():
+    """Return the process-wide cache of per-package summaries used in map-reduce mode"""
+    return SummaryCache()
+
+@st.cache_resource
+def get_model_router():
+    """Return the process-wide model router, which also keeps per-model latency statistics"""
+    return ModelRouter()
+
+@st.cache_resource
+def get_request_metrics():
+    """Return the process-wide request metrics, writing them to the Prometheus file if one is configured"""
+    metrics = RequestMetrics()
+    if DEFAULT_METRICS_FILE:
+        metrics.start_exporter(DEFAULT_METRICS_FILE)
+    return metrics
+
+@st.cache_resource
+def get_rate_budget():
+    """Return the process-wide view of the Groq rate limits, fed by the client's response headers"""
+    return RateBudget()
+
+@st.cache_resource
+def get_response_cache():
+    """Return the process-wide cache of prefetched follow-up answers"""
+    return ResponseCache()
+
+@st.cache_resource
+def get_semantic_cache():
+    """Return the process-wide cache that answers questions similar to ones asked before"""
+    return SemanticCache()
+
+@st.cache_resource
+def get_code_assistant():
+    """Return the process-wide CodeAssistant shared by all sessions"""
+    groq_client = None
+    if groq_api_key:
+        groq_client = Groq(
+            api_key=groq_api_key,
+            http_client=httpx.Client(event_hooks={"response": [get_rate_budget().observe]})
+        )
+    return CodeAssistant(
+        groq_client,
+        router=get_model_router(),
+        metrics=get_request_metrics(),
+        summary_cache=get_package_summary_cache(),
+        response_cache=get_response_cache(),
+        semantic_cache=get_semantic_cache()
+    )
+
+@st.cache_resource
+def get_speculator():
+    """Return the process-wide prefetcher of likely follow-up answers"""
+    return Speculator(get_code_assistant(), get_response_cache(), get_rate_budget())
+
+def get_session_id():
+    """Return a stable identifier for the current browser session"""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def get_memory_holdings():
+    """Return this session's memory holdings; they are released together with the session state"""
+    if "memory_holdings" not in st.session_state:
+        st.session_state.memory_holdings = {}
+    return st.session_state.memory_holdings
+
+def track_upload(label, uploaded_file):
+    """Charge an upload that Streamlit keeps in memory to this session
+    
+    Returns False, after showing an error, if it would take the session over its memory cap.
+    """
+    holdings = get_memory_holdings()
+    key = f"upload:{label}"
+    holding = holdings.get(key)
+    if holding is not None and uploaded_file is not None and holding.tag == uploaded_file.file_id:
+        return True
+    if holding is not None:
+        holdings.pop(key).release()
+    if uploaded_file is None:
+        return True
+    
+    try:
+        holding = get_session_memory().hold(get_session_id(), key, uploaded_file.size, label=label)
+    except SessionMemoryError as e:
+        st.error(str(e))
+        return False
+    holding.tag = uploaded_file.file_id
+    holdings[key] = holding
+    return True
 
 # === HELPER FUNCTIONS ===
-def ask_groq(prompt):
+def get_model_settings():
+    """Return the (model, temperature) chosen in the sidebar
+    
+    main() stores them in session state, so tab fragments that rerun on their own still see them.
+    """
+    return st.session_state.get("model_settings", (AUTO_MODEL, DEFAULT_TEMPERATURE))
+
+def show_similar_question(cached_question, similarity):
+    st.caption(f"♻️ Answered from a similar earlier question ({similarity:.0%} similar): \"{cached_question}\"")
+
+def ask_groq(prompt, tab=None, conversation=None):
     try:
-        response = groq_client.chat.completions.create(
-            model="gemma2-9b-it",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+        return get_code_assistant().ask(prompt, get_model_settings(), conversation=conversation, tab=tab,
+                                        on_cache_hit=show_similar_question)
     except Exception as e:
         st.error(f"API Error: {str(e)}")
         return "Sorry, I encountered an error while processing your request. Please try again later."
 
+def get_conversation():
+    """Return this session's Text Input conversation"""
+    if "conversation" not in st.session_state:
+        st.session_state.conversation = Conversation()
+    return st.session_state.conversation
+
+def prefetch_follow_ups(conversation, answer):
+    """Start background requests for the follow-ups this session is most likely to ask next"""
+    try:
+        get_speculator().prefetch(get_session_id(), conversation, answer, get_model_settings())
+    except Exception:
+        pass  # Speculation is best effort and must never break the answer that was just shown
+
+def summarize_conversation(prompt):
+    """Fold older conversation turns into its summary (see Conversation.compact)"""
+    return get_code_assistant().summarize_conversation(prompt, get_model_settings())
+
 def ask_groq_with_image(prompt, base64_image):
-    response = groq_client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
-                        },
-                    },
-                ],
-            }
-        ],
-        temperature=0.7,
-        max_completion_tokens=1024,
-        top_p=1,
-        stream=False
-    )
-    return response.choices[0].message.content
+    return get_code_assistant().analyze_image(prompt, base64_image, get_model_settings())
+
+def ask_groq_with_uploaded_image(prompt, uploaded_file):
+    """Ask about an uploaded image, charging its encoded copies to the session while the request runs"""
+    # The base64 text, the data URL built from it and the JSON request body each hold a copy
+    request_bytes = 3 * base64_length(uploaded_file.size)
+    with get_session_memory().hold(get_session_id(), "request:image", request_bytes, label="Image request"):
+        return ask_groq_with_image(prompt, encode_image_to_base64(uploaded_file))
 
 def record_and_transcribe():
     """Record audio and transcribe it to text using Groq's Whisper API"""
+    workspace_manager = get_workspace_manager()
+    temp_dir = None
     try:
-        # Create a temporary directory for audio files if it doesn't exist
-        temp_dir = os.path.join(os.getcwd(), "temp_audio")
-        os.makedirs(temp_dir, exist_ok=True)
+        # Create a managed temporary directory for the recording
+        temp_dir = workspace_manager.create(get_session_id(), kind="audio")
         
         # Generate a unique filename
         audio_file_path = os.path.join(temp_dir, f"audio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.m4a")
@@ -117,41 +259,45 @@ def record_and_transcribe():
         with open(audio_file_path, "wb") as f:
             f.write(audio.get_wav_data())
         
-        # Transcribe using Groq
-        transcription = transcribe_with_groq(audio_file_path)
-        
-        # Clean up - remove the temporary audio file
-        try:
-            os.remove(audio_file_path)
-        except:
-            pass  # Ignore errors when removing temporary file
-            
-        return transcription
+        # Transcribe using Groq, streaming the file instead of reading it into memory
+        with open(audio_file_path, "rb") as audio_file:
+            return transcribe_with_groq(audio_file_path, audio_file)
     
     except Exception as e:
         st.error(f"Error in voice recognition: {str(e)}")
         return "Sorry, voice input isn't available or encountered an error. Please use text input instead."
+    
+    finally:
+        # Clean up - remove the temporary audio file
+        if temp_dir:
+            workspace_manager.release(temp_dir)
 
-def transcribe_with_groq(audio_file_path):
-    """Transcribe audio using Groq's Whisper API"""
+def transcribe_uploaded_audio(uploaded_file):
+    """Transcribe an uploaded recording straight from the upload buffer"""
+    # The request body is streamed from the upload, so it is charged only while the request runs
     try:
-        # Open audio file in binary mode
-        with open(audio_file_path, "rb") as file:
-            # Request transcription from Groq
-            transcription = groq_client.audio.transcriptions.create(
-                file=(audio_file_path, file.read()),
-                model="whisper-large-v3",
-                response_format="json"
-            )
-            
-            # Return the transcribed text
-            return transcription.text
+        holding = get_session_memory().hold(
+            get_session_id(), "request:audio", uploaded_file.size, label="Voice recording"
+        )
+    except SessionMemoryError as e:
+        st.error(str(e))
+        return f"Sorry, the recording could not be processed: {str(e)}"
+    
+    with holding:
+        uploaded_file.seek(0)
+        return transcribe_with_groq(os.path.basename(uploaded_file.name), uploaded_file)
+
+def transcribe_with_groq(file_name, audio_file):
+    """Transcribe audio using Groq's Whisper API, streaming it from an open binary file"""
+    try:
+        return get_code_assistant().transcribe(file_name, audio_file)
     except Exception as e:
         st.error(f"Error transcribing audio: {str(e)}")
         return f"Sorry, I encountered an error while transcribing your audio: {str(e)}"
 
 def encode_image_to_base64(uploaded_file):
-    return base64.b64encode(uploaded_file.read()).decode("utf-8")
+    # getvalue() shares the upload's buffer; getbuffer() would make the upload copy it
+    return base64.b64encode(uploaded_file.getvalue()).decode("ascii")
 
 def create_code_execution_area():
     st.markdown("<h3 class='section-header'>⚡ Code Playground</h3>", unsafe_allow_html=True)
@@ -168,447 +314,151 @@ def create_code_execution_area():
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
-def add_model_selector():
-    st.sidebar.markdown("<h3 class='section-header'>⚙️ Model Settings</h3>", unsafe_allow_html=True)
-    
-    text_models = {
-        "Gemma 2 9B": "gemma2-9b-it",
-        "Llama 3 70B": "llama3-70b-8192",
-        "Claude 3 Haiku": "claude-3-haiku-20240307"
-    }
-    
-    selected_model = st.sidebar.selectbox(
-        "Select Text Model:",
-        list(text_models.keys())
-    )
-    
-    temperature = st.sidebar.slider("Temperature:", 0.0, 1.0, 0.7, 0.1)
-    
-    return text_models[selected_model], temperature
-
 def translate_code(source_code, source_language, target_language):
     """Translate code from one programming language to another using Groq"""
-    
-    prompt = f"""
-    Translate the following {source_language} code to {target_language}.
-    Maintain the same functionality, logic, and behavior.
-    Add comments explaining any significant translation decisions or language differences.
-    If any feature doesn't have a direct equivalent, explain the workaround used.
-    
-    Here's the {source_language} code to translate:
-    ```{source_language}
-    {source_code}
-    ```
-    """
-    
-    response = groq_client.chat.completions.create(
-        model="gemma2-9b-it",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_completion_tokens=2048
-    )
-    
-    return response.choices[0].message.content
+    return get_code_assistant().translate(source_code, source_language, target_language, get_model_settings())
 
-def analyze_project(upload_folder):
-    """Analyze entire project structure and relationships"""
-    # Extract file structure
-    file_structure = extract_file_structure(upload_folder)
-    
-    # Parse files for imports, dependencies, and relationships
-    dependency_graph = build_dependency_graph(upload_folder)
-    
-    # Identify architectural patterns currently in use
-    current_patterns = identify_patterns(upload_folder)
-    
-    # Identify complexity hotspots
-    complexity_analysis = analyze_complexity(upload_folder)
-    
-    return {
-        "structure": file_structure,
-        "dependencies": dependency_graph,
-        "patterns": current_patterns,
-        "complexity": complexity_analysis
-    }
-
-def visualize_dependencies(dependency_graph):
-    """Create interactive visualization of project dependencies"""
-    G = nx.DiGraph()
-    
-    # Add nodes and edges from dependency graph
-    for source, targets in dependency_graph.items():
-        G.add_node(source)
-        for target in targets:
-            G.add_edge(source, target)
-    
-    # Check if graph is empty and add placeholder if needed
-    if len(G.nodes) == 0:
-        G.add_node("No dependencies found")
-    
-    # Create plot
-    fig, ax = plt.subplots(figsize=(10, 8))
-    pos = nx.spring_layout(G)
-    nx.draw_networkx(G, pos, with_labels=True, node_color="#3B82F6", 
-                    edge_color="#60A5FA", node_size=300, font_size=8,
-                    font_color="white", font_weight="bold")
-    
-    # Display in Streamlit
-    st.pyplot(fig)
-
-def get_architecture_recommendations(project_analysis):
-    """Get AI recommendations for architectural improvements"""
-    # Prepare detailed prompt with all analysis data
-    prompt = f"""
-    As an expert software architect, analyze this project and provide architectural recommendations.
-    
-    Project structure: {project_analysis['structure']}
-    
-    Dependency graph: {project_analysis['dependencies']}
-    
-    Current design patterns: {project_analysis['patterns']}
-    
-    Complexity analysis: {project_analysis['complexity']}
-    
-    Provide the following recommendations:
-    1. Overall architectural assessment (current architecture pattern if identifiable)
-    2. Suggested architectural improvements with reasoning
-    3. Specific design patterns that would improve the codebase
-    4. Component restructuring recommendations
-    5. Dependency management suggestions
-    6. Scalability considerations
-    7. Code quality improvements
-    
-    Format recommendations as structured JSON with explanations.
-    """
-    
-    # Get AI recommendations
-    response = groq_client.chat.completions.create(
-        model="gemma2-9b-it",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_completion_tokens=4096  # Make sure this matches other API calls
-    )
-    
-    # Parse and return recommendations
-    recommendations = response.choices[0].message.content
-    return recommendations
+def render_dependency_graph(dependency_graph, focus=None):
+    """Render the project dependency graph, collapsed by package, to PNG bytes"""
+    return render_dependency_view(dependency_graph, focus=focus)["image"]
 
-def generate_implementation_blueprint(project_analysis, recommendations_text):
-    """Generate specific implementation examples for recommended changes"""
-    # Initialize blueprint dictionary
-    blueprint = {}
-    
-    try:
-        # Try to parse recommendations as JSON
-        try:
-            recommendations = json.loads(recommendations_text)
-        except json.JSONDecodeError:
-            # If parsing fails, extract design patterns using AI
-            prompt = f"""
-            Based on the following architectural recommendations, identify the key design patterns 
-            that were suggested and list them in a simple format.
-            
-            Recommendations:
-            {recommendations_text}
-            
-            For each pattern, just provide the name, no description needed.
-            """
-            
-            response = groq_client.chat.completions.create(
-                model="gemma2-9b-it",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2
-            )
-            
-            pattern_text = response.choices[0].message.content
-            
-            # Extract pattern names using simple line processing
-            patterns = []
-            for line in pattern_text.split('\n'):
-                if line.strip() and not line.startswith('#') and not line.startswith('-'):
-                    patterns.append({"name": line.strip()})
-            
-            # Create a simple structure
-            recommendations = {"design_patterns": patterns}
-        
-        # Process patterns if they exist
-        if "design_patterns" in recommendations:
-            for pattern in recommendations["design_patterns"]:
-                if isinstance(pattern, dict) and "name" in pattern:
-                    pattern_name = pattern["name"]
-                elif isinstance(pattern, str):
-                    pattern_name = pattern
-                else:
-                    continue
-                    
-                prompt = f"""
-                Generate an implementation example for the {pattern_name} design pattern 
-                in the context of this project. Use pseudocode or Python.
-                
-                Project context: {project_analysis['structure']}
-                """
-                
-                response = groq_client.chat.completions.create(
-                    model="gemma2-9b-it",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3
-                )
-                
-                blueprint[f"pattern_{pattern_name}"] = response.choices[0].message.content
-        else:
-            # No design patterns found, get general implementation advice
-            prompt = f"""
-            Based on the project structure below, provide implementation examples 
-            for improving the architecture:
-            
-            Project structure: {project_analysis['structure']}
-            """
-            
-            response = groq_client.chat.completions.create(
-                model="gemma2-9b-it",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            
-            blueprint["general_improvements"] = response.choices[0].message.content
-    
-    except Exception as e:
-        blueprint["error"] = f"Error generating blueprint: {str(e)}"
-        blueprint["fallback_advice"] = "Consider implementing common patterns like Repository, Factory, or Dependency Injection to improve your code structure."
+def visualize_dependencies(dependency_graph, key="dependency_focus"):
+    """Show the collapsed dependency graph with drill-down into a package"""
+    packages = expandable_packages(dependency_graph)
+    focus = None
+    if packages:
+        focus = st.selectbox(
+            "Drill into package", ["(all packages)"] + packages, key=key,
+            help="Packages are drawn as single nodes; pick one to show the modules inside it"
+        )
+        if focus == "(all packages)":
+            focus = None
     
-    return blueprint
+    view = render_dependency_view(dependency_graph, focus=focus)
+    st.image(view["image"])
+    caption = f"{view['groups']} groups covering {view['modules']} modules"
+    if view["hidden"]:
+        caption += f"; {view['hidden']} less connected groups hidden"
+    if view["cycle_groups"]:
+        caption += "; red nodes are part of a dependency cycle"
+    st.caption(caption)
 
 def extract_zip_project(uploaded_file):
     """Extract uploaded ZIP file to a temporary directory"""
-    # Create a temporary directory
-    temp_dir = tempfile.mkdtemp()
+    workspace_manager = get_workspace_manager()
+    temp_dir = None
     
     try:
-        # Save uploaded file to a temporary file
-        temp_zip = os.path.join(temp_dir, "uploaded_project.zip")
-        with open(temp_zip, "wb") as f:
-            f.write(uploaded_file.getvalue())
-        
-        # Extract the zip file
-        extract_dir = os.path.join(temp_dir, "project")
-        os.makedirs(extract_dir, exist_ok=True)
-        
-        with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
+        uploaded_file.seek(0)
+        with zipfile.ZipFile(uploaded_file, 'r') as zip_ref:
+            # Reserve the uncompressed size up front so the quota is checked before writing
+            uncompressed_size = sum(info.file_size for info in zip_ref.infolist())
+            temp_dir = workspace_manager.create(
+                get_session_id(), kind="zip", expected_bytes=uncompressed_size
+            )
+            
+            # Extract the zip file straight from the upload buffer
+            extract_dir = os.path.join(temp_dir, "project")
+            os.makedirs(extract_dir, exist_ok=True)
             zip_ref.extractall(extract_dir)
         
+        # Record the actual size on disk; raises if it doesn't fit in the quota
+        workspace_manager.update_size(temp_dir)
         return extract_dir
     
     except Exception as e:
         st.error(f"Error extracting ZIP file: {str(e)}")
-        shutil.rmtree(temp_dir)
+        if temp_dir:
+            workspace_manager.release(temp_dir)
         return None
 
-def clone_git_repo(repo_url):
-    """Clone a Git repository to a temporary directory"""
-    # Create a temporary directory
-    temp_dir = tempfile.mkdtemp()
-    
+def index_git_repo(repo_url, ref="HEAD"):
+    """Index a Git repository straight from its mirror's objects, without a checkout"""
     try:
-        # Check if git is available
-        try:
-            subprocess.run(["git", "--version"], check=True, capture_output=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            st.error("Git is not installed or not in PATH. Please install Git.")
-            return None
-        
-        # Clone the repository - MODIFIED: Added timeout and better error handling
-        try:
-            result = subprocess.run(
-                ["git", "clone", "--depth=1", repo_url, temp_dir],  # Added depth=1 for faster cloning
-                check=True,
-                capture_output=True,
-                text=True,
-                timeout=60  # Add timeout to prevent hanging
-            )
-            
-            # Verify the repository was cloned (check for files)
-            if not os.path.exists(os.path.join(temp_dir, ".git")):
-                st.error("Repository appears empty or failed to clone properly.")
-                return None
-                
-            st.success(f"Repository cloned successfully! Found {len(os.listdir(temp_dir))} files/directories.")
-            return temp_dir
-            
-        except subprocess.TimeoutExpired:
-            st.error("Git clone operation timed out. The repository might be too large or the connection is slow.")
-            shutil.rmtree(temp_dir)
-            return None
-    
-    except subprocess.CalledProcessError as e:
-        st.error(f"Git error: {e.stderr}")
-        shutil.rmtree(temp_dir)
+        mirror_cache = get_git_mirror_cache()
+        # Pin the ref to a commit so later fetches can't change what the index describes
+        commit = mirror_cache.resolve(repo_url, ref)
+        return ProjectIndex.from_git(mirror_cache.mirror_path(repo_url), commit)
+    except GitMirrorError as e:
+        st.error(f"Git error: {str(e)}")
         return None
     except Exception as e:
-        st.error(f"Error cloning repository: {str(e)}")
-        shutil.rmtree(temp_dir)
+        st.error(f"Error reading repository: {str(e)}")
         return None
 
-def get_project_structure_text(project_path):
-    """Generate a text representation of the project structure"""
-    result = []
+def clone_git_repo(repo_url, ref="HEAD"):
+    """Check out a Git repository into a temporary directory via the shared mirror cache"""
+    workspace_manager = get_workspace_manager()
+    try:
+        # Create a managed temporary directory
+        temp_dir = workspace_manager.create(get_session_id(), kind="git")
+    except WorkspaceQuotaError as e:
+        st.error(str(e))
+        return None
     
-    for root, dirs, files in os.walk(project_path):
-        # Skip hidden directories and files
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
+    try:
+        # The first request clones a bare mirror; repeats only fetch what changed,
+        # and only source files are written to the working directory
+        file_count = get_git_mirror_cache().checkout(repo_url, temp_dir, ref=ref)
         
-        level = root.replace(project_path, '').count(os.sep)
-        indent = ' ' * 4 * level
-        folder_name = os.path.basename(root)
+        # Verify the repository was checked out (check for files)
+        if file_count == 0:
+            st.error("Repository appears empty or contains no source files.")
+            workspace_manager.release(temp_dir)
+            return None
         
-        if level > 0:  # Skip the root directory name
-            result.append(f"{indent}{folder_name}/")
+        # Account for the checkout's size; raises if it doesn't fit in the quota
+        workspace_manager.update_size(temp_dir)
         
-        sub_indent = ' ' * 4 * (level + 1)
-        for file in sorted([f for f in files if not f.startswith('.')]):
-            result.append(f"{sub_indent}{file}")
+        st.success(f"Repository cloned successfully! Found {file_count} source files.")
+        return temp_dir
     
-    return '\n'.join(result)
+    except GitMirrorError as e:
+        st.error(f"Git error: {str(e)}")
+        workspace_manager.release(temp_dir)
+        return None
+    except WorkspaceQuotaError as e:
+        # update_size() already removed the workspace
+        st.error(str(e))
+        return None
+    except Exception as e:
+        st.error(f"Error cloning repository: {str(e)}")
+        workspace_manager.release(temp_dir)
+        return None
 
-def extract_file_structure(project_path):
-    """Extract file structure from project folder with better error handling"""
-    structure = {}
+def display_recommendation_section(section, content):
+    """Display one section of the architectural recommendations"""
+    st.markdown(f"#### {section.replace('_', ' ').title()}")
     
-    try:
-        if not os.path.exists(project_path):
-            return {"error": "Project path does not exist"}
-            
-        # Get maximum depth to prevent recursion errors
-        max_depth = 5
-        current_depth = 0
-        
-        for root, dirs, files in os.walk(project_path, topdown=True):
-            # Skip hidden directories and files
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            files = [f for f in files if not f.startswith('.')]
-            
-            # Skip deep directories to prevent overwhelming analysis
-            depth = root.replace(project_path, '').count(os.sep)
-            if depth > max_depth:
-                continue
-                
-            # Skip large file counts for better performance
-            if len(files) > 100:
-                files = files[:100] + ["..."]
-                
-            rel_path = os.path.relpath(root, project_path)
-            if rel_path == '.':
-                rel_path = ''
-                
-            path_parts = rel_path.split(os.sep) if rel_path else []
-            current_dict = structure
-            
-            # Build nested dictionary structure
-            for part in path_parts:
-                if part:
-                    if part not in current_dict:
-                        current_dict[part] = {}
-                    current_dict = current_dict[part]
-            
-            # Add files
-            current_dict['__files__'] = files
+    if isinstance(content, list):
+        for item in content:
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    st.markdown(f"**{key}**: {value}")
+            else:
+                st.markdown(f"- {item}")
+    elif isinstance(content, dict):
+        for key, value in content.items():
+            st.markdown(f"**{key}**: {value}")
+    else:
+        st.markdown(content)
     
-    except Exception as e:
-        return {"error": f"Error analyzing file structure: {str(e)}"}
-        
-    return structure
-
-def build_dependency_graph(project_path):
-    """Build a dependency graph of project components"""
-    # For demonstration purposes - in a real app, you'd parse actual imports
-    dependency_graph = {}
-    python_files = []
-    
-    # Find all Python files
-    for root, _, files in os.walk(project_path):
-        for file in files:
-            if file.endswith('.py'):
-                rel_path = os.path.relpath(os.path.join(root, file), project_path)
-                python_files.append(rel_path)
-    
-    # Build simple dependency graph (in a real app, you'd analyze imports)
-    for file in python_files:
-        module_name = os.path.splitext(file)[0].replace(os.sep, '.')
-        dependency_graph[module_name] = []
-        
-        # Simple analysis: assume files in the same directory might be related
-        for other_file in python_files:
-            if file != other_file and os.path.dirname(file) == os.path.dirname(other_file):
-                other_module = os.path.splitext(other_file)[0].replace(os.sep, '.')
-                dependency_graph[module_name].append(other_module)
-    
-    return dependency_graph
-
-def identify_patterns(project_path):
-    """Identify common design patterns in the codebase"""
-    # In a real app, this would be a complex analysis
-    # For demonstration, we'll return placeholder data
-    return {
-        "singleton": ["Found potential Singleton pattern in app configuration"],
-        "factory": ["Possible Factory pattern in model creation"],
-        "observer": ["UI components may use Observer pattern"],
-        "mvc": ["Application structure suggests MVC architecture"],
-    }
+    st.markdown("---")
 
-def analyze_complexity(project_path):
-    """Analyze code complexity metrics"""
-    # In a real app, you would use tools like radon, pylint, etc.
-    # For demonstration, we'll return placeholder data
-    return {
-        "cyclomatic_complexity": {
-            "average": 4.2,
-            "max": 15,
-            "hotspots": ["app.py:create_architecture_recommendation_tab"]
-        },
-        "maintainability_index": {
-            "average": 65.3,
-            "issues": ["Long functions in data processing modules"]
-        },
-        "loc": {
-            "total": 850,
-            "per_module": {"app.py": 350, "ui_components.py": 500}
-        }
-    }
-
-def display_architectural_recommendations(recommendations_text):
+def display_architectural_recommendations(recommendations, recommendations_text=""):
     """Display architectural recommendations in a readable format"""
     st.markdown("### Architectural Analysis Results")
     
     try:
-        # First try to parse as JSON
-        try:
-            recommendations = json.loads(recommendations_text)
-            
+        if recommendations:
             # Display as formatted sections
             for section, content in recommendations.items():
-                st.markdown(f"#### {section.replace('_', ' ').title()}")
-                
-                if isinstance(content, list):
-                    for item in content:
-                        if isinstance(item, dict):
-                            for key, value in item.items():
-                                st.markdown(f"**{key}**: {value}")
-                        else:
-                            st.markdown(f"- {item}")
-                elif isinstance(content, dict):
-                    for key, value in content.items():
-                        st.markdown(f"**{key}**: {value}")
-                else:
-                    st.markdown(content)
-                
-                st.markdown("---")
-            
-            return True
-                
-        except json.JSONDecodeError:
-            # If not valid JSON, parse as markdown
+                display_recommendation_section(section, content)
+        else:
+            # If not valid JSON, show the text as markdown
             st.markdown("*AI returned formatted text instead of JSON:*")
             st.markdown(recommendations_text)
-            return True
+        return True
             
     except Exception as e:
         st.error(f"Error displaying recommendations: {str(e)}")
@@ -621,6 +471,228 @@ def display_implementation_blueprint(blueprint):
         with st.expander(f"{pattern}"):
             st.code(implementation)
 
+def get_upload_digest(uploaded_file):
+    """Return the SHA-256 digest of an uploaded file, hashing each upload only once"""
+    if "upload_digests" not in st.session_state:
+        st.session_state.upload_digests = {}
+    
+    file_id = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    if file_id not in st.session_state.upload_digests:
+        st.session_state.upload_digests[file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return st.session_state.upload_digests[file_id]
+
+def get_architecture_cache():
+    """Return the per-session LRU cache of extracted projects and their analysis results"""
+    if "architecture_cache" not in st.session_state:
+        st.session_state.architecture_cache = OrderedDict()
+    return st.session_state.architecture_cache
+
+def evict_architecture_project(key):
+    """Drop a cached project, releasing its memory and deleting its temporary directory"""
+    entry = get_architecture_cache().pop(key, None)
+    if entry is None:
+        return
+    for value in entry.values():
+        if isinstance(value, Holding):
+            value.release()
+    if entry["cleanup_dir"]:
+        get_workspace_manager().discard(entry["cleanup_dir"])
+
+def charge_architecture_project(key):
+    """Charge a cached project and its results to the session's memory cap
+    
+    Older projects are evicted to make room; returns False, after showing an error,
+    if the project does not fit on its own.
+    """
+    cache = get_architecture_cache()
+    entry = cache[key]
+    size = deep_size(entry)
+    while True:
+        try:
+            entry["memory"] = get_session_memory().hold(
+                get_session_id(), f"architecture:{key}", size, label="Architecture projects"
+            )
+            return True
+        except SessionMemoryError as e:
+            older = [other for other in cache if other != key]
+            if not older:
+                evict_architecture_project(key)
+                st.error(str(e))
+                return False
+            evict_architecture_project(older[0])
+
+def cache_architecture_project(key, index, cleanup_dir=None):
+    """Store a freshly indexed project, evicting the least recently used ones"""
+    cache = get_architecture_cache()
+    evict_architecture_project(key)
+    if cleanup_dir:
+        # The files stay on disk between reruns but may be evicted or reaped while idle
+        get_workspace_manager().keep(cleanup_dir)
+        get_workspace_manager().release(cleanup_dir)
+    
+    cache[key] = {
+        "index": index,
+        "cleanup_dir": cleanup_dir,
+        "structure_text": None,
+        "analysis": None,
+        "context_report": None,
+        "map_reduce": None,
+        "recommendations": None,
+        "recommendations_text": None,
+        "blueprint": None,
+        "memory": None
+    }
+    
+    while len(cache) > ARCHITECTURE_CACHE_SIZE:
+        oldest_key = next(iter(cache))
+        evict_architecture_project(oldest_key)
+    
+    if not charge_architecture_project(key):
+        return None
+    return cache[key]
+
+def get_cached_architecture_project(key):
+    """Look up a cached project and mark it as recently used"""
+    cache = get_architecture_cache()
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    
+    index = entry["index"]
+    backing_path = index.git_dir if isinstance(index, GitProjectIndex) else index.root
+    if not os.path.exists(backing_path):
+        # Workspace was reaped or mirror evicted after being idle; load again
+        evict_architecture_project(key)
+        return None
+    
+    cache.move_to_end(key)
+    if entry["cleanup_dir"]:
+        get_workspace_manager().touch(entry["cleanup_dir"])
+    return entry
+
+def run_architecture_analysis(entry, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET, use_map_reduce=False):
+    """Run the full analysis pipeline for a cached project and store the results in it"""
+    # Track usage first to avoid miss-counts on errors
+    if "architecture_analyses" not in st.session_state:
+        st.session_state.architecture_analyses = 0
+    st.session_state.architecture_analyses += 1
+    
+    analysis_progress = st.progress(0)
+    status_text = st.empty()
+    live_placeholder = st.empty()
+    live_sections = live_placeholder.container()
+    
+    status_text.text("Step 1/4: Analyzing project structure...")
+    analysis_progress.progress(10)
+    
+    def show_step(step, analysis=None, completed=0, total=0):
+        if step == "recommendations":
+            analysis_progress.progress(30)
+            # Render dependency visualization; layout and image are cached by graph hash,
+            # so displaying the results reuses them
+            status_text.text("Step 2/4: Generating dependency visualization...")
+            with tracer.span("analysis.visualize"):
+                render_dependency_graph(analysis["dependencies"])
+            analysis_progress.progress(50)
+            status_text.text("Step 3/4: Getting AI architectural recommendations...")
+        elif step == "packages":
+            status_text.text(f"Step 3/4: Summarised {completed}/{total} packages...")
+            analysis_progress.progress(50 + int(20 * completed / total))
+        elif step == "blueprint":
+            analysis_progress.progress(75)
+            status_text.text("Step 4/4: Creating implementation blueprint...")
+        elif step == "done":
+            analysis_progress.progress(100)
+            status_text.text("Analysis complete!")
+    
+    # Show each recommendation section as soon as it has streamed in
+    def show_section(section, content):
+        with live_sections:
+            display_recommendation_section(section, content)
+    
+    # Hold the project's workspace so it cannot be evicted or reaped mid-analysis
+    workspace_manager = get_workspace_manager()
+    held = bool(entry["cleanup_dir"]) and workspace_manager.acquire(entry["cleanup_dir"])
+    try:
+        results = get_code_assistant().analyze_architecture(
+            entry["index"], get_model_settings(), token_budget, use_map_reduce,
+            on_section=show_section, on_step=show_step
+        )
+    finally:
+        if held:
+            workspace_manager.release(entry["cleanup_dir"])
+    # The stored results are displayed in full below
+    live_placeholder.empty()
+    entry.update(results)
+
+def display_architecture_results(entry):
+    """Display stored analysis results without recomputing anything"""
+    st.subheader("Component Dependencies")
+    visualize_dependencies(entry["analysis"]["dependencies"])
+    dependency_stats = entry["analysis"]["dependency_stats"]
+    languages = ", ".join(f"{name} {count}" for name, count in dependency_stats["languages"].items())
+    st.caption(
+        f"Imports from {dependency_stats['files']} files ({languages or 'no supported languages'}): "
+        f"{dependency_stats['resolved_imports']} of {dependency_stats['imports']} resolved within the project; "
+        f"scanned {dependency_stats['bytes'] / 1024 / 1024:.1f} MB at {dependency_stats['mb_per_second']:.1f} MB/s"
+    )
+    
+    # Show the detected patterns with their source locations
+    patterns = entry["analysis"]["patterns"]
+    pattern_stats = entry["analysis"]["pattern_stats"]
+    with st.expander(
+        f"Detected design patterns: {len(patterns)} kinds in {pattern_stats['files']} Python files "
+        f"({pattern_stats['total_seconds']:.1f}s)"
+    ):
+        for name, evidence in patterns.items():
+            st.markdown(f"**{name}**")
+            st.code("\n".join(evidence), language=None)
+        timings = ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in pattern_stats["detector_seconds"].items()
+        )
+        st.caption(f"Parsing {pattern_stats['parse_seconds']:.1f}s; detectors: {timings}")
+        if pattern_stats["errors"]:
+            st.caption(f"{pattern_stats['errors']} files could not be parsed")
+    
+    # Show how the analysis was compressed to fit the prompt
+    report = entry["context_report"]
+    if report:
+        with st.expander(f"Prompt context: ~{report['context_tokens']} of {report['budget']} tokens"):
+            st.write(f"Raw analysis size: ~{report['raw_tokens']} tokens")
+            if report["dropped"]:
+                for section, count in report["dropped"].items():
+                    st.write(f"- {section}: {count} lines dropped to fit the budget")
+            else:
+                st.write("Nothing was dropped.")
+    
+    # Show the per-package summaries produced in map-reduce mode
+    map_reduce_result = entry["map_reduce"]
+    if map_reduce_result:
+        stats = map_reduce_result["stats"]
+        with st.expander(
+            f"Package summaries: {stats['packages']} packages "
+            f"({stats['cached']} cached) in {stats['total_seconds']:.1f}s"
+        ):
+            for summary in map_reduce_result["packages"]:
+                st.markdown(f"**{summary['package']}** ({summary['files']} files)")
+                if "summary" in summary:
+                    st.write(summary["summary"])
+                if "error" in summary:
+                    st.warning(f"Summary failed: {summary['error']}")
+    
+    # Debugging output
+    recommendations_text = entry["recommendations_text"]
+    st.write("Raw recommendations text (for debugging):")
+    st.code(recommendations_text[:500] + "...", language="json")  # Show first 500 chars
+    
+    # Display recommendation sections
+    st.subheader("Architectural Recommendations")
+    display_architectural_recommendations(entry["recommendations"], recommendations_text)
+    
+    # Display implementation examples
+    st.subheader("Implementation Blueprint")
+    display_implementation_blueprint(entry["blueprint"])
+
 def create_architecture_recommendation_tab():
     """Create the architecture recommendation tab"""
     st.markdown("<div class='section-header'>🏛️ Architecture Advisor</div>", unsafe_allow_html=True)
@@ -639,7 +711,7 @@ def create_architecture_recommendation_tab():
         ["Upload ZIP file", "Provide Git repository URL"]
     )
     
-    project_path = None
+    entry = None
     
     if upload_method == "Upload ZIP file":
         uploaded_file = st.file_uploader(
@@ -648,9 +720,17 @@ def create_architecture_recommendation_tab():
             help="Max size: 200MB"
         )
         
-        if uploaded_file:
-            # Save and extract zip file
-            project_path = extract_zip_project(uploaded_file)
+        if uploaded_file and track_upload("Project ZIP", uploaded_file):
+            # Extract each distinct upload only once; reruns reuse the cached directory
+            cache_key = f"zip:{get_upload_digest(uploaded_file)}"
+            entry = get_cached_architecture_project(cache_key)
+            if entry is None:
+                with tracer.span("project.extract", source="zip", bytes=uploaded_file.size):
+                    project_path = extract_zip_project(uploaded_file)
+                    if project_path:
+                        entry = cache_architecture_project(
+                            cache_key, ProjectIndex.from_directory(project_path), os.path.dirname(project_path)
+                        )
             
     else:  # Git repository
         repo_url = st.text_input(
@@ -658,8 +738,20 @@ def create_architecture_recommendation_tab():
             placeholder="https://github.com/username/repository"
         )
         
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            git_ref = st.text_input("Branch, tag or commit:", value="HEAD")
+        with col2:
+            read_objects = st.checkbox(
+                "Read directly from Git objects (no checkout)",
+                value=True,
+                help="Analyze files straight from the repository database without writing a working copy"
+            )
+        
         # Add validation for repository URL
         if repo_url:
+            cache_key = f"git:{repo_url}@{git_ref}:{'objects' if read_objects else 'checkout'}"
+            
             # Basic validation
             if not (repo_url.startswith("http://") or repo_url.startswith("https://") or 
                     repo_url.startswith("git@")):
@@ -671,211 +763,206 @@ def create_architecture_recommendation_tab():
                         status = st.empty()
                         status.text("Initializing Git clone operation...")
                         
-                        # Try to clone with detailed feedback
-                        project_path = clone_git_repo(repo_url)
-                        
-                        if project_path:
-                            status.text(f"Repository cloned to temporary directory: {project_path}")
+                        if read_objects:
+                            # Index the tree straight from the mirror; blobs are streamed on demand
+                            with tracer.span("project.extract", source="git-objects"):
+                                index = index_git_repo(repo_url, git_ref)
+                            if index:
+                                status.text(f"Indexed {len(index)} files at {index.ref[:12]} without a checkout")
+                                cache_architecture_project(cache_key, index)
+                            else:
+                                status.text("Failed to read repository. See error message above.")
                         else:
-                            status.text("Failed to clone repository. See error message above.")
+                            # Try to clone with detailed feedback
+                            with tracer.span("project.extract", source="git-checkout"):
+                                project_path = clone_git_repo(repo_url, git_ref)
+                            
+                            if project_path:
+                                status.text(f"Repository cloned to temporary directory: {project_path}")
+                                cache_architecture_project(
+                                    cache_key, ProjectIndex.from_directory(project_path), project_path
+                                )
+                            else:
+                                status.text("Failed to clone repository. See error message above.")
+                
+                # A previously cloned repository stays available across reruns
+                entry = get_cached_architecture_project(cache_key)
     
-    if project_path:
+    if entry:
+        index = entry["index"]
+        
         # Debug information
-        st.write(f"Project path: {project_path}")
-        st.write(f"Path exists: {os.path.exists(project_path)}")
-        try:
-            files = os.listdir(project_path)
-            st.write(f"Number of files/directories: {len(files)}")
-            st.write(f"First few files/dirs: {files[:5] if files else 'None'}")
-        except Exception as e:
-            st.write(f"Error listing directory: {str(e)}")
+        st.write(f"Project source: {index.source}")
+        st.write(f"Number of files: {len(index)}")
+        st.write(f"First few files: {index.paths[:5] if len(index) else 'None'}")
         
-        # Add verification that the path exists and has content
-        if not os.path.exists(project_path) or not os.listdir(project_path):
-            st.error("Project path is empty or doesn't exist. Please try again.")
+        # Add verification that the project has content
+        if not len(index):
+            st.error("Project is empty. Please try again.")
         else:
             # Show project structure
             try:
-                project_structure = get_project_structure_text(project_path)
+                if entry["structure_text"] is None:
+                    # Large trees are kept in a memory-mapped spill file between reruns
+                    entry["structure_text"] = get_session_memory().store(
+                        get_session_id(), f"structure:{cache_key}", get_project_structure_text(index),
+                        label="Project structures"
+                    )
                 with st.expander("Project Structure", expanded=True):
-                    st.code(project_structure)
+                    st.code(entry["structure_text"].text())
+                
+                token_budget = st.number_input(
+                    "Prompt context token budget:",
+                    min_value=500, max_value=32000, value=DEFAULT_CONTEXT_TOKEN_BUDGET, step=500,
+                    help="The project summary sent to the AI is compressed to fit this many tokens"
+                )
+                
+                use_map_reduce = st.checkbox(
+                    "Large project mode (summarise each package separately)",
+                    value=len(index) > MAP_REDUCE_FILE_THRESHOLD,
+                    help="Summarises every top-level package concurrently and combines the summaries. "
+                         "Unchanged packages are served from a cache."
+                )
                 
                 # Analysis button
-                if st.button("🔍 Analyze Architecture", use_container_width=True):
-                    # Track usage first to avoid miss-counts on errors
-                    if "architecture_analyses" not in st.session_state:
-                        st.session_state.architecture_analyses = 0
-                    st.session_state.architecture_analyses += 1
-                    
-                    analysis_progress = st.progress(0)
-                    status_text = st.empty()
-                    
-                    status_text.text("Step 1/4: Analyzing project structure...")
-                    analysis_progress.progress(10)
-                    
+                button_label = "🔍 Analyze Architecture" if entry["analysis"] is None else "🔁 Re-analyze Architecture"
+                if st.button(button_label, use_container_width=True):
                     try:
-                        # Perform initial analysis
-                        analysis_results = analyze_project(project_path)
-                        analysis_progress.progress(30)
-                        
-                        # Display dependency visualization
-                        status_text.text("Step 2/4: Generating dependency visualization...")
-                        st.subheader("Component Dependencies")
-                        visualize_dependencies(analysis_results["dependencies"])
-                        analysis_progress.progress(50)
-                        
-                        # Get AI recommendations
-                        status_text.text("Step 3/4: Getting AI architectural recommendations...")
-                        recommendations = get_architecture_recommendations(analysis_results)
-                        
-                        # Debugging output
-                        status_text.text("Recommendations received from AI. Displaying results...")
-                        st.write("Raw recommendations text (for debugging):")
-                        st.code(recommendations[:500] + "...", language="json")  # Show first 500 chars
-                        
-                        analysis_progress.progress(75)
-                        
-                        # Display recommendation sections
-                        st.subheader("Architectural Recommendations")
-                        display_architectural_recommendations(recommendations)
-                        
-                        # Generate implementation blueprint
-                        status_text.text("Step 4/4: Creating implementation blueprint...")
-                        st.subheader("Implementation Blueprint")
-                        blueprint = generate_implementation_blueprint(
-                            analysis_results, recommendations
-                        )
-                        analysis_progress.progress(95)
-                        
-                        # Display implementation examples
-                        display_implementation_blueprint(blueprint)
-                        analysis_progress.progress(100)
-                        status_text.text("Analysis complete!")
-                            
+                        run_architecture_analysis(entry, token_budget, use_map_reduce)
+                        if not charge_architecture_project(cache_key):
+                            entry = None
                     except Exception as e:
                         st.error(f"Error during architecture analysis: {str(e)}")
                         st.warning("Try with a smaller project or check your API connection.")
+                
+                # Results persist across reruns, so expanding a blueprint costs nothing
+                if entry is not None and entry["analysis"] is not None:
+                    display_architecture_results(entry)
             except Exception as e:
                 st.error(f"Error reading project structure: {str(e)}")
 
-def setup_for_streamlit_cloud():
-    """Set up all needed configuration files for Streamlit Cloud deployment"""
-    
-    # Create minimal requirements.txt
-    with open("requirements.txt", "w") as f:
-        f.write("""
-streamlit==1.31.0
-groq==0.4.1
-python-dotenv==1.0.0
-matplotlib==3.8.2
-networkx==3.2.1
-Pillow==10.1.0
-PyAudio-wheels==0.2.11
-SpeechRecognition==3.10.0
-""".strip())
-    
-    # Create runtime.txt
-    with open("runtime.txt", "w") as f:
-        f.write("python-3.10")
-    
-    # Create packages.txt
-    with open("packages.txt", "w") as f:
-        f.write("portaudio19-dev\npython3-dev\n")
-    
-    # Create .streamlit directory and config.toml
-    os.makedirs(".streamlit", exist_ok=True)
-    with open(".streamlit/config.toml", "w") as f:
-        f.write("""
-[theme]
-primaryColor = "#3B82F6"
-backgroundColor = "#111827"
-secondaryBackgroundColor = "#1F2937"
-textColor = "#F1F5F9"
-        """)
-    
-    print("All configuration files created successfully!")
-
-# Run the setup
-setup_for_streamlit_cloud()
+@contextlib.contextmanager
+def timed_render(name):
+    """Record how long a section of the page took to render in this rerun"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.session_state.render_timings[name] = {
+            "ms": elapsed_ms,
+            "at": datetime.datetime.now().strftime("%H:%M:%S")
+        }
+        if name != "Full rerun":
+            st.caption(f"⏱️ Rendered in {elapsed_ms:.1f} ms")
 
-# === MAIN APP ===
-def main():
-    # Apply custom styling
-    set_page_style()
-    
-    # Create sidebar with information
-    selected_model, temperature = create_sidebar()
-    
-    # Create header
-    create_header()
-    
-    # Create tabs for different input methods (removed favorites tab)
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "💬 Text Input", "🖼️ Image Analysis", 
-        "🎤 Voice Input", "⚡ Code Execution",
-        "🔄 Code Translation", "🏛️ Architecture Advisor"
-    ])
-    
-    # === TEXT INPUT TAB ===
-    with tab1:
+def display_render_timings():
+    """Show the most recent render time of the whole page and of each tab"""
+    with st.sidebar.expander("⏱️ Render Timings"):
+        timings = st.session_state.render_timings
+        if not timings:
+            st.caption("No renders recorded yet.")
+        for name, timing in timings.items():
+            st.caption(f"{name}: {timing['ms']:.1f} ms (at {timing['at']})")
+
+# === TAB FRAGMENTS ===
+@fragment
+def text_input_fragment():
+    with timed_render("Text Input"):
+        # Follow-up questions are answered with the earlier turns as context
+        conversation = get_conversation()
+        speculator = get_speculator()
+        follow_up = None
+        if len(conversation):
+            display_conversation(conversation)
+            settings = get_model_settings()
+            ready = {
+                key for key in FOLLOW_UPS
+                if get_response_cache().is_ready(speculator.request_key(conversation, key, settings))
+            }
+            follow_up = create_follow_up_buttons(FOLLOW_UPS, ready)
+            if st.button("🧹 New conversation"):
+                speculator.settle(get_session_id())
+                conversation.clear()
+                st.rerun()
+        
         user_input, submit_text = create_text_tab()
+        speculate = DEFAULT_TOP_K > 0 and st.checkbox(
+            "⚡ Prefetch likely follow-ups",
+            key="speculate_follow_ups",
+            help="Answers the follow-ups you are most likely to ask next in the background, "
+                 "using spare rate limit, so they appear instantly"
+        )
+        
+        if follow_up:
+            speculator.record_click(follow_up)
+            user_input, submit_text = FOLLOW_UPS[follow_up][1], True
+            prefetched = follow_up in ready
+        else:
+            prefetched = False
+        
         if submit_text:
             if user_input:
-                display_loading_animation()
-                response = ask_groq(user_input)
+                if not prefetched:
+                    display_loading_animation()
+                turns = len(conversation)
+                response = ask_groq(user_input, conversation=conversation)
                 
                 # Track usage
                 st.session_state.text_queries += 1
                 
                 # Display response
                 display_response(response)
+                
+                # Compact after answering, so the next follow-up is already small
+                conversation.compact(summarize_conversation)
+                if speculate and len(conversation) > turns:
+                    prefetch_follow_ups(conversation, response)
             else:
                 st.warning("Please enter some text before submitting.")
-    
-    # === IMAGE INPUT TAB ===
-    with tab2:
+
+@fragment
+def image_input_fragment():
+    with timed_render("Image Analysis"):
         uploaded_file, prompt_text, analyze_button = create_image_tab()
+        upload_fits = track_upload("Image upload", uploaded_file)
         
-        if analyze_button and uploaded_file:
+        if analyze_button and uploaded_file and upload_fits:
             display_loading_animation()
             
-            # Process the image
-            base64_image = encode_image_to_base64(uploaded_file)
-            
-            # Get AI response
-            response = ask_groq_with_image(prompt_text, base64_image)
+            # Get AI response; the encoded image only lives for the duration of the request
+            try:
+                response = ask_groq_with_uploaded_image(prompt_text, uploaded_file)
+            except SessionMemoryError as e:
+                st.error(str(e))
+                return
             
             # Track usage
             st.session_state.image_queries += 1
             
             # Display response
             display_response(response, response_type="code")
-    
-    # === VOICE INPUT TAB ===
-    with tab3:
+
+@fragment
+def voice_input_fragment():
+    with timed_render("Voice Input"):
         # Check if we're running in Streamlit Cloud
         is_cloud = os.environ.get("STREAMLIT_DEPLOYMENT", "") != ""
         
         if is_cloud:
             # Use file upload version in cloud
-            audio_file_path = create_fallback_voice_tab()
+            uploaded_audio = create_fallback_voice_tab()
             
-            if audio_file_path:
+            if uploaded_audio:
                 with st.spinner("Transcribing audio..."):
                     # Transcribe using Groq
-                    transcription = transcribe_with_groq(audio_file_path)
-                    
-                    # Clean up - remove the temporary file
-                    try:
-                        os.remove(audio_file_path)
-                    except:
-                        pass
+                    transcription = transcribe_uploaded_audio(uploaded_audio)
                     
                     if transcription and "Sorry" not in transcription:
                         st.success(f"Transcription: {transcription}")
                         
                         display_loading_animation()
-                        response = ask_groq(transcription)
+                        response = ask_groq(transcription, tab=TASK_TABS["transcription"])
                         
                         # Track usage
                         st.session_state.voice_queries += 1
@@ -896,7 +983,7 @@ def main():
                         st.success(f"You said: {transcribed_text}")
                         
                         display_loading_animation()
-                        response = ask_groq(transcribed_text)
+                        response = ask_groq(transcribed_text, tab=TASK_TABS["transcription"])
                         
                         # Track usage
                         st.session_state.voice_queries += 1
@@ -905,13 +992,15 @@ def main():
                         display_response(response)
                     else:
                         st.error(transcribed_text)
-    
-    # === CODE EXECUTION TAB ===
-    with tab4:
+
+@fragment
+def code_execution_fragment():
+    with timed_render("Code Execution"):
         create_code_execution_area()
-    
-    # === CODE TRANSLATION TAB ===
-    with tab5:
+
+@fragment
+def code_translation_fragment():
+    with timed_render("Code Translation"):
         source_language, target_language, source_code, translate_button = create_code_translation_tab()
         
         if translate_button:
@@ -945,10 +1034,53 @@ def main():
                 st.warning("Source and target languages must be different.")
             else:
                 st.warning("Please enter some code to translate.")
-    
-    # === ARCHITECTURE RECOMMENDATION TAB ===
-    with tab6:
+
+@fragment
+def architecture_fragment():
+    with timed_render("Architecture Advisor"):
         create_architecture_recommendation_tab()
 
+# === MAIN APP ===
+def main():
+    with timed_render("Full rerun"):
+        # Apply custom styling
+        set_page_style()
+        
+        # Create sidebar with information
+        selected_model, temperature = create_sidebar()
+        st.session_state.model_settings = (selected_model, temperature)
+        display_workspace_usage(get_workspace_manager().stats(get_session_id()))
+        display_memory_usage(get_session_memory().stats(get_session_id()))
+        metrics = get_request_metrics()
+        display_request_metrics(metrics.snapshot(), get_model_router().stats(), metrics.prometheus_text())
+        display_speculation_stats(get_speculator().stats())
+        display_semantic_cache_stats(get_semantic_cache().stats())
+        display_render_timings()
+        
+        # Create header
+        create_header()
+        
+        # Create tabs for different input methods (removed favorites tab)
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+            "💬 Text Input", "🖼️ Image Analysis", 
+            "🎤 Voice Input", "⚡ Code Execution",
+            "🔄 Code Translation", "🏛️ Architecture Advisor"
+        ])
+        
+        # Each tab is its own fragment, so interacting with one tab only
+        # re-executes that tab's body instead of the whole page
+        with tab1:
+            text_input_fragment()
+        with tab2:
+            image_input_fragment()
+        with tab3:
+            voice_input_fragment()
+        with tab4:
+            code_execution_fragment()
+        with tab5:
+            code_translation_fragment()
+        with tab6:
+            architecture_fragment()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
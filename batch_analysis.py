@@ -0,0 +1,369 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from code_assistant import create_assistant
+from context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET, build_architecture_context
+from git_mirror import GitMirrorCache
+from model_router import AUTO_MODEL, DEFAULT_TEMPERATURE
+from project_analysis import analyze_project, json_default
+from project_index import ProjectIndex
+from request_metrics import percentile
+from structured_output import RECOMMENDATION_SECTIONS
+from tracing import tracer
+from worker_pool import DEFAULT_MAX_WORKERS, process_pool
+
+DEFAULT_OUTPUT = "architecture-results.jsonl"
+# Concurrent recommendation requests; the model calls are network-bound
+DEFAULT_LLM_THREADS = 4
+# A target whose worker pool broke is retried once, on its own, since the crash may have been a neighbour's
+MAX_ATTEMPTS = 2
+REMOTE_PREFIXES = ("http://", "https://", "ssh://", "git://", "git@")
+
+_mirror_cache = None
+
+def split_target(target):
+    """Split "location#ref" into (location, ref); ref is None when not given"""
+    location, _, ref = target.partition("#")
+    return location, ref or None
+
+def git_dir_of(path):
+    """Return the git directory of a bare repository or work tree, or None"""
+    if os.path.isdir(os.path.join(path, ".git")):
+        return os.path.join(path, ".git")
+    if os.path.isfile(os.path.join(path, "HEAD")) and os.path.isdir(os.path.join(path, "objects")):
+        return path
+    return None
+
+def resolve_commit(git_dir, ref):
+    output = subprocess.run(
+        ["git", "--git-dir", git_dir, "rev-parse", "--verify", f"{ref}^{{commit}}"],
+        capture_output=True, check=True
+    ).stdout
+    return output.decode().strip()
+
+def open_target(target):
+    """Return (index, commit, temp_dir) for a directory, ZIP archive or git repository
+
+    Remote git URLs go through this worker's mirror cache; local repositories are
+    read from their objects. A work tree is analysed as checked out unless a ref
+    is given ("path#ref"). temp_dir holds an extracted archive and must be
+    cleaned up by the caller.
+    """
+    global _mirror_cache
+    location, ref = split_target(target)
+    if location.startswith(REMOTE_PREFIXES):
+        if _mirror_cache is None:
+            _mirror_cache = GitMirrorCache()
+        commit = _mirror_cache.resolve(location, ref or "HEAD")
+        return ProjectIndex.from_git(_mirror_cache.mirror_path(location), commit), commit, None
+
+    if location.startswith("file://"):
+        location = location[len("file://"):]
+    if os.path.isfile(location) and zipfile.is_zipfile(location):
+        temp_dir = tempfile.TemporaryDirectory(prefix="codehelper-batch-")
+        with zipfile.ZipFile(location) as archive:
+            archive.extractall(temp_dir.name)
+        return ProjectIndex.from_directory(temp_dir.name), None, temp_dir
+    if not os.path.isdir(location):
+        raise FileNotFoundError(f"Not a directory, ZIP archive or git repository: {location}")
+
+    git_dir = git_dir_of(location)
+    if git_dir is not None and (ref or git_dir == location):
+        commit = resolve_commit(git_dir, ref or "HEAD")
+        return ProjectIndex.from_git(git_dir, commit), commit, None
+    commit = None
+    if git_dir is not None:
+        try:
+            commit = resolve_commit(git_dir, "HEAD")
+        except subprocess.CalledProcessError:
+            pass  # A repository without commits yet
+    return ProjectIndex.from_directory(location), commit, None
+
+def analyze_target(target):
+    """Process-pool stage: index and analyse one repository
+
+    Import extraction and pattern detection stay in this worker process, so the
+    pool size alone decides how many cores the batch uses.
+    """
+    started = time.perf_counter()
+    index, commit, temp_dir = open_target(target)
+    try:
+        if not len(index):
+            raise ValueError("The project contains no files")
+        analysis = analyze_project(index, max_workers=1)
+        return {
+            "files": len(index),
+            "commit": commit,
+            "analysis": analysis,
+            "seconds": time.perf_counter() - started,
+        }
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+def recommend(assistant, target, analysis, settings, token_budget, blueprint):
+    """Thread-pool stage: architecture recommendations (and optionally a blueprint) for one analysis"""
+    started = time.perf_counter()
+    with tracer.span("batch.recommendations", target=target):
+        context, _ = build_architecture_context(analysis, token_budget)
+        recommendations, text = assistant.architecture_recommendations(analysis, context=context, settings=settings)
+        if not recommendations:
+            raise ValueError(f"The model did not return a JSON object: {text[:200]!r}")
+        implementation = assistant.implementation_blueprint(analysis, recommendations, settings) if blueprint else None
+    return recommendations, implementation, time.perf_counter() - started
+
+def load_checkpoint(path):
+    """Return the targets that already have a successful result in an output file
+
+    Lines that do not parse (the last one, if a previous run was killed mid-write) are ignored.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record.get("target"))
+    return done
+
+def open_output(path):
+    """Open the results file for appending, terminating a partial last line first"""
+    output = open(path, "a+b")
+    if output.tell() > 0:
+        output.seek(-1, os.SEEK_END)
+        if output.read(1) != b"\n":
+            output.write(b"\n")
+    return output
+
+class BatchStats:
+    """Counts, stage timings and failures of one batch run"""
+
+    def __init__(self, total, skipped):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failures = Counter()
+        self.analysis_seconds = []
+        self.recommendation_seconds = []
+        self.started = time.perf_counter()
+
+    @property
+    def failed(self):
+        return sum(self.failures.values())
+
+    @property
+    def completed(self):
+        return self.succeeded + self.failed
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repos_per_minute(self):
+        elapsed = self.elapsed()
+        return self.completed * 60 / elapsed if elapsed else 0.0
+
+    def report(self):
+        lines = [
+            f"Repositories:    {self.succeeded} analysed, {self.failed} failed, {self.skipped} skipped (already done)",
+            f"Throughput:      {self.repos_per_minute():.1f} repos/min over {self.elapsed():.1f}s",
+        ]
+        for name, values in (("Analysis", self.analysis_seconds), ("Recommendations", self.recommendation_seconds)):
+            if values:
+                values = sorted(values)
+                lines.append(f"{name + ':':<17}p50 {percentile(values, 0.5):.2f}s  p95 {percentile(values, 0.95):.2f}s  "
+                             f"max {values[-1]:.2f}s")
+        if self.failures:
+            lines.append("Failures:        " + ", ".join(
+                f"{stage}/{error_type} {count}" for (stage, error_type), count in self.failures.most_common()
+            ))
+        return "\n".join(lines)
+
+def result_record(target, analyzed, recommendations, implementation, llm_seconds, include_graph):
+    analysis = analyzed["analysis"]
+    record = {
+        "target": target,
+        "status": "ok",
+        "commit": analyzed["commit"],
+        "files": analyzed["files"],
+        "dependency_stats": analysis["dependency_stats"],
+        "patterns": analysis["patterns"],
+        "complexity": analysis["complexity"],
+    }
+    if recommendations is not None:
+        record["recommendations"] = {key: recommendations[key] for key in RECOMMENDATION_SECTIONS
+                                     if key in recommendations}
+    if implementation is not None:
+        record["blueprint"] = implementation
+    if include_graph:
+        record["structure"] = analysis["structure"]
+        record["dependencies"] = analysis["dependencies"]
+    record["seconds"] = {"analysis": round(analyzed["seconds"], 3), "recommendations": round(llm_seconds, 3)}
+    return record
+
+def run_batch(targets, output_path, assistant=None, processes=DEFAULT_MAX_WORKERS, threads=DEFAULT_LLM_THREADS,
+              settings=None, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET, blueprint=False, include_graph=False,
+              log=None):
+    """Analyse many repositories, appending one JSON line per repository to output_path
+
+    Static analysis runs in a pool of processes and the recommendation requests in
+    a pool of threads, so both overlap. Targets already recorded as successful in
+    output_path are skipped, which makes an interrupted run resumable; failed ones
+    are retried. Without an assistant only the static analysis is recorded.
+    Returns the BatchStats.
+    """
+    log = log or (lambda message: print(message, file=sys.stderr, flush=True))
+    done = load_checkpoint(output_path)
+    todo = deque(target for target in dict.fromkeys(targets) if target not in done)
+    stats = BatchStats(len(todo), len(targets) - len(todo))
+    suspects = deque()  # targets whose worker pool broke while they were queued or running
+    attempts = Counter()
+    pending = {}  # future -> (stage, target, pool for analyses or the analysis for recommendations)
+    analysing = 0
+    waiting_for_llm = 0
+
+    executor = process_pool(processes)
+    llm_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="batch-llm")
+    output = open_output(output_path)
+
+    def write(record, seconds_text=""):
+        output.write((json.dumps(record, default=json_default) + "\n").encode("utf-8"))
+        output.flush()
+        os.fsync(output.fileno())
+        status = "ok" if record["status"] == "ok" else f"FAILED ({record['stage']}: {record['error']})"
+        log(f"[{stats.completed}/{stats.total}] {record['target']}: {status}{seconds_text}")
+
+    def fail(target, stage, error):
+        stats.failures[(stage, type(error).__name__)] += 1
+        write({"target": target, "status": "error", "stage": stage,
+               "error_type": type(error).__name__, "error": str(error)[:500]})
+
+    try:
+        while todo or suspects or pending:
+            # Keep every worker busy without analysing far ahead of the model requests
+            while analysing < 2 * processes and waiting_for_llm < 2 * threads:
+                if todo:
+                    target = todo.popleft()
+                elif suspects and not analysing:
+                    # Alone in the pool, a target that crashes again is the culprit
+                    target = suspects.popleft()
+                else:
+                    break
+                attempts[target] += 1
+                pending[executor.submit(analyze_target, target)] = ("analysis", target, executor)
+                analysing += 1
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, target, detail = pending.pop(future)
+                if stage == "analysis":
+                    analysing -= 1
+                    try:
+                        analyzed = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. out of memory) and took the pool's other tasks with it:
+                        # restart the pool and retry each of them once
+                        if detail is executor:
+                            executor.shutdown(wait=False)
+                            executor = process_pool(processes)
+                        if attempts[target] < MAX_ATTEMPTS:
+                            suspects.append(target)
+                        else:
+                            fail(target, stage, e)
+                        continue
+                    except Exception as e:
+                        fail(target, stage, e)
+                        continue
+                    stats.analysis_seconds.append(analyzed["seconds"])
+                    if assistant is None:
+                        stats.succeeded += 1
+                        write(result_record(target, analyzed, None, None, 0.0, include_graph),
+                              f" ({analyzed['files']} files, {analyzed['seconds']:.1f}s)")
+                        continue
+                    pending[llm_pool.submit(recommend, assistant, target, analyzed["analysis"], settings,
+                                            token_budget, blueprint)] = ("recommendations", target, analyzed)
+                    waiting_for_llm += 1
+                else:
+                    analyzed = detail
+                    waiting_for_llm -= 1
+                    try:
+                        recommendations, implementation, seconds = future.result()
+                    except Exception as e:
+                        fail(target, stage, e)
+                        continue
+                    stats.recommendation_seconds.append(seconds)
+                    stats.succeeded += 1
+                    write(result_record(target, analyzed, recommendations, implementation, seconds, include_graph),
+                          f" ({analyzed['files']} files, {analyzed['seconds']:.1f}s analysis, {seconds:.1f}s model)")
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        llm_pool.shutdown(wait=True, cancel_futures=True)
+        output.close()
+    return stats
+
+def read_targets(paths, targets_file):
+    """Targets from the command line plus one per line of targets_file ("-" for stdin; # starts a comment)"""
+    targets = list(paths)
+    if targets_file:
+        f = sys.stdin if targets_file == "-" else open(targets_file, "r", encoding="utf-8")
+        with f:
+            targets.extend(line.split(" #")[0].strip() for line in f if line.strip() and not line.startswith("#"))
+    return [target for target in targets if target]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the Architecture Advisor over many repositories, writing one JSON line per repository"
+    )
+    parser.add_argument("targets", nargs="*",
+                        help="Project directories, ZIP archives or git repositories/URLs (append #ref to pick a ref)")
+    parser.add_argument("-f", "--targets-file", help="File with one target per line ('-' reads standard input)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT,
+                        help="JSONL results file; repositories already in it are skipped")
+    parser.add_argument("--processes", type=int, default=DEFAULT_MAX_WORKERS, help="Worker processes for the analysis")
+    parser.add_argument("--threads", type=int, default=DEFAULT_LLM_THREADS, help="Concurrent model requests")
+    parser.add_argument("--model", default=AUTO_MODEL, help="Model id, or 'auto' to route by prompt")
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_CONTEXT_TOKEN_BUDGET,
+                        help="Tokens of analysis context sent with each recommendation request")
+    parser.add_argument("--blueprint", action="store_true", help="Also generate implementation blueprints")
+    parser.add_argument("--no-llm", action="store_true", help="Only run the static analysis")
+    parser.add_argument("--include-graph", action="store_true",
+                        help="Include the file structure and dependency graph in each result")
+    parser.add_argument("--stub", action="store_true", help="Answer with the offline stub client instead of Groq")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds the stub client waits per request")
+    args = parser.parse_args(argv)
+
+    targets = read_targets(args.targets, args.targets_file)
+    if not targets:
+        parser.error("no targets given")
+
+    stats = run_batch(
+        targets,
+        args.output,
+        assistant=None if args.no_llm else create_assistant(args.stub, args.stub_latency),
+        processes=max(1, args.processes),
+        threads=max(1, args.threads),
+        settings=(args.model, args.temperature),
+        token_budget=args.token_budget,
+        blueprint=args.blueprint,
+        include_graph=args.include_graph,
+    )
+    print(stats.report(), file=sys.stderr)
+    return 1 if stats.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
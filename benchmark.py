@@ -0,0 +1,462 @@
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import platform
+import posixpath
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import graph_view
+from code_assistant import CodeAssistant
+from graph_view import collapse_graph, layered_layout, render_dependency_view, sample_graph
+from mock_groq_server import MockGroqServer
+from model_router import LARGE_MODEL
+from project_analysis import build_dependency_graph, extract_file_structure
+from project_index import ProjectIndex
+from request_metrics import RequestMetrics, percentile
+from semantic_cache import SemanticCache, tune_threshold
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+DEFAULT_RESULTS_FILE = os.path.join(BENCHMARK_DIR, "results.jsonl")
+DEFAULT_FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+DEFAULT_SIZES = (10, 100, 1000, 10000, 50000)
+# A benchmark regresses when its median is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.10
+# ...and at least this many seconds slower, so timer noise on tiny cases is ignored
+MIN_REGRESSION_SECONDS = 0.002
+MODULES_PER_PACKAGE = 40
+ARCHITECTURE_PROJECT_FILES = 200
+# A fixed model keeps the router's latency-based choices out of the measurements
+SCENARIO_SETTINGS = (LARGE_MODEL, 0.0)
+DEFAULT_SEMANTIC_ENTRIES = 100000
+SEMANTIC_LOOKUPS = 500
+SEMANTIC_THRESHOLDS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95)
+# (question, cached question, whether the cached answer also answers the question)
+SIMILAR_QUESTION_PAIRS = [
+    ("how do I use async await in python", "how to use async/await python?", True),
+    ("How do I reverse a list in Python?", "how to reverse a python list", True),
+    ("What is the difference between a process and a thread?", "difference between thread and process", True),
+    ("How do I read a file line by line in Python?", "python read file line by line", True),
+    ("How can I merge two dictionaries in Python?", "merge two dicts python", True),
+    ("What does the yield keyword do in Python?", "what does yield do in python", True),
+    ("How do I sort a list of dictionaries by a key?", "sort list of dicts by key", True),
+    ("How to check if a file exists in Python?", "python check whether a file exists", True),
+    ("What is a closure in JavaScript?", "explain closures in javascript", True),
+    ("How do I undo the last git commit?", "how to undo last commit in git", True),
+    ("How do I create a virtual environment in Python?", "how to create a python virtualenv", True),
+    ("What is the difference between == and === in JavaScript?", "javascript == vs ===", True),
+    ("How do I convert a string to an int in Python?", "python convert string to integer", True),
+    ("How do I center a div with CSS?", "how to center a div in css", True),
+    ("What is dependency injection?", "what's dependency injection", True),
+    ("How do I reverse a list in Python?", "How do I reverse a string in Python?", False),
+    ("How do I reverse a list in Python?", "How do I reverse an array in JavaScript?", False),
+    ("how do I use async await in python", "how do I use async await in javascript", False),
+    ("How do I convert a string to an int in Python?", "How do I convert an int to a string in Python?", False),
+    ("How do I read a file line by line in Python?", "How do I write a file line by line in Python?", False),
+    ("How can I merge two dictionaries in Python?", "How can I merge two lists in Python?", False),
+    ("How do I sort a list of dictionaries by a key?", "How do I sort a dictionary by value?", False),
+    ("What is a closure in JavaScript?", "What is a closure in Python?", False),
+    ("How do I undo the last git commit?", "How do I amend the last git commit?", False),
+    ("How to check if a file exists in Python?", "How to check if a directory exists in Python?", False),
+    ("What is the difference between a process and a thread?",
+     "What is the difference between a thread and a coroutine?", False),
+    ("How do I create a virtual environment in Python?", "How do I delete a virtual environment in Python?", False),
+    ("How do I center a div with CSS?", "How do I center text with CSS?", False),
+    ("What does the yield keyword do in Python?", "What does the await keyword do in Python?", False),
+    ("What is dependency injection?", "What is dependency inversion?", False),
+    ("How do I install numpy?", "How do I uninstall numpy?", False),
+    ("Python 2 print statement", "Python 3 print function", False),
+    ("Is Python 2 faster than Python 3?", "Is Python 3 faster than Python 2?", False),
+    ("Is a list faster than a tuple?", "Is a tuple faster than a list?", False),
+    ("Should I use a list instead of a tuple?", "Should I use a tuple instead of a list?", False),
+    ("How do I copy file a over file b?", "How do I copy file b over file a?", False),
+    ("How to read a text file line by line in JavaScript?", "How to read a text file line by line in Java?", False),
+    ("How do I sort an array of objects by property in Java?",
+     "How do I sort an array of objects by property in JavaScript?", False),
+    ("How do I reverse a string without using a built in function in C?",
+     "How do I reverse a string without using a built in function in C++?", False),
+    ("How do I make an HTTP request in Python?", "How do I make an HTTPS request in Python?", False),
+]
+QUESTION_VERBS = ("reverse", "sort", "filter", "parse", "serialize", "validate", "copy", "merge", "split", "cache")
+QUESTION_NOUNS = ("list", "string", "dictionary", "file", "date", "json document", "csv row", "url", "queue", "tree")
+QUESTION_LANGUAGES = ("Python", "JavaScript", "Go", "Rust", "Java", "C++", "Ruby", "Kotlin")
+
+PNG_1X1 = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c63000100000500010d0a2db40000000049454e44ae426082"
+)).decode("ascii")
+SAMPLE_CODE = '''def fibonacci(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+'''
+
+# --- synthetic projects ---
+
+def module_path(number):
+    """Path of the number-th synthetic module: packages of MODULES_PER_PACKAGE, nested three deep"""
+    package = number // MODULES_PER_PACKAGE
+    parts = [f"pkg{package // 100}", f"sub{package // 10 % 10}", f"mod{package % 10}"]
+    return "/".join(parts), f"m{number}"
+
+def python_module(number, imports):
+    lines = ["import os", "import json"]
+    for target in imports:
+        package, name = module_path(target)
+        lines.append(f"from {package.replace('/', '.')}.{name} import Component{target}")
+    lines.append("")
+    kind = ("Factory", "Repository", "Service", "Handler")[number % 4]
+    lines.append(f"class Component{number}{kind}:")
+    lines.append("    def run(self, value):")
+    lines.append(f"        if value > {number % 7}:")
+    lines.append(f"            return value * {number % 5 + 1}")
+    lines.append(f"        return json.dumps({{'module': {number}}})")
+    lines.append(f"Component{number} = Component{number}{kind}")
+    return "\n".join(lines) + "\n"
+
+def javascript_module(number, imports):
+    lines = []
+    directory = module_path(number)[0]
+    for target in imports:
+        package, name = module_path(target)
+        specifier = posixpath.relpath(f"{package}/{name}.js", directory)
+        lines.append(f"import {{ part{target} }} from '{specifier if specifier.startswith('.') else './' + specifier}';")
+    lines.append(f"export function part{number}(value) {{ return value + {number}; }}")
+    return "\n".join(lines) + "\n"
+
+def generate_project(root, files, seed=0):
+    """Write a deterministic synthetic project of the given number of files
+
+    Mostly Python modules with some JavaScript, grouped in nested packages (whose
+    __init__.py files come on top of the count). Each module imports up to three
+    modules of the same language with lower numbers, mostly from its own package,
+    so the dependency graph looks like a layered application with a few
+    cross-package edges.
+    """
+    rng = random.Random(seed)
+    for number in range(files):
+        package, name = module_path(number)
+        is_javascript = number % 10 == 9
+        candidates = [n for n in range(max(0, number - 3 * MODULES_PER_PACKAGE), number)
+                      if (n % 10 == 9) == is_javascript]
+        imports = sorted(rng.sample(candidates, min(len(candidates), rng.randint(0, 3))))
+        directory = os.path.join(root, package)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+            for level in range(1, 4):
+                open(os.path.join(root, *package.split("/")[:level], "__init__.py"), "a").close()
+        if is_javascript:
+            text, extension = javascript_module(number, imports), ".js"
+        else:
+            text, extension = python_module(number, imports), ".py"
+        with open(os.path.join(directory, name + extension), "w", encoding="utf-8") as f:
+            f.write(text)
+
+def project_fixture(files, fixtures_dir=DEFAULT_FIXTURES_DIR, seed=0):
+    """Return the directory of a synthetic project, generating it on first use"""
+    root = os.path.join(fixtures_dir, f"project-{files}-{seed}")
+    marker = os.path.join(root, ".complete")
+    if not os.path.exists(marker):
+        generate_project(root, files, seed)
+        open(marker, "w").close()
+    return root
+
+# --- measurement ---
+
+def summarize(name, params, samples, **extra):
+    """One result record: sorted samples with their min, median and p95 in seconds"""
+    samples = sorted(samples)
+    return dict({
+        "benchmark": name,
+        "params": params,
+        "samples": [round(sample, 6) for sample in samples],
+        "min": round(samples[0], 6),
+        "median": round(percentile(samples, 0.5), 6),
+        "p95": round(percentile(samples, 0.95), 6),
+    }, **extra)
+
+def time_calls(function, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def dependency_layout(graph):
+    """The graph work of visualize_dependencies, without drawing"""
+    nodes, edges = collapse_graph(graph, 1)
+    nodes, edges, _ = sample_graph(nodes, edges)
+    return layered_layout(nodes, edges)
+
+def can_render():
+    return all(importlib.util.find_spec(name) is not None for name in ("matplotlib", "networkx"))
+
+def project_benchmarks(sizes, repeat, fixtures_dir, log):
+    """Time indexing, extract_file_structure, build_dependency_graph and visualize_dependencies per project size"""
+    results = []
+    render = can_render()
+    if not render:
+        log("matplotlib/networkx not installed: timing the dependency layout without drawing")
+    for files in sizes:
+        params = {"files": files}
+        root = project_fixture(files, fixtures_dir)
+        index = ProjectIndex.from_directory(root)
+        graph, _ = build_dependency_graph(index)
+
+        results.append(summarize("project.index", params, time_calls(lambda: ProjectIndex.from_directory(root), repeat)))
+        results.append(summarize("project.extract_file_structure", params,
+                                 time_calls(lambda: extract_file_structure(index), repeat)))
+        results.append(summarize("project.build_dependency_graph", params,
+                                 time_calls(lambda: build_dependency_graph(index), repeat),
+                                 edges=graph.edge_count))
+        results.append(summarize("project.dependency_layout", params,
+                                 time_calls(lambda: dependency_layout(graph), repeat)))
+        if render:
+            # Clear the view cache so every run draws the graph
+            results.append(summarize("project.visualize_dependencies", params,
+                                     time_calls(lambda: render_dependency_view(graph), repeat,
+                                                setup=graph_view._view_cache.clear)))
+        log(f"project benchmarks done for {files} files")
+    return results
+
+def run_concurrently(function, iterations, concurrency):
+    """Call function(i) iterations times from concurrency threads; returns (latencies, wall seconds)"""
+    def timed(i):
+        started = time.perf_counter()
+        function(i)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, range(iterations)))
+    return latencies, time.perf_counter() - started
+
+def scenario_benchmarks(server, iterations, concurrency, fixtures_dir, log):
+    """Time the text, image, voice, translation and architecture paths against the mock server"""
+    from groq import Groq
+
+    client = Groq(api_key="mock", base_url=server.url, max_retries=5)
+    assistant = CodeAssistant(client, metrics=RequestMetrics())
+    architecture_index = ProjectIndex.from_directory(project_fixture(ARCHITECTURE_PROJECT_FILES, fixtures_dir))
+    audio = bytes(32000)  # one second of 16 kHz, 16-bit silence
+    first_tokens = []
+
+    def stream_text(i):
+        started = time.perf_counter()
+        for position, _ in enumerate(assistant.ask_stream(f"Explain Python generators ({i})", SCENARIO_SETTINGS)):
+            if position == 0:
+                first_tokens.append(time.perf_counter() - started)
+
+    scenarios = [
+        ("scenario.text", lambda i: assistant.ask(f"How do I reverse a list in Python? ({i})", SCENARIO_SETTINGS)),
+        ("scenario.text_stream", stream_text),
+        ("scenario.image", lambda i: assistant.analyze_image("What does this screenshot show?", PNG_1X1,
+                                                             SCENARIO_SETTINGS, "image/png")),
+        ("scenario.voice", lambda i: assistant.transcribe(f"clip-{i}.wav", audio)),
+        ("scenario.translation", lambda i: assistant.translate(SAMPLE_CODE, "Python", "JavaScript", SCENARIO_SETTINGS)),
+        ("scenario.architecture", lambda i: assistant.analyze_architecture(architecture_index, SCENARIO_SETTINGS)),
+    ]
+    params = {
+        "iterations": iterations, "concurrency": concurrency, "latency": server.latency,
+        "tokens_per_second": server.tokens_per_second, "completion_tokens": server.completion_tokens,
+        "rate_limit_every": server.rate_limit_every,
+    }
+
+    results = []
+    for name, function in scenarios:
+        rate_limited = server.rate_limited
+        latencies, wall = run_concurrently(function, iterations, concurrency)
+        extra = {"throughput_per_second": round(iterations / wall, 3), "rate_limited": server.rate_limited - rate_limited}
+        if first_tokens:
+            first_tokens.sort()
+            extra["time_to_first_token_median"] = round(percentile(first_tokens, 0.5), 6)
+            first_tokens.clear()
+        results.append(summarize(name, params, latencies, **extra))
+        log(f"{name} done")
+    return results
+
+def synthetic_question(number, paraphrase=False):
+    """The number-th distinct synthetic question, or a differently worded version of it"""
+    verb = QUESTION_VERBS[number % len(QUESTION_VERBS)]
+    noun = QUESTION_NOUNS[number // len(QUESTION_VERBS) % len(QUESTION_NOUNS)]
+    language = QUESTION_LANGUAGES[number // 100 % len(QUESTION_LANGUAGES)]
+    if paraphrase:
+        return f"{language} {verb} {noun} in module{number}"
+    return f"How do I {verb} a {noun} in {language} for module{number}?"
+
+def semantic_benchmarks(entries, lookups, log):
+    """Threshold tuning on labelled question pairs, then index memory and lookup latency at entries questions"""
+    results = []
+    started = time.perf_counter()
+    rows = tune_threshold(SemanticCache(max_entries=1), SIMILAR_QUESTION_PAIRS, SEMANTIC_THRESHOLDS)
+    results.append(summarize("semantic.threshold_tuning", {"pairs": len(SIMILAR_QUESTION_PAIRS)},
+                             [time.perf_counter() - started], thresholds=rows))
+    log("threshold  precision  recall  f1     false positives (without same_request)")
+    for row in rows:
+        log(f"{row['threshold']:<9.2f}  {row['precision']:<9.2f}  {row['recall']:<6.2f}  {row['f1']:<5.2f}  "
+            f"{row['false_positives']} ({row['unverified_false_positives']})")
+
+    cache = SemanticCache(max_entries=entries)
+    started = time.perf_counter()
+    for number in range(entries):
+        cache.add(synthetic_question(number), f"answer {number}")
+    build = time.perf_counter() - started
+    log(f"semantic cache built with {entries} questions in {build:.1f} s, index {cache.memory_bytes() / 2**20:.1f} MB")
+
+    queries = [random.Random(number).randrange(entries) for number in range(lookups)]
+    params = {"entries": entries, "lookups": lookups}
+    found, agreed = 0, 0
+    for number in queries:
+        question = synthetic_question(number, paraphrase=True)
+        approximate = cache.nearest(question)
+        exact = cache.nearest(question, exact=True)
+        found += cache.lookup(question) is not None
+        agreed += bool(approximate) and bool(exact) and approximate[0][1] == exact[0][1]
+    index = {"index_bytes": cache.memory_bytes(), "build_seconds": round(build, 3)}
+    results.append(summarize("semantic.lookup", params, time_calls_each(
+        lambda number: cache.lookup(synthetic_question(number, paraphrase=True)), queries),
+        hit_rate=round(found / lookups, 4), **index))
+    results.append(summarize("semantic.nearest_lsh", params, time_calls_each(
+        lambda number: cache.nearest(synthetic_question(number, paraphrase=True)), queries),
+        recall_vs_exact=round(agreed / lookups, 4), **index))
+    results.append(summarize("semantic.nearest_exact", params, time_calls_each(
+        lambda number: cache.nearest(synthetic_question(number, paraphrase=True), exact=True), queries), **index))
+    log("semantic benchmarks done")
+    return results
+
+def time_calls_each(function, arguments):
+    samples = []
+    for argument in arguments:
+        started = time.perf_counter()
+        function(argument)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+# --- results and regressions ---
+
+def git_revision():
+    """Return (commit, dirty) of the working tree, or ("unknown", False) outside git"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "-C", directory, "rev-parse", "HEAD"],
+                                capture_output=True, check=True).stdout.decode().strip()
+        status = subprocess.run(["git", "-C", directory, "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, bool(status.strip())
+
+def benchmark_key(record):
+    return record["benchmark"], json.dumps(record["params"], sort_keys=True)
+
+def append_results(path, results):
+    """Append a run's records to the results file, tagged with the commit and machine they ran on"""
+    commit, dirty = git_revision()
+    run = {
+        "run_id": f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}",
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    records = [dict(run, **result) for result in results]
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return records
+
+def load_baseline(path, baseline, exclude_run):
+    """Return the latest record per benchmark from the run(s) of a baseline commit (prefix), or the previous run"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records = [record for record in records if record["run_id"] != exclude_run]
+    if baseline:
+        records = [record for record in records if record["commit"].startswith(baseline)]
+    elif records:
+        last_run = records[-1]["run_id"]
+        records = [record for record in records if record["run_id"] == last_run]
+    return {benchmark_key(record): record for record in records}
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (key, baseline median, current median, change) for every benchmark slower than the threshold"""
+    regressions = []
+    for record in current:
+        previous = baseline.get(benchmark_key(record))
+        if previous is None or not previous["median"]:
+            continue
+        change = record["median"] / previous["median"] - 1
+        if change > threshold and record["median"] - previous["median"] > MIN_REGRESSION_SECONDS:
+            regressions.append((benchmark_key(record), previous["median"], record["median"], change))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic benchmarks for the Code Helper")
+    parser.add_argument("--suite", choices=("all", "project", "scenarios", "semantic"), default="all")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated synthetic project sizes in files")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per project benchmark")
+    parser.add_argument("--iterations", type=int, default=20, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0, help="Mock server token rate")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Length of mock text replies")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Mock server answers every Nth request with 429")
+    parser.add_argument("--semantic-entries", type=int, default=DEFAULT_SEMANTIC_ENTRIES,
+                        help="Questions in the semantic cache benchmark")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE, help="JSONL file the results are appended to")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Where synthetic projects are generated")
+    parser.add_argument("--compare", nargs="?", const="", metavar="COMMIT",
+                        help="Compare with the runs of COMMIT (default: the previous run); exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown that counts")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr, flush=True)
+
+    results = []
+    if args.suite in ("all", "project"):
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        results.extend(project_benchmarks(sizes, args.repeat, args.fixtures, log))
+    if args.suite in ("all", "scenarios"):
+        server = MockGroqServer(args.latency, args.tokens_per_second, args.completion_tokens,
+                                rate_limit_every=args.rate_limit_every)
+        server.start_in_thread()
+        try:
+            results.extend(scenario_benchmarks(server, args.iterations, args.concurrency, args.fixtures, log))
+        finally:
+            server.stop()
+    if args.suite in ("all", "semantic"):
+        results.extend(semantic_benchmarks(args.semantic_entries, SEMANTIC_LOOKUPS, log))
+
+    records = append_results(args.results, results)
+    for record in records:
+        params = " ".join(f"{key}={value}" for key, value in record["params"].items() if key in ("files", "entries"))
+        print(f"{record['benchmark']:<36} {params:<12} median {record['median'] * 1000:9.2f} ms  "
+              f"p95 {record['p95'] * 1000:9.2f} ms")
+
+    if args.compare is None:
+        return 0
+    baseline = load_baseline(args.results, args.compare, records[0]["run_id"] if records else None)
+    if not baseline:
+        print("No baseline results to compare with")
+        return 0
+    regressions = compare(records, baseline, args.threshold)
+    for (name, params), before, after, change in regressions:
+        print(f"REGRESSION {name} {params}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms (+{change:.0%})")
+    print(f"{len(regressions)} regression(s) against {next(iter(baseline.values()))['commit'][:12]}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+import os
+import weakref
+
+from context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET, build_architecture_context, build_structure_summary, estimate_tokens
+from map_reduce_analysis import SummaryCache, map_reduce_analysis
+from model_router import AUTO_MODEL, DEFAULT_TEMPERATURE, ModelRouter
+from project_analysis import analyze_project
+from request_metrics import DEFAULT_METRICS_FILE, RequestMetrics
+from response_cache import response_key
+from structured_output import RECOMMENDATION_FORMAT, IncrementalJSONObjectParser, parse_json_object, pattern_names
+from tracing import bind, tracer
+
+try:
+    from groq import BadRequestError
+except ImportError:
+    # Only needed with the real client; the stub client never rejects JSON mode
+    class BadRequestError(Exception):
+        pass
+
+VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+TRANSCRIPTION_MODEL = "whisper-large-v3"
+DEFAULT_SETTINGS = (AUTO_MODEL, DEFAULT_TEMPERATURE)
+
+# Tab each kind of request is reported under in the request metrics
+TASK_TABS = {
+    "chat": "Text Input",
+    "speculation": "Text Input (prefetch)",
+    "image": "Image Analysis",
+    "transcription": "Voice Input",
+    "translation": "Code Translation",
+    "architecture": "Architecture Advisor",
+    "summary": "Architecture Advisor",
+    "blueprint": "Architecture Advisor",
+}
+
+def chunk_usage(chunk):
+    """Return the token usage attached to a streamed chunk (Groq sends it with the last one)"""
+    return getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+def chunk_text(chunk):
+    """Return the text delta of a streamed chunk, or an empty string"""
+    return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+def end_completion_span(span, timer, error=None):
+    """Attach a finished request's figures to its trace span (OpenTelemetry gen_ai names) and end it"""
+    span.set_attribute("gen_ai.usage.input_tokens", timer.prompt_tokens or 0)
+    span.set_attribute("gen_ai.usage.output_tokens", timer.completion_tokens or 0)
+    span.set_attribute("queue_wait_ms", round(timer.queue_wait * 1000, 3))
+    if error is not None:
+        span.record_exception(error)
+    span.end()
+
+def finish_stream(timer, router, span, prompt_tokens, completion_text, error):
+    """Record a streamed completion's metrics and end its span; later calls are ignored"""
+    if timer.latency is not None:
+        return
+    if timer.prompt_tokens is None:
+        timer.prompt_tokens = prompt_tokens
+        timer.completion_tokens = estimate_tokens("".join(completion_text))
+    timer.finish(error=error)
+    end_completion_span(span, timer, RuntimeError("stream interrupted") if error else None)
+    if not error:
+        router.record(timer.model, timer.latency)
+
+def timed_stream(stream, timer, router, prompt_tokens, span):
+    """Return a generator of the chunks of a streamed completion that records its metrics once it ends
+
+    The metrics are recorded when the stream is exhausted, fails or is closed, and
+    also when a generator that was never iterated (so never entered its try block)
+    is garbage collected.
+    """
+    completion_text = []
+
+    def chunks():
+        error = True
+        try:
+            for chunk in stream:
+                if timer.time_to_first_token is None:
+                    timer.first_token()
+                    span.set_attribute("time_to_first_token_ms", round(timer.time_to_first_token * 1000, 3))
+                timer.add_usage(chunk_usage(chunk))
+                completion_text.append(chunk_text(chunk))
+                yield chunk
+            error = False
+        finally:
+            finish_stream(timer, router, span, prompt_tokens, completion_text, error)
+
+    generator = chunks()
+    weakref.finalize(generator, finish_stream, timer, router, span, prompt_tokens, completion_text, True)
+    return generator
+
+class CodeAssistant:
+    """The helper's capabilities independent of any front end
+
+    Wraps a Groq client (or StubGroqClient) with model routing, request metrics
+    and tracing. The Streamlit app and the HTTP API both call these methods;
+    settings is the (model, temperature) pair chosen by the caller. Methods raise
+    on API errors and are safe to call from worker threads. With a response_cache,
+    follow-ups prefetched for a conversation are answered from the cache; with a
+    semantic_cache, so are questions similar to ones answered before.
+    """
+
+    def __init__(self, client, router=None, metrics=None, summary_cache=None, response_cache=None,
+                 semantic_cache=None):
+        self.client = client
+        self.router = router or ModelRouter()
+        self.metrics = metrics or RequestMetrics()
+        self.summary_cache = summary_cache
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+
+    def complete(self, messages, task="chat", settings=None, model=None, tab=None, json_mode=False, **options):
+        """Send a chat completion to the model chosen by the router and record its metrics
+
+        model bypasses routing (e.g. for the vision model) and tab overrides the tab
+        the request is reported under. With json_mode, JSON output is requested and
+        the request is retried without it if the model does not support it. With
+        stream=True a generator of chunks is returned.
+        """
+        if self.client is None:
+            raise RuntimeError("No Groq client is configured")
+        selected_model, temperature = settings or DEFAULT_SETTINGS
+        prompt = "\n".join(message["content"] for message in messages if isinstance(message["content"], str))
+        if model is None:
+            # Route on the new question; earlier turns of a conversation are already compacted
+            question = messages[-1]["content"]
+            model = self.router.choose(question if isinstance(question, str) else prompt, task, selected_model)
+
+        request = dict(model=model, messages=messages, temperature=temperature, **options)
+        span = tracer.span(
+            "llm.completion", task=task, stream=bool(options.get("stream")),
+            **{"gen_ai.system": "groq", "gen_ai.request.model": model, "gen_ai.request.temperature": temperature}
+        )
+        timer = self.metrics.track(model, tab or TASK_TABS.get(task, task))
+        try:
+            if json_mode:
+                try:
+                    response = self.client.chat.completions.create(response_format={"type": "json_object"}, **request)
+                except BadRequestError:
+                    # JSON mode is not available for every model/streaming combination; the prompt still asks for JSON
+                    response = self.client.chat.completions.create(**request)
+            else:
+                response = self.client.chat.completions.create(**request)
+        except Exception as e:
+            timer.finish(error=True)
+            end_completion_span(span, timer, e)
+            raise
+
+        if options.get("stream"):
+            return timed_stream(response, timer, self.router, estimate_tokens(prompt), span)
+        timer.add_usage(getattr(response, "usage", None))
+        if timer.prompt_tokens is None:
+            timer.prompt_tokens = estimate_tokens(prompt)
+            timer.completion_tokens = estimate_tokens(response.choices[0].message.content or "")
+        timer.finish()
+        end_completion_span(span, timer)
+        self.router.record(model, timer.latency)
+        return response
+
+    def complete_prompt(self, prompt, settings=None, task="summary", max_completion_tokens=1024, tab=None, model=None):
+        """Send a single prompt and return the reply text"""
+        response = self.complete(
+            [{"role": "user", "content": prompt}],
+            task=task,
+            settings=settings,
+            model=model,
+            tab=tab,
+            max_completion_tokens=max_completion_tokens
+        )
+        return response.choices[0].message.content
+
+    def ask(self, prompt, settings=None, conversation=None, tab=None, on_cache_hit=None):
+        """Answer a coding question, as a follow-up in conversation if one is given
+
+        on_cache_hit(cached question, similarity) is called when the answer to a
+        similar earlier question is reused.
+        """
+        if conversation is not None:
+            messages = conversation.request_messages(prompt)
+        else:
+            messages = [{"role": "user", "content": prompt}]
+
+        # A cached answer is counted against the model the caller asked for (AUTO_MODEL when routed)
+        selected_model = (settings or DEFAULT_SETTINGS)[0]
+        answer = None
+        if self.response_cache is not None:
+            # Only prefetched follow-ups are cached, under the exact request that asks for them
+            answer = self.response_cache.get(response_key(messages, settings or DEFAULT_SETTINGS))
+            if answer is not None:
+                self.metrics.record_cache_hits(selected_model, tab or TASK_TABS["chat"])
+        # Similar questions only share an answer when asked with the same context and settings
+        namespace = response_key(messages[:-1], settings or DEFAULT_SETTINGS)
+        if answer is None and self.semantic_cache is not None:
+            match = self.semantic_cache.lookup(prompt, namespace)
+            if match is not None:
+                answer, similarity, cached_question = match
+                self.metrics.record_cache_hits(selected_model, tab or TASK_TABS["chat"])
+                if on_cache_hit is not None:
+                    on_cache_hit(cached_question, similarity)
+        if answer is None:
+            response = self.complete(messages, task="chat", settings=settings, tab=tab)
+            answer = response.choices[0].message.content
+            if self.semantic_cache is not None:
+                self.semantic_cache.add(prompt, answer, namespace)
+        if conversation is not None:
+            conversation.add_exchange(prompt, answer)
+        return answer
+
+    def ask_stream(self, prompt, settings=None, tab=None):
+        """Yield the answer to a coding question as text deltas"""
+        stream = self.complete([{"role": "user", "content": prompt}], task="chat", settings=settings, tab=tab,
+                               stream=True)
+        for chunk in stream:
+            text = chunk_text(chunk)
+            if text:
+                yield text
+
+    def summarize_conversation(self, prompt, settings=None):
+        """Fold older conversation turns into its summary (see Conversation.compact)"""
+        return self.complete_prompt(prompt, settings, task="conversation_summary", max_completion_tokens=400,
+                                    tab=TASK_TABS["chat"])
+
+    def analyze_image(self, prompt, base64_image, settings=None, mime_type="image/jpeg"):
+        """Answer a question about an image"""
+        # Only the vision model accepts images, so the chosen temperature applies but the chosen model does not
+        response = self.complete(
+            task="image",
+            settings=settings,
+            model=VISION_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{base64_image}",
+                            },
+                        },
+                    ],
+                }
+            ],
+            max_completion_tokens=1024,
+            top_p=1,
+            stream=False
+        )
+        return response.choices[0].message.content
+
+    def transcribe(self, file_name, data, tab=None):
+        """Transcribe audio bytes, or an open binary file that is streamed, with Whisper"""
+        if self.client is None:
+            raise RuntimeError("No Groq client is configured")
+        span = tracer.span(
+            "llm.transcription", file_name=file_name,
+            **{"gen_ai.system": "groq", "gen_ai.request.model": TRANSCRIPTION_MODEL}
+        )
+        timer = self.metrics.track(TRANSCRIPTION_MODEL, tab or TASK_TABS["transcription"])
+        try:
+            transcription = self.client.audio.transcriptions.create(
+                file=(file_name, data),
+                model=TRANSCRIPTION_MODEL,
+                response_format="json"
+            )
+        except Exception as e:
+            timer.finish(error=True)
+            end_completion_span(span, timer, e)
+            raise
+        timer.finish()
+        end_completion_span(span, timer)
+        self.router.record(TRANSCRIPTION_MODEL, timer.latency)
+        return transcription.text
+
+    def translate(self, source_code, source_language, target_language, settings=None):
+        """Translate code from one programming language to another"""
+        prompt = f"""
+        Translate the following {source_language} code to {target_language}.
+        Maintain the same functionality, logic, and behavior.
+        Add comments explaining any significant translation decisions or language differences.
+        If any feature doesn't have a direct equivalent, explain the workaround used.
+
+        Here's the {source_language} code to translate:
+        ```{source_language}
+        {source_code}
+        ```
+        """
+        return self.complete_prompt(prompt, settings, task="translation", max_completion_tokens=2048)
+
+    def stream_json(self, prompt, on_section=None, settings=None, task="architecture", max_completion_tokens=4096):
+        """Stream a JSON-mode completion, calling on_section(key, value) as each top-level member completes
+
+        Returns (sections, raw_text); sections is empty if the model did not return a JSON object.
+        """
+        stream = self.complete(
+            [{"role": "user", "content": prompt}],
+            task=task,
+            settings=settings,
+            json_mode=True,
+            max_completion_tokens=max_completion_tokens,
+            stream=True
+        )
+
+        parser = IncrementalJSONObjectParser()
+        sections = {}
+        for chunk in stream:
+            delta = chunk_text(chunk)
+            if not delta:
+                continue
+            for key, value in parser.feed(delta):
+                sections[key] = value
+                if on_section:
+                    on_section(key, value)
+
+        if not sections:
+            # Fall back to parsing the whole reply, e.g. if the object was wrapped oddly
+            sections = parse_json_object(parser.text) or {}
+        return sections, parser.text
+
+    def architecture_recommendations(self, project_analysis, context=None, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET,
+                                     on_section=None, settings=None):
+        """Get AI recommendations for architectural improvements
+
+        Returns (recommendations, raw_text). Sections are passed to on_section as soon as they are complete.
+        """
+        # Compress the analysis into a ranked summary that fits the token budget
+        if context is None:
+            context, _ = build_architecture_context(project_analysis, token_budget)
+
+        # Prepare detailed prompt with all analysis data
+        prompt = f"""
+        As an expert software architect, analyze this project and provide architectural recommendations.
+
+        {context}
+        {RECOMMENDATION_FORMAT}
+        """
+
+        return self.stream_json(prompt, on_section, settings)
+
+    def implementation_blueprint(self, project_analysis, recommendations, settings=None):
+        """Generate specific implementation examples for recommended changes"""
+        blueprint = {}
+
+        try:
+            # Recommendations arrive as structured JSON, so pattern names are read directly
+            patterns = pattern_names(recommendations)
+            if patterns:
+                for pattern_name in patterns:
+                    prompt = f"""
+                    Generate an implementation example for the {pattern_name} design pattern
+                    in the context of this project. Use pseudocode or Python.
+
+                    Project context:
+                    {build_structure_summary(project_analysis['structure'])}
+                    """
+                    blueprint[f"pattern_{pattern_name}"] = self.complete_prompt(prompt, settings, task="blueprint")
+            else:
+                # No design patterns found, get general implementation advice
+                prompt = f"""
+                Based on the project structure below, provide implementation examples
+                for improving the architecture:
+
+                Project structure:
+                {build_structure_summary(project_analysis['structure'])}
+                """
+                blueprint["general_improvements"] = self.complete_prompt(prompt, settings, task="blueprint")
+
+        except Exception as e:
+            blueprint["error"] = f"Error generating blueprint: {str(e)}"
+            blueprint["fallback_advice"] = "Consider implementing common patterns like Repository, Factory, or Dependency Injection to improve your code structure."
+
+        return blueprint
+
+    def analyze_architecture(self, index, settings=None, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET,
+                             use_map_reduce=False, on_section=None, on_step=None):
+        """Run the full Architecture Advisor pipeline for a project index
+
+        on_step(step, **details) is called as the pipeline advances: "recommendations"
+        (with the analysis), "packages" (completed and total, in map-reduce mode),
+        "blueprint" and "done". Returns the analysis, recommendations and blueprint.
+        """
+        step = on_step or (lambda name, **details: None)
+        with tracer.span("architecture.analysis", files=len(index), map_reduce=use_map_reduce):
+            analysis = analyze_project(index)
+            step("recommendations", analysis=analysis)
+
+            context_report = None
+            map_reduce_result = None
+            with tracer.span("analysis.recommendations", map_reduce=use_map_reduce):
+                if use_map_reduce:
+                    # One model writes every package summary, so cached summaries can be keyed by it;
+                    # in auto mode that is the large model, which the long code excerpts are routed to anyway
+                    selected_model = (settings or DEFAULT_SETTINGS)[0]
+                    summary_model = self.router.large_model if selected_model == AUTO_MODEL else selected_model
+                    # Summarise each top-level package concurrently, then combine the summaries
+                    map_reduce_result = map_reduce_analysis(
+                        index, analysis["dependencies"],
+                        # bind() keeps the worker threads' LLM spans inside this trace
+                        llm=bind(lambda prompt: self.complete_prompt(prompt, settings, max_completion_tokens=4096,
+                                                                     model=summary_model)),
+                        cache=self.summary_cache,
+                        model=summary_model,
+                        progress=lambda completed, total: step("packages", completed=completed, total=total),
+                        assess=lambda prompt: self.stream_json(prompt, on_section, settings)
+                    )
+                    recommendations, recommendations_text = map_reduce_result["assessment"]
+                    # Cached package summaries written by the model each saved a request
+                    self.metrics.record_cache_hits(summary_model, TASK_TABS["summary"], sum(
+                        1 for summary in map_reduce_result["packages"] if summary.get("cached") and "summary" in summary
+                    ))
+                else:
+                    context, context_report = build_architecture_context(analysis, token_budget)
+                    recommendations, recommendations_text = self.architecture_recommendations(
+                        analysis, context=context, on_section=on_section, settings=settings
+                    )
+
+            step("blueprint")
+            with tracer.span("analysis.blueprint"):
+                blueprint = self.implementation_blueprint(analysis, recommendations, settings)
+            step("done")
+
+        return {
+            "analysis": analysis,
+            "context_report": context_report,
+            "map_reduce": map_reduce_result,
+            "recommendations": recommendations,
+            "recommendations_text": recommendations_text,
+            "blueprint": blueprint
+        }
+
+def create_assistant(stub=False, stub_latency=0.0):
+    """Build a CodeAssistant on the real Groq client, or on the offline stub (for the command-line front ends)"""
+    metrics = RequestMetrics()
+    if DEFAULT_METRICS_FILE:
+        metrics.start_exporter(DEFAULT_METRICS_FILE)
+    if stub:
+        from stub_client import StubGroqClient
+        client = StubGroqClient(latency=stub_latency)
+    else:
+        from groq import Groq
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise SystemExit("Set GROQ_API_KEY, or pass --stub to use the offline stub client")
+        client = Groq(api_key=api_key)
+    return CodeAssistant(client, metrics=metrics, summary_cache=SummaryCache())
@@ -0,0 +1,243 @@
+import math
+import os
+from collections import Counter
+
+from module_graph import as_module_graph
+
+DEFAULT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CODEHELPER_CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Rough characters-per-token ratio for English text and code
+CHARS_PER_TOKEN = 4
+
+# Sections in the order they appear in the prompt
+SECTION_ORDER = [
+    "Overview", "Dependency cycles", "Most depended-on modules", "Modules with most dependencies",
+    "Current design patterns", "Complexity", "Project structure",
+]
+
+def estimate_tokens(text):
+    """Estimate the number of tokens a piece of text will use in a prompt"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class ContextFragment:
+    """One line of prompt context with its section, display order and importance"""
+
+    def __init__(self, section, order, text, priority):
+        self.section = section
+        self.order = order
+        self.text = text
+        self.priority = priority
+        self.tokens = estimate_tokens(text) + 1  # +1 for the line break
+
+# --- project structure ---
+
+def summarize_structure(structure, max_depth=4):
+    """Collapse a nested file structure into one line per directory with file counts
+
+    Returns (fragments, totals) where totals counts files and directories overall.
+    """
+    fragments = []
+    totals = {"files": 0, "directories": 0}
+
+    def count_files(node):
+        files = [f for f in node.get('__files__', []) if f != "..."]
+        total = len(files)
+        for name, child in node.items():
+            if name != '__files__' and isinstance(child, dict):
+                total += count_files(child)
+        return total
+
+    def walk(node, path, depth):
+        files = [f for f in node.get('__files__', []) if f != "..."]
+        totals["files"] += len(files)
+        subdirs = sorted(name for name, child in node.items() if name != '__files__' and isinstance(child, dict))
+        totals["directories"] += len(subdirs)
+
+        for name in subdirs:
+            child = node[name]
+            child_path = f"{path}{name}/"
+            file_count = count_files(child)
+            extensions = Counter(
+                os.path.splitext(f)[1] or f for f in child.get('__files__', []) if f != "..."
+            )
+            top_types = ", ".join(f"{ext} {count}" for ext, count in extensions.most_common(3))
+            details = f"{file_count} files" + (f"; here: {top_types}" if top_types else "")
+            text = f"{'  ' * depth}{child_path} ({details})"
+
+            # Shallow and large directories matter most
+            priority = 30 + depth * 10 - min(file_count, 1000) / 1000
+            fragments.append(ContextFragment("Project structure", child_path, text, priority))
+
+            if depth + 1 < max_depth:
+                walk(child, child_path, depth + 1)
+            else:
+                totals["directories"] += sum(1 for n in child if n != '__files__')
+
+    if isinstance(structure, dict) and "error" not in structure:
+        root_files = [f for f in structure.get('__files__', []) if f != "..."]
+        if root_files:
+            text = f"(root) {len(root_files)} files: {', '.join(sorted(root_files)[:15])}"
+            fragments.append(ContextFragment("Project structure", "", text, 25))
+        walk(structure, "", 0)
+
+    return fragments, totals
+
+def build_structure_summary(structure, token_budget=800):
+    """Return a collapsed directory tree of a project that fits a token budget"""
+    fragments, _ = summarize_structure(structure)
+    context, _ = fit_fragments(fragments, token_budget)
+    return context
+
+# --- dependency graph ---
+
+def summarize_dependencies(dependency_graph, top_n=10):
+    """Summarise a dependency graph into counts, cycles and the top fan-in/fan-out modules"""
+    fragments = []
+    graph = as_module_graph(dependency_graph)
+    if not graph:
+        return fragments, {"modules": 0, "edges": 0, "cycles": 0}
+
+    names = graph.names
+    _, components = graph.strongly_connected_components()
+    cycles = graph.cycles()
+
+    stats = {
+        "modules": len(graph),
+        "edges": graph.edge_count,
+        "components": len(components),
+        "cycles": len(cycles),
+    }
+    fragments.append(ContextFragment(
+        "Overview", 1,
+        f"Dependency graph: {stats['modules']} modules, {graph.edge_count} edges, "
+        f"{len(components)} strongly connected components, {len(cycles)} cycles",
+        0
+    ))
+
+    for rank, cycle in enumerate(cycles):
+        cycle = sorted(names[node] for node in cycle)
+        members = ", ".join(cycle[:8]) + (f", ... ({len(cycle)} modules)" if len(cycle) > 8 else "")
+        fragments.append(ContextFragment("Dependency cycles", rank, f"- {members}", 10 + rank))
+
+    fan_in = graph.fan_in()
+    top_fan_in = sorted(range(len(graph)), key=lambda node: (-fan_in[node], names[node]))[:top_n]
+    for rank, node in enumerate(top_fan_in):
+        if fan_in[node] == 0:
+            break
+        fragments.append(ContextFragment(
+            "Most depended-on modules", rank, f"- {names[node]}: imported by {fan_in[node]}", 12 + rank
+        ))
+
+    fan_out = graph.fan_out()
+    top_fan_out = sorted(range(len(graph)), key=lambda node: (-fan_out[node], names[node]))[:top_n]
+    for rank, node in enumerate(top_fan_out):
+        if fan_out[node] == 0:
+            break
+        fragments.append(ContextFragment(
+            "Modules with most dependencies", rank, f"- {names[node]}: imports {fan_out[node]}", 14 + rank
+        ))
+
+    return fragments, stats
+
+# --- patterns and complexity ---
+
+def summarize_patterns(patterns):
+    fragments = []
+    for rank, (name, evidence) in enumerate(sorted((patterns or {}).items())):
+        items = evidence if isinstance(evidence, list) else [evidence]
+        shown = "; ".join(str(item) for item in items[:3])
+        more = f" (+{len(items) - 3} more)" if len(items) > 3 else ""
+        fragments.append(ContextFragment("Current design patterns", rank, f"- {name}: {shown}{more}", 20 + rank))
+    return fragments
+
+def summarize_complexity(complexity, prefix="", order=None):
+    """Flatten a nested complexity dict into one fragment per leaf value"""
+    fragments = []
+    order = order if order is not None else [0]
+    for key, value in (complexity or {}).items():
+        label = f"{prefix}{key}"
+        if isinstance(value, dict):
+            fragments.extend(summarize_complexity(value, f"{label}.", order))
+        else:
+            if isinstance(value, list):
+                value = ", ".join(str(item) for item in value[:5]) + (" ..." if len(value) > 5 else "")
+            fragments.append(ContextFragment("Complexity", order[0], f"- {label}: {value}", 22 + order[0] / 10))
+            order[0] += 1
+    return fragments
+
+# --- budget fitting ---
+
+def fit_fragments(fragments, token_budget):
+    """Keep the most important fragments that fit in the budget and render them by section
+
+    Returns (context_text, dropped) where dropped maps section name to the number
+    of lines left out.
+    """
+    kept = []
+    dropped = Counter()
+    used = 0
+
+    opened_sections = set()
+
+    for fragment in sorted(fragments, key=lambda f: f.priority):
+        # The first line of a section also pays for the section heading
+        cost = fragment.tokens
+        if fragment.section not in opened_sections:
+            cost += estimate_tokens(f"{fragment.section}:") + 2
+        if used + cost <= token_budget:
+            kept.append(fragment)
+            opened_sections.add(fragment.section)
+            used += cost
+        else:
+            dropped[fragment.section] += 1
+
+    lines = []
+    sections = {}
+    for fragment in kept:
+        sections.setdefault(fragment.section, []).append(fragment)
+    for section in SECTION_ORDER + sorted(set(sections) - set(SECTION_ORDER)):
+        if section not in sections:
+            continue
+        lines.append(f"{section}:")
+        lines.extend(f.text for f in sorted(sections[section], key=lambda f: f.order))
+        lines.append("")
+
+    return "\n".join(lines).strip(), dict(dropped)
+
+def build_architecture_context(project_analysis, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET):
+    """Compress a project analysis into prompt context that fits a token budget
+
+    Returns (context_text, report). The report holds the estimated token counts
+    before and after compression and what was dropped per section.
+    """
+    structure_fragments, structure_totals = summarize_structure(project_analysis.get("structure", {}))
+    dependency_fragments, dependency_stats = summarize_dependencies(project_analysis.get("dependencies", {}))
+
+    fragments = [ContextFragment(
+        "Overview", 0,
+        f"Project: {structure_totals['files']} files in {structure_totals['directories']} directories",
+        0
+    )]
+    fragments += dependency_fragments
+    fragments += summarize_patterns(project_analysis.get("patterns"))
+    fragments += summarize_complexity(project_analysis.get("complexity"))
+    fragments += structure_fragments
+
+    context, dropped = fit_fragments(fragments, token_budget)
+
+    raw_tokens = sum(
+        estimate_tokens(str(project_analysis.get(key, "")))
+        for key in ("structure", "patterns", "complexity")
+    )
+    raw_tokens += math.ceil(
+        as_module_graph(project_analysis.get("dependencies")).text_size() / CHARS_PER_TOKEN
+    )
+    report = {
+        "budget": token_budget,
+        "raw_tokens": raw_tokens,
+        "context_tokens": estimate_tokens(context),
+        "fragments": len(fragments),
+        "dropped": dropped,
+        "dependency_stats": dependency_stats,
+    }
+    return context, report
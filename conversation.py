@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+
+from context_builder import estimate_tokens
+
+# Tokens of earlier turns sent with a follow-up question before older turns are summarised
+DEFAULT_HISTORY_TOKEN_BUDGET = int(os.getenv("CODEHELPER_HISTORY_TOKEN_BUDGET", "2000"))
+# Most recent question/answer pairs that are always sent verbatim
+DEFAULT_WINDOW_TURNS = 3
+# Shorter code blocks are cheaper to repeat than to reference
+MIN_DEDUPE_CHARS = 200
+SUMMARY_MAX_WORDS = 150
+
+CODE_BLOCK = re.compile(r"```([\w+#.-]*)[ \t]*\n(.*?)```", re.DOTALL)
+
+def code_digest(code):
+    """Short content hash identifying a code block within a conversation"""
+    return hashlib.sha256(code.strip().encode("utf-8")).hexdigest()[:10]
+
+def summary_prompt(summary, messages):
+    """Prompt asking the model to fold older turns into the running conversation summary"""
+    transcript = "\n\n".join(f"{message['role'].upper()}: {message['content']}" for message in messages)
+    return f"""
+    Update the summary of a conversation between a developer and a coding assistant.
+    Keep the facts a follow-up question could depend on: the developer's goal, languages,
+    libraries, names of functions and files, decisions made and open problems.
+    Answer with the updated summary only, in at most {SUMMARY_MAX_WORDS} words.
+
+    Current summary:
+    {summary or "(none)"}
+
+    New turns:
+    {transcript}
+    """
+
+class Conversation:
+    """Per-session chat history compacted to fit a token budget
+
+    The last window_turns question/answer pairs are kept verbatim; once the history
+    exceeds token_budget, older pairs are folded into a running summary. Code
+    blocks that were already sent are replaced by a reference to their hash, and
+    a referenced block whose original turn has been summarised is sent once with
+    the summary instead.
+    """
+
+    def __init__(self, token_budget=DEFAULT_HISTORY_TOKEN_BUDGET, window_turns=DEFAULT_WINDOW_TURNS):
+        self.token_budget = token_budget
+        self.window_turns = window_turns
+        self.summary = ""
+        self.messages = []         # compacted messages sent to the model
+        self.transcript = []       # everything, verbatim, for display
+        self.code_blocks = {}      # digest -> (language, code)
+        self.code_origins = {}     # digest -> index of the message that introduced it
+        self.summarized_messages = 0
+        self.deduplicated_tokens = 0
+
+    def __len__(self):
+        return len(self.transcript) // 2
+
+    def deduplicate(self, text, message_index=None):
+        """Replace code blocks already seen in this conversation by a reference to their hash
+
+        New blocks are remembered as introduced by message_index; without an index
+        (a question that has not been answered yet) only known blocks are replaced.
+        """
+        def replace(match):
+            language, code = match.group(1), match.group(2)
+            if len(code) < MIN_DEDUPE_CHARS:
+                return match.group(0)
+            digest = code_digest(code)
+            if digest not in self.code_blocks:
+                if message_index is not None:
+                    self.code_blocks[digest] = (language, code)
+                    self.code_origins[digest] = message_index
+                return match.group(0)
+            if message_index is not None:
+                self.deduplicated_tokens += estimate_tokens(match.group(0))
+            return f"[code block #{digest}: identical to code shared earlier in this conversation]"
+
+        return CODE_BLOCK.sub(replace, text)
+
+    def add_exchange(self, question, answer):
+        """Record a completed question and answer"""
+        for role, text in (("user", question), ("assistant", answer)):
+            self.transcript.append({"role": role, "content": text})
+            index = self.summarized_messages + len(self.messages)
+            self.messages.append({"role": role, "content": self.deduplicate(text, index)})
+
+    def history_tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(m["content"]) for m in self.messages)
+
+    def needs_compaction(self):
+        return (self.history_tokens() > self.token_budget
+                and len(self.messages) > 2 * self.window_turns)
+
+    def compact(self, summarize):
+        """Fold the turns before the sliding window into the summary once over budget
+
+        summarize(prompt) returns the new summary text; if it raises, the older
+        turns are dropped with a one-line note each, and the oldest notes go once
+        they no longer fit in the budget.
+        Returns True if the history was compacted.
+        """
+        if not self.needs_compaction():
+            return False
+        cut = len(self.messages) - 2 * self.window_turns
+        older, self.messages = self.messages[:cut], self.messages[cut:]
+        try:
+            self.summary = summarize(summary_prompt(self.summary, older)).strip()
+        except Exception:
+            notes = [f"{m['role']}: {m['content'].strip().splitlines()[0][:120]}" for m in older if m["content"].strip()]
+            lines = self.summary.splitlines() + notes
+            # Notes pile up with every failed summary: keep the newest ones that fit beside the window
+            available = self.token_budget - sum(estimate_tokens(m["content"]) for m in self.messages)
+            while lines and estimate_tokens("\n".join(lines)) > available:
+                lines.pop(0)
+            self.summary = "\n".join(lines)
+        self.summarized_messages += cut
+        return True
+
+    def referenced_code(self, texts):
+        """Return the code blocks referenced in texts whose original message was summarised"""
+        joined = "\n".join(texts)
+        return [
+            (digest, self.code_blocks[digest])
+            for digest, origin in self.code_origins.items()
+            if origin < self.summarized_messages and f"#{digest}:" in joined
+        ]
+
+    def request_messages(self, question):
+        """Return the messages to send for a new question: summary, window and the question itself"""
+        question = self.deduplicate(question)
+        context = []
+        if self.summary:
+            context.append(f"Summary of the earlier conversation:\n{self.summary}")
+        for digest, (language, code) in self.referenced_code([m["content"] for m in self.messages] + [question]):
+            context.append(f"Code block #{digest}:\n```{language}\n{code}```")
+
+        messages = [{"role": "system", "content": "\n\n".join(context)}] if context else []
+        messages.extend(self.messages)
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def clear(self):
+        self.__init__(self.token_budget, self.window_turns)
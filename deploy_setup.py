@@ -0,0 +1,92 @@
+import argparse
+import hashlib
+import os
+
+# Contents of the configuration files Streamlit Cloud needs for deployment
+DEPLOYMENT_FILES = {
+    "requirements.txt": """
+streamlit==1.37.0
+groq==0.4.1
+python-dotenv==1.0.0
+matplotlib==3.8.2
+networkx==3.2.1
+numpy==1.26.4
+Pillow==10.1.0
+PyAudio-wheels==0.2.11
+SpeechRecognition==3.10.0
+""".strip(),
+    "runtime.txt": "python-3.10",
+    "packages.txt": "portaudio19-dev\npython3-dev\ngit\n",
+    os.path.join(".streamlit", "config.toml"): """
+[theme]
+primaryColor = "#3B82F6"
+backgroundColor = "#111827"
+secondaryBackgroundColor = "#1F2937"
+textColor = "#F1F5F9"
+""".lstrip(),
+}
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of text or bytes, ignoring CRLF vs LF line endings"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data.replace(b"\r\n", b"\n")).hexdigest()
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file, or None if it doesn't exist"""
+    try:
+        with open(path, "rb") as f:
+            return content_hash(f.read())
+    except FileNotFoundError:
+        return None
+
+def setup_for_streamlit_cloud(base_dir=".", check_only=False):
+    """Write the Streamlit Cloud configuration files whose content has changed
+
+    Returns the list of paths that were (or, with check_only, would be) written.
+    Files that already hold the expected content are left untouched, so running
+    this repeatedly is a no-op.
+    """
+    changed = []
+
+    for rel_path, content in DEPLOYMENT_FILES.items():
+        path = os.path.join(base_dir, rel_path)
+        if file_hash(path) == content_hash(content):
+            continue
+
+        changed.append(path)
+        if check_only:
+            continue
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write to a sibling file first so a file watcher never sees a half-written file
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", newline="\n") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    return changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Create the configuration files needed for Streamlit Cloud deployment"
+    )
+    parser.add_argument("--dir", default=".", help="Project directory (default: current directory)")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Only report files that are out of date; exit with status 1 if any are"
+    )
+    args = parser.parse_args(argv)
+
+    changed = setup_for_streamlit_cloud(args.dir, check_only=args.check)
+
+    if not changed:
+        print("All configuration files are up to date.")
+        return 0
+
+    for path in changed:
+        print(f"{'Out of date' if args.check else 'Updated'}: {path}")
+    return 1 if args.check else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,249 @@
+import fnmatch
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from workspace import directory_size
+
+DEFAULT_MIRROR_ROOT = os.getenv(
+    "CODEHELPER_MIRROR_ROOT", os.path.join(tempfile.gettempdir(), "codehelper-git-mirrors")
+)
+DEFAULT_MIRROR_CACHE_BYTES = int(os.getenv("CODEHELPER_MIRROR_CACHE_MB", "2048")) * 1024 * 1024
+# A mirror fetched more recently than this is reused as-is, so concurrent and
+# back-to-back requests for the same repository share one network round trip
+FETCH_FRESHNESS_SECONDS = 60
+CLONE_TIMEOUT_SECONDS = 600
+FETCH_TIMEOUT_SECONDS = 300
+
+# Files checked out in sparse mode: source code plus the manifests that describe a project
+SOURCE_FILE_PATTERNS = [
+    "*.py", "*.pyi", "*.js", "*.jsx", "*.mjs", "*.cjs", "*.ts", "*.tsx", "*.java", "*.kt",
+    "*.go", "*.cs", "*.c", "*.h", "*.cc", "*.cpp", "*.cxx", "*.hpp", "*.hh", "*.rb",
+    "*.php", "*.swift", "*.rs", "*.scala",
+    "requirements*.txt", "setup.py", "setup.cfg", "pyproject.toml", "Pipfile",
+    "package.json", "tsconfig.json", "go.mod", "Cargo.toml", "pom.xml", "build.gradle",
+    "*.csproj", "*.sln", "Gemfile", "composer.json", "Package.swift", "CMakeLists.txt",
+    "Makefile", "Dockerfile", "README*",
+]
+
+LAST_USED_STAMP = "codehelper-last-used"
+
+class GitMirrorError(Exception):
+    """Raised when a git operation on the mirror cache fails"""
+
+def run_git(args, timeout=None, input=None, env=None):
+    """Run a git command and return its stdout as bytes, raising GitMirrorError on failure"""
+    try:
+        result = subprocess.run(
+            ["git"] + args, capture_output=True, timeout=timeout, input=input, env=env
+        )
+    except FileNotFoundError:
+        raise GitMirrorError("Git is not installed or not in PATH. Please install Git.")
+    except subprocess.TimeoutExpired:
+        raise GitMirrorError(
+            "Git operation timed out. The repository might be too large or the connection is slow."
+        )
+    if result.returncode != 0:
+        raise GitMirrorError(result.stderr.decode("utf-8", errors="replace").strip())
+    return result.stdout
+
+def check_ref(ref):
+    """Refuse refs that git would read as an option"""
+    if ref.startswith("-"):
+        raise GitMirrorError(f"Invalid git ref: {ref}")
+    return ref
+
+def is_source_path(path, patterns=SOURCE_FILE_PATTERNS):
+    """Return True if a repository path matches one of the sparse checkout patterns"""
+    name = path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+class GitMirrorCache:
+    """Local cache of bare mirror repositories keyed by URL
+
+    The first request for a URL creates a bare mirror; later requests only run an
+    incremental fetch (skipped entirely if the mirror is fresh). Working copies are
+    materialised from the mirror with a temporary index, so no network access is
+    needed for a checkout and only the requested paths are written. Requests for
+    the same URL are serialised on a per-URL lock, so two users asking for the
+    same repository at once share one clone. Mirrors are evicted least recently
+    used first once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root=DEFAULT_MIRROR_ROOT, max_bytes=DEFAULT_MIRROR_CACHE_BYTES,
+                 freshness_seconds=FETCH_FRESHNESS_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.freshness_seconds = freshness_seconds
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._last_fetch = {}
+        self._sizes = {}
+        self.clones = 0
+        self.fetches = 0
+        self.reuses = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def mirror_path(self, url):
+        """Return the on-disk location of the mirror for a URL"""
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.root, f"{digest}.git")
+
+    def _url_lock(self, url):
+        with self._lock:
+            if url not in self._url_locks:
+                self._url_locks[url] = threading.Lock()
+            return self._url_locks[url]
+
+    def _refresh(self, url):
+        """Create or refresh the mirror for a URL; the caller holds the URL lock"""
+        mirror = self.mirror_path(url)
+
+        if not os.path.isdir(mirror):
+            # Clone into a scratch directory and rename, so a failed or
+            # interrupted clone never leaves a half-written mirror behind
+            scratch = tempfile.mkdtemp(dir=self.root, prefix="incoming-")
+            try:
+                run_git(["clone", "--mirror", "--quiet", "--", url, scratch], timeout=CLONE_TIMEOUT_SECONDS)
+                os.replace(scratch, mirror)
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+            self.clones += 1
+            self._last_fetch[url] = time.time()
+        elif time.time() - self._last_fetch.get(url, 0) > self.freshness_seconds:
+            run_git(["--git-dir", mirror, "fetch", "--prune", "--quiet", "origin"],
+                    timeout=FETCH_TIMEOUT_SECONDS)
+            self.fetches += 1
+            self._last_fetch[url] = time.time()
+        else:
+            self.reuses += 1
+
+        self._mark_used(mirror)
+        self._sizes[mirror] = directory_size(mirror)
+        return mirror
+
+    def ensure_mirror(self, url):
+        """Create or refresh the mirror for a URL and return its path"""
+        with self._url_lock(url):
+            mirror = self._refresh(url)
+        self.evict(keep=mirror)
+        return mirror
+
+    def resolve(self, url, ref="HEAD"):
+        """Return the commit id a ref points to in the (refreshed) mirror"""
+        check_ref(ref)
+        with self._url_lock(url):
+            mirror = self._refresh(url)
+            commit = run_git(["--git-dir", mirror, "rev-parse", "--verify", f"{ref}^{{commit}}"])
+        self.evict(keep=mirror)
+        return commit.decode().strip()
+
+    def list_files(self, url, ref="HEAD"):
+        """Return every file path in the tree of a ref"""
+        check_ref(ref)
+        with self._url_lock(url):
+            mirror = self._refresh(url)
+            paths = self._list_files(mirror, ref)
+        self.evict(keep=mirror)
+        return paths
+
+    def _list_files(self, mirror, ref):
+        output = run_git(["--git-dir", mirror, "ls-tree", "-r", "-z", "--name-only", ref])
+        return [path for path in output.decode("utf-8", errors="replace").split("\0") if path]
+
+    def checkout(self, url, dest, ref="HEAD", sparse=True):
+        """Write the files of a ref into dest without creating a .git directory
+
+        With sparse=True only paths matching SOURCE_FILE_PATTERNS are written.
+        Returns the number of files checked out.
+        """
+        check_ref(ref)
+        os.makedirs(dest, exist_ok=True)
+
+        # Hold the URL lock while reading so the mirror cannot be evicted mid-checkout
+        with self._url_lock(url):
+            mirror = self._refresh(url)
+            paths = self._list_files(mirror, ref)
+            if sparse:
+                paths = [path for path in paths if is_source_path(path)]
+            if paths:
+                self._checkout_paths(mirror, ref, paths, dest)
+
+        self.evict(keep=mirror)
+        return len(paths)
+
+    def _checkout_paths(self, mirror, ref, paths, dest):
+        """Load a tree into a throwaway index and write just the selected paths"""
+        index_fd, index_path = tempfile.mkstemp(dir=self.root, prefix="index-")
+        os.close(index_fd)
+        os.remove(index_path)
+        env = dict(os.environ, GIT_INDEX_FILE=index_path)
+        try:
+            run_git(["--git-dir", mirror, "read-tree", ref], env=env)
+            run_git(
+                ["--git-dir", mirror, "--work-tree", dest, "checkout-index", "-z", "--stdin"],
+                input="\0".join(paths).encode("utf-8"),
+                env=env
+            )
+        finally:
+            try:
+                os.remove(index_path)
+            except FileNotFoundError:
+                pass
+
+    def _mark_used(self, mirror):
+        stamp = os.path.join(mirror, LAST_USED_STAMP)
+        with open(stamp, "a"):
+            pass
+        os.utime(stamp)
+
+    def _last_used(self, mirror):
+        try:
+            return os.path.getmtime(os.path.join(mirror, LAST_USED_STAMP))
+        except OSError:
+            return 0
+
+    def evict(self, keep=None):
+        """Remove least recently used mirrors until the cache fits in max_bytes"""
+        with self._lock:
+            mirrors = [
+                os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".git")
+            ]
+            for mirror in mirrors:
+                if mirror not in self._sizes:
+                    self._sizes[mirror] = directory_size(mirror)
+
+            total = sum(self._sizes.get(mirror, 0) for mirror in mirrors)
+            evicted = 0
+            for mirror in sorted(mirrors, key=self._last_used):
+                if total <= self.max_bytes:
+                    break
+                if mirror == keep:
+                    continue
+                # Skip mirrors that are being cloned or fetched right now
+                busy = [
+                    lock for url, lock in self._url_locks.items()
+                    if self.mirror_path(url) == mirror and lock.locked()
+                ]
+                if busy:
+                    continue
+                shutil.rmtree(mirror, ignore_errors=True)
+                total -= self._sizes.pop(mirror, 0)
+                evicted += 1
+            return evicted
+
+    def stats(self):
+        """Return cache usage figures"""
+        with self._lock:
+            return {
+                "mirrors": len(self._sizes),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "clones": self.clones,
+                "fetches": self.fetches,
+                "reuses": self.reuses,
+            }
@@ -0,0 +1,211 @@
+import hashlib
+import io
+import math
+import threading
+from collections import Counter, OrderedDict
+
+from module_graph import ModuleGraph, as_module_graph
+
+# Graphs are collapsed and sampled down to at most this many nodes before drawing
+DEFAULT_MAX_NODES = 60
+VIEW_CACHE_SIZE = 64
+
+NODE_COLOR = "#3B82F6"
+CYCLE_COLOR = "#EF4444"
+EDGE_COLOR = "#60A5FA"
+
+_view_cache = OrderedDict()
+_view_cache_lock = threading.Lock()
+
+def graph_hash(nodes, edges):
+    """Return a stable hash of a weighted graph, used as the layout and image cache key"""
+    digest = hashlib.sha256()
+    for node in sorted(nodes):
+        digest.update(f"n\0{node}\0{nodes[node]}\0".encode("utf-8"))
+    for (source, target), weight in sorted(edges.items()):
+        digest.update(f"e\0{source}\0{target}\0{weight}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+def group_name(module, depth, focus=None):
+    """Return the group a module (a project-relative file path) is drawn in
+
+    Modules inside the focused directory are grouped one level below it; all other
+    modules are grouped by their first `depth` path components.
+    """
+    parts = module.split('/')
+    if focus and (module == focus or module.startswith(focus + '/')):
+        return '/'.join(parts[:len(focus.split('/')) + 1])
+    return '/'.join(parts[:depth])
+
+def collapse_graph(dependency_graph, depth=1, focus=None):
+    """Collapse a module graph into package groups
+
+    Returns (nodes, edges) where nodes maps each group to the number of modules in
+    it and edges maps (source group, target group) to the number of module edges
+    between them. Edges inside a group are dropped.
+    """
+    graph = as_module_graph(dependency_graph)
+    # Group names are computed once per module, not once per edge
+    groups = [group_name(name, depth, focus) for name in graph.names]
+    nodes = Counter(groups)
+    edges = Counter()
+    for source, target in graph.edges():
+        if groups[source] != groups[target]:
+            edges[(groups[source], groups[target])] += 1
+    return dict(nodes), dict(edges)
+
+def expandable_packages(dependency_graph):
+    """Return every directory that contains more than one module, for drill-down"""
+    counts = Counter()
+    for module in as_module_graph(dependency_graph).names:
+        parts = module.split('/')
+        for length in range(1, len(parts)):
+            counts['/'.join(parts[:length])] += 1
+    return sorted(prefix for prefix, count in counts.items() if count > 1)
+
+def sample_graph(nodes, edges, max_nodes=DEFAULT_MAX_NODES):
+    """Keep the max_nodes most important groups, ranked by size plus weighted degree
+
+    Returns (nodes, edges, hidden) where hidden is the number of groups left out.
+    """
+    if len(nodes) <= max_nodes:
+        return nodes, edges, 0
+
+    importance = Counter(nodes)
+    for (source, target), weight in edges.items():
+        importance[source] += weight
+        importance[target] += weight
+    kept = set(sorted(nodes, key=lambda node: (-importance[node], node))[:max_nodes])
+
+    kept_nodes = {node: count for node, count in nodes.items() if node in kept}
+    kept_edges = {
+        (source, target): weight for (source, target), weight in edges.items()
+        if source in kept and target in kept
+    }
+    return kept_nodes, kept_edges, len(nodes) - len(kept)
+
+def layered_layout(nodes, edges):
+    """Compute hierarchical (layered) coordinates for a graph in O((V + E) log V)
+
+    Cycles are condensed into their strongly connected components, components are
+    assigned to layers by longest path so every edge points downwards, and nodes
+    within a layer are ordered by the barycenter of their neighbours to reduce
+    crossings. Returns ({node: (x, y)}, cycle_nodes).
+    """
+    names = sorted(nodes)
+    ids = {name: node for node, name in enumerate(names)}
+    graph = ModuleGraph.from_edges(names, [(ids[source], ids[target]) for source, target in edges])
+    component_of, components = graph.strongly_connected_components()
+    component_of = {name: component_of[node] for node, name in enumerate(names)}
+    cycle_nodes = {names[node] for component in components if len(component) > 1 for node in component}
+    layer = graph.topological_layers()
+
+    layers = {}
+    for node, name in enumerate(names):
+        layers.setdefault(layer[node], []).append(name)
+
+    # Barycenter ordering: one sweep down using parents, one sweep up using children
+    neighbours_up = {node: [] for node in nodes}
+    neighbours_down = {node: [] for node in nodes}
+    for source, target in edges:
+        neighbours_down[source].append(target)
+        neighbours_up[target].append(source)
+
+    position = {}
+    for depth in sorted(layers):
+        for index, node in enumerate(layers[depth]):
+            position[node] = index
+
+    def reorder(depth, neighbours):
+        def barycenter(node):
+            placed = [position[n] for n in neighbours[node] if n in position]
+            # Keep cycle members next to each other
+            return (sum(placed) / len(placed) if placed else position[node], component_of[node])
+        layers[depth].sort(key=barycenter)
+        for index, node in enumerate(layers[depth]):
+            position[node] = index
+
+    ordered_depths = sorted(layers)
+    for depth in ordered_depths[1:]:
+        reorder(depth, neighbours_up)
+    for depth in reversed(ordered_depths[:-1]):
+        reorder(depth, neighbours_down)
+
+    coordinates = {}
+    for depth, members in layers.items():
+        for index, node in enumerate(members):
+            # Centre every layer horizontally around 0
+            coordinates[node] = (index - (len(members) - 1) / 2, -depth)
+    return coordinates, cycle_nodes
+
+def render_graph_png(nodes, edges, coordinates, cycle_nodes):
+    """Draw a laid-out graph to PNG bytes"""
+    # Imported here so the collapsing and layout code can be used without a plotting stack
+    import networkx as nx
+    from matplotlib.figure import Figure
+
+    # Only the small collapsed view is ever copied into networkx
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+
+    widest = max((sum(1 for y in coordinates.values() if y[1] == depth)
+                  for depth in {y for _, y in coordinates.values()}), default=1)
+    depth = len({y for _, y in coordinates.values()})
+    fig = Figure(figsize=(min(max(8, widest * 1.2), 24), min(max(5, depth * 1.2), 18)))
+    ax = fig.add_subplot()
+    ax.axis("off")
+
+    node_list = list(G.nodes)
+    nx.draw_networkx_nodes(
+        G, coordinates, ax=ax, nodelist=node_list,
+        node_size=[150 + 120 * math.sqrt(nodes[node]) for node in node_list],
+        node_color=[CYCLE_COLOR if node in cycle_nodes else NODE_COLOR for node in node_list]
+    )
+    nx.draw_networkx_edges(
+        G, coordinates, ax=ax, edge_color=EDGE_COLOR, arrows=True, arrowsize=8,
+        width=[0.5 + math.log2(edges[edge]) for edge in G.edges], alpha=0.7
+    )
+    nx.draw_networkx_labels(
+        G, coordinates, ax=ax, font_size=7,
+        labels={node: f"{node} ({nodes[node]})" if nodes[node] > 1 else node for node in node_list}
+    )
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=100)
+    return buffer.getvalue()
+
+def render_dependency_view(dependency_graph, depth=1, focus=None, max_nodes=DEFAULT_MAX_NODES):
+    """Collapse, sample, lay out and draw a dependency graph, reusing cached views
+
+    Returns a dict with the PNG image, the number of modules and groups drawn, the
+    number of groups hidden by sampling, the groups on a cycle and whether the view
+    came from the cache.
+    """
+    if not dependency_graph:
+        dependency_graph = ModuleGraph.from_adjacency({"No dependencies found": []})
+
+    nodes, edges = collapse_graph(dependency_graph, depth, focus)
+    nodes, edges, hidden = sample_graph(nodes, edges, max_nodes)
+    key = graph_hash(nodes, edges)
+
+    with _view_cache_lock:
+        view = _view_cache.get(key)
+        if view is not None:
+            _view_cache.move_to_end(key)
+            return dict(view, hidden=hidden, cached=True)
+
+    coordinates, cycle_nodes = layered_layout(nodes, edges)
+    view = {
+        "image": render_graph_png(nodes, edges, coordinates, cycle_nodes),
+        "coordinates": coordinates,
+        "groups": len(nodes),
+        "modules": sum(nodes.values()),
+        "cycle_groups": sorted(cycle_nodes),
+    }
+
+    with _view_cache_lock:
+        _view_cache[key] = view
+        while len(_view_cache) > VIEW_CACHE_SIZE:
+            _view_cache.popitem(last=False)
+    return dict(view, hidden=hidden, cached=False)
@@ -0,0 +1,41 @@
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_HEADER_LINES = 100
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+async def read_request(reader):
+    """Read one request; returns (method, path, headers, body) or None when the client is done"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "Too many headers")
+
+    if "transfer-encoding" in headers:
+        raise HTTPError(400, "Chunked request bodies are not supported; send Content-Length")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request bodies are limited to {MAX_BODY_BYTES // (1024 * 1024)} MB")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+def chunk(data):
+    return f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n"
@@ -0,0 +1,438 @@
+import argparse
+import posixpath
+import re
+import time
+from collections import Counter
+
+from module_graph import ModuleGraphBuilder
+from worker_pool import DEFAULT_MAX_WORKERS, map_batches
+
+# Projects with fewer source bytes than this are scanned in-process: the main process spends
+# about a third of the serial extraction time per MB shipping texts to the pool and results
+# back, so with pool start-up (~0.5-0.8 s) the pool only wins on tens of MB (see README)
+PARALLEL_BYTES_THRESHOLD = 64 * 1024 * 1024
+FILES_PER_TASK = 200
+
+LANGUAGE_EXTENSIONS = {
+    "python": (".py", ".pyi"),
+    "javascript": (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts", ".vue", ".svelte"),
+    "java": (".java", ".kt", ".kts", ".scala"),
+    "go": (".go",),
+    "csharp": (".cs",),
+    "cpp": (".c", ".h", ".cc", ".cpp", ".cxx", ".hpp", ".hh", ".hxx", ".m", ".mm"),
+    "ruby": (".rb",),
+    "php": (".php",),
+    "swift": (".swift",),
+    "rust": (".rs",),
+}
+LANGUAGE_OF_EXTENSION = {
+    extension: language for language, extensions in LANGUAGE_EXTENSIONS.items() for extension in extensions
+}
+JS_RESOLVE_EXTENSIONS = LANGUAGE_EXTENSIONS["javascript"] + (".json",)
+
+# --- per-language extractors ---
+#
+# Each extractor takes (path, text) and returns (imports, declarations).
+# imports is a list of (kind, candidates) tuples, tried in order by the resolver:
+#   "python"     absolute Python module name, relative to the package roots
+#   "path_module" relative Python import, as a dotted project path
+#   "module"     dotted module name, matched against the end of file paths
+#   "path"       exact project-relative file paths
+#   "path_tail"  relative path matched against the end of file paths
+#   "directory"  directory name; every file below it (Swift modules)
+#   "namespace"  namespace or package declared by other files
+#   "go"         Go import path, matched against go.mod module paths
+#   "external"   not resolvable within the project (counted only)
+# declarations lists the namespaces/packages the file itself declares.
+
+PYTHON_IMPORT = re.compile(r"^[ \t]*import[ \t]+([\w. \t,]+)", re.MULTILINE)
+# Imported names are either on the same line or inside parentheses spanning several lines
+PYTHON_FROM_IMPORT = re.compile(r"^[ \t]*from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]+(?:\(([^)]*)\)|([\w \t,*]+))", re.MULTILINE)
+
+def extract_python(path, text):
+    imports = []
+    for match in PYTHON_IMPORT.finditer(text):
+        for name in match.group(1).split(','):
+            name = name.split()[0] if name.split() else ""
+            if name:
+                imports.append(("python", [name]))
+
+    package = posixpath.dirname(path).split('/') if '/' in path else []
+    for match in PYTHON_FROM_IMPORT.finditer(text):
+        module = match.group(1)
+        if module.startswith('.'):
+            # Relative import: one dot is the current package, each extra dot goes up one level
+            level = len(module) - len(module.lstrip('.'))
+            base = package[:len(package) - (level - 1)] if level - 1 <= len(package) else []
+            rest = module.lstrip('.')
+            module = '.'.join(base + ([rest] if rest else []))
+            kind = "path_module"
+        else:
+            kind = "python"
+        names = [
+            name.split()[0] for name in (match.group(2) or match.group(3)).replace('\n', ',').split(',')
+            if name.split() and name.split()[0] not in ('*', '#')
+        ]
+        for name in names:
+            # "from package import module" imports a module; otherwise fall back to the package
+            candidates = [f"{module}.{name}" if module else name]
+            if module:
+                candidates.append(module)
+            imports.append((kind, candidates))
+        if not names and module:
+            imports.append((kind, [module]))
+    return imports, []
+
+JS_IMPORT = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)"""
+    r"""['"]([^'"\n]+)['"]"""
+)
+
+def extract_javascript(path, text):
+    imports = []
+    directory = posixpath.dirname(path)
+    for match in JS_IMPORT.finditer(text):
+        specifier = match.group(1)
+        if not specifier.startswith('.'):
+            imports.append(("external", [specifier]))
+            continue
+        target = posixpath.normpath(posixpath.join(directory, specifier))
+        candidates = [target]
+        candidates += [target + extension for extension in JS_RESOLVE_EXTENSIONS]
+        candidates += [f"{target}/index{extension}" for extension in JS_RESOLVE_EXTENSIONS]
+        imports.append(("path", candidates))
+    return imports, []
+
+JAVA_PACKAGE = re.compile(r"^[ \t]*package[ \t]+([\w.]+)", re.MULTILINE)
+JAVA_IMPORT = re.compile(r"^[ \t]*import[ \t]+(?:static[ \t]+)?(\w+(?:\.\w+)*)(\.\*)?", re.MULTILINE)
+
+def extract_java(path, text):
+    """Java, Kotlin and Scala: `package a.b` and `import a.b.C` / `import a.b.*`"""
+    imports = []
+    for match in JAVA_IMPORT.finditer(text):
+        name, wildcard = match.groups()
+        if wildcard:
+            imports.append(("namespace", [name]))
+        else:
+            # A static import names a member; fall back to its class
+            imports.append(("module", [name, name.rsplit('.', 1)[0]]))
+    return imports, JAVA_PACKAGE.findall(text)[:1]
+
+GO_IMPORT_BLOCK = re.compile(r"^import\s*\(([^)]*)\)", re.MULTILINE)
+GO_IMPORT_LINE = re.compile(r'^import\s+(?:[\w.]+\s+)?"([^"]+)"', re.MULTILINE)
+GO_QUOTED = re.compile(r'"([^"]+)"')
+GO_MODULE = re.compile(r"^module\s+(\S+)", re.MULTILINE)
+
+def extract_go(path, text):
+    specifiers = GO_IMPORT_LINE.findall(text)
+    for block in GO_IMPORT_BLOCK.findall(text):
+        specifiers.extend(GO_QUOTED.findall(block))
+    return [("go", [specifier]) for specifier in specifiers], []
+
+def extract_go_mod(path, text):
+    """go.mod declares the import path prefix of the packages below its directory"""
+    return [], [f"gomod:{module}" for module in GO_MODULE.findall(text)[:1]]
+
+CSHARP_NAMESPACE = re.compile(r"^[ \t]*namespace[ \t]+([\w.]+)", re.MULTILINE)
+CSHARP_USING = re.compile(r"^[ \t]*(?:global[ \t]+)?using[ \t]+(?:static[ \t]+)?(?:\w+[ \t]*=[ \t]*)?([\w.]+)[ \t]*;", re.MULTILINE)
+
+def extract_csharp(path, text):
+    imports = [("namespace", [name]) for name in CSHARP_USING.findall(text)]
+    return imports, CSHARP_NAMESPACE.findall(text)
+
+CPP_INCLUDE = re.compile(r'^[ \t]*#[ \t]*(?:include|import)[ \t]*([<"])([^>"\n]+)[>"]', re.MULTILINE)
+
+def extract_cpp(path, text):
+    imports = []
+    directory = posixpath.dirname(path)
+    for bracket, header in CPP_INCLUDE.findall(text):
+        if bracket == '"':
+            # Quoted includes are relative to the including file first, then to any include directory
+            imports.append(("path_tail", [posixpath.normpath(posixpath.join(directory, header)), header]))
+        else:
+            imports.append(("path_tail", [header]))
+    return imports, []
+
+RUBY_REQUIRE = re.compile(r"""^[ \t]*(require_relative|require|load)[ \t(]+['"]([^'"]+)['"]""", re.MULTILINE)
+
+def extract_ruby(path, text):
+    imports = []
+    directory = posixpath.dirname(path)
+    for method, name in RUBY_REQUIRE.findall(text):
+        name = name if name.endswith(".rb") else name + ".rb"
+        if method == "require_relative":
+            imports.append(("path", [posixpath.normpath(posixpath.join(directory, name))]))
+        else:
+            imports.append(("path_tail", [name]))
+    return imports, []
+
+PHP_USE = re.compile(r"^[ \t]*use[ \t]+(?:function[ \t]+|const[ \t]+)?\\?([\w\\]+)", re.MULTILINE)
+PHP_NAMESPACE = re.compile(r"^[ \t]*namespace[ \t]+([\w\\]+)", re.MULTILINE)
+PHP_INCLUDE = re.compile(r"""\b(?:require|include)(?:_once)?[ \t(]*(?:__DIR__[ \t]*\.[ \t]*)?['"]([^'"]+\.php)['"]""")
+
+def extract_php(path, text):
+    imports = []
+    directory = posixpath.dirname(path)
+    for name in PHP_USE.findall(text):
+        # PSR-4 maps a namespace prefix to a directory, so App\Models\User usually lives
+        # in <root>/Models/User.php: try shorter suffixes of the name as well
+        parts = name.split('\\')
+        imports.append(("module", ['.'.join(parts[start:]) for start in range(max(1, len(parts) - 1))]))
+    for name in PHP_INCLUDE.findall(text):
+        imports.append(("path", [posixpath.normpath(posixpath.join(directory, name.lstrip('/')))]))
+    return imports, [name.replace('\\', '.') for name in PHP_NAMESPACE.findall(text)]
+
+SWIFT_IMPORT = re.compile(r"^[ \t]*(?:@\w+[ \t]+)*import[ \t]+(?:(?:class|struct|enum|protocol|func|var|let|typealias)[ \t]+)?(\w+)", re.MULTILINE)
+
+def extract_swift(path, text):
+    """Swift imports whole modules; a module is a directory (Sources/<Module> in SwiftPM)"""
+    return [("directory", [name]) for name in SWIFT_IMPORT.findall(text)], []
+
+RUST_USE = re.compile(r"^[ \t]*(?:pub(?:\([\w:]+\))?[ \t]+)?use[ \t]+(crate|self|super)::([\w:]+)", re.MULTILINE)
+RUST_MOD = re.compile(r"^[ \t]*(?:pub(?:\([\w:]+\))?[ \t]+)?mod[ \t]+(\w+)[ \t]*;", re.MULTILINE)
+
+def extract_rust(path, text):
+    imports = []
+    directory = posixpath.dirname(path)
+    for name in RUST_MOD.findall(text):
+        target = posixpath.join(directory, name)
+        imports.append(("path", [f"{target}.rs", f"{target}/mod.rs"]))
+    for root, name in RUST_USE.findall(text):
+        parts = [part for part in name.split("::") if part]
+        if root == "crate":
+            # Try the longest module path first: crate::a::b::Item may be a/b.rs or a.rs
+            imports.append(("module", ['.'.join(parts[:length]) for length in range(len(parts), 0, -1)]))
+    return imports, []
+
+EXTRACTORS = {
+    "python": extract_python,
+    "javascript": extract_javascript,
+    "java": extract_java,
+    "go": extract_go,
+    "csharp": extract_csharp,
+    "cpp": extract_cpp,
+    "ruby": extract_ruby,
+    "php": extract_php,
+    "swift": extract_swift,
+    "rust": extract_rust,
+}
+
+def language_of(path):
+    """Return the language an extractor exists for, or None"""
+    if posixpath.basename(path) == "go.mod":
+        return "go.mod"
+    return LANGUAGE_OF_EXTENSION.get(posixpath.splitext(path)[1].lower())
+
+def extract_batch(batch):
+    """Run the extractors over a batch of (path, text); runs in a worker process for large projects"""
+    results = []
+    for path, text in batch:
+        language = language_of(path)
+        extractor = extract_go_mod if language == "go.mod" else EXTRACTORS[language]
+        imports, declarations = extractor(path, text)
+        results.append((path, language, len(text.encode("utf-8", errors="replace")), imports, declarations))
+    return results
+
+class ImportResolver:
+    """Maps import specifiers from any language onto files of the project"""
+
+    def __init__(self, paths):
+        self.paths = set(paths)
+        self.by_module_tail = {}
+        self.by_path_tail = {}
+        self.by_directory = {}
+        self.by_namespace = {}
+        self.python_modules = {}
+        self.go_modules = []
+        self._directory_modules = {}
+
+        # A Python module's importable name starts at the first directory above
+        # it without an __init__.py (its package root)
+        packages = {posixpath.dirname(path) for path in paths if posixpath.basename(path) == "__init__.py"}
+
+        for path in paths:
+            parts = posixpath.splitext(path)[0].split('/')
+            for start in range(len(parts)):
+                self.by_module_tail.setdefault('.'.join(parts[start:]), []).append(path)
+            path_parts = path.split('/')
+            for start in range(len(path_parts)):
+                self.by_path_tail.setdefault('/'.join(path_parts[start:]), []).append(path)
+            self.by_directory.setdefault(posixpath.dirname(path), []).append(path)
+
+            if path.endswith((".py", ".pyi")):
+                root = len(parts) - 1
+                while root > 0 and '/'.join(parts[:root]) in packages:
+                    root -= 1
+                name = '.'.join(parts[root:])
+                if name.endswith(".__init__"):
+                    name = name[:-len(".__init__")]
+                self.python_modules.setdefault(name, path)
+
+        # An uploaded folder is often a package itself, so its own name is missing from paths
+        self.root_is_package = "" in packages
+
+    def declare(self, path, declarations):
+        for name in declarations:
+            if name.startswith("gomod:"):
+                self.go_modules.append((name[len("gomod:"):], posixpath.dirname(path)))
+            else:
+                self.by_namespace.setdefault(name, []).append(path)
+
+    def files_below(self, name):
+        """Return every file below a directory with the given name, anywhere in the project"""
+        if name not in self._directory_modules:
+            self._directory_modules[name] = [
+                path for path in self.paths if path.startswith(name + '/') or f"/{name}/" in path
+            ]
+        return self._directory_modules[name]
+
+    @staticmethod
+    def closest(importer, candidates):
+        """Pick the candidate sharing the longest directory prefix with the importing file"""
+        if len(candidates) == 1:
+            return candidates
+        importer_parts = importer.split('/')
+
+        def shared(path):
+            count = 0
+            for a, b in zip(importer_parts, path.split('/')):
+                if a != b:
+                    break
+                count += 1
+            return count
+        return [max(candidates, key=lambda path: (shared(path), -len(path)))]
+
+    def resolve(self, importer, kind, candidates):
+        """Return the project files an import refers to (empty if external or unknown)"""
+        for candidate in candidates:
+            found = None
+            if kind == "python":
+                found = self.python_modules.get(candidate)
+                if not found and self.root_is_package and '.' in candidate:
+                    found = self.python_modules.get(candidate.split('.', 1)[1])
+                found = [found] if found else None
+            elif kind == "path_module":
+                # Relative Python import, already turned into a path-based module name
+                for name in (candidate, f"{candidate}.__init__"):
+                    path = name.replace('.', '/')
+                    found = [path + ext for ext in (".py", ".pyi") if path + ext in self.paths] or found
+            elif kind == "module":
+                found = self.by_module_tail.get(candidate)
+                found = self.closest(importer, found) if found else None
+            elif kind == "path":
+                found = [candidate] if candidate in self.paths else None
+            elif kind == "path_tail":
+                found = self.by_path_tail.get(candidate)
+                found = self.closest(importer, found) if found else None
+            elif kind == "directory":
+                found = self.files_below(candidate)
+            elif kind == "namespace":
+                found = self.by_namespace.get(candidate)
+            elif kind == "go":
+                for module, directory in self.go_modules:
+                    if candidate == module or candidate.startswith(module + '/'):
+                        package = posixpath.join(directory, candidate[len(module):].lstrip('/')).strip('/')
+                        found = [path for path in self.by_directory.get(package, []) if path.endswith(".go")]
+                        if found:
+                            break
+            if found:
+                return found
+        return []
+
+def extract_imports(index, max_workers=DEFAULT_MAX_WORKERS):
+    """Run the import extractors over every supported file of a project index
+
+    Returns a list of (path, language, bytes, imports, declarations) tuples.
+    Projects of at least PARALLEL_BYTES_THRESHOLD bytes are processed in a worker
+    pool, streaming file texts in batches.
+    """
+    files = [(path, size) for path, size in index.files if language_of(path)]
+    texts = index.iter_texts([path for path, _ in files])
+    if sum(size for _, size in files) < PARALLEL_BYTES_THRESHOLD or max_workers <= 1:
+        return extract_batch(texts)
+    results = []
+    for batch_results in map_batches(extract_batch, texts, FILES_PER_TASK, max_workers):
+        results.extend(batch_results)
+    return results
+
+def build_import_graph(index, max_workers=DEFAULT_MAX_WORKERS):
+    """Build one cross-language dependency graph of a project from its import statements
+
+    Returns (graph, stats). Graph nodes are project-relative file paths, so a.py,
+    a.js and a/__init__.py stay apart; only imports that resolve to files of the
+    project become edges.
+    """
+    started = time.perf_counter()
+    results = extract_imports(index, max_workers)
+    extract_seconds = time.perf_counter() - started
+
+    source_paths = [path for path, language, _, _, _ in results if language != "go.mod"]
+    resolver = ImportResolver(source_paths)
+    for path, _, _, _, declarations in results:
+        resolver.declare(path, declarations)
+
+    builder = ModuleGraphBuilder()
+    languages = Counter()
+    total_bytes = 0
+    imports_found = 0
+    resolved = 0
+    for path, language, size, imports, _ in results:
+        total_bytes += size
+        if language == "go.mod":
+            continue
+        languages[language] += 1
+        source = builder.add_node(path)
+        for kind, candidates in imports:
+            imports_found += 1
+            if kind == "external":
+                continue
+            targets = resolver.resolve(path, kind, candidates)
+            if targets:
+                resolved += 1
+            for target in targets:
+                if target != path:
+                    builder.add_edge_ids(source, builder.add_node(target))
+
+    graph = builder.build()
+    total_seconds = time.perf_counter() - started
+    stats = {
+        "files": len(source_paths),
+        "languages": dict(languages.most_common()),
+        "bytes": total_bytes,
+        "imports": imports_found,
+        "resolved_imports": resolved,
+        "edges": graph.edge_count,
+        "extract_seconds": extract_seconds,
+        "total_seconds": total_seconds,
+        "mb_per_second": total_bytes / 1024 / 1024 / extract_seconds if extract_seconds else 0.0,
+    }
+    return graph, stats
+
+def benchmark(directory, repeat=3, max_workers=DEFAULT_MAX_WORKERS):
+    """Measure extraction throughput on a directory; returns the best run's stats"""
+    from project_index import ProjectIndex
+
+    index = ProjectIndex.from_directory(directory)
+    best = None
+    for _ in range(repeat):
+        _, stats = build_import_graph(index, max_workers)
+        if best is None or stats["extract_seconds"] < best["extract_seconds"]:
+            best = stats
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark multi-language import extraction")
+    parser.add_argument("directory", help="Project directory to use as the benchmark corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs; the fastest is reported")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Worker processes (1 = in-process)")
+    args = parser.parse_args(argv)
+
+    stats = benchmark(args.directory, args.repeat, args.workers)
+    print(f"Files:      {stats['files']} ({', '.join(f'{k} {v}' for k, v in stats['languages'].items())})")
+    print(f"Size:       {stats['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"Imports:    {stats['imports']} found, {stats['resolved_imports']} resolved, {stats['edges']} edges")
+    print(f"Extraction: {stats['extract_seconds']:.2f}s ({stats['mb_per_second']:.1f} MB/s)")
+    print(f"Total:      {stats['total_seconds']:.2f}s")
+
+if __name__ == "__main__":
+    main()
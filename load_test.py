@@ -0,0 +1,466 @@
+import argparse
+import asyncio
+import base64
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+import wave
+from collections import Counter
+from http.cookies import SimpleCookie
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import FileURLs, UploadedFileInfo
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.websocket import websocket_connect
+
+from benchmark import BENCHMARK_DIR, DEFAULT_FIXTURES_DIR, PNG_1X1, SAMPLE_CODE, append_results, project_fixture, summarize
+from mock_groq_server import MockGroqServer
+from request_metrics import percentile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_LEVELS = "1,2,4,8,16"
+DEFAULT_DURATION = 30.0
+DEFAULT_SERVER_PORT = 8599
+# A level saturates the app when it adds less than this much throughput over the previous one
+SATURATION_GAIN = 0.10
+ARCHITECTURE_PROJECT_FILES = 200
+
+# Share of user actions per kind; "browse" is a rerun without a request (e.g. switching tabs or settings)
+MIXES = {
+    "default": {"text": 45, "translation": 15, "image": 10, "voice": 5, "architecture": 5, "browse": 20},
+    "chat": {"text": 85, "browse": 15},
+    "architecture": {"architecture": 50, "text": 30, "browse": 20},
+}
+QUESTIONS = [
+    "How do I reverse a list in Python?",
+    "Why does my recursive function hit the recursion limit?",
+    "Explain the difference between a process and a thread.",
+    "Refactor this loop into a list comprehension:\n```python\nresult = []\nfor x in data:\n    if x > 0:\n        result.append(x * 2)\n```",
+]
+TRANSLATION_TARGETS = ["JavaScript", "Java", "Go", "TypeScript"]
+
+def silent_wav(seconds=1, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(2 * rate * seconds))
+    return buffer.getvalue()
+
+class AppError(Exception):
+    """The app showed an exception or st.error while handling an action"""
+
+class SessionClient:
+    """One simulated browser tab, speaking Streamlit's websocket protocol to a running app
+
+    Like the browser, it keeps the value of every widget it has set and sends all
+    of them with each rerun; a button click is a one-off trigger. Widgets are
+    found by their label in the elements of the latest run.
+    """
+
+    def __init__(self, base_url, timeout=120.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+        self.session_id = None
+        self.page_script_hash = ""
+        self.xsrf = None
+        self.widgets = {}        # label -> (kind, element, fragment_id)
+        self.widget_states = {}  # widget id -> WidgetState
+        self.cached_messages = {}
+        self.errors = []
+
+    async def connect(self):
+        url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.connection = await websocket_connect(HTTPRequest(url), subprotocols=["streamlit"])
+        cookie = SimpleCookie(self.connection.headers.get("Set-Cookie", ""))
+        if "_streamlit_xsrf" in cookie:
+            self.xsrf = cookie["_streamlit_xsrf"].value
+        return await self.rerun()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    async def send(self, message):
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+
+    async def receive(self):
+        data = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+        if data is None:
+            raise ConnectionError("The app closed the connection")
+        message = ForwardMsg()
+        message.ParseFromString(data)
+        if message.WhichOneof("type") == "ref_hash":
+            # A message the server knows this client has already received
+            message = self.cached_messages[message.ref_hash]
+        elif message.hash:
+            self.cached_messages[message.hash] = message
+        return message
+
+    def handle_delta(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.errors.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind == "alert" and element.alert.format == 1:  # Alert.ERROR
+            self.errors.append(element.alert.body)
+        else:
+            widget = getattr(element, kind)
+            if hasattr(widget, "id") and getattr(widget, "label", ""):
+                self.widgets[widget.label] = (kind, widget, delta.fragment_id)
+
+    async def rerun(self, triggers=(), fragment_id=""):
+        """Rerun the script (or one fragment) with the current widget states; returns the seconds it took"""
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.page_script_hash = self.page_script_hash
+        client_state.fragment_id = fragment_id
+        client_state.widget_states.widgets.extend(self.widget_states.values())
+        client_state.widget_states.widgets.extend(triggers)
+
+        self.errors = []
+        started = time.perf_counter()
+        await self.send(message)
+        while True:
+            response = await self.receive()
+            kind = response.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = response.new_session.page_script_hash
+                self.session_id = response.new_session.initialize.session_id
+            elif kind == "delta":
+                self.handle_delta(response.delta)
+            elif kind == "script_finished":
+                if response.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        seconds = time.perf_counter() - started
+        if self.errors:
+            raise AppError("; ".join(self.errors)[:300])
+        return seconds
+
+    def widget(self, label):
+        for widget_label, found in self.widgets.items():
+            if label in widget_label:
+                return found
+        raise LookupError(f"No widget labelled {label!r} on the page")
+
+    def set_value(self, label, value):
+        """Set a text, selectbox, radio or checkbox widget (takes effect with the next rerun)"""
+        kind, widget, _ = self.widget(label)
+        state = WidgetState(id=widget.id)
+        if kind in ("text_area", "text_input"):
+            state.string_value = value
+        elif kind in ("selectbox", "radio"):
+            state.int_value = list(widget.options).index(value)
+        elif kind == "checkbox":
+            state.bool_value = value
+        else:
+            raise TypeError(f"Cannot set a {kind} widget")
+        self.widget_states[widget.id] = state
+
+    async def click(self, label):
+        kind, widget, fragment_id = self.widget(label)
+        return await self.rerun([WidgetState(id=widget.id, trigger_value=True)], fragment_id)
+
+    async def upload(self, label, name, data, content_type):
+        """Upload a file into a file_uploader widget the way the browser does"""
+        kind, widget, _ = self.widget(label)
+        message = BackMsg()
+        message.file_urls_request.request_id = uuid.uuid4().hex
+        message.file_urls_request.session_id = self.session_id
+        message.file_urls_request.file_names.append(name)
+        await self.send(message)
+        while True:
+            response = await self.receive()
+            if response.WhichOneof("type") == "file_urls_response":
+                break
+        urls = response.file_urls_response.file_urls[0]
+
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+                f"Content-Type: {content_type}\r\n\r\n").encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if self.xsrf:
+            headers.update({"Cookie": f"_streamlit_xsrf={self.xsrf}", "X-Xsrftoken": self.xsrf})
+        upload_url = urls.upload_url if urls.upload_url.startswith("http") else self.base_url + urls.upload_url
+        await AsyncHTTPClient().fetch(upload_url, method="PUT", body=body, headers=headers)
+
+        state = WidgetState(id=widget.id)
+        state.file_uploader_state_value.max_file_id = 0
+        state.file_uploader_state_value.uploaded_file_info.append(UploadedFileInfo(
+            id=0, name=name, size=len(data), file_id=urls.file_id,
+            file_urls=FileURLs(file_id=urls.file_id, upload_url=urls.upload_url, delete_url=urls.delete_url),
+        ))
+        self.widget_states[widget.id] = state
+
+# --- user actions (each returns after the app has finished rendering the answer) ---
+
+async def ask_question(session, rng, context):
+    session.set_value("Enter your question or paste your code below", rng.choice(QUESTIONS))
+    await session.click("Get Answer")
+
+async def translate_code(session, rng, context):
+    session.set_value("Source Language", "Python")
+    session.set_value("Target Language", rng.choice(TRANSLATION_TARGETS))
+    session.set_value("Enter your Python code here", SAMPLE_CODE)
+    await session.click("Translate Code")
+
+async def analyze_image(session, rng, context):
+    await session.upload("Choose an image file", "error.png", context["image"], "image/png")
+    await session.rerun()
+    await session.click("Analyze Screenshot")
+
+async def transcribe_voice(session, rng, context):
+    await session.upload("Upload voice recording", "question.wav", context["audio"], "audio/wav")
+    await session.rerun()
+    await session.click("Process Voice Recording")
+
+async def analyze_architecture(session, rng, context):
+    session.set_value("Choose upload method", "Provide Git repository URL")
+    await session.rerun()
+    session.set_value("Enter Git repository URL", context["repository_url"])
+    await session.rerun()
+    await session.click("Clone Repository")
+    await session.click("Analyze Architecture")
+
+async def browse(session, rng, context):
+    await session.rerun()
+
+ACTIONS = {
+    "text": ask_question,
+    "translation": translate_code,
+    "image": analyze_image,
+    "voice": transcribe_voice,
+    "architecture": analyze_architecture,
+    "browse": browse,
+}
+
+# --- load generation ---
+
+async def simulate_user(base_url, mix, deadline, think_time, rng, context, samples, on_connected):
+    """One session performing actions drawn from the mix until the deadline"""
+    session = SessionClient(base_url)
+    kinds, weights = zip(*mix.items())
+    try:
+        await session.connect()
+        on_connected()
+        while time.monotonic() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                await ACTIONS[kind](session, rng, context)
+                samples.append((kind, time.perf_counter() - started, None))
+            except (AppError, LookupError, asyncio.TimeoutError, ConnectionError) as e:
+                samples.append((kind, time.perf_counter() - started, type(e).__name__))
+                if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+                    return
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+    finally:
+        session.close()
+
+async def warm_up(base_url, mix, context, seed):
+    """Perform every action of the mix once, so lazy imports and process-wide caches are loaded before measuring"""
+    session = SessionClient(base_url)
+    rng = random.Random(seed)
+    try:
+        await session.connect()
+        for kind in mix:
+            await ACTIONS[kind](session, rng, context)
+    finally:
+        session.close()
+
+def rss_bytes(pid):
+    """Resident memory of a process on Linux, or None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+async def run_level(base_url, sessions, duration, mix, think_time, seed, context, server_pid):
+    """Run a number of concurrent sessions for duration seconds; returns the level's statistics"""
+    samples = []
+    connected = []
+    peak_rss = [0]
+
+    def on_connected():
+        connected.append(True)
+        if server_pid and len(connected) == sessions:
+            peak_rss[0] = rss_bytes(server_pid) or 0
+
+    rss_before = rss_bytes(server_pid) if server_pid else None
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*(
+        simulate_user(base_url, mix, deadline, think_time, random.Random(seed * 1000 + i), context, samples, on_connected)
+        for i in range(sessions)
+    ))
+    elapsed = time.monotonic() - started
+    rss_after = rss_bytes(server_pid) if server_pid else None
+
+    latencies = sorted(seconds for _, seconds, error in samples if error is None)
+    errors = Counter(f"{kind}/{error}" for kind, _, error in samples if error is not None)
+    by_kind = {}
+    for kind in mix:
+        kind_latencies = sorted(seconds for sample_kind, seconds, error in samples if sample_kind == kind and error is None)
+        if kind_latencies:
+            by_kind[kind] = {"count": len(kind_latencies), "p50": round(percentile(kind_latencies, 0.5), 4),
+                             "p95": round(percentile(kind_latencies, 0.95), 4)}
+    level = {
+        "sessions": sessions,
+        "actions": len(latencies),
+        "throughput_per_minute": round(len(latencies) * 60 / elapsed, 2),
+        "p50": round(percentile(latencies, 0.5), 4),
+        "p95": round(percentile(latencies, 0.95), 4),
+        "p99": round(percentile(latencies, 0.99), 4),
+        "errors": dict(errors),
+        "by_kind": by_kind,
+        "latencies": latencies,
+    }
+    if rss_before is not None and rss_after is not None:
+        peak = max(peak_rss[0], rss_after)
+        level["server_rss_mb"] = round(peak / 2 ** 20, 1)
+        level["memory_per_session_mb"] = round(max(0, peak - rss_before) / sessions / 2 ** 20, 2)
+    return level
+
+def saturation_point(levels, gain=SATURATION_GAIN):
+    """Return the last level whose extra sessions still raised throughput by at least gain, and why it stops there"""
+    for previous, level in zip(levels, levels[1:]):
+        if level["errors"] and sum(level["errors"].values()) > 0.01 * max(1, level["actions"]):
+            return previous, f"errors start at {level['sessions']} sessions"
+        if level["throughput_per_minute"] < previous["throughput_per_minute"] * (1 + gain):
+            return previous, f"throughput stops growing at {level['sessions']} sessions"
+    return levels[-1], "not reached; try more sessions"
+
+# --- fixtures and server ---
+
+def git_fixture(files, fixtures_dir=DEFAULT_FIXTURES_DIR):
+    """Return a file:// URL of a git repository holding a synthetic project"""
+    repository = os.path.join(fixtures_dir, f"repository-{files}")
+    if not os.path.isdir(os.path.join(repository, ".git")):
+        shutil.rmtree(repository, ignore_errors=True)
+        shutil.copytree(project_fixture(files, fixtures_dir), repository)
+        for command in (["init", "-q"], ["add", "-A"],
+                        ["-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "-q", "-m", "fixture"]):
+            subprocess.run(["git", "-C", repository] + command, check=True)
+    return "file://" + os.path.abspath(repository)
+
+def wait_until_healthy(base_url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"The app at {base_url} did not become healthy")
+
+def start_app(port, mock_url, log_path):
+    """Start `streamlit run app.py` against the mock Groq server; returns the process"""
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="mock",
+        GROQ_BASE_URL=mock_url,
+        # Makes the voice tab take uploaded recordings instead of the microphone
+        STREAMLIT_DEPLOYMENT="load-test",
+    )
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+def format_level(level):
+    line = (f"{level['sessions']:>4} sessions  {level['throughput_per_minute']:8.1f} actions/min  "
+            f"p50 {level['p50']:6.2f}s  p95 {level['p95']:6.2f}s  p99 {level['p99']:6.2f}s")
+    if "memory_per_session_mb" in level:
+        line += f"  {level['memory_per_session_mb']:6.2f} MB/session"
+    if level["errors"]:
+        line += f"  errors: {', '.join(f'{k} {v}' for k, v in level['errors'].items())}"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit app with simulated browser sessions")
+    parser.add_argument("--url", help="Test an already running app instead of starting one (it must use a mock backend)")
+    parser.add_argument("--server-pid", type=int, help="Process id of the app given with --url, for memory figures")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT, help="Port for the app this tool starts")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS, help="Comma-separated numbers of concurrent sessions")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds per level")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default", help="Share of actions per tab")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds a user pauses between actions")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock model seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=300.0, help="Mock model token rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", default=os.path.join(BENCHMARK_DIR, "results.jsonl"),
+                        help="JSONL file the per-level results are appended to")
+    args = parser.parse_args(argv)
+
+    mock = MockGroqServer(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    mock_url = mock.start_in_thread()
+    process = None
+    base_url = args.url
+    server_pid = args.server_pid
+    if base_url is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        process = start_app(args.port, mock_url, os.path.join(BENCHMARK_DIR, "load-test-app.log"))
+        base_url = f"http://127.0.0.1:{args.port}"
+        server_pid = process.pid
+
+    context = {
+        "image": base64.b64decode(PNG_1X1),
+        "audio": silent_wav(),
+        "repository_url": git_fixture(ARCHITECTURE_PROJECT_FILES),
+    }
+    mix = MIXES[args.mix]
+    levels = []
+    try:
+        wait_until_healthy(base_url)
+        asyncio.run(warm_up(base_url, mix, context, args.seed))
+        for sessions in [int(level) for level in args.levels.split(",") if level]:
+            level = asyncio.run(run_level(base_url, sessions, args.duration, mix, args.think_time, args.seed,
+                                          context, server_pid))
+            levels.append(level)
+            print(format_level(level), flush=True)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        mock.stop()
+
+    if not levels:
+        return 1
+    saturated, reason = saturation_point(levels)
+    print(f"Saturation: about {saturated['sessions']} concurrent sessions "
+          f"({saturated['throughput_per_minute']:.0f} actions/min, p95 {saturated['p95']:.2f}s); {reason}")
+    stats = mock.stats()
+    print(f"Mock model: {sum(stats['requests'].values())} requests, {stats['generated_tokens']} tokens generated")
+
+    params = {"mix": args.mix, "duration": args.duration, "think_time": args.think_time,
+              "latency": args.latency, "tokens_per_second": args.tokens_per_second}
+    append_results(args.results, [
+        summarize("load.actions", dict(params, sessions=level["sessions"]), level["latencies"] or [0.0],
+                  **{key: value for key, value in level.items() if key not in ("latencies", "sessions")})
+        for level in levels
+    ])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from context_builder import estimate_tokens
+from module_graph import as_module_graph
+from structured_output import RECOMMENDATION_FORMAT
+from project_index import GitProjectIndex
+
+# Projects with more files than this are analysed package by package
+MAP_REDUCE_FILE_THRESHOLD = int(os.getenv("CODEHELPER_MAP_REDUCE_FILE_THRESHOLD", "2000"))
+# Package summaries feed into prompts, so they are kept in a directory only this user can access
+DEFAULT_SUMMARY_CACHE_DIR = os.getenv("CODEHELPER_SUMMARY_CACHE_DIR", os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "codehelper"
+))
+DEFAULT_MAX_WORKERS = 8
+# Packages at least this large get an LLM-written summary; smaller ones a structural one
+LLM_SUMMARY_MIN_FILES = 10
+# Bump when the summary format or prompts change so stale cache entries are ignored
+SUMMARY_VERSION = 1
+
+ROOT_PACKAGE = "(root)"
+SUMMARY_FIELDS = {"package", "files", "bytes", "file_types", "subpackages", "depends_on", "summary"}
+SAMPLE_FILES_PER_PACKAGE = 6
+SAMPLE_CHARS_PER_FILE = 600
+REDUCE_TOKEN_BUDGET = 6000
+
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".kt", ".go", ".cs", ".c", ".h", ".cc",
+    ".cpp", ".hpp", ".rb", ".php", ".swift", ".rs", ".scala",
+}
+
+def private_directory(path):
+    """Create a directory only the current user can access; False if it exists but is not private
+
+    Always True on platforms without POSIX permissions.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return True
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        return False
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return True
+
+def valid_summary(value):
+    """Whether a value loaded from the cache file has the shape summarize_package() stores"""
+    return (isinstance(value, dict)
+            and isinstance(value.get("package"), str)
+            and isinstance(value.get("files"), int)
+            and isinstance(value.get("bytes"), int)
+            and isinstance(value.get("file_types"), dict)
+            and isinstance(value.get("subpackages"), list)
+            and isinstance(value.get("depends_on"), dict)
+            and isinstance(value.get("summary", ""), str)
+            and set(value) <= SUMMARY_FIELDS)
+
+class SummaryCache:
+    """Package summaries keyed by content hash and model, persisted to a JSON file
+
+    The file lives in a directory private to the current user (memory only if
+    that directory is not private) and entries that are not well-formed
+    summaries are ignored when it is loaded. put() only updates memory; flush()
+    writes the file atomically once, e.g. after a run.
+    """
+
+    def __init__(self, path=None, max_entries=5000):
+        self.path = path or os.path.join(DEFAULT_SUMMARY_CACHE_DIR, "package-summaries.json")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        try:
+            self.persistent = private_directory(os.path.dirname(os.path.abspath(self.path)))
+        except OSError:
+            self.persistent = False
+        if self.persistent:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(entries, dict):
+            self._entries.update(
+                (key, summary) for key, summary in entries.items()
+                if isinstance(key, str) and valid_summary(summary)
+            )
+
+    def get(self, key):
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def put(self, key, summary):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def flush(self):
+        """Write the entries to the file if they changed since the last flush"""
+        if not self.persistent:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = OrderedDict(self._entries)
+                self._dirty = False
+            # mkstemp creates the file readable by this user only, under a name nobody can guess
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self.path)
+            except OSError:
+                # The cache is an optimisation; failing to persist it is not an error
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+def package_of(path):
+    """Return the top-level package a project path belongs to"""
+    return path.split('/', 1)[0] if '/' in path else ROOT_PACKAGE
+
+def group_by_package(index):
+    """Group an index's (path, size) entries by top-level package"""
+    packages = {}
+    for path, size in index.files:
+        packages.setdefault(package_of(path), []).append((path, size))
+    return packages
+
+def package_digest(index, files, model=None):
+    """Hash a package's content and the summarising model; git indexes reuse blob ids instead of reading files"""
+    digest = hashlib.sha256(f"v{SUMMARY_VERSION}\0{model or ''}\0".encode("utf-8"))
+    if isinstance(index, GitProjectIndex):
+        for path, _ in files:
+            digest.update(f"{path}\0{index.object_id(path) or ''}\0".encode("utf-8"))
+    else:
+        texts = dict(index.iter_texts([path for path, _ in files]))
+        for path, size in files:
+            digest.update(f"{path}\0{size}\0".encode("utf-8"))
+            digest.update(texts.get(path, "").encode("utf-8", errors="replace"))
+    return digest.hexdigest()
+
+def package_dependencies(dependency_graph):
+    """Collapse a module dependency graph into {package: Counter(other_package: edge count)}"""
+    graph = as_module_graph(dependency_graph)
+    packages = [package_of(name) for name in graph.names]
+    edges = {}
+    for source, target in graph.edges():
+        if packages[source] != packages[target]:
+            edges.setdefault(packages[source], Counter())[packages[target]] += 1
+    return edges
+
+def structural_summary(name, files, depends_on):
+    """Describe a package from its file listing alone, without calling the LLM"""
+    extensions = Counter(os.path.splitext(path)[1] or "(none)" for path, _ in files)
+    subpackages = Counter(
+        path.split('/')[1] for path, _ in files if path.count('/') >= 2
+    )
+    return {
+        "package": name,
+        "files": len(files),
+        "bytes": sum(size for _, size in files),
+        "file_types": dict(extensions.most_common(5)),
+        "subpackages": [sub for sub, _ in subpackages.most_common(8)],
+        "depends_on": dict(depends_on.most_common(8)) if depends_on else {},
+    }
+
+def sample_sources(index, files):
+    """Return the heads of a package's largest source files, for the LLM summary prompt"""
+    sources = sorted(
+        (item for item in files if os.path.splitext(item[0])[1] in SOURCE_EXTENSIONS),
+        key=lambda item: -item[1]
+    )[:SAMPLE_FILES_PER_PACKAGE]
+    return [
+        f"--- {path} ---\n{text[:SAMPLE_CHARS_PER_FILE]}"
+        for path, text in index.iter_texts([path for path, _ in sources])
+    ]
+
+def summarize_package(name, index, files, depends_on, llm, cache, model=None):
+    """Map step: summarise one package, reusing a cached summary when its content and model are unchanged"""
+    key = package_digest(index, files, model)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return dict(cached, cached=True)
+
+    summary = structural_summary(name, files, depends_on)
+    if llm is not None and len(files) >= LLM_SUMMARY_MIN_FILES:
+        prompt = f"""
+        Summarise the responsibility and internal design of the package "{name}" in at most 5 sentences.
+        Mention its main components, any design patterns you can see, and notable coupling problems.
+
+        Package facts: {json.dumps(summary)}
+
+        Excerpts of its largest source files:
+        {chr(10).join(sample_sources(index, files))}
+        """
+        try:
+            summary["summary"] = llm(prompt)
+        except Exception as e:
+            summary["error"] = str(e)
+
+    if cache is not None and "error" not in summary:
+        cache.put(key, summary)
+    return dict(summary, cached=False)
+
+def reduce_prompt(summaries, token_budget=REDUCE_TOKEN_BUDGET):
+    """Build the final prompt from per-package summaries, largest packages first, within budget"""
+    lines = []
+    used = 0
+    omitted = 0
+    for summary in sorted(summaries, key=lambda s: -s["files"]):
+        line = json.dumps({k: v for k, v in summary.items() if k not in ("cached", "error")})
+        tokens = estimate_tokens(line)
+        if used + tokens > token_budget:
+            omitted += 1
+            continue
+        lines.append(line)
+        used += tokens
+
+    if omitted:
+        lines.append(f"({omitted} smaller packages omitted to fit the context budget)")
+
+    return f"""
+    As an expert software architect, assess the architecture of a large project from the
+    per-package summaries below (one JSON object per top-level package, including which
+    other packages it depends on).
+
+    {chr(10).join(lines)}
+    {RECOMMENDATION_FORMAT}
+    """
+
+def map_reduce_analysis(index, dependency_graph, llm, cache=None, max_workers=DEFAULT_MAX_WORKERS,
+                        progress=None, assess=None, model=None):
+    """Summarise each top-level package concurrently, then combine the summaries with one LLM call
+
+    llm is a callable taking a prompt and returning text; it is called from worker
+    threads. progress, if given, is called with (completed, total) after each package.
+    assess, if given, makes the final call instead of llm (on the calling thread).
+    model names the model llm uses, so cached summaries are only reused for it.
+    Returns a dict with the package summaries, the assessment and timing stats.
+    """
+    started = time.perf_counter()
+    packages = group_by_package(index)
+    dependencies = package_dependencies(dependency_graph)
+
+    summaries = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    summarize_package, name, index, files, dependencies.get(name), llm, cache, model
+                )
+                for name, files in packages.items()
+            ]
+            for completed, future in enumerate(futures, start=1):
+                summaries.append(future.result())
+                if progress:
+                    progress(completed, len(futures))
+    finally:
+        if cache is not None:
+            cache.flush()
+
+    map_seconds = time.perf_counter() - started
+    assessment = (assess or llm)(reduce_prompt(summaries))
+
+    return {
+        "packages": summaries,
+        "assessment": assessment,
+        "stats": {
+            "packages": len(summaries),
+            "cached": sum(1 for s in summaries if s.get("cached")),
+            "llm_summaries": sum(1 for s in summaries if "summary" in s and not s.get("cached")),
+            "errors": sum(1 for s in summaries if "error" in s),
+            "map_seconds": map_seconds,
+            "total_seconds": time.perf_counter() - started,
+        },
+    }
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from context_builder import estimate_tokens
+from http_util import HTTPError, chunk, read_request
+from stub_client import STUB_RECOMMENDATIONS
+from structured_output import RECOMMENDATION_SECTIONS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.getenv("CODEHELPER_MOCK_GROQ_PORT", "8766"))
+FILLER_SENTENCE = "Mock completion text with a deterministic length for benchmarks. "
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 429: "Too Many Requests"}
+
+def filler_text(tokens):
+    """Deterministic text of about the given number of tokens"""
+    sentence_tokens = estimate_tokens(FILLER_SENTENCE)
+    return FILLER_SENTENCE * max(1, round(tokens / sentence_tokens))
+
+def head(status, content_type, length=None, headers=None):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Unknown')}", f"Content-Type: {content_type}"]
+    lines.append("Transfer-Encoding: chunked" if length is None else f"Content-Length: {length}")
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+class MockGroqServer:
+    """Local Groq-compatible HTTP endpoint with configurable latency, token rate and 429s
+
+    Serves the OpenAI-style chat completion (plain or server-sent-event streaming)
+    and transcription routes the groq client calls, so the real client can be
+    pointed at it with base_url. Replies are deterministic: recommendation JSON
+    for JSON-mode requests, filler text of completion_tokens tokens otherwise.
+    The first token arrives after latency seconds and the rest at
+    tokens_per_second. Every rate_limit_every-th request (0 = never) is answered
+    with 429 and a retry-after of retry_after seconds, which the client honours.
+    """
+
+    def __init__(self, latency=0.05, tokens_per_second=500.0, completion_tokens=200, chunk_tokens=8,
+                 rate_limit_every=0, retry_after=0.05, transcription_latency=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.chunk_tokens = chunk_tokens
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.transcription_latency = latency if transcription_latency is None else transcription_latency
+        self.requests = Counter()
+        self.rate_limited = 0
+        self.generated_tokens = 0
+        self._count = 0
+        self._loop = None
+        self._listener = None
+        self._thread = None
+        self._writers = set()
+        self.url = None
+
+    def stats(self):
+        return {"requests": dict(self.requests), "rate_limited": self.rate_limited,
+                "generated_tokens": self.generated_tokens}
+
+    def reply(self, payload):
+        """Return the completion text for a chat request"""
+        question = payload["messages"][-1]["content"] if payload.get("messages") else ""
+        if not isinstance(question, str):
+            question = " ".join(part.get("text", "") for part in question if isinstance(part, dict))
+        if (payload.get("response_format") or {}).get("type") == "json_object" or "Respond with one JSON object" in question:
+            return json.dumps({key: STUB_RECOMMENDATIONS[key] for key in RECOMMENDATION_SECTIONS})
+        limit = payload.get("max_completion_tokens") or payload.get("max_tokens") or self.completion_tokens
+        return filler_text(min(self.completion_tokens, limit))
+
+    def usage(self, payload, text):
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in payload.get("messages", []))
+        completion_tokens = estimate_tokens(text)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def admit(self):
+        """Count a request; False if it is one of the rate-limited ones"""
+        self._count += 1
+        if self.rate_limit_every and self._count % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            return False
+        return True
+
+    # --- routes ---
+
+    async def chat(self, writer, body, keep_alive):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not JSON")
+        text = self.reply(payload)
+        usage = self.usage(payload, text)
+        self.generated_tokens += usage["completion_tokens"]
+        completion_id = f"chatcmpl-mock-{self._count}"
+        model = payload.get("model", "mock")
+        created = int(time.time())
+        await asyncio.sleep(self.latency)
+
+        if not payload.get("stream"):
+            await asyncio.sleep(usage["completion_tokens"] / self.tokens_per_second)
+            await self.write_json(writer, 200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop", "logprobs": None}],
+                "usage": usage,
+            }, keep_alive)
+            return
+
+        def event(delta, finish_reason=None, extra=None):
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]}
+            data.update(extra or {})
+            return chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+        writer.write(head(200, "text/event-stream", headers={"Connection": "keep-alive" if keep_alive else "close"}))
+        writer.write(event({"role": "assistant", "content": ""}))
+        chars_per_chunk = max(1, round(len(text) * self.chunk_tokens / max(1, usage["completion_tokens"])))
+        for start in range(0, len(text), chars_per_chunk):
+            writer.write(event({"content": text[start:start + chars_per_chunk]}))
+            await writer.drain()
+            await asyncio.sleep(self.chunk_tokens / self.tokens_per_second)
+        # Groq reports usage on the final chunk, under x_groq
+        writer.write(event({}, "stop", {"x_groq": {"id": completion_id, "usage": usage}}))
+        writer.write(chunk(b"data: [DONE]\n\n") + b"0\r\n\r\n")
+        await writer.drain()
+
+    async def transcription(self, writer, body, keep_alive):
+        # The multipart body is not parsed; only its size shows up in the reply
+        await asyncio.sleep(self.transcription_latency)
+        await self.write_json(writer, 200, {"text": f"Mock transcription of {len(body)} bytes"}, keep_alive)
+
+    async def models(self, writer, body, keep_alive):
+        await self.write_json(writer, 200, {"object": "list", "data": []}, keep_alive)
+
+    ROUTES = {
+        ("POST", "/openai/v1/chat/completions"): chat,
+        ("POST", "/openai/v1/audio/transcriptions"): transcription,
+        ("GET", "/openai/v1/models"): models,
+    }
+
+    # --- connection handling ---
+
+    async def write_json(self, writer, status, value, keep_alive, headers=None):
+        body = json.dumps(value).encode("utf-8")
+        headers = dict(headers or {}, Connection="keep-alive" if keep_alive else "close")
+        writer.write(head(status, "application/json", len(body), headers) + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await self.write_json(writer, e.status, {"error": {"message": str(e)}}, False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                path = path.split("?")[0]
+                route = self.ROUTES.get((method, path))
+                self.requests[path] += 1
+                if route is None:
+                    await self.write_json(writer, 404, {"error": {"message": f"No route for {method} {path}"}}, keep_alive)
+                elif method == "POST" and not self.admit():
+                    await self.write_json(writer, 429, {"error": {
+                        "message": "Rate limit reached (mock)", "type": "tokens", "code": "rate_limit_exceeded",
+                    }}, keep_alive, headers={
+                        "retry-after": max(1, round(self.retry_after)),
+                        "retry-after-ms": round(self.retry_after * 1000),
+                    })
+                else:
+                    try:
+                        await route(self, writer, body, keep_alive)
+                    except HTTPError as e:
+                        await self.write_json(writer, e.status, {"error": {"message": str(e)}}, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._listener = await asyncio.start_server(self.handle_connection, host, port)
+        host, port = self._listener.sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+        return self._listener
+
+    def start_in_thread(self, host=DEFAULT_HOST, port=0):
+        """Serve from a background thread (port 0 picks a free port); returns the base URL"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="mock-groq", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop(self):
+        """Stop a server started with start_in_thread, closing idle keep-alive connections"""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._listener.close()
+            for writer in list(self._writers):
+                writer.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if tasks:
+                await asyncio.wait(tasks, timeout=5)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Groq API server for benchmarks and load tests")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Length of non-JSON replies")
+    parser.add_argument("--chunk-tokens", type=int, default=8, help="Tokens per streamed chunk")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429 (0 = never)")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Seconds the 429 responses ask clients to wait")
+    args = parser.parse_args(argv)
+
+    server = MockGroqServer(args.latency, args.tokens_per_second, args.completion_tokens, args.chunk_tokens,
+                            args.rate_limit_every, args.retry_after)
+
+    async def serve():
+        listener = await server.start(args.host, args.port)
+        print(f"Mock Groq API on {server.url} (point the client's base_url here)")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
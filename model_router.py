@@ -0,0 +1,107 @@
+import re
+import threading
+from collections import deque
+
+from context_builder import estimate_tokens
+from request_metrics import percentile
+
+AUTO_MODEL = "auto"
+
+# Text models offered in the sidebar (label -> Groq model id)
+TEXT_MODELS = {
+    "Auto (fast model for simple prompts)": AUTO_MODEL,
+    "Gemma 2 9B": "gemma2-9b-it",
+    "Llama 3 70B": "llama3-70b-8192",
+    "Llama 3.1 8B Instant": "llama-3.1-8b-instant",
+}
+DEFAULT_TEMPERATURE = 0.7
+
+FAST_MODEL = "llama-3.1-8b-instant"
+LARGE_MODEL = "llama3-70b-8192"
+# Models that are good enough for simple prompts; auto mode picks the fastest observed one
+SIMPLE_PROMPT_MODELS = [FAST_MODEL, "gemma2-9b-it"]
+
+# Tasks that always need the larger model, whatever the prompt looks like
+COMPLEX_TASKS = {"translation", "architecture", "blueprint"}
+LONG_PROMPT_TOKENS = 400
+CODE_LINES_FOR_COMPLEX = 3
+# Auto mode trusts observed latencies once a model has this many samples
+MIN_SAMPLES_FOR_LATENCY_ROUTING = 5
+LATENCY_WINDOW = 200
+
+CODE_LINE = re.compile(
+    r"^\s*(?:```|def |class |import |from \S+ import|function |public |private |#include|package |func |fn |"
+    r"const |let |var |return\b)|[;{}]\s*$",
+    re.MULTILINE
+)
+
+def classify_prompt(prompt, task="chat"):
+    """Return "complex" for long, code-heavy or inherently hard prompts and "simple" otherwise"""
+    if task in COMPLEX_TASKS:
+        return "complex"
+    if estimate_tokens(prompt) > LONG_PROMPT_TOKENS:
+        return "complex"
+    if len(CODE_LINE.findall(prompt)) >= CODE_LINES_FOR_COMPLEX:
+        return "complex"
+    return "simple"
+
+class ModelRouter:
+    """Chooses the model for each request and keeps per-model latency statistics
+
+    A manually selected model is always honoured. In auto mode simple prompts go
+    to the fastest of SIMPLE_PROMPT_MODELS (by observed median latency once there
+    are enough samples) and complex prompts go to the large model.
+    """
+
+    def __init__(self, fast_model=FAST_MODEL, large_model=LARGE_MODEL, simple_models=None):
+        self.fast_model = fast_model
+        self.large_model = large_model
+        self.simple_models = list(simple_models or SIMPLE_PROMPT_MODELS)
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._routed = {}
+
+    def choose(self, prompt, task="chat", selected_model=AUTO_MODEL):
+        """Return the model id to use for a prompt"""
+        if selected_model and selected_model != AUTO_MODEL:
+            return selected_model
+
+        if classify_prompt(prompt, task) == "complex":
+            model = self.large_model
+        else:
+            model = self.fast_model
+            with self._lock:
+                medians = {
+                    candidate: percentile(sorted(self._latencies[candidate]), 0.5)
+                    for candidate in self.simple_models
+                    if len(self._latencies.get(candidate, ())) >= MIN_SAMPLES_FOR_LATENCY_ROUTING
+                }
+            if medians:
+                model = min(medians, key=medians.get)
+
+        with self._lock:
+            self._routed[model] = self._routed.get(model, 0) + 1
+        return model
+
+    def record(self, model, seconds):
+        """Record the latency of a completed request"""
+        with self._lock:
+            if model not in self._latencies:
+                self._latencies[model] = deque(maxlen=LATENCY_WINDOW)
+            self._latencies[model].append(seconds)
+
+    def stats(self):
+        """Return {model: {"requests", "routed", "mean", "p50", "p95"}} over the recent window"""
+        with self._lock:
+            models = set(self._latencies) | set(self._routed)
+            stats = {}
+            for model in sorted(models):
+                samples = sorted(self._latencies.get(model, ()))
+                stats[model] = {
+                    "requests": len(samples),
+                    "routed": self._routed.get(model, 0),
+                    "mean": sum(samples) / len(samples) if samples else 0.0,
+                    "p50": percentile(samples, 0.5),
+                    "p95": percentile(samples, 0.95),
+                }
+            return stats
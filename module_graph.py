@@ -0,0 +1,312 @@
+import sys
+from array import array
+
+class ModuleGraph:
+    """Compact directed graph of modules with integer ids and CSR edge storage
+
+    Module names are interned once and referred to by their index in `names`.
+    Outgoing edges of node i are targets[offsets[i]:offsets[i + 1]] (compressed
+    sparse rows), and the reverse graph is stored the same way for fan-in
+    queries. Edges are de-duplicated and the graph is immutable once built;
+    use ModuleGraphBuilder or ModuleGraph.from_adjacency to create one.
+    """
+
+    def __init__(self, names, offsets, targets):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self._ids = {name: node for node, name in enumerate(names)}
+        self._reverse = None
+
+    @classmethod
+    def from_adjacency(cls, adjacency):
+        """Build a graph from a {module: [imported modules]} dict"""
+        builder = ModuleGraphBuilder()
+        for source, targets in adjacency.items():
+            builder.add_node(source)
+            for target in targets:
+                builder.add_edge(source, target)
+        return builder.build()
+
+    @classmethod
+    def from_edges(cls, names, edges):
+        """Build a graph from a list of names and (source id, target id) pairs"""
+        builder = ModuleGraphBuilder()
+        for name in names:
+            builder.add_node(name)
+        for source, target in edges:
+            builder.add_edge_ids(source, target)
+        return builder.build()
+
+    # --- basic access ---
+
+    def __len__(self):
+        return len(self.names)
+
+    def __bool__(self):
+        return len(self.names) > 0
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def node_id(self, name):
+        """Return the integer id of a module name, or None if it is not in the graph"""
+        return self._ids.get(name)
+
+    def successors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def predecessors(self, node):
+        offsets, sources = self._reverse_csr()
+        return sources[offsets[node]:offsets[node + 1]]
+
+    def edges(self):
+        """Yield (source id, target id) pairs"""
+        offsets, targets = self.offsets, self.targets
+        for node in range(len(self.names)):
+            for position in range(offsets[node], offsets[node + 1]):
+                yield node, targets[position]
+
+    def named_edges(self):
+        """Yield (source name, target name) pairs"""
+        names = self.names
+        for source, target in self.edges():
+            yield names[source], names[target]
+
+    def to_adjacency(self):
+        """Return the graph as a {module: [imported modules]} dict"""
+        return {
+            name: [self.names[target] for target in self.successors(node)]
+            for node, name in enumerate(self.names)
+        }
+
+    def to_networkx(self, nodes=None):
+        """Build a networkx DiGraph of the whole graph or of the given node ids, for drawing"""
+        import networkx as nx
+
+        G = nx.DiGraph()
+        selected = range(len(self.names)) if nodes is None else nodes
+        wanted = set(selected)
+        G.add_nodes_from(self.names[node] for node in selected)
+        G.add_edges_from(
+            (self.names[source], self.names[target])
+            for source in wanted for target in self.successors(source) if target in wanted
+        )
+        return G
+
+    def _reverse_csr(self):
+        if self._reverse is None:
+            counts = array('i', [0]) * (len(self.names) + 1)
+            for target in self.targets:
+                counts[target + 1] += 1
+            for node in range(len(self.names)):
+                counts[node + 1] += counts[node]
+            fill = array('i', counts)
+            sources = array('i', [0]) * len(self.targets)
+            for source, target in self.edges():
+                sources[fill[target]] = source
+                fill[target] += 1
+            self._reverse = (counts, sources)
+        return self._reverse
+
+    # --- degree queries ---
+
+    def fan_out(self):
+        """Return an array with the number of modules each module imports"""
+        offsets = self.offsets
+        return array('i', (offsets[node + 1] - offsets[node] for node in range(len(self.names))))
+
+    def fan_in(self):
+        """Return an array with the number of modules importing each module"""
+        offsets, _ = self._reverse_csr()
+        return array('i', (offsets[node + 1] - offsets[node] for node in range(len(self.names))))
+
+    # --- structure queries ---
+
+    def strongly_connected_components(self):
+        """Return (component_of, components) using an iterative Tarjan's algorithm
+
+        component_of is an array mapping node id to component number. Components
+        are numbered in reverse topological order: every edge between two
+        components points from a higher to a lower number.
+        """
+        count = len(self.names)
+        offsets, targets = self.offsets, self.targets
+        index_of = array('i', [-1]) * count
+        lowlink = array('i', [0]) * count
+        on_stack = bytearray(count)
+        component_of = array('i', [-1]) * count
+        stack = []
+        components = []
+        counter = 0
+
+        for start in range(count):
+            if index_of[start] != -1:
+                continue
+            index_of[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack[start] = 1
+            work = [(start, offsets[start])]
+
+            while work:
+                node, position = work[-1]
+                end = offsets[node + 1]
+                while position < end:
+                    target = targets[position]
+                    position += 1
+                    if index_of[target] == -1:
+                        work[-1] = (node, position)
+                        index_of[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = 1
+                        work.append((target, offsets[target]))
+                        break
+                    if on_stack[target] and index_of[target] < lowlink[node]:
+                        lowlink[node] = index_of[target]
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if lowlink[node] < lowlink[parent]:
+                            lowlink[parent] = lowlink[node]
+                    if lowlink[node] == index_of[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            component_of[member] = len(components)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+
+        return component_of, components
+
+    def cycles(self):
+        """Return the node ids of every dependency cycle, including self-imports, largest first"""
+        _, components = self.strongly_connected_components()
+        cycles = [component for component in components if len(component) > 1]
+        cycles.extend(
+            [node] for node in range(len(self.names)) if node in self.successors(node)
+        )
+        cycles.sort(key=len, reverse=True)
+        return cycles
+
+    def topological_layers(self):
+        """Return an array with each node's layer: the longest import chain leading to it
+
+        Nodes on a cycle share their component's layer, so every edge between
+        different components goes from a lower to a higher layer.
+        """
+        component_of, components = self.strongly_connected_components()
+        component_layer = array('i', [0]) * len(components)
+        # Tarjan numbers components in reverse topological order, so walking them
+        # from the highest number down visits every importer before what it imports
+        for number in range(len(components) - 1, -1, -1):
+            layer = component_layer[number]
+            for node in components[number]:
+                for target in self.successors(node):
+                    successor = component_of[target]
+                    if successor != number and component_layer[successor] <= layer:
+                        component_layer[successor] = layer + 1
+        return array('i', (component_layer[component_of[node]] for node in range(len(self.names))))
+
+    def reachable(self, node):
+        """Return the ids of every module a module depends on, directly or transitively"""
+        seen = bytearray(len(self.names))
+        pending = [node]
+        result = []
+        while pending:
+            current = pending.pop()
+            for target in self.successors(current):
+                if not seen[target]:
+                    seen[target] = 1
+                    result.append(target)
+                    pending.append(target)
+        return result
+
+    def transitive_closure_sizes(self):
+        """Return an array with the number of modules each module transitively depends on
+
+        Reachability is computed once per strongly connected component as a bitset
+        (a Python int), merging successor bitsets in reverse topological order.
+        """
+        component_of, components = self.strongly_connected_components()
+        reach = [0] * len(components)
+        for number, members in enumerate(components):
+            bits = 0
+            for node in members:
+                for target in self.successors(node):
+                    successor = component_of[target]
+                    if successor != number:
+                        bits |= reach[successor]
+            members_bits = 0
+            for node in members:
+                members_bits |= 1 << node
+            reach[number] = bits | members_bits
+
+        sizes = array('i', [0]) * len(self.names)
+        for node in range(len(self.names)):
+            component = components[component_of[node]]
+            # A module only depends on itself if it is on a cycle
+            on_cycle = len(component) > 1 or node in self.successors(node)
+            sizes[node] = bin(reach[component_of[node]]).count("1") - (0 if on_cycle else 1)
+        return sizes
+
+    def memory_bytes(self):
+        """Approximate memory used by the graph, including interned names"""
+        total = sys.getsizeof(self.offsets) + sys.getsizeof(self.targets) + sys.getsizeof(self.names)
+        total += sum(sys.getsizeof(name) for name in self.names)
+        total += sys.getsizeof(self._ids)
+        if self._reverse is not None:
+            total += sum(sys.getsizeof(buffer) for buffer in self._reverse)
+        return total
+
+    def text_size(self):
+        """Return the length of the graph written out as an adjacency dict, for token estimates"""
+        lengths = [len(name) + 4 for name in self.names]
+        return sum(lengths) + sum(lengths[target] for target in self.targets)
+
+class ModuleGraphBuilder:
+    """Accumulates nodes and edges, then packs them into a ModuleGraph"""
+
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+        self._edges = set()
+
+    def add_node(self, name):
+        """Intern a module name and return its id"""
+        node = self._ids.get(name)
+        if node is None:
+            node = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    def add_edge(self, source, target):
+        self._edges.add((self.add_node(source), self.add_node(target)))
+
+    def add_edge_ids(self, source, target):
+        self._edges.add((source, target))
+
+    def build(self):
+        offsets = array('i', [0]) * (len(self.names) + 1)
+        for source, _ in self._edges:
+            offsets[source + 1] += 1
+        for node in range(len(self.names)):
+            offsets[node + 1] += offsets[node]
+        targets = array('i', [0]) * len(self._edges)
+        fill = array('i', offsets)
+        for source, target in sorted(self._edges):
+            targets[fill[source]] = target
+            fill[source] += 1
+        return ModuleGraph(self.names, offsets, targets)
+
+def as_module_graph(graph):
+    """Accept a ModuleGraph or a {module: [imported modules]} dict and return a ModuleGraph"""
+    if isinstance(graph, ModuleGraph):
+        return graph
+    return ModuleGraph.from_adjacency(graph or {})
@@ -0,0 +1,374 @@
+import ast
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from worker_pool import DEFAULT_MAX_WORKERS, map_batches
+
+# Projects with fewer Python files than this are scanned in-process
+PARALLEL_FILE_THRESHOLD = 200
+FILES_PER_TASK = 100
+MAX_EVIDENCE_PER_PATTERN = 50
+
+FACTORY_NAME_PREFIXES = ("create_", "make_", "build_", "new_")
+LISTENER_METHOD_NAMES = {
+    "subscribe", "unsubscribe", "attach", "detach", "register", "unregister",
+    "add_listener", "remove_listener", "add_observer", "remove_observer",
+    "add_handler", "remove_handler", "add_callback", "connect", "on",
+}
+REPOSITORY_METHOD_PREFIXES = ("get", "find", "list", "all", "add", "save", "create", "update", "delete", "remove")
+LAYER_DIRECTORIES = {
+    "model": {"models", "model", "entities", "domain", "schemas"},
+    "view": {"views", "view", "templates", "ui", "components", "pages", "screens"},
+    "controller": {"controllers", "controller", "routes", "handlers", "api", "endpoints"},
+    "service": {"services", "service", "usecases"},
+    "repository": {"repositories", "repository", "repos", "dao"},
+}
+
+def base_name(node):
+    """Return the last name component of a base class or decorator expression"""
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+def class_methods(node):
+    return [item for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+def is_abstract_method(function):
+    """Return True for @abstractmethod methods and methods that only raise NotImplementedError"""
+    if any(base_name(decorator) == "abstractmethod" for decorator in function.decorator_list):
+        return True
+    body = [statement for statement in function.body
+            if not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant))]
+    return (len(body) == 1 and isinstance(body[0], ast.Raise) and body[0].exc is not None
+            and base_name(body[0].exc) == "NotImplementedError")
+
+class FileContext:
+    """What a detector sees while the shared AST walk visits one file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.findings = {}
+        # Innermost function enclosing the node being visited, if any
+        self.function = None
+        # Per-file scratch space for detectors that report in finish_file()
+        self.state = {}
+
+    def report(self, detector, line, message):
+        self.findings.setdefault(detector.name, []).append((self.path, line, message))
+
+class PatternDetector(ABC):
+    """Base class for pluggable pattern detectors
+
+    A detector lists the AST node types it wants in node_types; the single walk
+    over each file calls visit() for every matching node. Findings reported
+    through the context are collected per file (possibly in a worker process),
+    and reduce() turns all findings of the project into evidence strings.
+    Detectors must be defined at module level so worker processes can import them.
+    """
+
+    name = ""
+    node_types = ()
+
+    @abstractmethod
+    def visit(self, node, context):
+        """Inspect one node of a type in node_types and report findings through the context"""
+
+    def finish_file(self, context):
+        """Called once after the walk over a file, for detectors that aggregate per file"""
+
+    def reduce(self, findings):
+        """Turn [(path, line, message)] from every file into evidence strings"""
+        return [f"{path}:{line}: {message}" for path, line, message in findings]
+
+class SingletonDetector(PatternDetector):
+    name = "singleton"
+    node_types = (ast.ClassDef, ast.FunctionDef)
+
+    def visit(self, node, context):
+        if isinstance(node, ast.ClassDef):
+            methods = {method.name: method for method in class_methods(node)}
+            instance_attributes = {
+                target.id for item in node.body if isinstance(item, (ast.Assign, ast.AnnAssign))
+                for target in (item.targets if isinstance(item, ast.Assign) else [item.target])
+                if isinstance(target, ast.Name) and "instance" in target.id.lower()
+            }
+            if "__new__" in methods and instance_attributes:
+                context.report(self, node.lineno, f"class {node.name} caches its instance in __new__")
+                return
+            for method in methods.values():
+                decorators = {base_name(decorator) for decorator in method.decorator_list}
+                if ("classmethod" in decorators and instance_attributes
+                        and method.name in ("instance", "get_instance", "shared", "default", "get")):
+                    context.report(self, method.lineno, f"{node.name}.{method.name}() returns a shared instance")
+                    return
+        elif node.col_offset == 0:
+            # Module-level accessor: global X; if X is None: X = ...; return X
+            globals_declared = {
+                name for statement in node.body if isinstance(statement, ast.Global) for name in statement.names
+            }
+            if globals_declared and any(
+                isinstance(statement, ast.If) and isinstance(statement.test, ast.Compare)
+                and isinstance(statement.test.left, ast.Name) and statement.test.left.id in globals_declared
+                for statement in node.body
+            ):
+                context.report(self, node.lineno, f"{node.name}() lazily creates a module-level instance")
+
+class FactoryDetector(PatternDetector):
+    name = "factory"
+    node_types = (ast.ClassDef, ast.Return)
+
+    def visit(self, node, context):
+        if isinstance(node, ast.ClassDef):
+            if node.name.endswith("Factory"):
+                context.report(self, node.lineno, f"factory class {node.name}")
+            return
+
+        # Collect the classes each function returns new instances of
+        if context.function is not None and isinstance(node.value, ast.Call):
+            name = base_name(node.value.func)
+            if name[:1].isupper():
+                created = context.state.setdefault(self.name, {})
+                created.setdefault(context.function, set()).add(name)
+
+    def finish_file(self, context):
+        for function, created in context.state.get(self.name, {}).items():
+            # A function that returns instances of two or more different classes
+            if len(created) >= 2:
+                context.report(
+                    self, function.lineno, f"{function.name}() returns one of {', '.join(sorted(created)[:4])}"
+                )
+            elif function.name.startswith(FACTORY_NAME_PREFIXES):
+                context.report(self, function.lineno, f"{function.name}() creates {next(iter(created))} instances")
+
+class ObserverDetector(PatternDetector):
+    name = "observer"
+    node_types = (ast.ClassDef,)
+
+    def visit(self, node, context):
+        methods = class_methods(node)
+        registration = [method.name for method in methods if method.name in LISTENER_METHOD_NAMES]
+        if not registration:
+            return
+        # Look for a notify loop: for listener in self.<attr>: listener(...) / listener.<method>(...)
+        for method in methods:
+            for child in ast.walk(method):
+                if (isinstance(child, ast.For) and isinstance(child.iter, ast.Attribute)
+                        and isinstance(child.iter.value, ast.Name) and child.iter.value.id == "self"
+                        and isinstance(child.target, ast.Name)):
+                    listener = child.target.id
+                    for inner in ast.walk(child):
+                        if isinstance(inner, ast.Call) and (
+                            (isinstance(inner.func, ast.Name) and inner.func.id == listener) or
+                            (isinstance(inner.func, ast.Attribute) and isinstance(inner.func.value, ast.Name)
+                             and inner.func.value.id == listener)
+                        ):
+                            context.report(
+                                self, node.lineno,
+                                f"class {node.name} registers listeners via {registration[0]}() "
+                                f"and notifies them in {method.name}()"
+                            )
+                            return
+
+class RepositoryDetector(PatternDetector):
+    name = "repository"
+    node_types = (ast.ClassDef,)
+
+    def visit(self, node, context):
+        if node.name.endswith(("Repository", "Repo", "DAO", "Dao")):
+            context.report(self, node.lineno, f"class {node.name}")
+            return
+        # A class whose public API is mostly CRUD-style data access
+        verbs = {
+            method.name.split('_')[0] for method in class_methods(node)
+            if method.name.startswith(REPOSITORY_METHOD_PREFIXES)
+        }
+        if len(verbs) >= 4 and verbs & {"get", "find", "list", "all"} and verbs & {"add", "save", "create"}:
+            context.report(self, node.lineno, f"class {node.name} exposes {', '.join(sorted(verbs))} operations")
+
+class StrategyDetector(PatternDetector):
+    """Abstract interfaces with two or more interchangeable implementations across the project"""
+
+    name = "strategy"
+    node_types = (ast.ClassDef,)
+
+    def visit(self, node, context):
+        abstract = [method.name for method in class_methods(node) if is_abstract_method(method)]
+        bases = [base_name(base) for base in node.bases]
+        if abstract:
+            context.report(self, node.lineno, ("interface", node.name, tuple(abstract)))
+        for base in bases:
+            if base and base not in ("object", "ABC", "Protocol"):
+                context.report(self, node.lineno, ("implementation", node.name, base))
+
+    def reduce(self, findings):
+        interfaces = {}
+        implementations = {}
+        for path, line, (kind, name, detail) in findings:
+            if kind == "interface":
+                interfaces.setdefault(name, (path, line, detail))
+            else:
+                implementations.setdefault(detail, []).append(name)
+
+        evidence = []
+        for name, (path, line, methods) in sorted(interfaces.items()):
+            implementers = sorted(set(implementations.get(name, [])))
+            if len(implementers) >= 2:
+                shown = ", ".join(implementers[:4]) + (" ..." if len(implementers) > 4 else "")
+                evidence.append(
+                    f"{path}:{line}: {name} ({', '.join(methods[:3])}) has {len(implementers)} "
+                    f"implementations: {shown}"
+                )
+        return evidence
+
+class LayeringDetector(PatternDetector):
+    """MVC-style layering, from layer-named packages and framework base classes"""
+
+    name = "mvc"
+    node_types = (ast.Module, ast.ClassDef)
+
+    def visit(self, node, context):
+        if isinstance(node, ast.Module):
+            parts = [part.lower() for part in os.path.splitext(context.path)[0].split('/')]
+            for layer, names in LAYER_DIRECTORIES.items():
+                if any(part in names for part in parts):
+                    context.report(self, 1, (layer, context.path))
+                    return
+        else:
+            bases = {base_name(base) for base in node.bases}
+            if bases & {"Model", "BaseModel"}:
+                context.report(self, node.lineno, ("model", f"{context.path}:{node.lineno}"))
+            elif bases & {"View", "TemplateView", "APIView", "MethodView", "ViewSet", "ModelViewSet"}:
+                context.report(self, node.lineno, ("view", f"{context.path}:{node.lineno}"))
+
+    def reduce(self, findings):
+        layers = {}
+        for _, _, (layer, location) in findings:
+            layers.setdefault(layer, []).append(location)
+        if len(layers) < 2:
+            return []
+        return [
+            f"{locations[0]}: {layer} layer ({len(locations)} files or classes)"
+            for layer, locations in sorted(layers.items())
+        ]
+
+DEFAULT_DETECTORS = [
+    SingletonDetector, FactoryDetector, ObserverDetector,
+    RepositoryDetector, StrategyDetector, LayeringDetector,
+]
+
+def scan_file(path, text, detectors):
+    """Parse one file and run every detector over it in a single AST walk"""
+    tree = ast.parse(text, filename=path)
+    context = FileContext(path)
+    handlers = {}
+    for detector in detectors:
+        for node_type in detector.node_types:
+            handlers.setdefault(node_type, []).append(detector)
+
+    # When every detector only looks at statements, expression subtrees are skipped
+    statement_types = (ast.mod, ast.stmt, ast.excepthandler, ast.match_case)
+    statements_only = all(issubclass(node_type, statement_types) for node_type in handlers)
+
+    timings = Counter()
+    # Depth-first walk that tracks the enclosing function of every node
+    pending = [(tree, None)]
+    while pending:
+        node, function = pending.pop()
+        context.function = function
+        for detector in handlers.get(type(node), ()):
+            started = time.perf_counter()
+            detector.visit(node, context)
+            timings[detector.name] += time.perf_counter() - started
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            function = node
+        for child in ast.iter_child_nodes(node):
+            if not statements_only or isinstance(child, statement_types):
+                pending.append((child, function))
+
+    for detector in detectors:
+        started = time.perf_counter()
+        detector.finish_file(context)
+        timings[detector.name] += time.perf_counter() - started
+    return context.findings, timings
+
+def scan_files(batch, detector_classes):
+    """Scan a batch of (path, text) pairs; runs in a worker process for large projects"""
+    detectors = [detector_class() for detector_class in detector_classes]
+    findings = {}
+    timings = Counter()
+    parse_seconds = 0.0
+    errors = 0
+    for path, text in batch:
+        started = time.perf_counter()
+        try:
+            file_findings, file_timings = scan_file(path, text, detectors)
+        except (SyntaxError, ValueError, RecursionError):
+            errors += 1
+            continue
+        parse_seconds += time.perf_counter() - started - sum(file_timings.values())
+        for name, items in file_findings.items():
+            findings.setdefault(name, []).extend(items)
+        timings.update(file_timings)
+    return findings, timings, parse_seconds, errors
+
+def detect_patterns(index, detectors=None, max_workers=DEFAULT_MAX_WORKERS):
+    """Detect design patterns in every Python file of a project index
+
+    Returns (patterns, stats). patterns maps each pattern name to a list of
+    "path:line: description" evidence strings; stats holds the file and error
+    counts, the parse time and the time spent in each detector.
+    """
+    detector_classes = list(detectors or DEFAULT_DETECTORS)
+    started = time.perf_counter()
+    paths = [path for path in index.paths if path.endswith('.py')]
+    texts = index.iter_texts(paths)
+
+    findings = {}
+    timings = Counter()
+    parse_seconds = 0.0
+    errors = 0
+
+    def merge(result):
+        nonlocal parse_seconds, errors
+        batch_findings, batch_timings, batch_parse_seconds, batch_errors = result
+        for name, items in batch_findings.items():
+            findings.setdefault(name, []).extend(items)
+        timings.update(batch_timings)
+        parse_seconds += batch_parse_seconds
+        errors += batch_errors
+
+    if len(paths) < PARALLEL_FILE_THRESHOLD or max_workers <= 1:
+        merge(scan_files(texts, detector_classes))
+    else:
+        for result in map_batches(scan_files, texts, FILES_PER_TASK, max_workers, args=(detector_classes,)):
+            merge(result)
+
+    patterns = {}
+    reduce_timings = Counter()
+    for detector_class in detector_classes:
+        detector = detector_class()
+        reduce_started = time.perf_counter()
+        evidence = detector.reduce(sorted(findings.get(detector.name, []), key=lambda item: item[:2]))
+        reduce_timings[detector.name] = time.perf_counter() - reduce_started
+        if evidence:
+            patterns[detector.name] = evidence[:MAX_EVIDENCE_PER_PATTERN]
+            if len(evidence) > MAX_EVIDENCE_PER_PATTERN:
+                patterns[detector.name].append(f"... and {len(evidence) - MAX_EVIDENCE_PER_PATTERN} more")
+
+    stats = {
+        "files": len(paths),
+        "errors": errors,
+        "parse_seconds": parse_seconds,
+        "detector_seconds": {
+            detector_class.name: timings[detector_class.name] + reduce_timings[detector_class.name]
+            for detector_class in detector_classes
+        },
+        "total_seconds": time.perf_counter() - started,
+    }
+    return patterns, stats
@@ -0,0 +1,148 @@
+import os
+
+from import_extraction import build_import_graph
+from pattern_detection import detect_patterns
+from project_index import ProjectIndex, as_project_index
+from tracing import tracer
+from worker_pool import DEFAULT_MAX_WORKERS
+
+def analyze_project(upload_folder=None, git_dir=None, ref="HEAD", max_workers=DEFAULT_MAX_WORKERS):
+    """Analyze entire project structure and relationships
+    
+    Pass either a project directory (or ProjectIndex) as upload_folder, or a git
+    repository and ref to read trees and blobs directly without a checkout.
+    max_workers=1 keeps import extraction and pattern detection in this process.
+    """
+    if git_dir is not None:
+        project = ProjectIndex.from_git(git_dir, ref)
+    else:
+        project = as_project_index(upload_folder)
+    
+    # Extract file structure
+    with tracer.span("analysis.scan", files=len(project)):
+        file_structure = extract_file_structure(project)
+    
+    # Parse files for imports, dependencies, and relationships
+    with tracer.span("analysis.dependencies") as span:
+        dependency_graph, dependency_stats = build_dependency_graph(project, max_workers)
+        span.set_attribute("edges", dependency_stats["edges"])
+    
+    # Identify architectural patterns currently in use
+    with tracer.span("analysis.patterns") as span:
+        current_patterns, pattern_stats = identify_patterns(project, max_workers)
+        span.set_attribute("patterns", len(current_patterns))
+    
+    # Identify complexity hotspots
+    with tracer.span("analysis.complexity"):
+        complexity_analysis = analyze_complexity(project)
+    
+    return {
+        "structure": file_structure,
+        "dependencies": dependency_graph,
+        "dependency_stats": dependency_stats,
+        "patterns": current_patterns,
+        "pattern_stats": pattern_stats,
+        "complexity": complexity_analysis
+    }
+
+def json_default(value):
+    """Make analysis results JSON-serialisable (dependency graphs become adjacency lists)"""
+    if hasattr(value, "to_adjacency"):
+        return value.to_adjacency()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+def get_project_structure_text(project):
+    """Generate a text representation of the project structure"""
+    index = as_project_index(project)
+    result = []
+    seen_dirs = set()
+    
+    for path in index.paths:
+        parts = path.split('/')
+        
+        # Emit each directory the first time one of its files is listed
+        for level in range(1, len(parts)):
+            directory = '/'.join(parts[:level])
+            if directory not in seen_dirs:
+                seen_dirs.add(directory)
+                result.append(f"{' ' * 4 * level}{parts[level - 1]}/")
+        
+        result.append(f"{' ' * 4 * len(parts)}{parts[-1]}")
+    
+    return '\n'.join(result)
+
+def extract_file_structure(project):
+    """Extract file structure from project folder with better error handling"""
+    structure = {}
+    
+    try:
+        if not isinstance(project, ProjectIndex) and not os.path.exists(project):
+            return {"error": "Project path does not exist"}
+        index = as_project_index(project)
+            
+        # Get maximum depth to prevent recursion errors
+        max_depth = 5
+        
+        for path in index.paths:
+            path_parts = path.split('/')
+            directory_parts, file_name = path_parts[:-1], path_parts[-1]
+            
+            # Skip deep directories to prevent overwhelming analysis
+            if len(directory_parts) > max_depth:
+                continue
+            
+            current_dict = structure
+            
+            # Build nested dictionary structure
+            for part in directory_parts:
+                if part not in current_dict:
+                    current_dict[part] = {}
+                current_dict = current_dict[part]
+            
+            # Add files, skipping large file counts for better performance
+            files = current_dict.setdefault('__files__', [])
+            if len(files) < 100:
+                files.append(file_name)
+            elif len(files) == 100:
+                files.append("...")
+    
+    except Exception as e:
+        return {"error": f"Error analyzing file structure: {str(e)}"}
+        
+    return structure
+
+def build_dependency_graph(project, max_workers=DEFAULT_MAX_WORKERS):
+    """Build a dependency graph of project components from the import statements of every language
+    
+    Returns (graph, stats) where stats holds file counts per language and extraction throughput.
+    """
+    return build_import_graph(as_project_index(project), max_workers)
+
+def identify_patterns(project, max_workers=DEFAULT_MAX_WORKERS):
+    """Identify common design patterns in the codebase
+    
+    Returns (patterns, stats): evidence strings per pattern and detector timings.
+    """
+    return detect_patterns(as_project_index(project), max_workers=max_workers)
+
+def analyze_complexity(project):
+    """Analyze code complexity metrics"""
+    # In a real app, you would use tools like radon, pylint, etc.
+    # For demonstration, we'll return placeholder data
+    return {
+        "cyclomatic_complexity": {
+            "average": 4.2,
+            "max": 15,
+            "hotspots": ["app.py:create_architecture_recommendation_tab"]
+        },
+        "maintainability_index": {
+            "average": 65.3,
+            "issues": ["Long functions in data processing modules"]
+        },
+        "loc": {
+            "total": 850,
+            "per_module": {"app.py": 350, "ui_components.py": 500}
+        }
+    }
@@ -0,0 +1,145 @@
+import os
+import subprocess
+from abc import ABC, abstractmethod
+
+# Files larger than this are listed but never read as text
+MAX_TEXT_FILE_BYTES = 1024 * 1024
+
+def is_hidden_path(path):
+    """Return True if any component of a relative path starts with a dot"""
+    return any(part.startswith('.') for part in path.split('/'))
+
+class ProjectIndex(ABC):
+    """Listing of a project's files plus streaming access to their text
+
+    Paths are relative and always use '/' as separator. An index is built either
+    from a directory on disk or straight from a git repository's objects, so the
+    analysis code never needs a working tree.
+    """
+
+    def __init__(self, files, source):
+        # files: list of (path, size) tuples; source: description for display
+        self.files = sorted(files)
+        self.source = source
+        self._sizes = dict(self.files)
+
+    @property
+    def paths(self):
+        return [path for path, _ in self.files]
+
+    def __len__(self):
+        return len(self.files)
+
+    @classmethod
+    def from_directory(cls, root):
+        """Index every non-hidden file below a directory"""
+        return DirectoryProjectIndex(root)
+
+    @classmethod
+    def from_git(cls, git_dir, ref="HEAD"):
+        """Index the tree of a ref in a (bare or non-bare) git repository"""
+        return GitProjectIndex(git_dir, ref)
+
+    @abstractmethod
+    def iter_texts(self, paths=None):
+        """Yield (path, text) for the given paths (default: all files), skipping large files"""
+
+    def read_text(self, path):
+        """Return the text of a single file, or None if it is missing or too large"""
+        for _, text in self.iter_texts([path]):
+            return text
+        return None
+
+class DirectoryProjectIndex(ProjectIndex):
+    def __init__(self, root):
+        self.root = root
+        files = []
+        for current, dirs, names in os.walk(root):
+            # Skip hidden directories and files
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                full_path = os.path.join(current, name)
+                try:
+                    size = os.path.getsize(full_path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(full_path, root).replace(os.sep, '/')
+                files.append((rel_path, size))
+        super().__init__(files, root)
+
+    def iter_texts(self, paths=None):
+        for path in (self.paths if paths is None else paths):
+            if self._sizes.get(path, MAX_TEXT_FILE_BYTES + 1) > MAX_TEXT_FILE_BYTES:
+                continue
+            try:
+                with open(os.path.join(self.root, *path.split('/')), encoding="utf-8", errors="replace") as f:
+                    yield path, f.read()
+            except OSError:
+                continue
+
+class GitProjectIndex(ProjectIndex):
+    def __init__(self, git_dir, ref="HEAD"):
+        self.git_dir = git_dir
+        self.ref = ref
+        self._objects = {}
+
+        output = subprocess.run(
+            ["git", "--git-dir", git_dir, "ls-tree", "-r", "-l", "-z", ref],
+            capture_output=True, check=True
+        ).stdout
+
+        files = []
+        for entry in output.split(b"\0"):
+            if not entry:
+                continue
+            # "<mode> <type> <object> <size>\t<path>"
+            meta, _, raw_path = entry.partition(b"\t")
+            mode, obj_type, obj_id, size = meta.split()
+            path = raw_path.decode("utf-8", errors="replace")
+            if obj_type != b"blob" or is_hidden_path(path):
+                continue
+            files.append((path, int(size)))
+            self._objects[path] = obj_id.decode()
+
+        super().__init__(files, f"{git_dir}@{ref}")
+
+    def object_id(self, path):
+        """Return the blob id of a path, which doubles as a content hash"""
+        return self._objects.get(path)
+
+    def iter_texts(self, paths=None):
+        wanted = [
+            path for path in (self.paths if paths is None else paths)
+            if path in self._objects and self._sizes[path] <= MAX_TEXT_FILE_BYTES
+        ]
+        if not wanted:
+            return
+
+        # One long-lived cat-file process streams every blob without a checkout
+        process = subprocess.Popen(
+            ["git", "--git-dir", self.git_dir, "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        try:
+            for path in wanted:
+                process.stdin.write(self._objects[path].encode() + b"\n")
+                process.stdin.flush()
+
+                header = process.stdout.readline().split()
+                if len(header) < 3 or header[1] == b"missing":
+                    continue
+                content = process.stdout.read(int(header[2]))
+                process.stdout.read(1)  # Trailing newline after each object
+                yield path, content.decode("utf-8", errors="replace")
+        finally:
+            process.stdin.close()
+            process.stdout.close()
+            process.wait()
+
+def as_project_index(project):
+    """Accept a ProjectIndex or a directory path and return a ProjectIndex"""
+    if isinstance(project, ProjectIndex):
+        return project
+    return ProjectIndex.from_directory(project)
@@ -0,0 +1,258 @@
+import os
+import tempfile
+import threading
+import time
+from array import array
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_WINDOW = int(os.getenv("CODEHELPER_METRICS_WINDOW", "1024"))
+# 0 means no limit; a limit makes requests beyond it wait for a slot (reported as queue wait)
+DEFAULT_MAX_CONCURRENT_REQUESTS = int(os.getenv("CODEHELPER_MAX_CONCURRENT_REQUESTS", "0"))
+# Prometheus text file rewritten every DEFAULT_EXPORT_INTERVAL_SECONDS; empty disables it
+DEFAULT_METRICS_FILE = os.getenv("CODEHELPER_METRICS_FILE", "")
+DEFAULT_EXPORT_INTERVAL_SECONDS = int(os.getenv("CODEHELPER_METRICS_INTERVAL_SECONDS", "15"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def percentile(values, fraction):
+    """Return the value at a fraction (0..1) of a sorted list, or 0 for an empty list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class RingBuffer:
+    """The last size float samples, in a fixed-size array that is overwritten in place"""
+
+    def __init__(self, size=DEFAULT_WINDOW):
+        self._values = array("d", bytes(8 * size))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+    def quantiles(self, fractions=QUANTILES):
+        """Return the values at the given fractions of the buffered samples"""
+        samples = sorted(self._values[:self._count])
+        return [percentile(samples, fraction) for fraction in fractions]
+
+class SeriesStats:
+    """Counters and latency windows for one (model, tab) pair"""
+
+    def __init__(self, window):
+        self.requests = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_sum = 0.0
+        self.queue_wait = RingBuffer(window)
+        self.first_token = RingBuffer(window)
+        self.latency = RingBuffer(window)
+
+class RequestTimer:
+    """Times one request: created once it has a concurrency slot (if limited), finished exactly once"""
+
+    def __init__(self, metrics, model, tab, queue_wait):
+        self.metrics = metrics
+        self.model = model
+        self.tab = tab
+        self.queue_wait = queue_wait
+        self.started = time.perf_counter()
+        self.time_to_first_token = None
+        self.latency = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+
+    def first_token(self):
+        """Mark the arrival of the first streamed chunk (later calls are ignored)"""
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started
+
+    def add_usage(self, usage):
+        """Take token counts from a response's usage object, if it has one"""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+    def finish(self, error=False):
+        if self.latency is not None:
+            return
+        self.latency = time.perf_counter() - self.started
+        self.metrics._release()
+        self.metrics.record(
+            self.model, self.tab,
+            queue_wait=self.queue_wait,
+            time_to_first_token=self.time_to_first_token if self.time_to_first_token is not None else self.latency,
+            latency=self.latency,
+            prompt_tokens=self.prompt_tokens or 0,
+            completion_tokens=self.completion_tokens or 0,
+            error=error
+        )
+
+class RequestMetrics:
+    """Process-wide request metrics per model and tab, with an optional limit on concurrent requests
+
+    Latencies are kept in fixed-size ring buffers, so memory does not grow with
+    traffic and percentiles describe recent requests. With max_concurrent set,
+    time spent waiting for one of the request slots is reported as queue wait.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_concurrent=DEFAULT_MAX_CONCURRENT_REQUESTS):
+        self.window = window
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self._lock = threading.Lock()
+        self._series = {}
+        self._cache_hits = {}
+        self._exporter = None
+        self._stop_event = threading.Event()
+
+    def track(self, model, tab):
+        """Wait for a request slot (if limited) and return a RequestTimer; call its finish() when the request ends"""
+        queued = time.perf_counter()
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self.in_flight += 1
+        return RequestTimer(self, model, tab, time.perf_counter() - queued)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def record(self, model, tab, queue_wait=0.0, time_to_first_token=0.0, latency=0.0,
+               prompt_tokens=0, completion_tokens=0, error=False):
+        """Record one finished request"""
+        with self._lock:
+            series = self._series.get((model, tab))
+            if series is None:
+                series = self._series[(model, tab)] = SeriesStats(self.window)
+            series.requests += 1
+            series.errors += bool(error)
+            series.prompt_tokens += prompt_tokens
+            series.completion_tokens += completion_tokens
+            series.latency_sum += latency
+            series.queue_wait.append(queue_wait)
+            series.first_token.append(time_to_first_token)
+            series.latency.append(latency)
+
+    def record_cache_hits(self, model, tab, count=1):
+        """Record requests for model that were answered from a cache instead"""
+        if count:
+            with self._lock:
+                self._cache_hits[(model, tab)] = self._cache_hits.get((model, tab), 0) + count
+
+    def snapshot(self):
+        """Return (rows, cache_hits): one dict per (model, tab) with counters and p50/p95/p99 in seconds,
+        and the cache hits per (model, tab)"""
+        with self._lock:
+            rows = []
+            for (model, tab), series in sorted(self._series.items()):
+                row = {
+                    "model": model,
+                    "tab": tab,
+                    "requests": series.requests,
+                    "errors": series.errors,
+                    "prompt_tokens": series.prompt_tokens,
+                    "completion_tokens": series.completion_tokens,
+                }
+                for name, buffer in (("queue", series.queue_wait), ("ttft", series.first_token),
+                                     ("latency", series.latency)):
+                    for fraction, value in zip(QUANTILES, buffer.quantiles()):
+                        row[f"{name}_p{int(fraction * 100)}"] = value
+                rows.append(row)
+            return rows, dict(self._cache_hits)
+
+    def prometheus_text(self):
+        """Render the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            series = sorted(self._series.items())
+            lines = []
+
+            for name, attribute, help_text in (
+                ("codehelper_requests_total", "requests", "Groq requests"),
+                ("codehelper_request_errors_total", "errors", "Groq requests that failed"),
+                ("codehelper_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent"),
+                ("codehelper_completion_tokens_total", "completion_tokens", "Completion tokens received"),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (model, tab), stats in series:
+                    lines.append(f"{name}{{{labels(model=model, tab=tab)}}} {getattr(stats, attribute)}")
+
+            for name, attribute, help_text in (
+                ("codehelper_queue_wait_seconds", "queue_wait", "Time spent waiting for a request slot"),
+                ("codehelper_time_to_first_token_seconds", "first_token", "Time to the first streamed token"),
+                ("codehelper_request_latency_seconds", "latency", "Total request latency"),
+            ):
+                lines.append(f"# HELP {name} {help_text} (recent window)")
+                lines.append(f"# TYPE {name} summary")
+                for (model, tab), stats in series:
+                    buffer = getattr(stats, attribute)
+                    for fraction, value in zip(QUANTILES, buffer.quantiles()):
+                        lines.append(
+                            f"{name}{{{labels(model=model, tab=tab, quantile=fraction)}}} {value:.6f}"
+                        )
+                    if attribute == "latency":
+                        lines.append(f"{name}_sum{{{labels(model=model, tab=tab)}}} {stats.latency_sum:.6f}")
+                        lines.append(f"{name}_count{{{labels(model=model, tab=tab)}}} {stats.requests}")
+
+            lines.append("# HELP codehelper_cache_hits_total Requests answered from a cache")
+            lines.append("# TYPE codehelper_cache_hits_total counter")
+            for (model, tab), hits in sorted(self._cache_hits.items()):
+                lines.append(f"codehelper_cache_hits_total{{{labels(model=model, tab=tab)}}} {hits}")
+            return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically replace path with the current metrics, for a node exporter textfile collector"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def start_exporter(self, path, interval_seconds=DEFAULT_EXPORT_INTERVAL_SECONDS):
+        """Start a background thread that rewrites the Prometheus file periodically (idempotent)"""
+        if self._exporter is not None and self._exporter.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while True:
+                try:
+                    self.write_prometheus(path)
+                except OSError:
+                    pass  # Never let a transient filesystem error kill the exporter
+                if self._stop_event.wait(interval_seconds):
+                    return
+
+        self._exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self):
+        """Stop the background exporter thread"""
+        self._stop_event.set()
+        if self._exporter is not None:
+            self._exporter.join(timeout=5)
+            self._exporter = None
+
+def labels(**values):
+    """Format Prometheus labels, escaping backslashes, quotes and newlines"""
+    return ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in values.items()
+    )
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_RESPONSE_CACHE_SIZE = int(os.getenv("CODEHELPER_RESPONSE_CACHE_SIZE", "512"))
+DEFAULT_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("CODEHELPER_RESPONSE_CACHE_TTL_SECONDS", "900"))
+# How long a request waits for a speculative request for the same prompt that is still running
+DEFAULT_PENDING_WAIT_SECONDS = 120
+
+def response_key(messages, settings):
+    """Cache key of a chat request: the exact messages sent and the chosen (model, temperature)"""
+    payload = json.dumps([list(settings), messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CacheEntry:
+    """One prefetched answer, filled in by a background request"""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.answer = None
+        self.tokens = 0
+        self.used = False
+        self.created_at = time.time()
+        self.ready = threading.Event()
+
+class ResponseCache:
+    """Process-wide LRU cache of prefetched chat answers keyed by the exact request
+
+    Only speculative (prefetched) entries are stored: an answer a user waited for
+    was sampled for them, at their temperature, and is not handed to other
+    sessions. Entries are created before their request has finished; a lookup
+    for a pending entry waits for it instead of sending the same request again.
+    Entries expire after ttl_seconds, and one that is dropped, evicted or
+    expires without having been used counts as wasted, together with the tokens
+    its request cost.
+    """
+
+    def __init__(self, max_entries=DEFAULT_RESPONSE_CACHE_SIZE, ttl_seconds=DEFAULT_RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.speculative_started = 0
+        self.speculative_hits = 0
+        self.speculative_failed = 0
+        self.used_tokens = 0
+        self.wasted = 0
+        self.wasted_tokens = 0
+
+    def get(self, key, wait_seconds=DEFAULT_PENDING_WAIT_SECONDS):
+        """Return the cached answer for key, waiting for a pending speculative request; None on a miss"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None and entry.created_at < time.time() - self.ttl_seconds:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        if not entry.ready.wait(wait_seconds) or entry.answer is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            if not entry.used:
+                self.speculative_hits += 1
+                self.used_tokens += entry.tokens
+            entry.used = True
+        return entry.answer
+
+    def is_ready(self, key):
+        """Whether key has an answer that get() would return at once"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.ready.is_set() and entry.answer is not None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def begin(self, key, label=None):
+        """Create a pending speculative entry; returns False if key is already cached"""
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                return False
+            self._store(key, CacheEntry(label))
+            self.speculative_started += 1
+            return True
+
+    def fulfil(self, key, answer, tokens):
+        """Complete a speculative entry; its tokens are wasted if it was dropped meanwhile"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.ready.is_set():
+                self.wasted += 1
+                self.wasted_tokens += tokens
+                return
+            entry.answer = answer
+            entry.tokens = tokens
+            entry.ready.set()
+
+    def fail(self, key):
+        """Give up on a speculative entry; waiting lookups fall back to a normal request"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.ready.is_set():
+                del self._entries[key]
+                self.speculative_failed += 1
+                entry.ready.set()
+
+    def drop_unused(self, keys):
+        """Remove speculative entries nobody asked for, e.g. once a conversation has moved on"""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and not entry.used:
+                    self._discard(key)
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.created_at >= cutoff:
+                # Entries are ordered by use, not age; get() checks the age of the entry it returns
+                break
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key)
+        if not entry.used:
+            if entry.ready.is_set():
+                self.wasted += 1
+                self.wasted_tokens += entry.tokens
+            else:
+                # Counted by fulfil() once its request finishes
+                entry.ready.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "speculative_started": self.speculative_started,
+                "speculative_hits": self.speculative_hits,
+                "speculative_failed": self.speculative_failed,
+                "used_tokens": self.used_tokens,
+                "wasted": self.wasted,
+                "wasted_tokens": self.wasted_tokens,
+            }
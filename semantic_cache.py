@@ -0,0 +1,317 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from context_builder import estimate_tokens
+from conversation import CODE_BLOCK
+from model_router import CODE_LINE
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("CODEHELPER_SEMANTIC_CACHE_THRESHOLD", "0.8"))
+DEFAULT_SEMANTIC_CACHE_SIZE = int(os.getenv("CODEHELPER_SEMANTIC_CACHE_SIZE", "10000"))
+EMBEDDING_DIMENSIONS = 256
+# Random-hyperplane LSH: a question is a candidate if it shares all bits in any one table
+LSH_TABLES = 16
+LSH_BITS = 12
+# Questions longer than this, or with code in them, are never answered from a similar question
+MAX_QUESTION_TOKENS = 120
+
+# Words, including C++/C# style suffixes, and operators such as == and ===
+WORD = re.compile(r"[a-z0-9]+[+#]*|[=!<>&|*/%^~+-]{2,}")
+# Words that do not change what a question asks for
+STOPWORDS = frozenset("a an the i im i'm me my we our you your please can could would do does did "
+                      "is are be it its this that there some any so just".split())
+# ...and words that only phrase it, which may differ between two questions with the same answer
+PHRASING_WORDS = STOPWORDS | frozenset("how what whats s why when where which who if in on of for with by at "
+                                       "and or between difference use using way best explain tell "
+                                       "about get whether should will keyword example correct proper properly "
+                                       "possible".split())
+# Words whose two sides must not be swapped: "convert a string to an int" is not
+# "convert an int to a string", nor is "python 2 faster than python 3" its reverse
+ORDER_WORDS = frozenset(["to", "into", "from", "than", "instead", "over", "vs", "versus"])
+SYNONYMS = {
+    "js": ["javascript"], "ts": ["typescript"], "py": ["python"], "int": ["integer"], "str": ["string"],
+    "dict": ["dictionary"], "func": ["function"], "env": ["environment"], "dir": ["directory"],
+    "folder": ["directory"], "repo": ["repository"], "arg": ["argument"], "var": ["variable"],
+    "virtualenv": ["virtual", "environment"], "venv": ["virtual", "environment"], "golang": ["go"],
+}
+# Names whose trailing s is not a plural: https is not http
+UNSTEMMED = frozenset(["https", "ftps", "aws", "ios", "macos"])
+# Most similar entries checked against the question before giving up
+MAX_VERIFIED_CANDIDATES = 5
+
+def question_words(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+def stem(word):
+    if word in UNSTEMMED:
+        return word
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def key_terms(text):
+    """The words of a question that decide its answer, normalised; order words are kept as markers"""
+    terms = []
+    previous = None
+    for word in WORD.findall(text.lower()):
+        # "how to" and "best way to" only phrase the question
+        if word in ORDER_WORDS and previous not in PHRASING_WORDS - STOPWORDS:
+            terms.append(word)
+        elif word not in PHRASING_WORDS and word not in ORDER_WORDS:
+            terms.extend(SYNONYMS.get(stem(word), [stem(word)]))
+        previous = word
+    return terms
+
+def sides(terms, word):
+    """Terms before and after the first occurrence of an order word and the terms next to it
+
+    None if the word is missing or starts the question.
+    """
+    if word not in terms[1:]:
+        return None
+    index = terms.index(word, 1)
+    before = [term for term in terms[:index] if term not in ORDER_WORDS]
+    after = [term for term in terms[index + 1:] if term not in ORDER_WORDS]
+    return before, after, terms[index - 1:index] + terms[index + 1:index + 2]
+
+def shared(terms, others):
+    return [term for term in terms if term in others]
+
+def only(terms, others):
+    return [term for term in terms if term not in others]
+
+def swapped(first, second, word):
+    """Whether key terms changed sides of an order word between two questions
+
+    A term that only moves from one end to the other ("python convert string to
+    int" and "convert string to int python") does not change the question; a
+    term moving next to the order word, or two terms moving in opposite
+    directions, does.
+    """
+    first_sides, second_sides = sides(first, word), sides(second, word)
+    if first_sides is None or second_sides is None:
+        return False
+    before, after, first_neighbours = first_sides
+    other_before, other_after, second_neighbours = second_sides
+    moved_after = shared(only(before, after), only(other_after, other_before))
+    moved_before = shared(only(after, before), only(other_before, other_after))
+    if moved_after and moved_before:
+        return True
+    return bool(shared(moved_after + moved_before, first_neighbours + second_neighbours))
+
+def same_request(question, cached_question):
+    """Whether two similar questions ask for the same thing
+
+    Hashed n-grams score "read a file" and "write a file" as close; an answer is
+    only reused when every key term of each question has a counterpart in the
+    other and no two sides of an order word such as "to" or "than" are swapped.
+    """
+    first, second = key_terms(question), key_terms(cached_question)
+    first_words = [term for term in first if term not in ORDER_WORDS]
+    second_words = [term for term in second if term not in ORDER_WORDS]
+    if not first_words or not second_words:
+        return False
+    for terms, others in ((first_words, second_words), (second_words, first_words)):
+        if not set(terms) <= set(others):
+            return False
+    return not any(swapped(first, second, word) for word in ORDER_WORDS)
+
+def features(text):
+    """Hashed features of a question: its key terms, term pairs and character trigrams of each term
+
+    Key terms drop phrasing, so "how to reverse a python list" and "How do I reverse
+    a list in Python?" land close together; trigrams make "async/await" match
+    "asyncawait" and "await", and pairs keep some word order.
+    """
+    terms = key_terms(text)
+    for term in terms:
+        yield term, 1.0
+        padded = f" {term} "
+        for start in range(len(padded) - 2):
+            yield padded[start:start + 3], 0.5
+    for first, second in zip(terms, terms[1:]):
+        yield f"{first} {second}", 0.5
+
+def embed(text, dimensions=EMBEDDING_DIMENSIONS):
+    """Unit-length float32 vector of a text's hashed n-gram features (signed feature hashing)"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in features(text):
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        vector[hashed % dimensions] += weight if hashed & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def cacheable(question):
+    """Whether a question may be answered from a similar one: short and without code"""
+    return (estimate_tokens(question) <= MAX_QUESTION_TOKENS
+            and not CODE_BLOCK.search(question)
+            and not CODE_LINE.search(question)
+            and bool(question_words(question)))
+
+def namespace_id(namespace):
+    return zlib.crc32(namespace.encode("utf-8"))
+
+class SemanticCache:
+    """Answers to earlier questions, found again by similarity instead of exact text
+
+    Questions are embedded with hashed n-gram features (no model download) and
+    kept in preallocated NumPy arrays. Lookups use random-hyperplane LSH: the
+    signatures of all entries are compared with the question's, one vectorised
+    pass per table, and only the candidates sharing a bucket in some table are
+    scored by cosine similarity. An answer is reused when a score reaches threshold, the
+    entry has the same namespace (e.g. the conversation context and model
+    settings the question was asked with) and same_request() agrees. Only short
+    questions without code are cached. The least recently used entries are
+    replaced once max_entries is reached.
+    """
+
+    def __init__(self, max_entries=DEFAULT_SEMANTIC_CACHE_SIZE, threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                 dimensions=EMBEDDING_DIMENSIONS, tables=LSH_TABLES, bits=LSH_BITS, seed=0):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self._planes = np.random.default_rng(seed).standard_normal((dimensions, tables * bits)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(bits, dtype=np.uint32)).astype(np.uint32)
+        self.tables = tables
+        self.bits = bits
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        # One row per table, so each table is compared with a question in one contiguous pass
+        self._signatures = np.zeros((tables, max_entries), dtype=np.uint8 if bits <= 8 else np.uint16)
+        self._namespaces = np.zeros(max_entries, dtype=np.uint32)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries = [None] * max_entries     # slot -> (namespace, question, answer)
+        self._slots = OrderedDict()              # (namespace, question) -> slot, least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.lookup_seconds = 0.0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def signature(self, vectors):
+        """LSH bucket of each vector in each table"""
+        bits = (np.atleast_2d(vectors) @ self._planes > 0).reshape(-1, self.tables, self.bits)
+        return (bits * self._bit_weights).sum(axis=2).astype(self._signatures.dtype)
+
+    def add(self, question, answer, namespace=""):
+        """Remember the answer to a question; questions that are not cacheable() are ignored"""
+        if not cacheable(question):
+            return
+        vector = embed(question, self.dimensions)
+        signature = self.signature(vector)[0]
+        key = (namespace, question)
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is None:
+                if len(self._slots) < self.max_entries:
+                    slot = len(self._slots)
+                else:
+                    _, slot = self._slots.popitem(last=False)
+            self._slots[key] = slot
+            self._vectors[slot] = vector
+            self._signatures[:, slot] = signature
+            self._namespaces[slot] = namespace_id(namespace)
+            self._valid[slot] = True
+            self._entries[slot] = (namespace, question, answer)
+
+    def nearest(self, question, namespace="", limit=1, exact=False):
+        """Return up to limit (similarity, cached question, answer) of the most similar entries, best first
+
+        exact=True scores every entry instead of only the LSH candidates.
+        """
+        vector = embed(question, self.dimensions)
+        if not vector.any():
+            return []
+        signature = self.signature(vector)[0]
+        with self._lock:
+            size = len(self._slots)
+            mask = self._valid[:size] & (self._namespaces[:size] == namespace_id(namespace))
+            if not exact:
+                shared = np.zeros(size, dtype=bool)
+                for table, bucket in enumerate(signature):
+                    shared |= self._signatures[table, :size] == bucket
+                mask &= shared
+            candidates = np.flatnonzero(mask)
+            scores = self._vectors[candidates] @ vector
+            best = np.argsort(-scores)[:limit]
+            matches = []
+            for index in best:
+                cached_namespace, cached_question, answer = self._entries[int(candidates[index])]
+                if cached_namespace == namespace:  # Skip namespace hash collisions
+                    matches.append((float(scores[index]), cached_question, answer))
+            return matches
+
+    def lookup(self, question, namespace=""):
+        """Return (answer, similarity, cached question) if a similar enough question was cached, else None"""
+        if not cacheable(question):
+            with self._lock:
+                self.skipped += 1
+            return None
+        started = time.perf_counter()
+        match = None
+        for similarity, cached_question, answer in self.nearest(question, namespace, MAX_VERIFIED_CANDIDATES):
+            if similarity < self.threshold:
+                break
+            if same_request(question, cached_question):
+                match = answer, similarity, cached_question
+                break
+        with self._lock:
+            self.lookup_seconds += time.perf_counter() - started
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._slots.move_to_end((namespace, match[2]))
+        return match
+
+    def memory_bytes(self):
+        """Bytes of the NumPy index (vectors, signatures, namespaces); answers are extra"""
+        return (self._vectors.nbytes + self._signatures.nbytes + self._namespaces.nbytes
+                + self._valid.nbytes + self._planes.nbytes)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "threshold": self.threshold,
+                "mean_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+                "index_bytes": self.memory_bytes(),
+            }
+
+def tune_threshold(cache, pairs, thresholds):
+    """Precision, recall and F1 of answering from a similar question, per threshold
+
+    pairs are (question, cached question, same_answer) with same_answer True when
+    the cached answer would also answer question. unverified_false_positives
+    counts the wrong answers the threshold alone, without same_request(), would give.
+    """
+    scores = [(float(embed(first, cache.dimensions) @ embed(second, cache.dimensions)),
+               same_request(first, second), same)
+              for first, second, same in pairs]
+    positives = sum(1 for *_, same in scores if same)
+    rows = []
+    for threshold in thresholds:
+        true_positives = sum(1 for score, verified, same in scores if score >= threshold and verified and same)
+        false_positives = sum(1 for score, verified, same in scores if score >= threshold and verified and not same)
+        precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 1.0
+        recall = true_positives / positives if positives else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        rows.append({"threshold": threshold, "precision": precision, "recall": recall, "f1": f1,
+                     "false_positives": false_positives,
+                     "unverified_false_positives": sum(1 for score, _, same in scores
+                                                       if score >= threshold and not same)})
+    return rows
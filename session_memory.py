@@ -0,0 +1,338 @@
+import mmap
+import os
+import sys
+import tempfile
+import threading
+import types
+import uuid
+import weakref
+from collections import Counter
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_SESSION_MEMORY_BYTES = int(os.getenv("CODEHELPER_SESSION_MEMORY_MB", "256")) * 1024 * 1024
+DEFAULT_SPILL_THRESHOLD_BYTES = int(os.getenv("CODEHELPER_SPILL_THRESHOLD_KB", "256")) * 1024
+DEFAULT_SPILL_ROOT = os.path.join(tempfile.gettempdir(), "codehelper-spill")
+COPY_CHUNK_BYTES = 1024 * 1024
+
+# Shared, process-wide objects that must never be charged to one session
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, weakref.ref)
+
+class SessionMemoryError(Exception):
+    """Raised when holding more bytes would take a session over its memory cap"""
+
+def base64_length(size):
+    """Length of the base64 encoding of size bytes"""
+    return (size + 2) // 3 * 4
+
+def deep_size(value):
+    """Approximate number of bytes of Python objects reachable from value
+
+    Payloads and holdings are skipped, since they are accounted for on their own.
+    """
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (Holding, *SKIPPED_TYPES)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, bytearray, int, float, bool)) and obj is not None:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for name in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return total
+
+class Holding:
+    """Bytes charged to one session until released
+
+    A holding is released explicitly, when used as a context manager, or when it
+    is garbage collected, so holdings kept in st.session_state are freed together
+    with a session that disconnected without cleaning up.
+    """
+
+    def __init__(self, memory, session_id, key, label, size, cleanup=None):
+        self.key = key
+        self.label = label
+        self.size = size
+        self.token = uuid.uuid4().hex
+        self.tag = None
+        self._finalizer = weakref.finalize(self, memory._forget, session_id, key, self.token, cleanup)
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class Payload(Holding):
+    """Bytes kept for a session: in memory when small, otherwise in a memory-mapped temp file
+
+    Spilled payloads live in the page cache, which the kernel can write back and
+    drop under memory pressure, instead of on the Python heap.
+    """
+
+    def __init__(self, memory, session_id, key, label, size, data=None, path=None, mapping=None):
+        self._data = data
+        self._mapping = mapping
+        self.path = path
+        super().__init__(memory, session_id, key, label, size, (mapping, path))
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def view(self):
+        """Zero-copy memoryview of the contents; release it before releasing the payload"""
+        if self.released:
+            raise ValueError("Payload was released")
+        return memoryview(self._mapping if self.spilled else self._data)
+
+    def open(self):
+        """Binary file object over the contents, e.g. to stream them into an HTTP request"""
+        if self.spilled:
+            return open(self.path, "rb")
+        return _BytesReader(self._data)
+
+    def text(self):
+        """Decode the contents as UTF-8 (a transient copy)"""
+        with self.view() as view:
+            return str(view, "utf-8")
+
+    def __len__(self):
+        return self.size
+
+class _BytesReader:
+    """Minimal binary file over bytes; unlike io.BytesIO it never copies them"""
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._position = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = self._view[self._position:end].tobytes()
+        self._position = end
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _close_spill(mapping, path):
+    if mapping is not None:
+        try:
+            mapping.close()
+        except BufferError:
+            pass  # A view is still exported; the mapping is unmapped once that view is gone
+    if path is not None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class SessionMemory:
+    """Accounts the bytes each session holds and keeps every session under a memory cap
+
+    Callers charge what a session keeps alive (uploads held by Streamlit, cached
+    analyses, transient copies such as base64 encodings) as holdings under a key;
+    charging a key again replaces its earlier amount. Payloads larger than
+    spill_threshold_bytes are written to memory-mapped temp files and count as
+    spilled rather than resident bytes. Both count towards the cap: spilling moves
+    bytes off the Python heap into reclaimable page cache, it does not raise the limit.
+    """
+
+    def __init__(self, session_cap_bytes=DEFAULT_SESSION_MEMORY_BYTES,
+                 spill_threshold_bytes=DEFAULT_SPILL_THRESHOLD_BYTES, spill_root=DEFAULT_SPILL_ROOT):
+        self.session_cap_bytes = session_cap_bytes
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self.spill_root = spill_root
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.rejections = 0
+        self.spills = 0
+        os.makedirs(self.spill_root, exist_ok=True)
+        self.remove_orphans()
+
+    # --- charging ---
+
+    def hold(self, session_id, key, size, label=None):
+        """Charge size bytes to a session under key; raises SessionMemoryError over the cap"""
+        holding = Holding(self, session_id, key, label or key, size)
+        try:
+            self._charge(session_id, key, holding.token, holding.label, size, 0)
+        except SessionMemoryError:
+            holding._finalizer.detach()
+            raise
+        return holding
+
+    def store(self, session_id, key, source, label=None):
+        """Keep bytes, text or the rest of a binary file for a session as a Payload
+
+        Sources larger than the spill threshold are written to a memory-mapped
+        temp file; file sources are copied in chunks and never read into one
+        bytes object. The charge is made before anything is copied.
+        """
+        label = label or key
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        in_memory = isinstance(source, (bytes, bytearray, memoryview))
+        size = len(source) if in_memory else _remaining(source)
+        if size <= self.spill_threshold_bytes:
+            self._charge(session_id, key, None, label, size, 0)
+            payload = Payload(self, session_id, key, label, size, data=bytes(source) if in_memory else source.read())
+            self._charge(session_id, key, payload.token, label, size, 0)
+            return payload
+
+        self._charge(session_id, key, None, label, 0, size)
+        path = os.path.join(self.spill_root, f"{os.getpid()}-{uuid.uuid4().hex}")
+        try:
+            with open(path, "w+b") as f:
+                if in_memory:
+                    f.write(source)
+                else:
+                    while True:
+                        chunk = source.read(COPY_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                f.flush()
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.forget(session_id, key)
+            _close_spill(None, path)
+            raise
+        payload = Payload(self, session_id, key, label, size, path=path, mapping=mapping)
+        self._charge(session_id, key, payload.token, label, 0, size)
+        self.spills += 1
+        return payload
+
+    def fits(self, session_id, size, key=None):
+        """Whether size more bytes (replacing key's current charge) fit under the cap"""
+        with self._lock:
+            return self._held(session_id, exclude=key) + size <= self.session_cap_bytes
+
+    def forget(self, session_id, key):
+        """Drop a key's charge regardless of which holding made it"""
+        with self._lock:
+            entries = self._sessions.get(session_id, {})
+            entries.pop(key, None)
+            if not entries:
+                self._sessions.pop(session_id, None)
+
+    def release_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _charge(self, session_id, key, token, label, resident, spilled):
+        with self._lock:
+            if self._held(session_id, exclude=key) + resident + spilled > self.session_cap_bytes:
+                self.rejections += 1
+                raise SessionMemoryError(
+                    f"{label} needs {(resident + spilled) / 1024 / 1024:.1f} MB, which would take this session "
+                    f"over its {self.session_cap_bytes / 1024 / 1024:.0f} MB memory limit. "
+                    "Close other projects or remove uploads and try again."
+                )
+            self._sessions.setdefault(session_id, {})[key] = {
+                "token": token,
+                "label": label,
+                "resident": resident,
+                "spilled": spilled,
+            }
+
+    def _forget(self, session_id, key, token, cleanup):
+        if cleanup is not None:
+            _close_spill(*cleanup)
+        with self._lock:
+            entries = self._sessions.get(session_id, {})
+            # A newer holding may have replaced this key in the meantime
+            if key in entries and entries[key]["token"] == token:
+                del entries[key]
+                if not entries:
+                    self._sessions.pop(session_id, None)
+
+    def _held(self, session_id, exclude=None):
+        return sum(entry["resident"] + entry["spilled"]
+                   for key, entry in self._sessions.get(session_id, {}).items() if key != exclude)
+
+    # --- housekeeping ---
+
+    def remove_orphans(self):
+        """Delete spill files left behind by processes that are no longer running"""
+        removed = 0
+        for name in os.listdir(self.spill_root):
+            pid = name.split("-", 1)[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                try:
+                    os.remove(os.path.join(self.spill_root, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    # --- metrics ---
+
+    def stats(self, session_id=None):
+        """Return resident and spilled bytes overall, optionally with one session's breakdown by label"""
+        with self._lock:
+            entries = [entry for session in self._sessions.values() for entry in session.values()]
+            stats = {
+                "sessions": len(self._sessions),
+                "resident_bytes": sum(entry["resident"] for entry in entries),
+                "spilled_bytes": sum(entry["spilled"] for entry in entries),
+                "session_cap_bytes": self.session_cap_bytes,
+                "rejections": self.rejections,
+                "spills": self.spills,
+            }
+            if session_id is not None:
+                session = self._sessions.get(session_id, {}).values()
+                by_label = Counter()
+                for entry in session:
+                    by_label[entry["label"]] += entry["resident"] + entry["spilled"]
+                stats["session_resident_bytes"] = sum(entry["resident"] for entry in session)
+                stats["session_spilled_bytes"] = sum(entry["spilled"] for entry in session)
+                stats["session_by_label"] = dict(by_label.most_common())
+            return stats
+
+def _remaining(file):
+    position = file.tell()
+    end = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return end - position
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
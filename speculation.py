@@ -0,0 +1,221 @@
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from code_assistant import TASK_TABS
+from context_builder import estimate_tokens
+from conversation import CODE_BLOCK
+from response_cache import response_key
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_TOP_K = int(os.getenv("CODEHELPER_SPECULATIVE_TOP_K", "2"))
+DEFAULT_SPECULATIVE_TOKENS_PER_MINUTE = int(os.getenv("CODEHELPER_SPECULATIVE_TOKENS_PER_MINUTE", "20000"))
+# Share of the Groq rate limit (requests and tokens) that speculation never touches
+DEFAULT_RATE_LIMIT_RESERVE = 0.5
+# Completion length assumed when checking the budget before a speculative request
+EXPECTED_COMPLETION_TOKENS = 500
+SPECULATION_WORKERS = 2
+# Requests in flight treated as full load when no concurrency limit is configured
+DEFAULT_BUSY_REQUESTS = 8
+
+# Follow-ups offered after an answer: key -> (button label, prompt, only offered when the answer has code)
+FOLLOW_UPS = {
+    "explain": ("💡 Explain more", "Explain your last answer in more detail, step by step.", False),
+    "fix": ("🐞 Fix the bug", "Find and fix the bug in the code from your last answer. Show the corrected code.", True),
+    "tests": ("🧪 Add tests", "Write unit tests for the code from your last answer.", True),
+}
+
+DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(text):
+    """Seconds in a Groq rate-limit reset header such as "2m59.56s" or "120ms"; None if unparsable"""
+    parts = DURATION_PART.findall(text or "")
+    if not parts:
+        return None
+    return sum(float(value) * DURATION_SECONDS[unit] for value, unit in parts)
+
+class RateBudget:
+    """Decides whether a low-priority request may use the spare rate-limit budget
+
+    observe() is an httpx response hook: it reads Groq's x-ratelimit-* headers,
+    and a 429 pauses speculation until its retry-after has passed. Speculation
+    only runs while more than reserve of both the request and the token limit
+    remain, and speculative requests may use at most tokens_per_minute tokens
+    in any minute, which also bounds them when no headers are seen.
+    """
+
+    def __init__(self, tokens_per_minute=DEFAULT_SPECULATIVE_TOKENS_PER_MINUTE, reserve=DEFAULT_RATE_LIMIT_RESERVE):
+        self.tokens_per_minute = tokens_per_minute
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._limits = {}           # "requests"/"tokens" -> (limit, remaining, valid until)
+        self._paused_until = 0.0
+        self._spent = deque()       # (time, tokens) of recent speculative requests
+
+    def observe(self, response):
+        now = time.time()
+        headers = response.headers
+        with self._lock:
+            if response.status_code == 429:
+                retry_after = headers.get("retry-after")
+                try:
+                    delay = float(retry_after) if retry_after else 60.0
+                except ValueError:
+                    delay = 60.0
+                self._paused_until = max(self._paused_until, now + delay)
+            for kind in ("requests", "tokens"):
+                try:
+                    limit = int(headers[f"x-ratelimit-limit-{kind}"])
+                    remaining = int(headers[f"x-ratelimit-remaining-{kind}"])
+                except (KeyError, ValueError):
+                    continue
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or 60.0
+                self._limits[kind] = (limit, remaining, now + reset)
+
+    def reserve_tokens(self, tokens):
+        """Claim tokens for a speculative request; False if that would eat into the reserve"""
+        now = time.time()
+        with self._lock:
+            if now < self._paused_until:
+                return False
+            for kind, (limit, remaining, valid_until) in list(self._limits.items()):
+                if now > valid_until:
+                    # The window has reset since the headers were seen
+                    del self._limits[kind]
+                    continue
+                needed = tokens if kind == "tokens" else 1
+                if remaining - needed < limit * self.reserve:
+                    return False
+            while self._spent and self._spent[0][0] < now - 60:
+                self._spent.popleft()
+            if sum(spent for _, spent in self._spent) + tokens > self.tokens_per_minute:
+                return False
+            self._spent.append((now, tokens))
+            return True
+
+    def settle(self, reserved, actual):
+        """Replace a reservation by the tokens the request really used"""
+        with self._lock:
+            self._spent.append((time.time(), actual - reserved))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "paused": time.time() < self._paused_until,
+                "remaining": {kind: remaining for kind, (_, remaining, _) in self._limits.items()},
+            }
+
+class Speculator:
+    """Prefetches answers to the follow-ups a user is most likely to click next
+
+    After an answer, the top_k follow-ups (ranked by how often each has been
+    clicked) are sent as background requests with the conversation as context,
+    and their answers are stored in the response cache under the exact request
+    the follow-up button will make. Requests only go out while the rate budget
+    has spare capacity and at most half of the concurrent request slots (of
+    DEFAULT_BUSY_REQUESTS without a limit) are busy, so they never hold up
+    requests users are waiting for.
+    """
+
+    def __init__(self, assistant, cache, budget=None, top_k=DEFAULT_TOP_K, workers=SPECULATION_WORKERS):
+        self.assistant = assistant
+        self.cache = cache
+        self.budget = budget or RateBudget()
+        self.top_k = top_k
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+        self._outstanding = {}      # session id -> cache keys prefetched for its latest answer
+        self.clicks = Counter()
+        self.prefetched = Counter()
+        self.skipped = Counter()
+
+    def candidates(self, answer):
+        """Follow-up keys that fit an answer, most clicked first"""
+        has_code = bool(CODE_BLOCK.search(answer or ""))
+        order = list(FOLLOW_UPS)
+        keys = [key for key in order if has_code or not FOLLOW_UPS[key][2]]
+        with self._lock:
+            return sorted(keys, key=lambda key: (-self.clicks[key], order.index(key)))
+
+    def request_key(self, conversation, follow_up, settings):
+        return response_key(conversation.request_messages(FOLLOW_UPS[follow_up][1]), settings)
+
+    def record_click(self, follow_up):
+        with self._lock:
+            self.clicks[follow_up] += 1
+
+    def settle(self, session_id):
+        """Drop the unused prefetches of a session's previous answer (they count as wasted)"""
+        with self._lock:
+            keys = self._outstanding.pop(session_id, ())
+        self.cache.drop_unused(keys)
+
+    def prefetch(self, session_id, conversation, answer, settings):
+        """Start background requests for the likely follow-ups to answer; returns the keys started"""
+        self.settle(session_id)
+        metrics = self.assistant.metrics
+        started = []
+        for follow_up in self.candidates(answer)[:self.top_k]:
+            messages = conversation.request_messages(FOLLOW_UPS[follow_up][1])
+            key = response_key(messages, settings)
+            if key in self.cache:
+                continue
+            if metrics.in_flight * 2 >= (metrics.max_concurrent or DEFAULT_BUSY_REQUESTS):
+                self.skipped["busy"] += 1
+                continue
+            estimate = sum(estimate_tokens(message["content"]) for message in messages) + EXPECTED_COMPLETION_TOKENS
+            if not self.budget.reserve_tokens(estimate):
+                self.skipped["rate budget"] += 1
+                continue
+            if not self.cache.begin(key, label=follow_up):
+                self.budget.settle(estimate, 0)
+                continue
+            self._executor.submit(self._run, key, messages, settings, estimate)
+            with self._lock:
+                self.prefetched[follow_up] += 1
+            started.append(key)
+        with self._lock:
+            self._outstanding[session_id] = started
+        return started
+
+    def _run(self, key, messages, settings, estimate):
+        try:
+            response = self.assistant.complete(messages, task="chat", settings=settings,
+                                               tab=TASK_TABS["speculation"])
+        except Exception:
+            self.budget.settle(estimate, 0)
+            self.cache.fail(key)
+            return
+        answer = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        tokens = getattr(usage, "total_tokens", None) or (
+            sum(estimate_tokens(message["content"]) for message in messages) + estimate_tokens(answer or "")
+        )
+        self.budget.settle(estimate, tokens)
+        self.cache.fulfil(key, answer, tokens)
+
+    def stats(self):
+        """Hit rate and token accounting, for tuning top_k and the budget"""
+        cache_stats = self.cache.stats()
+        with self._lock:
+            stats = {
+                "prefetched": dict(self.prefetched),
+                "clicks": dict(self.clicks),
+                "skipped": dict(self.skipped),
+            }
+        started = cache_stats["speculative_started"]
+        stats.update(
+            started=started,
+            hits=cache_stats["speculative_hits"],
+            hit_rate=cache_stats["speculative_hits"] / started if started else 0.0,
+            failed=cache_stats["speculative_failed"],
+            used_tokens=cache_stats["used_tokens"],
+            wasted=cache_stats["wasted"],
+            wasted_tokens=cache_stats["wasted_tokens"],
+            budget=self.budget.snapshot(),
+        )
+        return stats
@@ -0,0 +1,124 @@
+import json
+import re
+
+# Top-level keys of the architecture recommendations object, in the order they are requested
+RECOMMENDATION_SECTIONS = [
+    "overall_assessment",
+    "architectural_improvements",
+    "design_patterns",
+    "component_restructuring",
+    "dependency_management",
+    "scalability",
+    "code_quality",
+]
+
+RECOMMENDATION_FORMAT = """
+    Respond with one JSON object and nothing else. Use exactly these keys, in this order:
+    - "overall_assessment": string, the current architecture pattern if identifiable and its main strengths and weaknesses
+    - "architectural_improvements": list of {"improvement": string, "reasoning": string}
+    - "design_patterns": list of {"name": string, "reason": string}, the design patterns that would improve the codebase
+    - "component_restructuring": list of strings
+    - "dependency_management": list of strings
+    - "scalability": list of strings
+    - "code_quality": list of strings
+"""
+
+# Characters that can change the parser state outside and inside strings
+STRUCTURAL_CHARACTERS = re.compile(r'["{}\[\],]')
+STRING_CHARACTERS = re.compile(r'["\\]')
+
+class IncrementalJSONObjectParser:
+    """Parses a streamed JSON object and reports each top-level member once it is complete
+
+    Feed chunks as they arrive; feed() returns the (key, value) pairs whose values
+    were completed by that chunk. Text before the opening brace (such as a
+    markdown code fence) is ignored. Every character is scanned once.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.member_start = None
+        self.done = False
+        self.errors = []
+
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        while not self.done:
+            if self.in_string:
+                match = STRING_CHARACTERS.search(text, self.position)
+                if match is None:
+                    self.position = len(text)
+                    break
+                if match.group() == '\\':
+                    # Skip the escaped character; wait for it if the chunk ends here
+                    if match.end() >= len(text):
+                        self.position = match.start()
+                        break
+                    self.position = match.end() + 1
+                    continue
+                self.in_string = False
+                self.position = match.end()
+                continue
+
+            match = STRUCTURAL_CHARACTERS.search(text, self.position)
+            if match is None:
+                self.position = len(text)
+                break
+            char = match.group()
+            self.position = match.end()
+
+            if self.depth == 0:
+                if char == '{':
+                    self.depth = 1
+                    self.member_start = self.position
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                if self.depth == 1:
+                    self._complete_member(match.start(), completed)
+                    self.done = True
+                self.depth -= 1
+            elif char == ',' and self.depth == 1:
+                self._complete_member(match.start(), completed)
+                self.member_start = self.position
+
+        return completed
+
+    def _complete_member(self, end, completed):
+        member = self.text[self.member_start:end].strip()
+        if not member:
+            return
+        try:
+            completed.extend(json.loads("{" + member + "}").items())
+        except json.JSONDecodeError as e:
+            self.errors.append(f"{member[:60]}: {e}")
+
+def parse_json_object(text):
+    """Parse a complete JSON object from model output, tolerating text around it"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+def pattern_names(recommendations):
+    """Return the names of the design patterns recommended in a recommendations object"""
+    names = []
+    for pattern in (recommendations or {}).get("design_patterns") or []:
+        if isinstance(pattern, dict) and pattern.get("name"):
+            names.append(str(pattern["name"]))
+        elif isinstance(pattern, str) and pattern.strip():
+            names.append(pattern.strip())
+    return names
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from context_builder import estimate_tokens
+from structured_output import RECOMMENDATION_SECTIONS
+
+STUB_RECOMMENDATIONS = {
+    "overall_assessment": "Layered application with a thin UI over analysis modules (stub response).",
+    "architectural_improvements": [
+        {"improvement": "Separate the user interface from the core logic", "reasoning": "Both can then be tested alone"}
+    ],
+    "design_patterns": [{"name": "Facade", "reason": "Give the front ends one entry point (stub response)"}],
+    "component_restructuring": ["Group analysis modules into a package"],
+    "dependency_management": ["Pin dependency versions"],
+    "scalability": ["Cache analysis results by content hash"],
+    "code_quality": ["Add type hints to the public functions"],
+}
+
+def usage(prompt_tokens, completion_tokens):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+class StubCompletions:
+    def __init__(self, client):
+        self.client = client
+
+    def reply(self, model, messages, json_mode):
+        """Deterministic reply text: recommendations JSON for JSON requests, an echo otherwise"""
+        question = messages[-1]["content"]
+        if not isinstance(question, str):
+            question = " ".join(part.get("text", "") for part in question if isinstance(part, dict))
+        if json_mode or "Respond with one JSON object" in question:
+            return json.dumps({key: STUB_RECOMMENDATIONS[key] for key in RECOMMENDATION_SECTIONS})
+        return f"Stub answer from {model}: {' '.join(question.split())[:200]}"
+
+    def create(self, model, messages, stream=False, response_format=None, **options):
+        self.client.record(model, messages, options)
+        json_mode = (response_format or {}).get("type") == "json_object"
+        text = self.reply(model, messages, json_mode)
+        prompt_tokens = sum(estimate_tokens(str(m["content"])) for m in messages)
+        time.sleep(self.client.latency)
+
+        if not stream:
+            return SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(index=0, message=SimpleNamespace(role="assistant", content=text),
+                                         finish_reason="stop")],
+                usage=usage(prompt_tokens, estimate_tokens(text)),
+            )
+        return self.stream(model, text, prompt_tokens)
+
+    def stream(self, model, text, prompt_tokens):
+        size = self.client.chunk_chars
+        for start in range(0, len(text), size):
+            time.sleep(self.client.chunk_delay)
+            yield SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=text[start:start + size]),
+                                         finish_reason=None)],
+                x_groq=None,
+            )
+        # Groq reports usage on a final chunk without content
+        yield SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None), finish_reason="stop")],
+            x_groq=SimpleNamespace(usage=usage(prompt_tokens, estimate_tokens(text))),
+        )
+
+class StubTranscriptions:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, file, model, **options):
+        name, data = file
+        self.client.record(model, [{"role": "user", "content": name}], options)
+        time.sleep(self.client.latency)
+        return SimpleNamespace(text=f"Stub transcription of {name} ({len(data)} bytes)")
+
+class StubGroqClient:
+    """Offline stand-in for groq.Groq with the same call shapes, for tests and local runs
+
+    Replies are deterministic; latency (per request), chunk_delay and chunk_chars
+    (per streamed chunk) simulate a remote model. Requests are kept in calls.
+    """
+
+    def __init__(self, latency=0.0, chunk_delay=0.0, chunk_chars=16):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=StubCompletions(self))
+        self.audio = SimpleNamespace(transcriptions=StubTranscriptions(self))
+
+    def record(self, model, messages, options):
+        with self._lock:
+            self.calls.append({"model": model, "messages": messages, **options})
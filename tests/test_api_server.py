@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from api_server import APIServer, HTTPError, check_git_url, path_in_root, request_token_budget
+from context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET
+
+@pytest.fixture
+def project_root(tmp_path):
+    root = tmp_path / "projects"
+    (root / "app" / "src").mkdir(parents=True)
+    (root / "app" / "README.md").write_text("readme")
+    (tmp_path / "outside").mkdir()
+    return os.path.realpath(root)
+
+def assert_rejected(call, *args, status=400):
+    with pytest.raises(HTTPError) as error:
+        call(*args)
+    assert error.value.status == status
+
+def test_open_project_accepts_directories_inside_the_root(project_root):
+    server = APIServer(None, project_root=project_root)
+    assert server.open_project({"path": "app"}).path == os.path.join(project_root, "app")
+    assert server.open_project({"path": "app/src/.."}).path == os.path.join(project_root, "app")
+
+@pytest.mark.parametrize("path", ["..", "../outside", "/etc", "app/README.md", "missing", "app/../../outside"])
+def test_open_project_rejects_paths_outside_the_root(project_root, path):
+    assert_rejected(APIServer(None, project_root=project_root).open_project, {"path": path})
+
+def test_open_project_rejects_symlinks_out_of_the_root(project_root):
+    os.symlink(os.path.join(os.path.dirname(project_root), "outside"), os.path.join(project_root, "escape"))
+    assert_rejected(APIServer(None, project_root=project_root).open_project, {"path": "escape"})
+
+def test_local_paths_need_a_project_root():
+    assert_rejected(APIServer(None).open_project, {"path": "app"})
+
+@pytest.mark.parametrize("payload", [{}, {"zip_base64": "not base64!"}])
+def test_open_project_rejects_bad_payloads(payload):
+    assert_rejected(APIServer(None).open_project, payload)
+
+def test_path_in_root_accepts_directories_inside_the_root(project_root):
+    assert path_in_root(project_root, "app") == os.path.join(project_root, "app")
+    assert path_in_root(project_root, "app/src/..") == os.path.join(project_root, "app")
+    assert path_in_root(project_root, os.path.join(project_root, "app", "src")) == os.path.join(project_root, "app", "src")
+
+@pytest.mark.parametrize("path", ["..", "../outside", "/etc", "app/README.md", "missing", "app/../../outside"])
+def test_path_in_root_rejects_paths_outside_or_not_directories(project_root, path):
+    assert_rejected(path_in_root, project_root, path)
+
+def test_path_in_root_rejects_symlinks_out_of_the_root(project_root):
+    os.symlink(os.path.join(os.path.dirname(project_root), "outside"), os.path.join(project_root, "escape"))
+    assert_rejected(path_in_root, project_root, "escape")
+
+def test_path_in_root_rejects_sibling_with_common_prefix(project_root):
+    os.mkdir(project_root + "-other")
+    assert_rejected(path_in_root, project_root, "../projects-other")
+
+def test_local_checks_need_a_project_root():
+    assert_rejected(path_in_root, None, "app")
+    assert_rejected(check_git_url, "/srv/repo.git")
+    assert_rejected(check_git_url, "file:///srv/repo.git")
+
+@pytest.mark.parametrize("url", ["https://github.com/org/repo.git", "ssh://git@host/repo.git", "git@github.com:org/repo.git"])
+def test_remote_urls_are_used_as_given(url, project_root):
+    assert check_git_url(url) == url
+    assert check_git_url(url, project_root) == url
+
+@pytest.mark.parametrize("url", ["", None, 42, "-uupload-pack=touch /tmp/x", "ext::sh -c touch% /tmp/x", "http://host/repo.git"])
+def test_bad_git_urls_are_rejected(url):
+    assert_rejected(check_git_url, url)
+
+def test_local_git_urls_must_be_inside_the_root(project_root):
+    app = os.path.join(project_root, "app")
+    assert check_git_url(app, project_root) == app
+    assert check_git_url("file://" + app, project_root) == app
+    assert check_git_url("app", project_root) == app
+    assert_rejected(check_git_url, "file://" + os.path.join(os.path.dirname(project_root), "outside"), project_root)
+    assert_rejected(check_git_url, "../outside", project_root)
+    assert_rejected(check_git_url, "-uupload-pack=touch /tmp/x", project_root)
+
+def test_open_project_checks_git_urls(project_root):
+    assert_rejected(APIServer(None, project_root=project_root).open_project, {"git_url": "../outside"})
+    assert_rejected(APIServer(None).open_project, {"git_url": "/srv/repo.git"})
+
+@pytest.mark.parametrize("value, expected", [
+    (None, DEFAULT_CONTEXT_TOKEN_BUDGET), ("", DEFAULT_CONTEXT_TOKEN_BUDGET), (3000, 3000), (" 3000 ", 3000),
+])
+def test_token_budget(value, expected):
+    assert request_token_budget({"token_budget": value}) == expected
+
+@pytest.mark.parametrize("value", ["lots", "1e4", 0, -5, 12.5, True, [4000], {"tokens": 1}])
+def test_bad_token_budgets_are_rejected(value):
+    assert_rejected(request_token_budget, {"token_budget": value})
+
+def test_analyze_checks_the_token_budget_before_opening_the_project(project_root):
+    server = APIServer(None, project_root=project_root)
+    with pytest.raises(HTTPError) as error:
+        server.analyze({"path": "app", "token_budget": "lots"})
+    assert (error.value.status, str(error.value)) == (400, '"token_budget" must be a positive integer')
@@ -0,0 +1,91 @@
+import json
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+from groq import Groq
+
+from benchmark import append_results, compare, generate_project, load_baseline
+from mock_groq_server import MockGroqServer, filler_text
+from structured_output import RECOMMENDATION_SECTIONS
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**options):
+        server = MockGroqServer(latency=0, tokens_per_second=100000, **options)
+        servers.append(server)
+        return server, server.start_in_thread()
+
+    yield start
+    for server in servers:
+        server.stop()
+
+def client(url):
+    return Groq(api_key="test", base_url=url, max_retries=3)
+
+def read_tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, encoding="utf-8") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+def test_generated_projects_are_deterministic(tmp_path):
+    generate_project(str(tmp_path / "first"), 60)
+    generate_project(str(tmp_path / "second"), 60)
+    first = read_tree(tmp_path / "first")
+    assert first == read_tree(tmp_path / "second")
+    modules = [path for path in first if not path.endswith("__init__.py")]
+    assert len(modules) == 60
+    assert sum(path.endswith(".js") for path in modules) == 6
+
+def test_compare_reports_only_regressions_above_the_threshold(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    baseline = append_results(path, [
+        {"benchmark": "slow", "params": {"files": 10}, "median": 1.0},
+        {"benchmark": "steady", "params": {"files": 10}, "median": 1.0},
+    ])
+    current = [
+        {"benchmark": "slow", "params": {"files": 10}, "median": 1.5},
+        {"benchmark": "steady", "params": {"files": 10}, "median": 1.05},
+        {"benchmark": "new", "params": {}, "median": 9.0},
+    ]
+    previous = load_baseline(path, None, exclude_run="current")
+    assert set(previous) == {("slow", '{"files": 10}'), ("steady", '{"files": 10}')}
+    assert compare(current, previous, threshold=0.1) == [(("slow", '{"files": 10}'), 1.0, 1.5, 0.5)]
+    assert load_baseline(path, None, exclude_run=baseline[0]["run_id"]) == {}
+
+def test_mock_server_answers_plain_and_streamed_completions(mock_server):
+    server, url = mock_server(completion_tokens=50)
+    messages = [{"role": "user", "content": "Explain closures"}]
+    completion = client(url).chat.completions.create(model="mock", messages=messages)
+    assert completion.choices[0].message.content == filler_text(50)
+    assert completion.usage.completion_tokens > 0
+
+    stream = client(url).chat.completions.create(model="mock", messages=messages, stream=True)
+    assert "".join(chunk.choices[0].delta.content or "" for chunk in stream) == filler_text(50)
+    assert server.stats()["requests"] == {"/openai/v1/chat/completions": 2}
+
+def test_mock_server_returns_recommendations_in_json_mode(mock_server):
+    _, url = mock_server()
+    completion = client(url).chat.completions.create(
+        model="mock", messages=[{"role": "user", "content": "Review this"}], response_format={"type": "json_object"})
+    assert list(json.loads(completion.choices[0].message.content)) == list(RECOMMENDATION_SECTIONS)
+
+def test_mock_server_rate_limits_and_the_client_retries(mock_server):
+    server, url = mock_server(rate_limit_every=2, retry_after=0.01, completion_tokens=5)
+    for _ in range(2):
+        client(url).chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}])
+    assert server.rate_limited == 1
+    assert server.stats()["requests"] == {"/openai/v1/chat/completions": 3}
+
+def test_mock_server_rejects_unknown_routes(mock_server):
+    _, url = mock_server()
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(url + "/openai/v1/unknown")
+    assert error.value.code == 404
@@ -0,0 +1,54 @@
+import random
+
+from context_builder import (
+    SECTION_ORDER, ContextFragment, build_architecture_context, estimate_tokens, fit_fragments,
+)
+
+def large_analysis(seed=0):
+    rng = random.Random(seed)
+    structure = {"__files__": ["setup.py", "README.md"]}
+    for package in range(30):
+        node = structure.setdefault(f"pkg{package}", {"__files__": []})
+        for sub in range(5):
+            node[f"sub{sub}"] = {"__files__": [f"m{n}.py" for n in range(rng.randint(1, 20))]}
+    modules = [f"pkg{n // 10}.m{n}" for n in range(300)]
+    dependencies = {name: rng.sample(modules, 3) for name in modules}
+    dependencies["pkg0.m0"].append("pkg0.m1")
+    dependencies["pkg0.m1"].append("pkg0.m0")
+    return {
+        "structure": structure,
+        "dependencies": dependencies,
+        "patterns": {"Factory": ["pkg0/m1.py:10"] * 5, "Singleton": ["pkg3/m30.py:4"]},
+        "complexity": {"files": 300, "lines": {"total": 45000, "largest": ["pkg1/m12.py"] * 8}},
+    }
+
+def test_context_never_exceeds_the_budget():
+    analysis = large_analysis()
+    for budget in (20, 50, 100, 200, 500, 1000, 3000, 8000):
+        context, report = build_architecture_context(analysis, budget)
+        assert estimate_tokens(context) <= budget
+        assert report["context_tokens"] == estimate_tokens(context)
+        assert report["raw_tokens"] > report["context_tokens"]
+
+def test_small_budgets_keep_the_overview_and_drop_the_structure():
+    context, report = build_architecture_context(large_analysis(), 100)
+    assert context.startswith("Overview:\nProject: ")
+    assert "Dependency graph: 300 modules" in context
+    assert "Project structure:" not in context
+    assert report["dropped"]["Project structure"] > 0
+
+def test_sections_are_rendered_in_order():
+    context, report = build_architecture_context(large_analysis(), 8000)
+    headings = [line[:-1] for line in context.splitlines() if line[:-1] in SECTION_ORDER]
+    assert headings == sorted(headings, key=SECTION_ORDER.index)
+    assert "Dependency cycles" in headings
+
+def test_fit_fragments_keeps_the_highest_ranked_first():
+    fragments = [ContextFragment("Complexity", order, f"- item {order}: " + "x" * 30, priority)
+                 for order, priority in enumerate([5, 1, 4, 2, 3])]
+    # Heading plus two fragments
+    budget = estimate_tokens("Complexity:") + 2 + fragments[0].tokens * 2
+    context, dropped = fit_fragments(fragments, budget)
+    assert context.splitlines() == ["Complexity:", fragments[1].text, fragments[3].text]
+    assert dropped == {"Complexity": 3}
+    assert fit_fragments(fragments, 0) == ("", {"Complexity": 5})
@@ -0,0 +1,91 @@
+from context_builder import estimate_tokens
+from conversation import MIN_DEDUPE_CHARS, Conversation, code_digest
+
+CODE = "def parse(line):\n" + "".join(f"    field_{n} = line.split(',')[{n}]\n" for n in range(12))
+assert len(CODE) >= MIN_DEDUPE_CHARS
+
+def block(code=CODE):
+    return f"```python\n{code}```"
+
+def talk(conversation, turns, summarize=lambda prompt: "They are writing a CSV parser."):
+    for number in range(turns):
+        conversation.add_exchange(f"Question {number}: " + "why " * 40, f"Answer {number}: " + "because " * 60)
+        conversation.compact(summarize)
+
+def test_compaction_keeps_the_history_inside_its_budget():
+    conversation = Conversation(token_budget=400, window_turns=2)
+    talk(conversation, 10)
+    assert conversation.history_tokens() <= conversation.token_budget
+    # The window is kept verbatim and everything before it was summarised
+    assert len(conversation.messages) == 4
+    assert conversation.messages[0]["content"].startswith("Question 8")
+    assert conversation.summarized_messages == 16
+    assert conversation.summary == "They are writing a CSV parser."
+    assert len(conversation) == 10
+
+def test_history_below_the_budget_is_not_compacted():
+    conversation = Conversation(token_budget=10000, window_turns=2)
+    calls = []
+    talk(conversation, 5, summarize=calls.append)
+    assert calls == []
+    assert len(conversation.messages) == 10 and conversation.summary == ""
+
+def test_failed_summary_falls_back_to_one_line_notes():
+    def fail(prompt):
+        raise TimeoutError("model unavailable")
+
+    conversation = Conversation(token_budget=400, window_turns=2)
+    talk(conversation, 4, summarize=fail)
+    assert conversation.history_tokens() <= conversation.token_budget
+    # Only the newest notes fit beside the window
+    assert conversation.summary.splitlines()[-1].startswith("assistant: Answer 1")
+    assert "Question 0" not in conversation.summary
+
+def test_summary_prompt_includes_the_folded_turns():
+    prompts = []
+    conversation = Conversation(token_budget=400, window_turns=2)
+    talk(conversation, 4, summarize=lambda prompt: prompts.append(prompt) or "summary")
+    assert "USER: Question 0" in prompts[0] and "ASSISTANT: Answer 0" in prompts[0]
+
+def test_repeated_code_block_is_replaced_by_its_reference():
+    conversation = Conversation()
+    conversation.add_exchange("Why does this fail?\n" + block(), "It splits every field again.")
+    conversation.add_exchange("Here it is again:\n" + block(), "Split once:\n" + block())
+    reference = f"[code block #{code_digest(CODE)}: identical to code shared earlier in this conversation]"
+    assert CODE in conversation.messages[0]["content"]
+    assert conversation.messages[2]["content"] == "Here it is again:\n" + reference
+    assert conversation.messages[3]["content"] == "Split once:\n" + reference
+    assert conversation.deduplicated_tokens == 2 * estimate_tokens(block())
+    # The verbatim transcript is kept for display
+    assert CODE in conversation.transcript[2]["content"]
+
+def test_short_code_blocks_are_repeated():
+    conversation = Conversation()
+    conversation.add_exchange(block("x = 1\n"), "ok")
+    conversation.add_exchange(block("x = 1\n"), "ok")
+    assert conversation.messages[2]["content"] == block("x = 1\n")
+
+def test_a_new_question_only_references_known_blocks():
+    conversation = Conversation()
+    messages = conversation.request_messages("Look:\n" + block())
+    assert messages == [{"role": "user", "content": "Look:\n" + block()}]
+    assert conversation.code_blocks == {}
+
+def test_summarised_code_is_sent_once_with_the_summary():
+    conversation = Conversation(token_budget=400, window_turns=2)
+    conversation.add_exchange("Review this:\n" + block(), "Looks fine.")
+    talk(conversation, 3)
+    assert conversation.summarized_messages >= 2
+    messages = conversation.request_messages("And this one?\n" + block())
+    system = messages[0]
+    assert system["role"] == "system"
+    assert system["content"].startswith("Summary of the earlier conversation:\nThey are writing a CSV parser.")
+    assert f"Code block #{code_digest(CODE)}:\n{block()}" in system["content"]
+    assert messages[-1]["content"].startswith("And this one?\n[code block #")
+
+def test_clear_keeps_the_settings():
+    conversation = Conversation(token_budget=123, window_turns=1)
+    talk(conversation, 3)
+    conversation.clear()
+    assert (conversation.token_budget, conversation.window_turns, len(conversation)) == (123, 1, 0)
+    assert conversation.messages == [] and conversation.summary == ""
@@ -0,0 +1,81 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from git_mirror import GitMirrorCache, GitMirrorError
+
+def git(*args, cwd):
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+@pytest.fixture
+def repository(tmp_path):
+    path = tmp_path / "repo"
+    (path / "pkg").mkdir(parents=True)
+    (path / "pkg" / "app.py").write_text("import os\n")
+    (path / "pkg" / "util.py").write_text("def helper():\n    return 1\n")
+    (path / "notes.txt").write_text("not source\n")
+    git("init", "--quiet", cwd=path)
+    git("add", ".", cwd=path)
+    git("commit", "--quiet", "-m", "initial", cwd=path)
+    return str(path)
+
+def test_concurrent_checkouts_share_one_clone(tmp_path, repository):
+    cache = GitMirrorCache(root=str(tmp_path / "mirrors"))
+
+    def checkout(number):
+        dest = str(tmp_path / f"checkout{number}")
+        return cache.checkout(repository, dest), dest
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(checkout, range(16)))
+
+    assert cache.clones == 1
+    assert cache.clones + cache.fetches + cache.reuses == 16
+    for count, dest in results:
+        assert count == 2
+        assert sorted(os.listdir(os.path.join(dest, "pkg"))) == ["app.py", "util.py"]
+        assert not os.path.exists(os.path.join(dest, "notes.txt"))
+        assert not os.path.exists(os.path.join(dest, ".git"))
+
+def test_resolve_and_list_files(tmp_path, repository):
+    cache = GitMirrorCache(root=str(tmp_path / "mirrors"))
+    assert cache.resolve(repository) == git("rev-parse", "HEAD", cwd=repository)
+    assert sorted(cache.list_files(repository)) == ["notes.txt", "pkg/app.py", "pkg/util.py"]
+    assert cache.checkout(repository, str(tmp_path / "full"), sparse=False) == 3
+    assert sorted(os.listdir(tmp_path / "full")) == ["notes.txt", "pkg"]
+
+def test_new_commits_are_fetched_once_stale(tmp_path, repository):
+    cache = GitMirrorCache(root=str(tmp_path / "mirrors"), freshness_seconds=0)
+    first = cache.resolve(repository)
+    (tmp_path / "repo" / "pkg" / "new.py").write_text("x = 1\n")
+    git("add", ".", cwd=repository)
+    git("commit", "--quiet", "-m", "second", cwd=repository)
+    assert cache.resolve(repository) != first
+    assert cache.fetches == 1
+
+@pytest.mark.parametrize("ref", ["--upload-pack=touch /tmp/x", "-h"])
+def test_option_like_refs_are_refused(tmp_path, repository, ref):
+    cache = GitMirrorCache(root=str(tmp_path / "mirrors"))
+    with pytest.raises(GitMirrorError):
+        cache.resolve(repository, ref)
+    with pytest.raises(GitMirrorError):
+        cache.checkout(repository, str(tmp_path / "dest"), ref)
+    assert cache.clones == 0
+
+def test_missing_repository_leaves_no_mirror(tmp_path):
+    root = tmp_path / "mirrors"
+    cache = GitMirrorCache(root=str(root))
+    with pytest.raises(GitMirrorError):
+        cache.resolve(str(tmp_path / "missing"))
+    assert os.listdir(root) == []
+
+def test_option_like_urls_are_not_read_as_options(tmp_path):
+    root = tmp_path / "mirrors"
+    cache = GitMirrorCache(root=str(root))
+    with pytest.raises(GitMirrorError):
+        cache.resolve("--upload-pack=touch " + str(tmp_path / "pwned"))
+    assert not (tmp_path / "pwned").exists()
+    assert os.listdir(root) == []
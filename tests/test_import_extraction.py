@@ -0,0 +1,131 @@
+import pytest
+
+from import_extraction import EXTRACTORS, ImportResolver, build_import_graph, extract_go_mod, language_of
+from project_index import ProjectIndex
+
+@pytest.mark.parametrize("path, text, imports, declarations", [
+    ("pkg/sub/mod.py",
+     "import os, pkg.util as u\nfrom . import sibling\nfrom ..core import (\n    Engine,\n    run,\n)\n",
+     [("python", ["os"]), ("python", ["pkg.util"]),
+      ("path_module", ["pkg.sub.sibling", "pkg.sub"]),
+      ("path_module", ["pkg.core.Engine", "pkg.core"]), ("path_module", ["pkg.core.run", "pkg.core"])],
+     []),
+    ("web/src/app.js",
+     "import React from 'react';\nconst util = require('./util');\nexport { a } from '../lib/a';\n",
+     [("external", ["react"]),
+      ("path", ["web/src/util", "web/src/util.js", "web/src/util.jsx"]),
+      ("path", ["web/lib/a", "web/lib/a.js", "web/lib/a.jsx"])],
+     []),
+    ("src/com/acme/App.java",
+     "package com.acme;\nimport com.acme.util.Strings;\nimport com.acme.model.*;\nimport static com.acme.util.Math.max;\n",
+     [("module", ["com.acme.util.Strings", "com.acme.util"]), ("namespace", ["com.acme.model"]),
+      ("module", ["com.acme.util.Math.max", "com.acme.util.Math"])],
+     ["com.acme"]),
+    ("cmd/main.go",
+     'package main\n\nimport "fmt"\nimport (\n    "example.com/app/store"\n    log "example.com/app/log"\n)\n',
+     [("go", ["fmt"]), ("go", ["example.com/app/store"]), ("go", ["example.com/app/log"])],
+     []),
+    ("App/Program.cs",
+     "using System;\nusing Acme.Models;\nusing static Acme.Util.Math;\nnamespace Acme.App\n{\n}\n",
+     [("namespace", ["System"]), ("namespace", ["Acme.Models"]), ("namespace", ["Acme.Util.Math"])],
+     ["Acme.App"]),
+    ("src/net/socket.cpp",
+     '#include <vector>\n#include "socket.h"\n#include "../util/log.h"\n',
+     [("path_tail", ["vector"]), ("path_tail", ["src/net/socket.h", "socket.h"]),
+      ("path_tail", ["src/util/log.h", "../util/log.h"])],
+     []),
+    ("lib/app.rb",
+     "require 'json'\nrequire_relative 'models/user'\n",
+     [("path_tail", ["json.rb"]), ("path", ["lib/models/user.rb"])],
+     []),
+    ("src/Http/Controller.php",
+     "<?php\nnamespace App\\Http;\nuse App\\Models\\User;\nrequire_once __DIR__ . '/helpers.php';\n",
+     [("module", ["App.Models.User", "Models.User"]), ("path", ["src/Http/helpers.php"])],
+     ["App.Http"]),
+    ("Sources/App/main.swift",
+     "import Foundation\n@testable import Core\nimport struct Models.User\n",
+     [("directory", ["Foundation"]), ("directory", ["Core"]), ("directory", ["Models"])],
+     []),
+    ("src/lib.rs",
+     "mod parser;\npub mod lexer;\nuse crate::parser::ast::Node;\nuse std::fmt;\n",
+     [("path", ["src/parser.rs", "src/parser/mod.rs"]), ("path", ["src/lexer.rs", "src/lexer/mod.rs"]),
+      ("module", ["parser.ast.Node", "parser.ast", "parser"])],
+     []),
+])
+def test_extractors(path, text, imports, declarations):
+    found, declared = EXTRACTORS[language_of(path)](path, text)
+    # JavaScript candidates list every resolvable extension; compare their heads
+    assert [(kind, candidates[:len(expected)]) for (kind, candidates), (_, expected) in zip(found, imports)] == imports
+    assert len(found) == len(imports)
+    assert declared == declarations
+
+def test_every_language_has_an_extractor_test():
+    assert len(EXTRACTORS) == 10
+    assert language_of("go.mod") == "go.mod"
+    assert language_of("README.md") is None
+    assert extract_go_mod("svc/go.mod", "module example.com/app\n\ngo 1.22\n") == ([], ["gomod:example.com/app"])
+
+PATHS = [
+    "pkg/__init__.py", "pkg/util.py", "pkg/core/__init__.py", "pkg/core/engine.py",
+    "web/src/util.js", "web/src/index.ts", "web/lib/a/index.tsx",
+    "src/com/acme/util/Strings.java", "src/com/acme/model/User.java", "src/com/acme/model/Order.java",
+    "svc/store/store.go", "svc/store/store_test.go", "svc/main.go",
+    "src/net/socket.h", "src/util/log.h", "other/util/log.h",
+    "Sources/Core/core.swift", "Sources/Core/more.swift",
+    "src/parser/mod.rs", "src/parser/ast.rs",
+]
+
+@pytest.fixture
+def resolver():
+    resolver = ImportResolver(PATHS)
+    resolver.declare("src/com/acme/model/User.java", ["com.acme.model"])
+    resolver.declare("src/com/acme/model/Order.java", ["com.acme.model"])
+    resolver.declare("svc/go.mod", ["gomod:example.com/app"])
+    return resolver
+
+@pytest.mark.parametrize("importer, kind, candidates, expected", [
+    ("pkg/core/engine.py", "python", ["pkg.util"], ["pkg/util.py"]),
+    ("pkg/util.py", "python", ["pkg.core"], ["pkg/core/__init__.py"]),
+    ("pkg/util.py", "path_module", ["pkg.core.engine", "pkg.core"], ["pkg/core/engine.py"]),
+    ("pkg/util.py", "path_module", ["pkg.core.missing", "pkg.core"], ["pkg/core/__init__.py"]),
+    ("web/src/index.ts", "path", ["web/src/util", "web/src/util.js"], ["web/src/util.js"]),
+    ("web/src/index.ts", "path", ["web/lib/a", "web/lib/a.tsx", "web/lib/a/index.tsx"], ["web/lib/a/index.tsx"]),
+    ("src/com/acme/App.java", "module", ["com.acme.util.Strings"], ["src/com/acme/util/Strings.java"]),
+    ("src/com/acme/App.java", "namespace", ["com.acme.model"],
+     ["src/com/acme/model/User.java", "src/com/acme/model/Order.java"]),
+    ("svc/main.go", "go", ["example.com/app/store"], ["svc/store/store.go", "svc/store/store_test.go"]),
+    ("svc/main.go", "go", ["fmt"], []),
+    ("src/net/socket.cpp", "path_tail", ["src/net/socket.h", "socket.h"], ["src/net/socket.h"]),
+    # Two headers share the tail util/log.h: the one closest to the importer wins
+    ("src/net/socket.cpp", "path_tail", ["util/log.h"], ["src/util/log.h"]),
+    ("other/main.cpp", "path_tail", ["util/log.h"], ["other/util/log.h"]),
+    ("Sources/App/main.swift", "directory", ["Core"], ["Sources/Core/core.swift", "Sources/Core/more.swift"]),
+    ("src/lib.rs", "module", ["parser.ast.Node", "parser.ast", "parser"], ["src/parser/ast.rs"]),
+    ("src/lib.rs", "path", ["src/lexer.rs", "src/lexer/mod.rs"], []),
+])
+def test_resolver(resolver, importer, kind, candidates, expected):
+    assert sorted(resolver.resolve(importer, kind, candidates)) == sorted(expected)
+
+def write_project(root, files):
+    for path, text in files.items():
+        target = root.joinpath(*path.split("/"))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text)
+    return ProjectIndex.from_directory(str(root))
+
+def test_graph_nodes_are_file_paths(tmp_path):
+    index = write_project(tmp_path, {
+        "a/__init__.py": "",
+        "a/b.py": "from a import c\n",
+        "a/b.js": "import c from './c.js';\n",
+        "a/c.py": "",
+        "a/c.js": "",
+        # Before nodes were paths, a.b/c.py and a/b/c.py were both the node a.b.c
+        "a.b/c.py": "",
+        "a/b/c.py": "import a.b\n",
+    })
+    graph, stats = build_import_graph(index, max_workers=1)
+    assert sorted(graph.names) == sorted(["a/__init__.py", "a/b.py", "a/b.js", "a/c.py", "a/c.js", "a.b/c.py", "a/b/c.py"])
+    assert sorted(graph.named_edges()) == [("a/b.js", "a/c.js"), ("a/b.py", "a/c.py"), ("a/b/c.py", "a/b.py")]
+    assert stats["languages"] == {"python": 5, "javascript": 2}
+    assert stats["edges"] == 3
@@ -0,0 +1,62 @@
+import random
+
+import networkx as nx
+
+from module_graph import ModuleGraph
+
+def random_graph(rng):
+    count = rng.randint(1, 40)
+    density = rng.choice([0.0, 0.02, 0.05, 0.1, 0.3])
+    edges = [(source, target) for source in range(count) for target in range(count)
+             if rng.random() < density]
+    return ModuleGraph.from_edges([f"m{node}" for node in range(count)], edges), edges
+
+def as_networkx(graph, edges):
+    reference = nx.DiGraph()
+    reference.add_nodes_from(range(len(graph)))
+    reference.add_edges_from(edges)
+    return reference
+
+def test_matches_networkx_on_random_graphs():
+    rng = random.Random(0)
+    for _ in range(200):
+        graph, edges = random_graph(rng)
+        reference = as_networkx(graph, edges)
+
+        component_of, components = graph.strongly_connected_components()
+        assert sorted(map(sorted, components)) == sorted(map(sorted, nx.strongly_connected_components(reference)))
+        assert all(node in components[component_of[node]] for node in range(len(graph)))
+        # Components are numbered in reverse topological order
+        assert all(component_of[source] >= component_of[target] for source, target in edges)
+
+        on_cycle = {node for component in components if len(component) > 1 for node in component}
+        on_cycle.update(source for source, target in edges if source == target)
+        sizes = graph.transitive_closure_sizes()
+        for node in range(len(graph)):
+            expected = nx.descendants(reference, node) | ({node} if node in on_cycle else set())
+            assert sizes[node] == len(expected)
+            assert set(graph.reachable(node)) == expected
+
+        expected_cycles = [sorted(component) for component in nx.strongly_connected_components(reference)
+                           if len(component) > 1]
+        expected_cycles.extend([node] for node in nx.nodes_with_selfloops(reference))
+        assert sorted(map(sorted, graph.cycles())) == sorted(expected_cycles)
+
+def test_topological_layers_follow_edges():
+    rng = random.Random(1)
+    for _ in range(50):
+        graph, edges = random_graph(rng)
+        component_of, _ = graph.strongly_connected_components()
+        layers = graph.topological_layers()
+        for source, target in edges:
+            if component_of[source] == component_of[target]:
+                assert layers[source] == layers[target]
+            else:
+                assert layers[source] < layers[target]
+
+def test_from_adjacency_round_trip():
+    adjacency = {"app": ["db", "ui"], "ui": ["app"], "db": []}
+    graph = ModuleGraph.from_adjacency(adjacency)
+    assert {name: sorted(targets) for name, targets in graph.to_adjacency().items()} == adjacency
+    assert graph.edge_count == 3
+    assert graph.node_id("missing") is None
@@ -0,0 +1,148 @@
+import ast
+
+import pytest
+
+import pattern_detection
+from pattern_detection import DEFAULT_DETECTORS, FileContext, PatternDetector, detect_patterns, scan_file
+from project_index import ProjectIndex
+
+SOURCES = {
+    "app/config.py": '''
+class Config:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+''',
+    "app/shapes.py": '''
+class ShapeFactory:
+    pass
+
+def make_shape(kind):
+    if kind == "circle":
+        return Circle()
+    return Square()
+
+def create_user(name):
+    return User(name)
+''',
+    "app/events.py": '''
+class EventBus:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def publish(self, event):
+        for listener in self.listeners:
+            listener(event)
+''',
+    "app/storage.py": '''
+class UserRepository:
+    pass
+
+class OrderStore:
+    def get(self, key): ...
+    def list_all(self): ...
+    def add(self, order): ...
+    def delete(self, key): ...
+''',
+    "app/compression.py": '''
+from abc import ABC, abstractmethod
+
+class Compressor(ABC):
+    @abstractmethod
+    def compress(self, data):
+        """Compress bytes"""
+''',
+    "app/codecs.py": '''
+from app.compression import Compressor
+
+class GzipCompressor(Compressor):
+    def compress(self, data):
+        return data
+
+class ZstdCompressor(Compressor):
+    def compress(self, data):
+        return data
+''',
+    "app/models/user.py": "class User:\n    pass\n",
+    "app/views/user.py": "class UserPage:\n    pass\n",
+    "app/broken.py": "def broken(:\n",
+}
+
+@pytest.fixture
+def index(tmp_path):
+    for path, text in SOURCES.items():
+        target = tmp_path.joinpath(*path.split("/"))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text)
+    return ProjectIndex.from_directory(str(tmp_path))
+
+def evidence_files(patterns, name):
+    return {item.split(":", 1)[0] for item in patterns.get(name, [])}
+
+def test_every_detector_finds_its_pattern(index):
+    patterns, stats = detect_patterns(index)
+    assert evidence_files(patterns, "singleton") == {"app/config.py"}
+    assert any("ShapeFactory" in item for item in patterns["factory"])
+    assert any("make_shape() returns one of Circle, Square" in item for item in patterns["factory"])
+    assert any("create_user() creates User instances" in item for item in patterns["factory"])
+    assert patterns["observer"] == [
+        "app/events.py:2: class EventBus registers listeners via subscribe() and notifies them in publish()"
+    ]
+    assert evidence_files(patterns, "repository") == {"app/storage.py"}
+    assert len(patterns["repository"]) == 2
+    assert patterns["strategy"] == [
+        "app/compression.py:4: Compressor (compress) has 2 implementations: GzipCompressor, ZstdCompressor"
+    ]
+    assert evidence_files(patterns, "mvc") == {"app/models/user.py", "app/views/user.py"}
+    assert stats["files"] == len(SOURCES)
+    assert stats["errors"] == 1
+    assert set(stats["detector_seconds"]) == {detector.name for detector in DEFAULT_DETECTORS}
+
+def test_process_pool_finds_the_same_patterns(index, monkeypatch):
+    serial, _ = detect_patterns(index, max_workers=1)
+    monkeypatch.setattr(pattern_detection, "PARALLEL_FILE_THRESHOLD", 0)
+    monkeypatch.setattr(pattern_detection, "FILES_PER_TASK", 2)
+    parallel, stats = detect_patterns(index, max_workers=2)
+    assert parallel == serial
+    assert stats["errors"] == 1
+
+class CountingDetector(PatternDetector):
+    name = "counting"
+    node_types = (ast.FunctionDef, ast.Return, ast.Call)
+
+    def visit(self, node, context):
+        context.state.setdefault("visits", []).append(node)
+        if isinstance(node, ast.Return):
+            context.report(self, node.lineno, f"return in {context.function.name}()")
+
+def test_one_walk_visits_each_node_once_with_its_enclosing_function():
+    text = "def outer():\n    def inner():\n        return len([])\n    return inner()\n"
+    detector = CountingDetector()
+    context_findings, timings = scan_file("example.py", text, [detector])
+    assert sorted(context_findings["counting"]) == [
+        ("example.py", 3, "return in inner()"), ("example.py", 4, "return in outer()"),
+    ]
+    assert set(timings) == {"counting"}
+
+def test_visits_are_not_repeated(monkeypatch):
+    context = FileContext("example.py")
+    monkeypatch.setattr(pattern_detection, "FileContext", lambda path: context)
+    scan_file("example.py", "def f():\n    return g(h())\n", [CountingDetector()])
+    visits = context.state["visits"]
+    assert len({id(node) for node in visits}) == len(visits) == 4
+
+def test_detectors_must_implement_visit():
+    with pytest.raises(TypeError):
+        PatternDetector()
+
+    class Incomplete(PatternDetector):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,32 @@
+import subprocess
+
+import pytest
+
+from project_index import MAX_TEXT_FILE_BYTES, ProjectIndex
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "app.py").write_text("import os\n")
+    (tmp_path / "README.md").write_text("readme\n")
+    (tmp_path / "big.txt").write_text("x" * (MAX_TEXT_FILE_BYTES + 1))
+    (tmp_path / ".hidden").write_text("secret\n")
+    subprocess.run(["git", "init", "--quiet"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com",
+                    "commit", "--quiet", "-m", "initial"], cwd=tmp_path, check=True)
+    return tmp_path
+
+def test_the_base_class_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        ProjectIndex([], "nothing")
+
+def test_directory_and_git_indexes_agree(project):
+    directory = ProjectIndex.from_directory(str(project))
+    git = ProjectIndex.from_git(str(project / ".git"))
+    assert directory.paths == git.paths == ["README.md", "big.txt", "pkg/app.py"]
+    expected = [("README.md", "readme\n"), ("pkg/app.py", "import os\n")]
+    assert list(directory.iter_texts()) == list(git.iter_texts()) == expected
+    assert git.read_text("pkg/app.py") == directory.read_text("pkg/app.py") == "import os\n"
+    assert git.read_text("big.txt") is None
+    assert directory.read_text("missing.py") is None
@@ -0,0 +1,80 @@
+import pytest
+
+from request_metrics import RequestMetrics, RingBuffer, labels, percentile
+
+def test_ring_buffer_keeps_the_last_samples():
+    buffer = RingBuffer(4)
+    assert len(buffer) == 0
+    assert buffer.quantiles() == [0.0, 0.0, 0.0]
+    for value in range(1, 11):
+        buffer.append(float(value))
+    # 1..6 were overwritten in place
+    assert len(buffer) == 4
+    assert sorted(buffer._values) == [7.0, 8.0, 9.0, 10.0]
+    assert buffer.quantiles((0.0, 0.5, 0.99)) == [7.0, 9.0, 10.0]
+
+def test_ring_buffer_quantiles_before_it_is_full():
+    buffer = RingBuffer(100)
+    for value in (5.0, 1.0, 3.0):
+        buffer.append(value)
+    # The unused (zeroed) slots are not samples
+    assert buffer.quantiles((0.0, 0.5, 1.0)) == [1.0, 3.0, 5.0]
+
+@pytest.mark.parametrize("fraction, expected", [(0.0, 1), (0.5, 51), (0.95, 96), (0.99, 100), (1.0, 100)])
+def test_percentile(fraction, expected):
+    assert percentile(list(range(1, 101)), fraction) == expected
+
+def test_snapshot_rows_and_cache_hits():
+    metrics = RequestMetrics(window=8)
+    metrics.record("small", "Text Input", latency=0.5, prompt_tokens=10, completion_tokens=20)
+    metrics.record("small", "Text Input", latency=1.5, error=True)
+    metrics.record("large", "Architecture Advisor", latency=2.0)
+    metrics.record_cache_hits("small", "Text Input")
+    metrics.record_cache_hits("large", "Text Input", 2)
+    metrics.record_cache_hits("large", "Text Input", 0)
+    rows, cache_hits = metrics.snapshot()
+    assert [(row["model"], row["tab"], row["requests"], row["errors"]) for row in rows] == [
+        ("large", "Architecture Advisor", 1, 0), ("small", "Text Input", 2, 1),
+    ]
+    assert rows[1]["prompt_tokens"] == 10 and rows[1]["latency_p99"] == 1.5
+    assert cache_hits == {("small", "Text Input"): 1, ("large", "Text Input"): 2}
+
+def test_track_counts_requests_in_flight():
+    metrics = RequestMetrics(max_concurrent=1)
+    timer = metrics.track("small", "Text Input")
+    assert metrics.in_flight == 1
+    timer.finish()
+    timer.finish()
+    assert metrics.in_flight == 0
+    rows, _ = metrics.snapshot()
+    assert rows[0]["requests"] == 1
+
+def test_labels_are_escaped():
+    assert labels(model='a"b', tab="back\\slash\nnext") == 'model="a\\"b",tab="back\\\\slash\\nnext"'
+
+def test_prometheus_text():
+    metrics = RequestMetrics()
+    metrics.record("llama", 'Tab "one"', latency=0.25, prompt_tokens=3, completion_tokens=4)
+    metrics.record("llama", 'Tab "one"', latency=0.75, error=True)
+    metrics.record_cache_hits("llama", 'Tab "one"', 5)
+    lines = metrics.prometheus_text().splitlines()
+    series = 'model="llama",tab="Tab \\"one\\""'
+    assert f"codehelper_requests_total{{{series}}} 2" in lines
+    assert f"codehelper_request_errors_total{{{series}}} 1" in lines
+    assert f"codehelper_prompt_tokens_total{{{series}}} 3" in lines
+    assert f'codehelper_request_latency_seconds{{{series},quantile="0.5"}} 0.750000' in lines
+    assert f"codehelper_request_latency_seconds_sum{{{series}}} 1.000000" in lines
+    assert f"codehelper_request_latency_seconds_count{{{series}}} 2" in lines
+    # Only the latency summary has a sum and a count
+    assert not any(line.startswith("codehelper_queue_wait_seconds_sum") for line in lines)
+    assert f"codehelper_cache_hits_total{{{series}}} 5" in lines
+    assert "# TYPE codehelper_request_latency_seconds summary" in lines
+    assert "# TYPE codehelper_cache_hits_total counter" in lines
+
+def test_write_prometheus_replaces_the_file(tmp_path):
+    metrics = RequestMetrics()
+    path = tmp_path / "codehelper.prom"
+    path.write_text("stale")
+    metrics.write_prometheus(str(path))
+    assert path.read_text() == metrics.prometheus_text()
+    assert [entry.name for entry in tmp_path.iterdir()] == ["codehelper.prom"]
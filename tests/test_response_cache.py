@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+import response_cache
+from code_assistant import CodeAssistant
+from conversation import Conversation
+from response_cache import ResponseCache, response_key
+from speculation import FOLLOW_UPS, Speculator
+from stub_client import StubGroqClient
+
+SETTINGS = ("llama-3.1-8b-instant", 0.7)
+
+def test_prefetched_answer_is_served_once_ready():
+    cache = ResponseCache()
+    assert cache.get("key") is None
+    assert cache.begin("key", label="tests")
+    assert not cache.begin("key")
+    assert "key" in cache and not cache.is_ready("key")
+    cache.fulfil("key", "answer", 120)
+    assert cache.is_ready("key")
+    assert cache.get("key") == "answer"
+    assert cache.get("key") == "answer"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["speculative_started"], stats["speculative_hits"]) == (2, 1, 1, 1)
+    # A used entry's tokens count once, and are never wasted
+    assert (stats["used_tokens"], stats["wasted"], stats["wasted_tokens"]) == (120, 0, 0)
+    cache.drop_unused(["key"])
+    assert cache.stats()["wasted"] == 0
+
+def test_lookup_waits_for_a_pending_entry():
+    cache = ResponseCache()
+    cache.begin("key")
+    timer = threading.Timer(0.05, cache.fulfil, ("key", "answer", 10))
+    timer.start()
+    assert cache.get("key", wait_seconds=5) == "answer"
+    timer.join()
+
+def test_failed_entry_falls_back_to_a_normal_request():
+    cache = ResponseCache()
+    cache.begin("key")
+    timer = threading.Timer(0.05, cache.fail, ("key",))
+    timer.start()
+    assert cache.get("key", wait_seconds=5) is None
+    timer.join()
+    assert "key" not in cache
+    assert cache.stats()["speculative_failed"] == 1
+
+def test_unused_entries_count_as_wasted():
+    cache = ResponseCache(max_entries=2)
+    for key, tokens in (("a", 10), ("b", 20)):
+        cache.begin(key)
+        cache.fulfil(key, key, tokens)
+    cache.drop_unused(["a"])
+    assert (cache.stats()["wasted"], cache.stats()["wasted_tokens"]) == (1, 10)
+
+    # Dropped while its request still runs: counted when the request finishes
+    cache.begin("c")
+    cache.drop_unused(["c"])
+    cache.fulfil("c", "late", 30)
+    assert (cache.stats()["wasted"], cache.stats()["wasted_tokens"]) == (2, 40)
+
+    # Evicted by newer entries
+    cache.begin("d")
+    cache.fulfil("d", "d", 5)
+    cache.begin("e")
+    assert "b" not in cache
+    assert (cache.stats()["wasted"], cache.stats()["wasted_tokens"]) == (3, 60)
+
+def test_entries_expire(monkeypatch):
+    cache = ResponseCache(ttl_seconds=60)
+    cache.begin("key")
+    cache.fulfil("key", "answer", 50)
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    assert cache.get("key") is None
+    assert (cache.stats()["entries"], cache.stats()["wasted_tokens"]) == (0, 50)
+
+def test_answers_to_users_are_not_shared():
+    client = StubGroqClient()
+    cache = ResponseCache()
+    assistant = CodeAssistant(client, response_cache=cache)
+    assistant.ask("How do I reverse a list?", SETTINGS)
+    assistant.ask("How do I reverse a list?", SETTINGS)
+    assert len(client.calls) == 2
+    assert cache.stats()["entries"] == 0
+
+def test_prefetched_follow_up_answers_the_click():
+    client = StubGroqClient()
+    cache = ResponseCache()
+    assistant = CodeAssistant(client, response_cache=cache)
+    speculator = Speculator(assistant, cache, top_k=1)
+    conversation = Conversation()
+    answer = assistant.ask("How do I reverse a list?", SETTINGS, conversation=conversation)
+    [key] = speculator.prefetch("session", conversation, answer, SETTINGS)
+    assert key == response_key(conversation.request_messages(FOLLOW_UPS["explain"][1]), SETTINGS)
+    speculator._executor.shutdown(wait=True)
+    assert len(client.calls) == 2
+
+    # Another session asking the same follow-up is not given this conversation's prefetch
+    assistant.ask(FOLLOW_UPS["explain"][1], SETTINGS, conversation=Conversation())
+    assert len(client.calls) == 3 and cache.stats()["hits"] == 0
+    assistant.ask(FOLLOW_UPS["explain"][1], SETTINGS, conversation=conversation)
+    assert len(client.calls) == 3
+    stats = speculator.stats()
+    assert (stats["started"], stats["hits"], stats["hit_rate"]) == (1, 1, 1.0)
+    assert stats["used_tokens"] > 0
+    assert assistant.metrics.snapshot()[1] == {(SETTINGS[0], "Text Input"): 1}
+
+@pytest.mark.parametrize("messages, settings", [
+    ([{"role": "user", "content": "q"}], ("other-model", 0.7)),
+    ([{"role": "user", "content": "q"}], ("llama-3.1-8b-instant", 0.2)),
+    ([{"role": "system", "content": "s"}, {"role": "user", "content": "q"}], SETTINGS),
+])
+def test_key_covers_messages_and_settings(messages, settings):
+    assert response_key(messages, settings) != response_key([{"role": "user", "content": "q"}], SETTINGS)
@@ -0,0 +1,77 @@
+import pytest
+
+from semantic_cache import SemanticCache, same_request
+
+@pytest.mark.parametrize("question, cached_question", [
+    ("How do I read a file line by line in Python?", "How do I write a file line by line in Python?"),
+    ("How do I reverse a list in Python?", "How do I reverse a string in Python?"),
+    ("What is a closure in JavaScript?", "What is a closure in Python?"),
+    ("How do I install numpy?", "How do I uninstall numpy?"),
+    ("How do I convert a string to an int in Python?", "How do I convert an int to a string in Python?"),
+    ("how do i convert a to b", "how do i convert b to a"),
+    ("is python 2 faster than python 3", "is python 3 faster than python 2"),
+    ("is a list faster than a tuple", "is a tuple faster than a list"),
+    ("use a list instead of a tuple", "use a tuple instead of a list"),
+    ("copy file a over file b", "copy file b over file a"),
+    ("python 2 vs python 3", "python 3 vs python 2"),
+    ("How to read a text file line by line in JavaScript?", "How to read a text file line by line in Java?"),
+    ("How do I sort an array of objects by property in Java?",
+     "How do I sort an array of objects by property in JavaScript?"),
+    ("How do I reverse a string without using a built in function in C?",
+     "How do I reverse a string without using a built in function in C++?"),
+    ("How do I make an HTTP request in Python?", "How do I make an HTTPS request in Python?"),
+    ("?", "how do I reverse a list"),
+])
+def test_different_requests(question, cached_question):
+    assert not same_request(question, cached_question)
+    assert not same_request(cached_question, question)
+
+@pytest.mark.parametrize("question, cached_question", [
+    ("How do I reverse a list in Python?", "how to reverse a python list"),
+    ("What is the difference between a process and a thread?", "difference between thread and process"),
+    ("What is the difference between == and === in JavaScript?", "javascript == vs ==="),
+    ("How do I convert a string to an int in Python?", "python convert string to integer"),
+    ("convert string to int in python", "python: how to convert string to int"),
+    ("is a list faster than a tuple in python", "python is list faster than tuple"),
+    ("use a list instead of a tuple", "should I use a list instead of a tuple"),
+    ("How do I format a date in Go?", "golang format dates"),
+    ("What is a closure in JavaScript?", "explain closures in js"),
+])
+def test_same_requests(question, cached_question):
+    assert same_request(question, cached_question)
+    assert same_request(cached_question, question)
+
+def test_lookup_does_not_answer_the_reversed_conversion():
+    cache = SemanticCache(max_entries=16)
+    cache.add("How do I convert a string to an int in Python?", "int(text)")
+    assert cache.lookup("How do I convert an int to a string in Python?") is None
+    answer, similarity, cached_question = cache.lookup("python convert string to integer")
+    assert (answer, cached_question) == ("int(text)", "How do I convert a string to an int in Python?")
+    assert similarity >= cache.threshold
+
+def test_lookup_does_not_answer_the_reversed_comparison():
+    cache = SemanticCache(max_entries=16)
+    cache.add("Is a list faster than a tuple?", "no")
+    assert cache.lookup("Is a tuple faster than a list?") is None
+    answer, similarity, cached_question = cache.lookup("is a list faster than a tuple")
+    assert (answer, cached_question) == ("no", "Is a list faster than a tuple?")
+    assert similarity >= cache.threshold
+
+def test_lookup_does_not_answer_another_language():
+    cache = SemanticCache(max_entries=16)
+    cache.add("how to read a text file line by line in javascript", "readline.createInterface()")
+    assert cache.lookup("how to read a text file line by line in java") is None
+    assert cache.lookup("javascript read text file line by line")[0] == "readline.createInterface()"
+
+def test_lookup_is_per_namespace():
+    cache = SemanticCache(max_entries=16)
+    cache.add("How do I reverse a list in Python?", "reversed()", namespace="model-a")
+    assert cache.lookup("how to reverse a python list", namespace="model-b") is None
+    assert cache.lookup("how to reverse a python list", namespace="model-a")[0] == "reversed()"
+
+def test_questions_with_code_are_not_cached():
+    cache = SemanticCache(max_entries=16)
+    cache.add("Why does this fail?\n```python\nprint(x)\n```", "x is undefined")
+    assert len(cache) == 0
+    assert cache.lookup("Why does this fail?\n```python\nprint(x)\n```") is None
+    assert cache.stats()["skipped"] == 1
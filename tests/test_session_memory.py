@@ -0,0 +1,96 @@
+import gc
+import io
+import os
+
+import pytest
+
+from session_memory import SessionMemory, SessionMemoryError, deep_size
+
+@pytest.fixture
+def memory(tmp_path):
+    return SessionMemory(session_cap_bytes=64 * 1024, spill_threshold_bytes=1024, spill_root=str(tmp_path / "spill"))
+
+def spill_files(memory):
+    return os.listdir(memory.spill_root)
+
+def test_small_payload_stays_in_memory(memory):
+    payload = memory.store("s1", "upload", b"small")
+    assert not payload.spilled
+    assert payload.text() == "small"
+    with payload.open() as f:
+        assert f.read(2) == b"sm" and f.read() == b"all"
+    stats = memory.stats("s1")
+    assert (stats["session_resident_bytes"], stats["session_spilled_bytes"]) == (5, 0)
+    assert spill_files(memory) == []
+
+@pytest.mark.parametrize("as_file", [False, True])
+def test_large_payload_spills_to_mmap_and_reads_back_identically(memory, as_file):
+    data = os.urandom(10 * 1024 + 7)
+    payload = memory.store("s1", "upload", io.BytesIO(data) if as_file else data)
+    assert payload.spilled and len(payload) == len(data)
+    assert spill_files(memory) == [os.path.basename(payload.path)]
+    with payload.view() as view:
+        assert view.tobytes() == data
+    with payload.open() as f:
+        assert f.read() == data
+    stats = memory.stats("s1")
+    assert (stats["session_resident_bytes"], stats["session_spilled_bytes"]) == (0, len(data))
+    assert memory.spills == 1
+
+    payload.release()
+    assert spill_files(memory) == []
+    assert memory.stats()["sessions"] == 0
+    with pytest.raises(ValueError):
+        payload.view()
+
+def test_dropping_a_holding_returns_its_bytes(memory):
+    memory.hold("s1", "analysis", 1000)
+    memory.store("s1", "upload", os.urandom(4096))
+    gc.collect()
+    assert memory.stats()["sessions"] == 0
+    assert spill_files(memory) == []
+
+    kept = memory.hold("s1", "analysis", 1000)
+    assert memory.stats("s1")["session_resident_bytes"] == 1000
+    del kept
+    gc.collect()
+    assert memory.stats("s1")["session_resident_bytes"] == 0
+
+def test_holdings_over_the_cap_are_rejected(memory):
+    held = memory.hold("s1", "first", 60 * 1024)
+    with pytest.raises(SessionMemoryError):
+        memory.hold("s1", "second", 8 * 1024)
+    with pytest.raises(SessionMemoryError):
+        memory.store("s1", "upload", os.urandom(8 * 1024))
+    assert memory.rejections == 2
+    assert spill_files(memory) == []
+    # Other sessions have their own cap, and charging a key again replaces its amount
+    memory.hold("s2", "first", 60 * 1024)
+    assert memory.fits("s1", 64 * 1024, key="first")
+    replaced = memory.hold("s1", "first", 64 * 1024)
+    assert memory.stats("s1")["session_resident_bytes"] == 64 * 1024
+    # Releasing the replaced holding leaves the newer charge alone
+    held.release()
+    assert memory.stats("s1")["session_by_label"] == {"first": 64 * 1024}
+    replaced.release()
+
+def test_release_session_drops_every_charge(memory):
+    holdings = [memory.hold("s1", key, 100) for key in ("a", "b")]
+    memory.release_session("s1")
+    assert memory.stats()["sessions"] == 0
+    for holding in holdings:
+        holding.release()
+
+def test_orphaned_spill_files_are_removed(memory):
+    dead = os.path.join(memory.spill_root, "999999999-abc")
+    open(dead, "wb").close()
+    mine = os.path.join(memory.spill_root, f"{os.getpid()}-abc")
+    open(mine, "wb").close()
+    assert memory.remove_orphans() == 1
+    assert spill_files(memory) == [os.path.basename(mine)]
+
+def test_deep_size_skips_holdings_and_shared_objects(memory):
+    holding = memory.hold("s1", "upload", 10)
+    state = {"text": "x" * 1000, "holding": holding, "module": os, "function": deep_size}
+    assert 1000 < deep_size(state) < 1000 + deep_size({"text": "", "holding": None, "module": None,
+                                                       "function": None}) + 100
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+import speculation
+from speculation import RateBudget, Speculator, parse_duration
+
+def response(status_code=200, **headers):
+    return SimpleNamespace(status_code=status_code, headers={name.replace("_", "-"): value
+                                                             for name, value in headers.items()})
+
+def limits(requests=(100, 90), tokens=(10000, 9000), reset="60s"):
+    return response(
+        x_ratelimit_limit_requests=str(requests[0]), x_ratelimit_remaining_requests=str(requests[1]),
+        x_ratelimit_reset_requests=reset,
+        x_ratelimit_limit_tokens=str(tokens[0]), x_ratelimit_remaining_tokens=str(tokens[1]),
+        x_ratelimit_reset_tokens=reset,
+    )
+
+@pytest.mark.parametrize("text, seconds", [("2m59.56s", 179.56), ("120ms", 0.12), ("1h", 3600)])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == pytest.approx(seconds)
+
+@pytest.mark.parametrize("text", ["", None, "soon"])
+def test_unparsable_durations(text):
+    assert parse_duration(text) is None
+
+def test_without_headers_only_the_token_rate_applies():
+    budget = RateBudget(tokens_per_minute=1000)
+    assert budget.reserve_tokens(600)
+    assert not budget.reserve_tokens(600)
+    assert budget.reserve_tokens(400)
+    assert budget.snapshot() == {"paused": False, "remaining": {}}
+
+def test_reserve_keeps_the_share_users_need():
+    budget = RateBudget(tokens_per_minute=100000, reserve=0.5)
+    budget.observe(limits(tokens=(10000, 6000)))
+    assert budget.reserve_tokens(1000)
+    # 6000 - 1001 would leave less than half of the 10000 token limit
+    assert not budget.reserve_tokens(1001)
+    budget.observe(limits(requests=(100, 50)))
+    assert not budget.reserve_tokens(10)
+    assert budget.snapshot()["remaining"] == {"requests": 50, "tokens": 9000}
+
+def test_limits_are_forgotten_once_their_window_resets(monkeypatch):
+    budget = RateBudget()
+    budget.observe(limits(requests=(100, 10), reset="2s"))
+    assert not budget.reserve_tokens(10)
+    now = speculation.time.time()
+    monkeypatch.setattr(speculation.time, "time", lambda: now + 3)
+    assert budget.reserve_tokens(10)
+    assert budget.snapshot()["remaining"] == {}
+
+def test_rate_limit_pauses_speculation(monkeypatch):
+    budget = RateBudget()
+    budget.observe(response(429, retry_after="30"))
+    assert budget.snapshot()["paused"]
+    assert not budget.reserve_tokens(10)
+    now = speculation.time.time()
+    monkeypatch.setattr(speculation.time, "time", lambda: now + 31)
+    assert budget.reserve_tokens(10)
+    # Without retry-after the pause is a minute
+    budget.observe(response(429))
+    monkeypatch.setattr(speculation.time, "time", lambda: now + 31 + 59)
+    assert not budget.reserve_tokens(10)
+
+def test_settle_replaces_the_reservation_by_actual_use():
+    budget = RateBudget(tokens_per_minute=1000)
+    assert budget.reserve_tokens(900)
+    budget.settle(900, 200)
+    assert budget.reserve_tokens(800)
+    assert not budget.reserve_tokens(1)
+
+ANSWER = "Use reversed():\n```python\nitems[::-1]\n```"
+
+def test_prefetch_is_skipped_without_budget():
+    class Metrics:
+        in_flight = 0
+        max_concurrent = 0
+
+    class Cache:
+        def __contains__(self, key):
+            return False
+
+        def drop_unused(self, keys):
+            pass
+
+    conversation = SimpleNamespace(request_messages=lambda prompt: [{"role": "user", "content": prompt}])
+    speculator = Speculator(SimpleNamespace(metrics=Metrics()), Cache(), RateBudget(tokens_per_minute=10), top_k=2)
+    assert speculator.prefetch("session", conversation, ANSWER, ("model", 0.7)) == []
+    assert speculator.skipped == {"rate budget": 2}
+    Metrics.in_flight = 8
+    speculator.prefetch("session", conversation, ANSWER, ("model", 0.7))
+    assert speculator.skipped["busy"] == 2
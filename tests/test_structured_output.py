@@ -0,0 +1,46 @@
+from structured_output import IncrementalJSONObjectParser, parse_json_object
+
+def feed_all(parser, chunks):
+    completed = []
+    for chunk in chunks:
+        completed.extend(parser.feed(chunk))
+    return completed
+
+def test_members_are_reported_once_complete():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('```json\n{"summary": "ok", "design_patterns": [{"na') == [("summary", "ok")]
+    assert parser.feed('me": "Factory"}], "risks": ["a, b"') == [("design_patterns", [{"name": "Factory"}])]
+    assert parser.feed(']}\n```') == [("risks", ["a, b"])]
+    assert parser.done
+    assert parser.errors == []
+
+def test_one_character_chunks_with_escapes():
+    text = '{"quote": "say \\"hi\\", {not a brace}", "path": "C:\\\\dir", "nested": {"a": [1, {"b": 2}]}}'
+    parser = IncrementalJSONObjectParser()
+    completed = feed_all(parser, text)
+    assert dict(completed) == {"quote": 'say "hi", {not a brace}', "path": "C:\\dir", "nested": {"a": [1, {"b": 2}]}}
+    assert len(completed) == 3
+
+def test_truncated_object_keeps_completed_members():
+    parser = IncrementalJSONObjectParser()
+    completed = feed_all(parser, ['{"summary": "ok", ', '"risks": ["unfinished'])
+    assert completed == [("summary", "ok")]
+    assert not parser.done
+
+def test_invalid_member_is_recorded_and_skipped():
+    parser = IncrementalJSONObjectParser()
+    completed = feed_all(parser, ['{"a": 1, "b": nope, ', '"c": [1]}'])
+    assert completed == [("a", 1), ("c", [1])]
+    assert len(parser.errors) == 1
+    assert parser.errors[0].startswith('"b": nope')
+
+def test_text_after_the_object_is_ignored():
+    parser = IncrementalJSONObjectParser()
+    assert feed_all(parser, ['{"a": 1}', ' {"b": 2}']) == [("a", 1)]
+
+def test_parse_json_object():
+    assert parse_json_object('Here you go:\n```json\n{"a": {"b": 1}}\n```') == {"a": {"b": 1}}
+    assert parse_json_object('{"a": 1') is None
+    assert parse_json_object('{"a": nope}') is None
+    assert parse_json_object("no json here") is None
+    assert parse_json_object("} backwards {") is None
@@ -0,0 +1,107 @@
+import pytest
+
+import tracing
+from code_assistant import CodeAssistant
+from stub_client import StubGroqClient
+from tracing import NOOP_SPAN, Tracer, bind, current_span, tracer
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append([span.name for span in spans])
+
+def test_disabled_tracer_returns_the_noop_span():
+    disabled = Tracer()
+    assert not disabled.enabled
+    with disabled.span("work", size=1) as span:
+        assert span is NOOP_SPAN
+        span.set_attribute("ignored", True)
+        assert current_span() is None
+
+def test_trace_is_exported_when_its_root_ends():
+    exporter = ListExporter()
+    traced = Tracer(exporter)
+    with traced.span("root") as root:
+        with traced.span("child") as child:
+            assert current_span() is child
+        assert exporter.traces == []
+    assert exporter.traces == [["child", "root"]]
+    assert child.trace_id == root.trace_id and child.parent_span_id == root.span_id
+
+def test_exception_is_recorded_on_the_span():
+    traced = Tracer(ListExporter())
+    with pytest.raises(ValueError):
+        with traced.span("root") as span:
+            raise ValueError("bad input")
+    assert span.error == "ValueError: bad input"
+
+def test_trace_whose_root_never_ends_is_exported_after_orphan_seconds(monkeypatch):
+    exporter = ListExporter()
+    traced = Tracer(exporter, orphan_seconds=60)
+    abandoned = traced.span("stream")
+    traced.span("chunk", parent=abandoned).end()
+    traced.span("other").end()
+    assert exporter.traces == [["other"]]
+
+    now = tracing.time.time_ns()
+    monkeypatch.setattr(tracing.time, "time_ns", lambda: now + 61 * 1_000_000_000)
+    traced.span("later").end()
+    assert exporter.traces == [["other"], ["later"], ["chunk"]]
+    assert traced.orphaned_traces == 1
+    assert traced._pending_spans == 0
+
+def test_oldest_traces_are_exported_beyond_max_pending_spans():
+    exporter = ListExporter()
+    traced = Tracer(exporter, max_pending_spans=2)
+    roots = [traced.span(f"root{number}") for number in range(3)]
+    for number, root in enumerate(roots):
+        traced.span(f"child{number}", parent=root).end()
+    # The third buffered span pushed the oldest trace out without its root
+    assert exporter.traces == [["child0"]]
+    assert traced.orphaned_traces == 1
+    roots[1].end()
+    assert exporter.traces == [["child0"], ["child1", "root1"]]
+
+def test_failing_exporter_does_not_break_the_operation():
+    class FailingExporter:
+        def export(self, spans):
+            raise OSError("disk full")
+
+    with Tracer(FailingExporter()).span("root"):
+        pass
+
+def test_bind_keeps_the_parent_in_another_context():
+    traced = Tracer(ListExporter())
+    with traced.span("root") as root:
+        run = bind(lambda: traced.span("worker"))
+    worker = run()
+    assert worker.parent_span_id == root.span_id
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracer.set_exporter(exporter)
+    yield exporter
+    tracer.set_exporter(None)
+
+def test_transcription_is_traced(exporter):
+    assistant = CodeAssistant(StubGroqClient())
+    with tracer.span("voice"):
+        text = assistant.transcribe("question.wav", b"RIFF")
+    assert text == "Stub transcription of question.wav (4 bytes)"
+    assert exporter.traces == [["llm.transcription", "voice"]]
+
+def test_failed_transcription_ends_its_span_with_the_error(exporter, monkeypatch):
+    client = StubGroqClient()
+
+    def fail(**options):
+        raise ConnectionError("upstream closed")
+
+    monkeypatch.setattr(client.audio.transcriptions, "create", fail)
+    spans = []
+    monkeypatch.setattr(exporter, "export", spans.extend)
+    with pytest.raises(ConnectionError):
+        CodeAssistant(client).transcribe("question.wav", b"RIFF")
+    assert [(span.name, span.error) for span in spans] == [("llm.transcription", "ConnectionError: upstream closed")]
@@ -0,0 +1,111 @@
+import os
+import time
+
+import pytest
+
+from workspace import WorkspaceManager, WorkspaceQuotaError
+
+@pytest.fixture
+def manager(tmp_path):
+    return WorkspaceManager(root=str(tmp_path / "workspaces"), session_quota_bytes=1000,
+                            global_quota_bytes=1500, idle_ttl_seconds=60)
+
+def fill(path, size):
+    with open(os.path.join(path, "data"), "wb") as f:
+        f.write(b"x" * size)
+
+def kept_workspace(manager, session_id, size):
+    """A filled workspace that is kept on disk with no references, like a cached project"""
+    path = manager.create(session_id)
+    fill(path, size)
+    manager.update_size(path)
+    manager.keep(path)
+    manager.release(path)
+    return path
+
+def test_release_deletes_unless_kept(manager):
+    path = manager.create("a")
+    manager.release(path)
+    assert not os.path.exists(path)
+    path = kept_workspace(manager, "a", 10)
+    assert os.path.isdir(path)
+    manager.discard(path)
+    assert not os.path.exists(path)
+
+def test_discard_waits_for_the_last_reference(manager):
+    path = kept_workspace(manager, "a", 10)
+    assert manager.acquire(path)
+    manager.discard(path)
+    assert os.path.isdir(path)
+    manager.release(path)
+    assert not os.path.exists(path)
+
+def test_requests_larger_than_a_quota_are_refused(manager):
+    with pytest.raises(WorkspaceQuotaError):
+        manager.create("a", expected_bytes=1001)
+    assert manager.stats()["workspaces"] == 0
+
+def test_update_size_removes_a_workspace_that_does_not_fit(manager):
+    path = manager.create("a")
+    fill(path, 1200)
+    with pytest.raises(WorkspaceQuotaError):
+        manager.update_size(path)
+    assert not os.path.exists(path)
+    assert manager.stats("a")["session_bytes"] == 0
+
+def test_idle_workspaces_are_evicted_least_recently_used_first(manager):
+    older = kept_workspace(manager, "a", 400)
+    newer = kept_workspace(manager, "a", 400)
+    manager.touch(newer)
+    path = manager.create("a", expected_bytes=500)
+    assert not os.path.exists(older)
+    assert os.path.isdir(newer)
+    assert manager.evictions == 1
+    assert manager.stats("a")["session_bytes"] == 900
+    manager.release(path)
+
+def test_referenced_workspaces_are_never_evicted(manager):
+    held = kept_workspace(manager, "a", 800)
+    assert manager.acquire(held)
+    with pytest.raises(WorkspaceQuotaError):
+        manager.create("a", expected_bytes=500)
+    assert os.path.isdir(held)
+    assert manager.evictions == 0
+
+def test_other_sessions_are_not_evicted_for_the_session_quota(manager):
+    other = kept_workspace(manager, "b", 900)
+    held = manager.create("a", expected_bytes=600)
+    with pytest.raises(WorkspaceQuotaError):
+        manager.create("a", expected_bytes=500)
+    assert os.path.isdir(other)
+    assert os.path.isdir(held)
+
+def test_other_sessions_are_evicted_for_the_global_quota(manager):
+    other = kept_workspace(manager, "b", 900)
+    mine = kept_workspace(manager, "a", 500)
+    path = manager.create("a", expected_bytes=500)
+    assert not os.path.exists(other)
+    assert os.path.isdir(mine)
+    assert manager.stats()["global_bytes"] == 1000
+    manager.release(path)
+
+def test_reap_removes_idle_workspaces_and_leftovers(manager):
+    idle = kept_workspace(manager, "a", 10)
+    leftover = os.path.join(manager.root, "project-leftover")
+    os.makedirs(leftover)
+    os.utime(leftover, (time.time() - 120, time.time() - 120))
+    assert manager.reap(now=time.time() + 30) == 1
+    assert os.path.isdir(idle)
+    assert manager.reap(now=time.time() + 120) == 1
+    assert not os.path.exists(idle)
+    assert not os.path.exists(leftover)
+
+def test_reap_keeps_referenced_workspaces_and_refreshes_them(manager):
+    path = manager.create("a")
+    later = time.time() + 3600
+    assert manager.reap(now=later) == 0
+    assert os.path.isdir(path)
+    manager.keep(path)
+    manager.release(path)
+    assert manager.reap(now=later + 30) == 0
+    assert os.path.isdir(path)
@@ -0,0 +1,261 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+# Tracing is off unless a directory for trace files is configured
+DEFAULT_TRACE_DIR = os.getenv("CODEHELPER_TRACE_DIR", "")
+# "chrome" (chrome://tracing, Perfetto) or "otlp" (OpenTelemetry OTLP/JSON)
+DEFAULT_TRACE_FORMAT = os.getenv("CODEHELPER_TRACE_FORMAT", "chrome")
+SERVICE_NAME = "codehelper"
+# Traces whose root span has not ended this long after their first span are exported without it
+ORPHAN_TRACE_SECONDS = 900
+# ...as are the oldest traces while more spans than this are buffered
+MAX_PENDING_SPANS = 10000
+
+_current_span = contextvars.ContextVar("codehelper_current_span", default=None)
+
+class Span:
+    """A timed operation with OpenTelemetry-style trace/span ids, attributes and status
+
+    Use it as a context manager to make it the parent of spans started inside the
+    block, or call end() yourself for operations that outlive a block (streams).
+    """
+
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_span_id", "attributes",
+        "start_ns", "end_ns", "thread_id", "error", "_token",
+    )
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else random.getrandbits(128) or 1
+        self.span_id = random.getrandbits(64) or 1
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.thread_id = threading.get_ident()
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.error = f"{type(exception).__name__}: {exception}"
+
+    def end(self):
+        """Finish the span (later calls are ignored)"""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._finish(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is not None:
+            self.record_exception(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+class NoopSpan:
+    """Stands in for a span while tracing is disabled; every method does nothing"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NOOP_SPAN = NoopSpan()
+
+class Tracer:
+    """Creates spans and hands each finished trace to an exporter
+
+    Spans are buffered per trace and exported together when the trace's root span
+    ends. A root that never ends (an abandoned stream, an exception before end())
+    would keep its children buffered forever, so traces are also exported without
+    their root after orphan_seconds, or oldest first once more than max_pending_spans
+    are buffered. Without an exporter span() returns the shared NOOP_SPAN, so
+    disabled tracing costs one attribute check per span.
+    """
+
+    def __init__(self, exporter=None, orphan_seconds=ORPHAN_TRACE_SECONDS, max_pending_spans=MAX_PENDING_SPANS):
+        self.orphan_seconds = orphan_seconds
+        self.max_pending_spans = max_pending_spans
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()   # trace id -> finished spans, oldest trace first
+        self._pending_spans = 0
+        self.orphaned_traces = 0
+        self.set_exporter(exporter)
+
+    def set_exporter(self, exporter):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    def span(self, name, parent=None, **attributes):
+        """Start a span, by default as a child of the current span"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, parent if parent is not None else _current_span.get(), attributes)
+
+    def _finish(self, span):
+        with self._lock:
+            self._pending.setdefault(span.trace_id, []).append(span)
+            self._pending_spans += 1
+            finished = []
+            if span.parent_span_id is None:
+                finished.append(self._pop(span.trace_id))
+            finished.extend(self._pop_orphans())
+        for spans in finished:
+            try:
+                self.exporter.export(spans)
+            except (OSError, ValueError):
+                pass  # Never let a failing exporter break the traced operation
+
+    def _pop(self, trace_id):
+        spans = self._pending.pop(trace_id)
+        self._pending_spans -= len(spans)
+        return spans
+
+    def _pop_orphans(self):
+        """Remove the traces that waited too long for their root, or the oldest while too many spans are buffered"""
+        cutoff = time.time_ns() - self.orphan_seconds * 1_000_000_000
+        orphans = []
+        while self._pending:
+            trace_id, spans = next(iter(self._pending.items()))
+            if spans[0].end_ns >= cutoff and self._pending_spans <= self.max_pending_spans:
+                break
+            orphans.append(self._pop(trace_id))
+            self.orphaned_traces += 1
+        return orphans
+
+def current_span():
+    """Return the span the calling code runs in, or None"""
+    return _current_span.get()
+
+def bind(function):
+    """Wrap function so it runs inside the caller's current span, e.g. in a worker thread
+
+    Context variables are not inherited by thread pool workers, so spans started
+    there would otherwise begin new traces.
+    """
+    parent = _current_span.get()
+
+    def run(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+
+    return run
+
+def write_json(directory, spans, document):
+    """Write one trace document to directory, named after its start time and trace id"""
+    os.makedirs(directory, exist_ok=True)
+    started = time.strftime("%Y%m%d-%H%M%S", time.localtime(min(span.start_ns for span in spans) / 1e9))
+    path = os.path.join(directory, f"trace-{started}-{spans[-1].trace_id:032x}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f)
+    return path
+
+class ChromeTraceExporter:
+    """Writes each trace as a Chrome trace event file (open it in chrome://tracing or Perfetto)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def export(self, spans):
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            args = dict(span.attributes, span_id=f"{span.span_id:016x}")
+            if span.parent_span_id is not None:
+                args["parent_span_id"] = f"{span.parent_span_id:016x}"
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": SERVICE_NAME,
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": args,
+            })
+        return write_json(self.directory, spans, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+def otlp_value(value):
+    """Encode an attribute value as an OTLP/JSON AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class OTLPJSONExporter:
+    """Writes each trace in the OpenTelemetry OTLP/JSON format, readable by a collector's file receiver"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def export(self, spans):
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": f"{span.trace_id:032x}",
+                "spanId": f"{span.span_id:016x}",
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    {"key": key, "value": otlp_value(value)} for key, value in span.attributes.items()
+                ],
+                # STATUS_CODE_ERROR or STATUS_CODE_OK
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_span_id is not None:
+                otlp_span["parentSpanId"] = f"{span.parent_span_id:016x}"
+            otlp_spans.append(otlp_span)
+
+        return write_json(self.directory, spans, {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": otlp_spans}],
+            }]
+        })
+
+EXPORTERS = {"chrome": ChromeTraceExporter, "otlp": OTLPJSONExporter}
+
+def configured_exporter(directory=DEFAULT_TRACE_DIR, trace_format=DEFAULT_TRACE_FORMAT):
+    """Return the exporter selected by the environment, or None when tracing is disabled"""
+    if not directory:
+        return None
+    return EXPORTERS.get(trace_format, ChromeTraceExporter)(directory)
+
+# Process-wide tracer used by the app and analysis modules
+tracer = Tracer(configured_exporter())
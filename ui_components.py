@@ -1,326 +1,343 @@
 import streamlit as st
 from PIL import Image
 import base64
+import functools
+import hashlib
 import os
+import re
+
+from model_router import AUTO_MODEL, DEFAULT_TEMPERATURE, TEXT_MODELS
+
+PAGE_STYLE_CSS = """
+    /* Modern typography */
+    html, body, [class*="css"] {
+        font-family: 'Inter', 'Segoe UI', 'Roboto', sans-serif;
+    }
+    
+    /* Dark theme optimized background colors */
+    .stApp {
+        background-color: #111827;
+        color: #F1F5F9;
+    }
+    
+    /* Vibrant header styling */
+    .main-header {
+        font-family: 'Inter', 'Segoe UI', sans-serif;
+        color: #3B82F6;
+        text-align: center;
+        padding-bottom: 24px;
+        font-size: 2.4rem;
+        font-weight: 700;
+        text-shadow: 0px 0px 10px rgba(59, 130, 246, 0.3);
+        letter-spacing: -0.5px;
+    }
+    
+    /* Text styling with dark theme optimization */
+    p, li {
+        font-size: 1rem !important;
+        color: #E2E8F0 !important;
+        line-height: 1.7 !important;
+        font-weight: 400 !important;
+    }
+    
+    /* Sidebar text */
+    .sidebar-text {
+        font-size: 0.95rem !important;
+        color: #E2E8F0 !important;
+        line-height: 1.6 !important;
+        font-weight: 400 !important;
+    }
+    
+    /* Colorful tab styling */
+    .stTabs [data-baseweb="tab-list"] {
+        gap: 6px;
+        border-bottom: 1px solid #374151;
+        padding-bottom: 6px;
+    }
+    .stTabs [data-baseweb="tab"] {
+        height: 45px;
+        white-space: pre-wrap;
+        border-radius: 6px 6px 0px 0px;
+        padding: 8px 16px;
+        background-color: #1F2937;
+        font-weight: 500;
+        font-size: 0.95rem;
+        border: 1px solid transparent;
+        border-bottom: none;
+        color: #D1D5DB;
+    }
+    .stTabs [aria-selected="true"] {
+        background-color: #3B82F6 !important;
+        color: white !important;
+        border: 1px solid #60A5FA !important;
+        border-bottom: none !important;
+        position: relative;
+        box-shadow: 0 0 10px rgba(59, 130, 246, 0.5);
+    }
+    .stTabs [aria-selected="true"]:after {
+        content: '';
+        position: absolute;
+        bottom: -1px;
+        left: 0;
+        right: 0;
+        height: 1px;
+        background: #3B82F6;
+    }
+    
+    /* Dark theme text area styling */
+    .stTextArea textarea {
+        border-radius: 6px;
+        border: 1px solid #4B5563;
+        font-size: 1rem !important;
+        padding: 12px !important;
+        background-color: #1F2937;
+        color: #F1F5F9;
+        box-shadow: 0 1px 2px rgba(0,0,0,0.3);
+        transition: all 0.2s;
+    }
+    .stTextArea textarea:focus {
+        border-color: #60A5FA;
+        box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.3);
+    }
+    
+    /* Vibrant button styling */
+    .stButton>button {
+        background-color: #3B82F6;
+        color: white;
+        border-radius: 6px;
+        padding: 8px 16px;
+        font-weight: 500;
+        font-size: 0.95rem;
+        border: none;
+        transition: all 0.2s;
+        box-shadow: 0 4px 6px rgba(59, 130, 246, 0.25);
+    }
+    .stButton>button:hover {
+        background-color: #2563EB;
+        transform: translateY(-1px);
+        box-shadow: 0 6px 10px rgba(59, 130, 246, 0.4);
+    }
+    
+    /* Success message styling */
+    .success-message {
+        background-color: #064E3B;
+        padding: 12px;
+        border-radius: 6px;
+        border-left: 3px solid #10B981;
+        margin: 12px 0;
+        color: #D1FAE5;
+    }
+    
+    /* Colorful info card */
+    .info-card {
+        background-color: #1E3A8A;
+        background: linear-gradient(135deg, #1E3A8A 0%, #1E40AF 100%);
+        padding: 20px;
+        border-radius: 8px;
+        margin: 16px 0;
+        border: 1px solid #3B82F6;
+        box-shadow: 0 4px 12px rgba(59, 130, 246, 0.2);
+    }
+    
+    .info-card p {
+        font-size: 1rem !important;
+        color: #E0E7FF !important;
+        line-height: 1.6 !important;
+    }
+    
+    /* Gradient response box styling */
+    .response-box {
+        background: linear-gradient(135deg, #1F2937 0%, #111827 100%);
+        padding: 20px;
+        border-radius: 8px;
+        margin: 12px 0;
+        border: 1px solid #3B82F6;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.2);
+    }
+    
+    /* Section header */
+    .section-header {
+        color: #60A5FA;
+        padding-bottom: 8px;
+        margin: 20px 0 12px 0;
+        font-weight: 600;
+        border-bottom: 1px solid #374151;
+        font-size: 1.1rem;
+    }
+    
+    /* File uploader */
+    .stFileUploader {
+        margin: 12px 0;
+    }
+    .stFileUploader > div {
+        background-color: #1F2937;
+        border-color: #4B5563;
+    }
+    
+    /* Sidebar styling */
+    .css-1d391kg {
+        background-color: #111827;
+    }
+    
+    /* Colorful model card styling */
+    .model-card {
+        padding: 10px;
+        border-radius: 6px;
+        text-align: center;
+        margin-bottom: 12px;
+        border: 1px solid #3B82F6;
+        background: linear-gradient(135deg, #1E3A8A 0%, #1E40AF 100%);
+        transition: all 0.2s;
+        box-shadow: 0 4px 6px rgba(0,0,0,0.2);
+    }
+    .model-card:hover {
+        box-shadow: 0 6px 12px rgba(59, 130, 246, 0.3);
+        transform: translateY(-2px);
+    }
+    
+    /* Stats styling */
+    .stat-value {
+        font-size: 1.2rem !important;
+        font-weight: 600 !important;
+        color: #60A5FA !important;
+        text-align: center;
+    }
+    
+    .stat-label {
+        font-weight: 500 !important;
+        color: #9CA3AF !important;
+        text-align: center;
+        font-size: 0.85rem !important;
+    }
+
+    /* Code editor and output */
+    pre {
+        background-color: #1F2937;
+        color: #E2E8F0;
+        border-radius: 6px;
+        border: 1px solid #374151;
+    }
+
+    code {
+        color: #60A5FA;
+    }
+
+    .streamlit-expanderHeader {
+        color: #E2E8F0 !important;
+        font-weight: 500;
+    }
+    
+    /* Scrollbar styling */
+    ::-webkit-scrollbar {
+        width: 8px;
+        height: 8px;
+    }
+    
+    ::-webkit-scrollbar-track {
+        background: #1F2937;
+        border-radius: 4px;
+    }
+    
+    ::-webkit-scrollbar-thumb {
+        background: #4B5563;
+        border-radius: 4px;
+    }
+    
+    ::-webkit-scrollbar-thumb:hover {
+        background: #60A5FA;
+    }
+    
+    /* Input fields for dark theme */
+    .stSelectbox div[data-baseweb="select"] {
+        background-color: #1F2937;
+        border-radius: 6px;
+        border-color: #4B5563;
+        color: #F1F5F9;
+    }
+    
+    /* Spinner */
+    .stSpinner > div {
+        border-color: #3B82F6 transparent transparent transparent;
+    }
+    
+    /* Slider for temperature control */
+    .stSlider div[data-baseweb="slider"] > div {
+        background-color: #374151;
+    }
+    .stSlider div[data-baseweb="slider"] div[role="progressbar"] {
+        background-color: #3B82F6;
+    }
+    .stSlider div[data-baseweb="slider"] div[role="slider"] {
+        background-color: #60A5FA;
+        border-color: #60A5FA;
+        box-shadow: 0 0 5px rgba(59, 130, 246, 0.5);
+    }
+    
+    /* Model settings card */
+    .settings-card {
+        background: linear-gradient(135deg, #1E3A8A 0%, #1F2937 100%);
+        padding: 15px;
+        border-radius: 8px;
+        margin: 12px 0;
+        border: 1px solid #3B82F6;
+        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
+    }
+    
+    /* Stats container */
+    .stats-container {
+        background: linear-gradient(135deg, #1F2937 0%, #111827 100%);
+        padding: 15px;
+        border-radius: 10px;
+        box-shadow: 0 4px 8px rgba(0,0,0,0.3);
+        margin-top: 10px;
+        border: 1px solid #3B82F6;
+    }
+"""
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a CSS stylesheet"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+def minify_html(html):
+    """Collapse the indentation and line breaks of an inline HTML fragment"""
+    html = re.sub(r">\s+<", "><", html.strip())
+    return re.sub(r"\s+", " ", html)
+
+@functools.lru_cache(maxsize=None)
+def static_html(html):
+    """Return a minified HTML fragment, computed once per process"""
+    return minify_html(html)
+
+@functools.lru_cache(maxsize=1)
+def get_page_style_block():
+    """Build the minified <style> block once per process, tagged with its content hash"""
+    css = minify_css(PAGE_STYLE_CSS)
+    digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+    return f'<style id="codehelper-style-{digest}">{css}</style>'
 
 def set_page_style():
     """Apply colorful styling to the Streamlit app with dark theme optimization"""
-    st.markdown("""
-    <style>
-        /* Modern typography */
-        html, body, [class*="css"] {
-            font-family: 'Inter', 'Segoe UI', 'Roboto', sans-serif;
-        }
-        
-        /* Dark theme optimized background colors */
-        .stApp {
-            background-color: #111827;
-            color: #F1F5F9;
-        }
-        
-        /* Vibrant header styling */
-        .main-header {
-            font-family: 'Inter', 'Segoe UI', sans-serif;
-            color: #3B82F6;
-            text-align: center;
-            padding-bottom: 24px;
-            font-size: 2.4rem;
-            font-weight: 700;
-            text-shadow: 0px 0px 10px rgba(59, 130, 246, 0.3);
-            letter-spacing: -0.5px;
-        }
-        
-        /* Text styling with dark theme optimization */
-        p, li {
-            font-size: 1rem !important;
-            color: #E2E8F0 !important;
-            line-height: 1.7 !important;
-            font-weight: 400 !important;
-        }
-        
-        /* Sidebar text */
-        .sidebar-text {
-            font-size: 0.95rem !important;
-            color: #E2E8F0 !important;
-            line-height: 1.6 !important;
-            font-weight: 400 !important;
-        }
-        
-        /* Colorful tab styling */
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 6px;
-            border-bottom: 1px solid #374151;
-            padding-bottom: 6px;
-        }
-        .stTabs [data-baseweb="tab"] {
-            height: 45px;
-            white-space: pre-wrap;
-            border-radius: 6px 6px 0px 0px;
-            padding: 8px 16px;
-            background-color: #1F2937;
-            font-weight: 500;
-            font-size: 0.95rem;
-            border: 1px solid transparent;
-            border-bottom: none;
-            color: #D1D5DB;
-        }
-        .stTabs [aria-selected="true"] {
-            background-color: #3B82F6 !important;
-            color: white !important;
-            border: 1px solid #60A5FA !important;
-            border-bottom: none !important;
-            position: relative;
-            box-shadow: 0 0 10px rgba(59, 130, 246, 0.5);
-        }
-        .stTabs [aria-selected="true"]:after {
-            content: '';
-            position: absolute;
-            bottom: -1px;
-            left: 0;
-            right: 0;
-            height: 1px;
-            background: #3B82F6;
-        }
-        
-        /* Dark theme text area styling */
-        .stTextArea textarea {
-            border-radius: 6px;
-            border: 1px solid #4B5563;
-            font-size: 1rem !important;
-            padding: 12px !important;
-            background-color: #1F2937;
-            color: #F1F5F9;
-            box-shadow: 0 1px 2px rgba(0,0,0,0.3);
-            transition: all 0.2s;
-        }
-        .stTextArea textarea:focus {
-            border-color: #60A5FA;
-            box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.3);
-        }
-        
-        /* Vibrant button styling */
-        .stButton>button {
-            background-color: #3B82F6;
-            color: white;
-            border-radius: 6px;
-            padding: 8px 16px;
-            font-weight: 500;
-            font-size: 0.95rem;
-            border: none;
-            transition: all 0.2s;
-            box-shadow: 0 4px 6px rgba(59, 130, 246, 0.25);
-        }
-        .stButton>button:hover {
-            background-color: #2563EB;
-            transform: translateY(-1px);
-            box-shadow: 0 6px 10px rgba(59, 130, 246, 0.4);
-        }
-        
-        /* Success message styling */
-        .success-message {
-            background-color: #064E3B;
-            padding: 12px;
-            border-radius: 6px;
-            border-left: 3px solid #10B981;
-            margin: 12px 0;
-            color: #D1FAE5;
-        }
-        
-        /* Colorful info card */
-        .info-card {
-            background-color: #1E3A8A;
-            background: linear-gradient(135deg, #1E3A8A 0%, #1E40AF 100%);
-            padding: 20px;
-            border-radius: 8px;
-            margin: 16px 0;
-            border: 1px solid #3B82F6;
-            box-shadow: 0 4px 12px rgba(59, 130, 246, 0.2);
-        }
-        
-        .info-card p {
-            font-size: 1rem !important;
-            color: #E0E7FF !important;
-            line-height: 1.6 !important;
-        }
-        
-        /* Gradient response box styling */
-        .response-box {
-            background: linear-gradient(135deg, #1F2937 0%, #111827 100%);
-            padding: 20px;
-            border-radius: 8px;
-            margin: 12px 0;
-            border: 1px solid #3B82F6;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-        }
-        
-        /* Section header */
-        .section-header {
-            color: #60A5FA;
-            padding-bottom: 8px;
-            margin: 20px 0 12px 0;
-            font-weight: 600;
-            border-bottom: 1px solid #374151;
-            font-size: 1.1rem;
-        }
-        
-        /* File uploader */
-        .stFileUploader {
-            margin: 12px 0;
-        }
-        .stFileUploader > div {
-            background-color: #1F2937;
-            border-color: #4B5563;
-        }
-        
-        /* Sidebar styling */
-        .css-1d391kg {
-            background-color: #111827;
-        }
-        
-        /* Colorful model card styling */
-        .model-card {
-            padding: 10px;
-            border-radius: 6px;
-            text-align: center;
-            margin-bottom: 12px;
-            border: 1px solid #3B82F6;
-            background: linear-gradient(135deg, #1E3A8A 0%, #1E40AF 100%);
-            transition: all 0.2s;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.2);
-        }
-        .model-card:hover {
-            box-shadow: 0 6px 12px rgba(59, 130, 246, 0.3);
-            transform: translateY(-2px);
-        }
-        
-        /* Stats styling */
-        .stat-value {
-            font-size: 1.2rem !important;
-            font-weight: 600 !important;
-            color: #60A5FA !important;
-            text-align: center;
-        }
-        
-        .stat-label {
-            font-weight: 500 !important;
-            color: #9CA3AF !important;
-            text-align: center;
-            font-size: 0.85rem !important;
-        }
-
-        /* Code editor and output */
-        pre {
-            background-color: #1F2937;
-            color: #E2E8F0;
-            border-radius: 6px;
-            border: 1px solid #374151;
-        }
-
-        code {
-            color: #60A5FA;
-        }
-
-        .streamlit-expanderHeader {
-            color: #E2E8F0 !important;
-            font-weight: 500;
-        }
-        
-        /* Scrollbar styling */
-        ::-webkit-scrollbar {
-            width: 8px;
-            height: 8px;
-        }
-        
-        ::-webkit-scrollbar-track {
-            background: #1F2937;
-            border-radius: 4px;
-        }
-        
-        ::-webkit-scrollbar-thumb {
-            background: #4B5563;
-            border-radius: 4px;
-        }
-        
-        ::-webkit-scrollbar-thumb:hover {
-            background: #60A5FA;
-        }
-        
-        /* Input fields for dark theme */
-        .stSelectbox div[data-baseweb="select"] {
-            background-color: #1F2937;
-            border-radius: 6px;
-            border-color: #4B5563;
-            color: #F1F5F9;
-        }
-        
-        /* Spinner */
-        .stSpinner > div {
-            border-color: #3B82F6 transparent transparent transparent;
-        }
-        
-        /* Slider for temperature control */
-        .stSlider div[data-baseweb="slider"] > div {
-            background-color: #374151;
-        }
-        .stSlider div[data-baseweb="slider"] div[role="progressbar"] {
-            background-color: #3B82F6;
-        }
-        .stSlider div[data-baseweb="slider"] div[role="slider"] {
-            background-color: #60A5FA;
-            border-color: #60A5FA;
-            box-shadow: 0 0 5px rgba(59, 130, 246, 0.5);
-        }
-        
-        /* Model settings card */
-        .settings-card {
-            background: linear-gradient(135deg, #1E3A8A 0%, #1F2937 100%);
-            padding: 15px;
-            border-radius: 8px;
-            margin: 12px 0;
-            border: 1px solid #3B82F6;
-            box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        }
-        
-        /* Stats container */
-        .stats-container {
-            background: linear-gradient(135deg, #1F2937 0%, #111827 100%);
-            padding: 15px;
-            border-radius: 10px;
-            box-shadow: 0 4px 8px rgba(0,0,0,0.3);
-            margin-top: 10px;
-            border: 1px solid #3B82F6;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(get_page_style_block(), unsafe_allow_html=True)
 
 def add_model_selector():
     st.sidebar.markdown("<h3 class='section-header'>⚙️ Model Settings</h3>", unsafe_allow_html=True)
     
-    text_models = {
-        "Gemma 2 9B": "gemma2-9b-it",
-        "Llama 3 70B": "llama3-70b-8192",
-        "Claude 3 Haiku": "claude-3-haiku-20240307"
-    }
-    
     selected_model = st.sidebar.selectbox(
         "Select Text Model:",
-        list(text_models.keys())
+        list(TEXT_MODELS.keys()),
+        help="Auto sends short, simple prompts to the fastest model and long or code-heavy prompts to a larger one"
     )
     
-    temperature = st.sidebar.slider("Temperature:", 0.0, 1.0, 0.7, 0.1)
+    temperature = st.sidebar.slider("Temperature:", 0.0, 1.0, DEFAULT_TEMPERATURE, 0.1)
     
     # Add voice model information
-    st.sidebar.markdown("<div style='margin-top:20px;'></div>", unsafe_allow_html=True)
-    st.sidebar.markdown("<h3 class='section-header'>🎤 Voice Settings</h3>", unsafe_allow_html=True)
-    st.sidebar.markdown("""
-    <div style="background-color:#1E293B; padding:10px; border-radius:5px; border-left:3px solid #60A5FA;">
-        <p style="margin-bottom:5px; font-weight:600; color:#E2E8F0;">Current Voice Model:</p>
-        <p style="margin:0; color:#94A3B8;">Whisper Large v3</p>
-        <p style="margin-top:5px; font-size:0.8rem; color:#94A3B8;">Used for audio transcription</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.sidebar.markdown(static_html(VOICE_SETTINGS_HTML), unsafe_allow_html=True)
     
-    return text_models[selected_model], temperature
+    return TEXT_MODELS[selected_model], temperature
 
 def add_theme_toggle():
     """Create a toggle for switching between light and dark themes"""
@@ -337,7 +354,7 @@ def add_theme_toggle():
                     use_container_width=True, 
                     disabled=st.session_state.theme=="dark"):
             st.session_state.theme = "dark"
-            st.experimental_rerun()
+            st.rerun()
             
     with col2:
         if st.button("☀️ Light", 
@@ -345,7 +362,55 @@ def add_theme_toggle():
                     use_container_width=True,
                     disabled=st.session_state.theme=="light"):
             st.session_state.theme = "light"
-            st.experimental_rerun()
+            st.rerun()
+
+# Static sidebar fragments; minified once per process by static_html()
+SIDEBAR_HOW_TO_HTML = """
+<hr style='margin: 25px 0; border-color: #374151;'>
+<div class='section-header'>How to use:</div>
+<ol class="sidebar-text">
+    <li><strong>Text Tab:</strong> Type your code or question for AI analysis</li>
+    <li><strong>Image Tab:</strong> Upload screenshot of code/error for visual recognition</li>
+    <li><strong>Voice Tab:</strong> Speak your question for voice-to-text processing</li>
+    <li><strong>Code Execution:</strong> Run and test Python code snippets</li>
+    <li><strong>Translation:</strong> Convert code between languages</li>
+</ol>
+<hr style='margin: 25px 0; border-color: #374151;'>
+<div class='section-header'>Model Information</div>
+"""
+
+TEXT_MODEL_CARD_HTML = """
+<div class="model-card" style="background:linear-gradient(135deg, #0D4C92 0%, #1A73E8 100%);">
+    <p style="font-size:0.8rem !important;margin:0;color:#A5D8FF !important;font-weight:600;">TEXT MODEL</p>
+    <p style="font-weight:bold;margin:0;font-size:0.9rem !important;color:#E0F2FE !important;">{model}</p>
+</div>
+"""
+
+IMAGE_MODEL_CARD_HTML = """
+<div class="model-card" style="background:linear-gradient(135deg, #064E3B 0%, #059669 100%);">
+    <p style="font-size:0.8rem !important;margin:0;color:#A7F3D0 !important;font-weight:600;">IMAGE MODEL</p>
+    <p style="font-weight:bold;margin:0;font-size:0.9rem !important;color:#D1FAE5 !important;">Llama 4 Scout</p>
+</div>
+"""
+
+VOICE_MODEL_CARD_HTML = """
+<div class="model-card" style="background:linear-gradient(135deg, #581C87 0%, #9333EA 100%);">
+    <p style="font-size:0.8rem !important;margin:0;color:#E9D5FF !important;font-weight:600;">VOICE MODEL</p>
+    <p style="font-weight:bold;margin:0;font-size:0.9rem !important;color:#F3E8FF !important;">Google Speech API</p>
+</div>
+<hr style='margin: 25px 0; border-color: #374151;'>
+<div class='section-header'>📊 Usage Stats</div>
+"""
+
+VOICE_SETTINGS_HTML = """
+<div style='margin-top:20px;'></div>
+<h3 class='section-header'>🎤 Voice Settings</h3>
+<div style="background-color:#1E293B; padding:10px; border-radius:5px; border-left:3px solid #60A5FA;">
+    <p style="margin-bottom:5px; font-weight:600; color:#E2E8F0;">Current Voice Model:</p>
+    <p style="margin:0; color:#94A3B8;">Whisper Large v3</p>
+    <p style="margin-top:5px; font-size:0.8rem; color:#94A3B8;">Used for audio transcription</p>
+</div>
+"""
 
 def create_sidebar():
     """Create an informative sidebar with reordered elements"""
@@ -359,49 +424,20 @@ def create_sidebar():
         # MODEL SETTINGS - Now added here, above the other sections
         selected_model, temperature = add_model_selector()
         
-        st.markdown("<hr style='margin: 25px 0; border-color: #374151;'>", unsafe_allow_html=True)
-        
-        st.markdown("<div class='section-header'>How to use:</div>", unsafe_allow_html=True)
-        st.markdown("""
-        <ol class="sidebar-text">
-            <li><strong>Text Tab:</strong> Type your code or question for AI analysis</li>
-            <li><strong>Image Tab:</strong> Upload screenshot of code/error for visual recognition</li>
-            <li><strong>Voice Tab:</strong> Speak your question for voice-to-text processing</li>
-            <li><strong>Code Execution:</strong> Run and test Python code snippets</li>
-            <li><strong>Translation:</strong> Convert code between languages</li>
-        </ol>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("<hr style='margin: 25px 0; border-color: #374151;'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>Model Information</div>", unsafe_allow_html=True)
+        st.markdown(static_html(SIDEBAR_HOW_TO_HTML), unsafe_allow_html=True)
         
         # Create a more visually appealing model display with 3 models
         col1, col2 = st.columns(2)
         with col1:
-            st.markdown("""
-            <div class="model-card" style="background:linear-gradient(135deg, #0D4C92 0%, #1A73E8 100%);">
-                <p style="font-size:0.8rem !important;margin:0;color:#A5D8FF !important;font-weight:600;">TEXT MODEL</p>
-                <p style="font-weight:bold;margin:0;font-size:0.9rem !important;color:#E0F2FE !important;">Gemma 2 9B</p>
-            </div>
-            """, unsafe_allow_html=True)
+            model_label = "Auto" if selected_model == AUTO_MODEL else next(
+                label for label, model in TEXT_MODELS.items() if model == selected_model
+            )
+            st.markdown(static_html(TEXT_MODEL_CARD_HTML.format(model=model_label)), unsafe_allow_html=True)
         with col2:
-            st.markdown("""
-            <div class="model-card" style="background:linear-gradient(135deg, #064E3B 0%, #059669 100%);">
-                <p style="font-size:0.8rem !important;margin:0;color:#A7F3D0 !important;font-weight:600;">IMAGE MODEL</p>
-                <p style="font-weight:bold;margin:0;font-size:0.9rem !important;color:#D1FAE5 !important;">Llama 4 Scout</p>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(static_html(IMAGE_MODEL_CARD_HTML), unsafe_allow_html=True)
             
         # Add voice model information
-        st.markdown("""
-        <div class="model-card" style="background:linear-gradient(135deg, #581C87 0%, #9333EA 100%);">
-            <p style="font-size:0.8rem !important;margin:0;color:#E9D5FF !important;font-weight:600;">VOICE MODEL</p>
-            <p style="font-weight:bold;margin:0;font-size:0.9rem !important;color:#F3E8FF !important;">Google Speech API</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("<hr style='margin: 25px 0; border-color: #374151;'>", unsafe_allow_html=True)
-        st.markdown("<div class='section-header'>📊 Usage Stats</div>", unsafe_allow_html=True)
+        st.markdown(static_html(VOICE_MODEL_CARD_HTML), unsafe_allow_html=True)
         
         # Initialize counters
         if "text_queries" not in st.session_state:
@@ -491,6 +527,19 @@ def create_text_tab():
     
     return user_input, submit_button
 
+def create_follow_up_buttons(follow_ups, ready=()):
+    """Show one button per follow-up question; returns the key of the one clicked, if any
+    
+    Follow-ups whose answer has already been prefetched are marked with ⚡.
+    """
+    clicked = None
+    columns = st.columns(len(follow_ups))
+    for column, (key, (label, _, _)) in zip(columns, follow_ups.items()):
+        with column:
+            if st.button(f"{label} ⚡" if key in ready else label, key=f"follow_up_{key}", use_container_width=True):
+                clicked = key
+    return clicked
+
 def create_image_tab():
     """Create the image upload tab with styling"""
     st.markdown("<div class='section-header'>📸 Analyze Code Screenshot</div>", unsafe_allow_html=True)
@@ -578,16 +627,8 @@ def create_fallback_voice_tab():
     process_button = st.button("🔊 Process Voice Recording", use_container_width=True, disabled=uploaded_file is None)
     
     if uploaded_file and process_button:
-        # Save the uploaded file temporarily
-        temp_dir = os.path.join(os.getcwd(), "temp_audio")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, f"uploaded_{uploaded_file.name}")
-        
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        # Return the audio file path for processing
-        return temp_path
+        # Return the uploaded recording; the caller streams it from the upload buffer
+        return uploaded_file
     
     return None
 
@@ -628,6 +669,132 @@ def create_code_translation_tab():
     
     return source_language, target_language, source_code, translate_button
 
+def format_bytes(num_bytes):
+    """Format a byte count for display"""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+def display_workspace_usage(stats):
+    """Show temporary workspace disk usage in the sidebar"""
+    with st.sidebar.expander("💾 Workspace Usage"):
+        st.caption(
+            f"This session: {format_bytes(stats['session_bytes'])} of "
+            f"{format_bytes(stats['session_quota_bytes'])} "
+            f"({stats['session_workspaces']} workspaces)"
+        )
+        st.progress(min(stats["session_bytes"] / stats["session_quota_bytes"], 1.0))
+        st.caption(
+            f"All sessions: {format_bytes(stats['global_bytes'])} of "
+            f"{format_bytes(stats['global_quota_bytes'])} "
+            f"({stats['workspaces']} workspaces)"
+        )
+        st.progress(min(stats["global_bytes"] / stats["global_quota_bytes"], 1.0))
+        st.caption(f"Evicted: {stats['evictions']} · Reaped: {stats['reaped']}")
+
+def display_memory_usage(stats):
+    """Show the memory held by this session and by all sessions in the sidebar"""
+    with st.sidebar.expander("🧠 Memory Usage"):
+        session_bytes = stats["session_resident_bytes"] + stats["session_spilled_bytes"]
+        st.caption(
+            f"This session: {format_bytes(session_bytes)} of "
+            f"{format_bytes(stats['session_cap_bytes'])} "
+            f"({format_bytes(stats['session_spilled_bytes'])} spilled to disk)"
+        )
+        st.progress(min(session_bytes / max(stats["session_cap_bytes"], 1), 1.0))
+        for label, held_bytes in stats["session_by_label"].items():
+            st.caption(f"{label}: {format_bytes(held_bytes)}")
+        st.caption(
+            f"All sessions: {format_bytes(stats['resident_bytes'])} in memory, "
+            f"{format_bytes(stats['spilled_bytes'])} spilled ({stats['sessions']} sessions)"
+        )
+        st.caption(f"Rejected: {stats['rejections']} · Spilled payloads: {stats['spills']}")
+
+def display_request_metrics(snapshot, routing_stats, prometheus_text):
+    """Show process-wide request latency, token and cache figures per model and tab in the sidebar"""
+    rows, cache_hits = snapshot
+    with st.sidebar.expander("📈 Request Metrics"):
+        if not rows and not cache_hits:
+            st.caption("No model requests yet")
+            return
+        for row in rows:
+            st.markdown(f"**{row['model']}** · {row['tab']}")
+            st.caption(
+                f"{row['requests']} requests · {row['errors']} errors · "
+                f"{row['prompt_tokens']} prompt / {row['completion_tokens']} completion tokens"
+            )
+            st.caption(
+                f"Latency p50/p95/p99: {row['latency_p50']:.2f} / {row['latency_p95']:.2f} / {row['latency_p99']:.2f}s · "
+                f"First token p50: {row['ttft_p50']:.2f}s · Queue p95: {row['queue_p95']:.2f}s"
+            )
+        if cache_hits:
+            st.caption("Cache hits: " + ", ".join(
+                f"{model} · {tab} {hits}" for (model, tab), hits in cache_hits.items()
+            ))
+        routed = {model: stats["routed"] for model, stats in routing_stats.items() if stats["routed"]}
+        if routed:
+            st.caption("Auto routing: " + ", ".join(f"{model} {count}" for model, count in routed.items()))
+        st.download_button(
+            "Download Prometheus metrics",
+            prometheus_text,
+            file_name="codehelper-metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+def display_speculation_stats(stats):
+    """Show how well prefetching follow-up answers pays off, in the sidebar"""
+    if not stats["started"] and not stats["skipped"]:
+        return
+    with st.sidebar.expander("⚡ Prefetched Follow-ups"):
+        st.caption(
+            f"Prefetched: {stats['started']} · Used: {stats['hits']} ({stats['hit_rate']:.0%}) · "
+            f"Failed: {stats['failed']}"
+        )
+        st.caption(
+            f"Tokens used: {stats['used_tokens']} · Wasted: {stats['wasted_tokens']} "
+            f"({stats['wasted']} answers nobody asked for)"
+        )
+        if stats["prefetched"]:
+            st.caption("By follow-up: " + ", ".join(
+                f"{key} {count} prefetched / {stats['clicks'].get(key, 0)} clicked"
+                for key, count in stats["prefetched"].items()
+            ))
+        if stats["skipped"]:
+            st.caption("Skipped: " + ", ".join(f"{reason} {count}" for reason, count in stats["skipped"].items()))
+        if stats["budget"]["paused"]:
+            st.caption("Paused after a rate limit response")
+
+def display_semantic_cache_stats(stats):
+    """Show how often questions are answered from similar earlier ones, in the sidebar"""
+    lookups = stats["hits"] + stats["misses"]
+    if not lookups:
+        return
+    with st.sidebar.expander("♻️ Similar Questions"):
+        st.caption(
+            f"Answered from similar questions: {stats['hits']} of {lookups} ({stats['hits'] / lookups:.0%}) · "
+            f"Cached: {stats['entries']}"
+        )
+        st.caption(
+            f"Similarity threshold: {stats['threshold']:.2f} · Lookup: {stats['mean_lookup_ms']:.2f} ms · "
+            f"Index: {stats['index_bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+def display_conversation(conversation):
+    """Show the earlier turns of the Text Input conversation"""
+    with st.expander(f"💬 Conversation so far ({len(conversation)} questions)"):
+        for message in conversation.transcript:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+        notes = []
+        if conversation.summarized_messages:
+            notes.append(f"{conversation.summarized_messages // 2} older questions are sent as a summary")
+        if conversation.deduplicated_tokens:
+            notes.append(f"~{conversation.deduplicated_tokens} tokens of repeated code sent as references")
+        if notes:
+            st.caption(" · ".join(notes))
+
 def display_response(response, response_type="text"):
     """Display AI response with nice formatting"""
     st.markdown("<div class='section-header'>✨ AI Response</div>", unsafe_allow_html=True)
@@ -654,7 +821,7 @@ def display_response(response, response_type="text"):
         )
     with col3:
         if st.button("🔄 New Question"):
-            st.experimental_rerun()
+            st.rerun()
 
 def display_loading_animation():
     """Display a custom loading animation"""
@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MAX_WORKERS = max(1, min(8, (os.cpu_count() or 1)))
+
+def iter_batches(items, size):
+    """Group an iterable into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def process_pool(max_workers=DEFAULT_MAX_WORKERS):
+    """Create a process pool whose workers never inherit the app's threads
+
+    Workers are forked from a clean single-threaded server process rather than
+    from the app itself, which runs background threads (spawn where forkserver
+    is unavailable).
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+
+def map_batches(function, items, batch_size, max_workers=DEFAULT_MAX_WORKERS, args=()):
+    """Yield function(batch, *args) for batches of items, computed in a process pool
+
+    Only a few batches are in flight at a time, so items (typically file texts
+    streamed from a project index) are never all held in memory. Results are
+    yielded in batch order. function must be importable at module level.
+    """
+    with process_pool(max_workers) as executor:
+        pending = deque()
+        for batch in iter_batches(items, batch_size):
+            pending.append(executor.submit(function, batch, *args))
+            if len(pending) >= max_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,277 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# Defaults can be overridden through environment variables on long-running hosts
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "codehelper-workspaces")
+DEFAULT_SESSION_QUOTA_BYTES = int(os.getenv("CODEHELPER_SESSION_QUOTA_MB", "512")) * 1024 * 1024
+DEFAULT_GLOBAL_QUOTA_BYTES = int(os.getenv("CODEHELPER_GLOBAL_QUOTA_MB", "4096")) * 1024 * 1024
+DEFAULT_IDLE_TTL_SECONDS = int(os.getenv("CODEHELPER_WORKSPACE_TTL_SECONDS", "3600"))
+DEFAULT_REAP_INTERVAL_SECONDS = 60
+
+class WorkspaceQuotaError(Exception):
+    """Raised when a workspace cannot be created or grown within the disk quotas"""
+
+def directory_size(path):
+    """Return the total size in bytes of all regular files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+class Workspace:
+    """A temporary directory owned by one session"""
+
+    def __init__(self, path, session_id, kind):
+        self.path = path
+        self.session_id = session_id
+        self.kind = kind
+        self.size = 0
+        self.refcount = 0
+        self.kept = False
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+class WorkspaceManager:
+    """Tracks temporary directories per session and keeps them within disk quotas
+
+    Workspaces are reference counted while something reads or writes them and
+    are never deleted while referenced. Once the last reference is released a
+    workspace is deleted, unless keep() marked it to stay on disk between uses
+    (e.g. a project cached in a Streamlit session, which can disappear without
+    cleaning up). Unreferenced kept workspaces are evicted least recently used
+    first when a quota would be exceeded, and a background reaper removes them
+    once they have been idle longer than the TTL.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, session_quota_bytes=DEFAULT_SESSION_QUOTA_BYTES,
+                 global_quota_bytes=DEFAULT_GLOBAL_QUOTA_BYTES, idle_ttl_seconds=DEFAULT_IDLE_TTL_SECONDS):
+        self.root = root
+        self.session_quota_bytes = session_quota_bytes
+        self.global_quota_bytes = global_quota_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._workspaces = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+        self._stop_event = threading.Event()
+        self.evictions = 0
+        self.reaped = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    # --- lifecycle ---
+
+    def create(self, session_id, kind="project", expected_bytes=0):
+        """Create a new workspace directory for a session and take a reference to it"""
+        with self._lock:
+            self._make_room(session_id, expected_bytes)
+            path = os.path.join(self.root, f"{kind}-{uuid.uuid4().hex}")
+            os.makedirs(path)
+            workspace = Workspace(path, session_id, kind)
+            workspace.size = expected_bytes
+            workspace.refcount = 1
+            self._workspaces[path] = workspace
+            return path
+
+    def acquire(self, path):
+        """Take an additional reference to a workspace"""
+        with self._lock:
+            workspace = self._workspaces.get(path)
+            if workspace is None:
+                return False
+            workspace.refcount += 1
+            workspace.last_used = time.time()
+            return True
+
+    def release(self, path):
+        """Drop a reference to a workspace, deleting it when no references remain unless it is kept"""
+        with self._lock:
+            workspace = self._workspaces.get(path)
+            if workspace is None:
+                return
+            workspace.refcount -= 1
+            workspace.last_used = max(workspace.last_used, time.time())
+            if workspace.refcount <= 0 and not workspace.kept:
+                self._remove(workspace)
+
+    def keep(self, path):
+        """Keep a workspace on disk after its last reference is released, until it is evicted or reaped"""
+        with self._lock:
+            workspace = self._workspaces.get(path)
+            if workspace is not None:
+                workspace.kept = True
+
+    def discard(self, path):
+        """Undo keep(): delete the workspace now, or when its last reference is released"""
+        with self._lock:
+            workspace = self._workspaces.get(path)
+            if workspace is None:
+                return
+            workspace.kept = False
+            if workspace.refcount <= 0:
+                self._remove(workspace)
+
+    def touch(self, path):
+        """Mark a workspace as recently used"""
+        with self._lock:
+            workspace = self._workspaces.get(path)
+            if workspace is not None:
+                workspace.last_used = time.time()
+
+    def update_size(self, path):
+        """Measure a workspace after it was filled and enforce the quotas
+
+        Raises WorkspaceQuotaError (and deletes the workspace) if it does not fit
+        even after evicting every unreferenced workspace.
+        """
+        size = directory_size(path)
+        with self._lock:
+            workspace = self._workspaces.get(path)
+            if workspace is None:
+                return size
+            workspace.size = 0
+            try:
+                self._make_room(workspace.session_id, size)
+            except WorkspaceQuotaError:
+                self._remove(workspace)
+                raise
+            workspace.size = size
+            workspace.last_used = time.time()
+            return size
+
+    def workspace_for(self, path):
+        """Return the tracked workspace that contains path, if any"""
+        path = os.path.abspath(path)
+        with self._lock:
+            for workspace_path, workspace in self._workspaces.items():
+                if path == workspace_path or path.startswith(workspace_path + os.sep):
+                    return workspace
+        return None
+
+    # --- quota enforcement ---
+
+    def _session_usage(self, session_id):
+        return sum(w.size for w in self._workspaces.values() if w.session_id == session_id)
+
+    def _global_usage(self):
+        return sum(w.size for w in self._workspaces.values())
+
+    def _make_room(self, session_id, needed_bytes):
+        """Evict unreferenced workspaces (least recently used first) until needed_bytes fits"""
+        if needed_bytes > self.session_quota_bytes or needed_bytes > self.global_quota_bytes:
+            raise WorkspaceQuotaError(
+                f"Workspace needs {needed_bytes / 1024 / 1024:.1f} MB, which exceeds the disk quota"
+            )
+
+        def over_quota():
+            return (self._session_usage(session_id) + needed_bytes > self.session_quota_bytes or
+                    self._global_usage() + needed_bytes > self.global_quota_bytes)
+
+        candidates = sorted(
+            (w for w in self._workspaces.values() if w.refcount <= 0),
+            key=lambda w: w.last_used
+        )
+        for workspace in candidates:
+            if not over_quota():
+                break
+            # Only evict from other sessions when the global quota is the problem
+            session_full = self._session_usage(session_id) + needed_bytes > self.session_quota_bytes
+            if session_full and workspace.session_id != session_id:
+                continue
+            self._remove(workspace)
+            self.evictions += 1
+
+        if over_quota():
+            raise WorkspaceQuotaError(
+                "Not enough workspace disk quota available. Close other projects or try again later."
+            )
+
+    def _remove(self, workspace):
+        self._workspaces.pop(workspace.path, None)
+        shutil.rmtree(workspace.path, ignore_errors=True)
+
+    # --- background reaping ---
+
+    def reap(self, now=None):
+        """Delete idle workspaces and leftover directories from earlier processes
+
+        Referenced workspaces are never idle: their last use is moved to now.
+        """
+        now = now if now is not None else time.time()
+        removed = 0
+        with self._lock:
+            for workspace in list(self._workspaces.values()):
+                if workspace.refcount > 0:
+                    workspace.last_used = max(workspace.last_used, now)
+                elif now - workspace.last_used > self.idle_ttl_seconds:
+                    self._remove(workspace)
+                    removed += 1
+
+            tracked = set(self._workspaces)
+            try:
+                entries = os.listdir(self.root)
+            except FileNotFoundError:
+                entries = []
+            for name in entries:
+                path = os.path.join(self.root, name)
+                if path in tracked:
+                    continue
+                try:
+                    idle = now - os.path.getmtime(path)
+                except OSError:
+                    continue
+                if idle > self.idle_ttl_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+
+            self.reaped += removed
+        return removed
+
+    def start_reaper(self, interval_seconds=DEFAULT_REAP_INTERVAL_SECONDS):
+        """Start the background reaper thread (idempotent)"""
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(interval_seconds):
+                try:
+                    self.reap()
+                except Exception:
+                    pass  # Never let a transient filesystem error kill the reaper
+
+        self._reaper = threading.Thread(target=run, name="workspace-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self):
+        """Stop the background reaper thread"""
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+    # --- metrics ---
+
+    def stats(self, session_id=None):
+        """Return current usage figures, optionally including one session's usage"""
+        with self._lock:
+            stats = {
+                "workspaces": len(self._workspaces),
+                "global_bytes": self._global_usage(),
+                "global_quota_bytes": self.global_quota_bytes,
+                "session_quota_bytes": self.session_quota_bytes,
+                "evictions": self.evictions,
+                "reaped": self.reaped,
+            }
+            if session_id is not None:
+                stats["session_bytes"] = self._session_usage(session_id)
+                stats["session_workspaces"] = sum(
+                    1 for w in self._workspaces.values() if w.session_id == session_id
+                )
+            return stats